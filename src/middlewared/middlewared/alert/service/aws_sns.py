@@ -1,7 +1,8 @@
-import boto3
-
 from middlewared.alert.base import ThreadedAlertService
 from middlewared.schema import Dict, Password, Str
+from middlewared.utils.python import lazy_import
+
+boto3 = lazy_import('boto3')
 
 
 class AWSSNSAlertService(ThreadedAlertService):
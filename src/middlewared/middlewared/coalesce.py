@@ -0,0 +1,90 @@
+import asyncio
+from collections import defaultdict
+
+from middlewared.client import ejson as json
+
+# Expired cached results are removed once there are more than this many of them
+CACHE_PRUNE_SIZE = 1000
+
+
+class CallCoalescer:
+    """
+    Single-flight execution of the methods marked with `@coalesce`: concurrent calls of the same method with the same
+    arguments (made by clients with the same credentials if the method receives `app`) share one execution and its
+    result. If the method has a `ttl`, the result is also returned to identical calls made within `ttl` seconds after
+    the execution has finished.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.cache = {}
+        self.counters = defaultdict(lambda: {'executed': 0, 'coalesced': 0, 'cached': 0})
+
+    def key(self, name, methodobj, params, app):
+        """
+        Returns the key identifying calls that can share one execution or `None` if the call can not be coalesced.
+        """
+        if hasattr(methodobj, '_job'):
+            return None
+
+        credentials = None
+        if hasattr(methodobj, '_pass_app'):
+            if app is None or app.authenticated_credentials is None:
+                return None
+
+            credentials = (
+                app.authenticated_credentials.class_name(),
+                json.dumps(app.authenticated_credentials.dump(), sort_keys=True),
+            )
+
+        try:
+            params = json.dumps(params, sort_keys=True)
+        except TypeError:
+            return None
+
+        return name, credentials, params
+
+    async def call(self, name, key, ttl, call):
+        """
+        Returns the result of the coroutine function `call` shared with the other calls with the same `key`.
+        """
+        counters = self.counters[name]
+        loop = asyncio.get_running_loop()
+
+        if (cached := self.cache.get(key)) is not None:
+            expires, result = cached
+            if expires > loop.time():
+                counters['cached'] += 1
+                return result
+
+            del self.cache[key]
+
+        if (task := self.in_flight.get(key)) is None:
+            counters['executed'] += 1
+            task = self.in_flight[key] = loop.create_task(self._run(key, ttl, call))
+            # All the callers might have been cancelled
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
+            counters['coalesced'] += 1
+
+        # Cancelling one of the callers must not cancel the execution shared with the others
+        return await asyncio.shield(task)
+
+    async def _run(self, key, ttl, call):
+        try:
+            result = await call()
+        finally:
+            del self.in_flight[key]
+
+        if ttl:
+            loop = asyncio.get_running_loop()
+            if len(self.cache) >= CACHE_PRUNE_SIZE:
+                now = loop.time()
+                self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+
+            self.cache[key] = (loop.time() + ttl, result)
+
+        return result
+
+    def stats(self):
+        return {name: dict(counters) for name, counters in sorted(self.counters.items())}
@@ -1,9 +1,10 @@
 import asyncio
 import contextlib
-from collections import OrderedDict
+from collections import defaultdict, OrderedDict
 import copy
 from datetime import datetime
 import enum
+import heapq
 import logging
 import os
 import shutil
@@ -12,6 +13,8 @@ import time
 import traceback
 import threading
 
+from middlewared.job_history import JobsHistory
+from middlewared.utils.type import trusted_method
 from middlewared.service_exception import CallError, ValidationError, ValidationErrors, adapt_exception
 from middlewared.pipe import Pipes
 
@@ -28,6 +31,9 @@ class State(enum.Enum):
     ABORTED = 5
 
 
+FINISHED_STATES = (State.SUCCESS, State.FAILED, State.ABORTED)
+
+
 class JobSharedLock(object):
     """
     Shared lock for jobs.
@@ -75,6 +81,11 @@ class JobsQueue(object):
         # Shared lock (JobSharedLock) dict
         self.job_locks = {}
 
+        # Finished jobs are persisted once the system dataset is available
+        self.history = JobsHistory()
+        self.history_lock = asyncio.Lock()
+        self.history_opened = False
+
         self.middleware.event_register('core.get_jobs', 'Updates on job changes.')
 
     def __getitem__(self, item):
@@ -87,17 +98,14 @@ class JobsQueue(object):
         return self.deque.all()
 
     def for_username(self, username):
-        out = {}
-        for jid, job in self.all().items():
-            if job.credentials is None or not job.credentials.is_user_session:
-                continue
+        return {job.id: job for job in self.deque.select([], username)}
 
-            if job.credentials.user['username'] != username:
-                continue
-
-            out[jid] = job
-
-        return out
+    def select(self, filters, username=None):
+        """
+        Returns jobs that might match `filters` (and are owned by `username` if it is specified) without having to
+        encode all of them. See `JobsDeque.select`.
+        """
+        return self.deque.select(filters, username)
 
     def add(self, job):
         self.handle_lock(job)
@@ -118,6 +126,79 @@ class JobsQueue(object):
     def remove(self, job_id):
         self.deque.remove(job_id)
 
+    async def persist(self, job):
+        """
+        Stores finished `job` in the persistent jobs history.
+        """
+        if job.options['transient'] or not self.history.available():
+            return
+
+        try:
+            async with self.history_lock:
+                if self.history_opened:
+                    jobs = [job]
+                else:
+                    await self.open_history()
+                    # Also store the jobs that have finished before the history became available
+                    jobs = [
+                        finished_job
+                        for finished_job in self.deque.select([['state', 'in', [s.name for s in FINISHED_STATES]]])
+                        if not finished_job.options['transient']
+                    ]
+
+                await self.middleware.run_in_thread(self.history.add, [
+                    (finished_job.__encode__(False), finished_job.username()) for finished_job in jobs
+                ])
+        except Exception:
+            logger.warning('Failed to persist job %r', job.id, exc_info=True)
+
+    async def open_history(self):
+        last_id = await self.middleware.run_in_thread(self.history.last_id)
+        # Jobs of this run must not share ids with the jobs of the previous runs
+        first_id = self.deque.count
+        self.deque.count = max(first_id, last_id)
+        await self.middleware.run_in_thread(self.history.open, first_id)
+        self.history_opened = True
+
+    def query_history(self, filters, options, username=None):
+        """
+        Returns encoded jobs from the persistent history that are no longer in memory and might match `filters`.
+        See `JobsHistory.query`.
+        """
+        if not self.history_opened or self._only_in_memory(filters) or not self.history.available():
+            return []
+
+        return self.history.query(filters, options, username, list(self.deque.all()))
+
+    def _only_in_memory(self, filters):
+        """
+        Returns `True` if top-level `id` or `state` filters can only match the jobs that are kept in memory (i.e. jobs
+        that are still running or the ones that have specific ids).
+        """
+        finished_states = {state.name for state in FINISHED_STATES}
+        for f in filters:
+            if not isinstance(f, (list, tuple)) or len(f) != 3:
+                continue
+
+            name, op, value = f
+            if op == '=':
+                values = [value]
+            elif op == 'in' and isinstance(value, (list, tuple)):
+                values = value
+            else:
+                continue
+
+            try:
+                if name == 'id' and all(self.deque.get(id_) is not None for id_ in values):
+                    return True
+                if name == 'state' and not finished_states & set(values):
+                    return True
+            except TypeError:
+                # Unhashable filter value
+                continue
+
+        return False
+
     def handle_lock(self, job):
         name = job.get_lock_name()
         if name is None:
@@ -192,6 +273,12 @@ class JobsDeque(object):
         self.maxlen = maxlen
         self.count = 0
         self.__dict = OrderedDict()
+        # Job ids by state name and by the username of the user session that started the job
+        self.__by_state = defaultdict(set)
+        self.__by_username = defaultdict(set)
+        # Heap of finished job ids. Ids of the jobs that have been removed otherwise are only discarded once they
+        # reach the top.
+        self.__finished = []
         with contextlib.suppress(FileNotFoundError):
             shutil.rmtree(LOGS_DIR)
 
@@ -211,23 +298,86 @@ class JobsDeque(object):
     def add(self, job):
         job.set_id(self._get_next_id())
         if len(self.__dict) > self.maxlen:
-            for old_job_id, old_job in self.__dict.items():
-                if old_job.state in (State.SUCCESS, State.FAILED, State.ABORTED):
-                    self.remove(old_job_id)
-                    break
+            while self.__finished and self.__finished[0] not in self.__dict:
+                heapq.heappop(self.__finished)
+
+            if self.__finished:
+                # Job ids are assigned in the order jobs are added so the lowest one is the oldest job
+                self.remove(heapq.heappop(self.__finished))
             else:
                 logger.warning("There are %d jobs waiting or running", len(self.__dict))
+        self._index(job)
+
+    def _index(self, job):
         self.__dict[job.id] = job
+        self.__by_state[job.state.name].add(job.id)
+        if job.state in FINISHED_STATES:
+            heapq.heappush(self.__finished, job.id)
+        if (username := job.username()) is not None:
+            self.__by_username[username].add(job.id)
+
+        job.jobs_deque = self
+
+    def state_changed(self, job, old_state):
+        if job.id in self.__dict:
+            self.__by_state[old_state.name].discard(job.id)
+            self.__by_state[job.state.name].add(job.id)
+            if job.state in FINISHED_STATES and old_state not in FINISHED_STATES:
+                heapq.heappush(self.__finished, job.id)
 
     def remove(self, job_id):
         if job_id in self.__dict:
-            self.__dict[job_id].cleanup()
-            del self.__dict[job_id]
+            job = self.__dict.pop(job_id)
+            job.cleanup()
+            self.__by_state[job.state.name].discard(job_id)
+            if (username := job.username()) is not None:
+                self.__by_username[username].discard(job_id)
+
+    def select(self, filters, username=None):
+        """
+        Returns jobs (in the order they were added) that might match `filters`. Top-level `id` and `state` equality
+        and `in` filters are resolved using indexes, the rest of the filters must still be applied by the caller.
+
+        If `username` is specified then only jobs started by that user session are returned.
+        """
+        ids = None
+        if username is not None:
+            ids = set(self.__by_username.get(username, ()))
+
+        for f in filters:
+            if not isinstance(f, (list, tuple)) or len(f) != 3:
+                continue
+
+            name, op, value = f
+            try:
+                if op == '=':
+                    values = {value}
+                elif op == 'in':
+                    values = set(value)
+                else:
+                    continue
+
+                if name == 'id':
+                    matching = values
+                elif name == 'state':
+                    matching = set().union(*[self.__by_state.get(state, ()) for state in values])
+                else:
+                    continue
+            except TypeError:
+                # Unhashable filter value
+                continue
+
+            ids = matching if ids is None else ids & matching
+
+        if ids is None:
+            return list(self.__dict.values())
+
+        return [self.__dict[job_id] for job_id in sorted(ids) if job_id in self.__dict]
 
     async def receive(self, middleware, job_dict, logs):
         job_dict['id'] = self._get_next_id()
         job = await Job.receive(middleware, job_dict, logs)
-        self.__dict[job.id] = job
+        self._index(job)
 
 
 class Job:
@@ -274,11 +424,20 @@ class Job:
         self.loop = self.middleware.loop
         self.future = None
         self.wrapped = []
+        # `threading.Event`s the job waits for when it is aborted (see `wait_on_abort`)
+        self.abort_waits = []
 
         self.logs_path = None
         self.logs_fd = None
         self.logs_excerpt = None
 
+        # `JobsDeque` this job is indexed in
+        self.jobs_deque = None
+        # `raw_result` -> encoded job. Replaced with a new dict every time the job changes.
+        self._encoded = {}
+        # Job arguments never change so they are only dumped once
+        self._dumped_arguments = None
+
         if self.options["check_pipes"]:
             for pipe in self.options["pipes"]:
                 self.check_pipe(pipe)
@@ -304,26 +463,44 @@ class Job:
             lock_name = lock_name(self.args)
         return lock_name
 
+    def username(self):
+        """
+        Returns the username of the user session that started the job (if any).
+        """
+        if self.credentials is not None and self.credentials.is_user_session:
+            return self.credentials.user['username']
+
     def set_id(self, id_):
         self.id = id_
+        self._changed()
 
     def set_result(self, result):
         self.result = result
+        self._changed()
 
     def set_exception(self, exc_info):
         self.error = str(exc_info[1])
         self.exception = ''.join(traceback.format_exception(*exc_info))
         self.exc_info = exc_info
+        self._changed()
 
     def set_state(self, state):
         if self.state == State.WAITING:
             assert state not in ('WAITING', 'SUCCESS')
         if self.state == State.RUNNING:
             assert state not in ('WAITING', 'RUNNING')
-        assert self.state not in (State.SUCCESS, State.FAILED, State.ABORTED)
+        assert self.state not in FINISHED_STATES
+        old_state = self.state
         self.state = State.__members__[state]
-        if self.state in (State.SUCCESS, State.FAILED, State.ABORTED):
+        if self.state in FINISHED_STATES:
             self.time_finished = datetime.utcnow()
+        self._changed()
+
+        if self.jobs_deque is not None:
+            self.jobs_deque.state_changed(self, old_state)
+
+    def _changed(self):
+        self._encoded = {}
 
     def set_description(self, description):
         """
@@ -334,6 +511,7 @@ class Job:
         """
         if self.description != description:
             self.description = description
+            self._changed()
             self.middleware.send_event('core.get_jobs', 'CHANGED', id=self.id, fields=self.__encode__())
 
     def set_progress(self, percent=None, description=None, extra=None):
@@ -343,7 +521,7 @@ class Job:
 
         Don't change this too often as every time an event is sent. Use :class:`middlewared.job.JobProgressBuffer` to
         throttle progress reporting if you are receiving it from an external source (e.g. network response reading
-        progress).
+        progress). The event only contains job `id`, `method`, `arguments`, `state` and `progress`.
 
         :param percent: Job progress [0-100]
         :param description: Human-readable description of what the job is currently doing.
@@ -364,15 +542,23 @@ class Job:
                 self.progress['extra'] = extra
                 changed = True
 
-        encoded = self.__encode__()
+        if changed:
+            self._changed()
+
         if self.on_progress_cb:
             try:
-                self.on_progress_cb(encoded)
+                self.on_progress_cb(self.__encode__())
             except Exception:
                 logger.warning('Failed to run on progress callback', exc_info=True)
 
         if changed:
-            self.middleware.send_event('core.get_jobs', 'CHANGED', id=self.id, fields=encoded)
+            self.middleware.send_event('core.get_jobs', 'CHANGED', id=self.id, fields={
+                'id': self.id,
+                'method': self.method_name,
+                'arguments': self._arguments(),
+                'state': self.state.name,
+                'progress': dict(self.progress),
+            })
 
         for wrapped in self.wrapped:
             wrapped.set_progress(**self.progress)
@@ -412,6 +598,16 @@ class Job:
                 raise CallError(self.error)
         return self.result
 
+    def wait_on_abort(self, event):
+        """
+        Makes the job wait for `event` (a `threading.Event`) to be set before it releases its lock when it is aborted.
+
+        Aborting a job only cancels the future of a method that is run in a thread, the thread keeps running until the
+        method notices that the job was aborted. Such methods use this so that the next job with the same lock does not
+        start while they are still running.
+        """
+        self.abort_waits.append(event)
+
     def abort(self):
         if self.loop is not None and self.future is not None:
             self.loop.call_soon_threadsafe(self.future.cancel)
@@ -426,6 +622,7 @@ class Job:
 
         if self.options["logs"]:
             self.logs_path = self._logs_path()
+            self._changed()
             await self.middleware.run_in_thread(self.start_logging)
 
         try:
@@ -446,6 +643,8 @@ class Job:
                     raise
         except asyncio.CancelledError:
             self.set_state('ABORTED')
+            for event in self.abort_waits:
+                await self.middleware.run_in_thread(event.wait)
         except Exception as e:
             self.set_state('FAILED')
             self.set_exception(sys.exc_info())
@@ -462,6 +661,8 @@ class Job:
             self.middleware.send_event('core.get_jobs', 'CHANGED', id=self.id, fields=self.__encode__())
             if self.options['transient']:
                 queue.remove(self.id)
+            else:
+                await queue.persist(self)
 
     async def __run_body(self):
         """
@@ -472,12 +673,13 @@ class Job:
         if self.options.get('process'):
             rv = await self.middleware._call_worker(self.method_name, *self.args, job={'id': self.id})
         else:
-            # Make sure args are not altered during job run
+            # Make sure args are not altered during job run. `@accepts` does not need to copy them again.
             args = copy.deepcopy(self.args)
-            if asyncio.iscoroutinefunction(self.method):
-                rv = await self.method(*([self] + args))
+            method = trusted_method(self.method)
+            if asyncio.iscoroutinefunction(method):
+                rv = await method(*([self] + args))
             else:
-                rv = await self.middleware.run_in_thread(self.method, *([self] + args))
+                rv = await self.middleware.run_in_thread(method, *([self] + args))
         self.set_result(rv)
         self.set_state('SUCCESS')
         if self.progress['percent'] != 100:
@@ -515,6 +717,7 @@ class Job:
                 return excerpt
 
             self.logs_excerpt = await self.middleware.run_in_thread(get_logs_excerpt)
+            self._changed()
 
     async def __close_pipes(self):
         def close_pipes():
@@ -526,6 +729,24 @@ class Job:
         await self.middleware.run_in_thread(close_pipes)
 
     def __encode__(self, raw_result=True):
+        """
+        Encoded job is cached until the job changes. Dump of the arguments and of the result is expensive and
+        `core.get_jobs` encodes every job on each call.
+        """
+        encoded = self._encoded
+        if (result := encoded.get(raw_result)) is None:
+            # If the job changes in the meantime, this is stored in the dict that was already discarded
+            result = encoded[raw_result] = self.__encode(raw_result)
+
+        return result
+
+    def _arguments(self):
+        if self._dumped_arguments is None:
+            self._dumped_arguments = self.middleware.dump_args(self.args, method=self.method)
+
+        return self._dumped_arguments
+
+    def __encode(self, raw_result):
         exc_info = None
         if self.exc_info:
             etype = self.exc_info[0]
@@ -550,13 +771,13 @@ class Job:
         return {
             'id': self.id,
             'method': self.method_name,
-            'arguments': self.middleware.dump_args(self.args, method=self.method),
+            'arguments': self._arguments(),
             'transient': self.options['transient'],
             'description': self.description,
             'abortable': self.options['abortable'],
             'logs_path': self.logs_path,
             'logs_excerpt': self.logs_excerpt,
-            'progress': self.progress,
+            'progress': dict(self.progress),
             'result': self.result if raw_result else self.middleware.dump_result(self.result, method=self.method),
             'error': self.error,
             'exception': self.exception,
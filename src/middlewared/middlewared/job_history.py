@@ -0,0 +1,276 @@
+from datetime import datetime, timezone
+import os
+import sqlite3
+import threading
+
+from middlewared.client import ejson as json
+
+# System dataset mountpoint (`middlewared.plugins.sysdataset.SYSDATASET_PATH`). History is only written there so it
+# survives reboots and does not wear out the boot device.
+JOBS_HISTORY_MOUNTPOINT = '/var/db/system'
+JOBS_HISTORY_PATH = os.path.join(JOBS_HISTORY_MOUNTPOINT, 'jobs.db')
+# Number of most recent jobs kept in the history
+JOBS_HISTORY_MAX = 10000
+# Old jobs are pruned once per this many writes
+JOBS_HISTORY_PRUNE_INTERVAL = 100
+# Number of most recently finished jobs a query considers unless it is paged (see `JobsHistory.query`)
+JOBS_HISTORY_QUERY_MAX = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY,
+    method TEXT NOT NULL,
+    state TEXT NOT NULL,
+    username TEXT,
+    time_started REAL,
+    time_finished REAL,
+    encoded TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_method ON job (method);
+CREATE INDEX IF NOT EXISTS job_state ON job (state);
+CREATE INDEX IF NOT EXISTS job_username ON job (username);
+CREATE INDEX IF NOT EXISTS job_time_started ON job (time_started);
+CREATE INDEX IF NOT EXISTS job_time_finished ON job (time_finished);
+"""
+
+COLUMN_FILTERS = {
+    'id': ('=', 'in'),
+    'method': ('=', 'in'),
+    'state': ('=', 'in'),
+    'time_started': ('>', '>=', '<', '<='),
+    'time_finished': ('>', '>=', '<', '<='),
+}
+
+
+def to_timestamp(value):
+    # Job times are naive UTC datetimes
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+
+    return value.timestamp()
+
+
+def from_timestamp(value):
+    if value is None:
+        return None
+
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+def chronological_key(job):
+    """
+    Sort key for encoded jobs: finished jobs in the order they have finished followed by the other jobs in the order
+    they were added.
+
+    Job ids do not reflect the order of the jobs across middleware runs: the jobs that are started before the history
+    becomes available are numbered from 1 again.
+    """
+    return job['time_finished'] is None, job['time_finished'] or datetime.min, job['id']
+
+
+def history_where(filters):
+    """
+    Translates top-level `filters` that can be resolved using the history table indexes to an SQL condition.
+
+    Returns `(where, params, exact)` where `exact` is `True` if all the `filters` were translated.
+    """
+    where = []
+    params = []
+    exact = True
+    for f in filters:
+        if (
+            isinstance(f, (list, tuple)) and len(f) == 3 and f[0] in COLUMN_FILTERS and
+            f[1] in COLUMN_FILTERS[f[0]]
+        ):
+            name, op, value = f
+            if name.startswith('time_'):
+                if isinstance(value, datetime):
+                    where.append(f'{name} {op} ?')
+                    params.append(to_timestamp(value))
+                    continue
+            elif op == 'in':
+                if isinstance(value, (list, tuple)):
+                    where.append(f'{name} IN ({", ".join(["?"] * len(value))})')
+                    params.extend(value)
+                    continue
+            elif isinstance(value, (int, str)):
+                where.append(f'{name} = ?')
+                params.append(value)
+                continue
+
+        exact = False
+
+    return where, params, exact
+
+
+class JobsHistory:
+    """
+    Persistent history of finished jobs stored in an SQLite database on the system dataset.
+
+    A new connection is made for every operation so that the database never keeps the system dataset busy when it is
+    being moved to another pool.
+    """
+
+    def __init__(
+        self, path=JOBS_HISTORY_PATH, mountpoint=JOBS_HISTORY_MOUNTPOINT, max_jobs=JOBS_HISTORY_MAX,
+        query_max=JOBS_HISTORY_QUERY_MAX,
+    ):
+        self.path = path
+        self.mountpoint = mountpoint
+        self.max_jobs = max_jobs
+        self.query_max = query_max
+        self.lock = threading.Lock()
+        self.writes = 0
+
+    def available(self):
+        return self.mountpoint is None or os.path.ismount(self.mountpoint)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def last_id(self):
+        with self.lock:
+            conn = self._connect()
+            try:
+                return conn.execute('SELECT MAX(id) FROM job').fetchone()[0] or 0
+            except sqlite3.OperationalError as e:
+                if 'no such table' not in str(e):
+                    raise
+
+                return 0
+            finally:
+                conn.close()
+
+    def open(self, first_id):
+        """
+        Prepares history for the current middleware run which has already assigned job ids up to `first_id` before
+        the history became available. Jobs of the previous runs with the same ids are removed.
+        """
+        with self.lock:
+            conn = self._connect()
+            try:
+                conn.executescript(SCHEMA)
+                with conn:
+                    conn.execute('DELETE FROM job WHERE id <= ?', (first_id,))
+                    self._prune(conn)
+            finally:
+                conn.close()
+
+    def add(self, jobs):
+        """
+        Stores (or replaces) `jobs`, a list of `(encoded job, username)` tuples.
+        """
+        rows = []
+        for job, username in jobs:
+            # Logs of the jobs that are no longer in memory are removed
+            job = dict(job, logs_path=None)
+            time_started = job.pop('time_started')
+            time_finished = job.pop('time_finished')
+            rows.append((
+                job['id'],
+                job['method'],
+                job['state'],
+                username,
+                None if time_started is None else to_timestamp(time_started),
+                None if time_finished is None else to_timestamp(time_finished),
+                json.dumps(job),
+            ))
+
+        with self.lock:
+            conn = self._connect()
+            try:
+                try:
+                    self._insert(conn, rows)
+                except sqlite3.OperationalError as e:
+                    if 'no such table' not in str(e):
+                        raise
+
+                    # The system dataset has been moved to a pool that does not have the history yet
+                    conn.executescript(SCHEMA)
+                    self._insert(conn, rows)
+            finally:
+                conn.close()
+
+    def _insert(self, conn, rows):
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO job VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+            self.writes += 1
+            if self.writes % JOBS_HISTORY_PRUNE_INTERVAL == 0:
+                self._prune(conn)
+
+    def _prune(self, conn):
+        # Ids of the jobs of different runs are not ordered (see `chronological_key`), the most recently finished jobs
+        # are kept
+        conn.execute(
+            'DELETE FROM job WHERE id NOT IN (SELECT id FROM job ORDER BY time_finished DESC, id DESC LIMIT ?)',
+            (self.max_jobs,),
+        )
+
+    def query(self, filters, options, username=None, exclude_ids=None):
+        """
+        Returns encoded jobs that might match `filters` ordered by id if `order_by` in `options` is `id` (or `-id`)
+        or by the time they have finished otherwise. Filters on `id`, `method`, `state`, and on the job times are
+        resolved using indexes, the rest of the filters must still be applied by the caller.
+
+        If all the `filters` can be resolved and the result is ordered by `id` or not ordered explicitly, only the jobs
+        needed to satisfy `offset` and `limit` in `options` are read. Otherwise, only the `query_max` most recently
+        finished jobs are considered.
+
+        If `username` is specified then only jobs started by that user session are returned. Jobs with ids in
+        `exclude_ids` are skipped.
+        """
+        where, params, exact = history_where(filters)
+        if username is not None:
+            where.append('username = ?')
+            params.append(username)
+        if exclude_ids:
+            where.append(f'id NOT IN ({", ".join(["?"] * len(exclude_ids))})')
+            params.extend(exclude_ids)
+
+        sql = 'SELECT id, time_started, time_finished, encoded FROM job'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+
+        order_by = options.get('order_by') or []
+        if order_by == ['id']:
+            order = ' ORDER BY id'
+        elif order_by == ['-id']:
+            order = ' ORDER BY id DESC'
+        else:
+            order = ' ORDER BY time_finished, id'
+
+        if (
+            exact and order_by in ([], ['id'], ['-id']) and options.get('limit') and
+            not options.get('count') and not options.get('get')
+        ):
+            sql += order + ' LIMIT ?'
+            params.append((options.get('offset') or 0) + options['limit'])
+        else:
+            sql = f'SELECT * FROM ({sql} ORDER BY time_finished DESC, id DESC LIMIT ?){order}'
+            params.append(self.query_max)
+
+        with self.lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                if 'no such table' not in str(e):
+                    raise
+
+                # The system dataset has been moved to a pool that does not have the history yet
+                return []
+            finally:
+                conn.close()
+
+        result = []
+        for id_, time_started, time_finished, encoded in rows:
+            job = json.loads(encoded)
+            job['time_started'] = from_timestamp(time_started)
+            job['time_finished'] = from_timestamp(time_finished)
+            result.append(job)
+
+        if order_by == ['-id']:
+            result.reverse()
+
+        return result
@@ -1,9 +1,12 @@
 from .apidocs import routes as apidocs_routes
 from .auth import is_ha_connection
 from .client import ejson as json
+from .coalesce import CallCoalescer
 from .common.event_source.manager import EventSourceManager
 from .event import Events
 from .job import Job, JobsQueue
+from .metrics import CallMetrics, process_pool_stats, prometheus_text, thread_pool_stats
+from .periodic import PeriodicTaskScheduler
 from .pipe import Pipes, Pipe
 from .restful import authenticate, copy_multipart_to_pipe, RESTfulAPI
 from .role import ROLES, RoleManager
@@ -19,11 +22,13 @@ from .utils.debug import get_frame_details, get_threads_stacks
 from .utils.lock import SoftHardSemaphore, SoftHardSemaphoreLimit
 from .utils.nginx import get_remote_addr_port
 from .utils.origin import UnixSocketOrigin, TCPIPOrigin
-from .utils.plugins import LoadPluginsMixin
+from .utils.plugins import LoadPluginsMixin, run_setup_graph, setup_critical_path, setup_dependencies
 from .utils.profile import profile_wrap
 from .utils.service.call import ServiceCallMixin
-from .utils.threading import set_thread_name, IoThreadPoolExecutor
-from .utils.type import copy_function_metadata
+from .utils.threading import (
+    create_executors, in_executors_thread, set_thread_name, IoThreadPoolExecutor, QuotaExecutor,
+)
+from .utils.type import copy_function_metadata, trusted_method
 from .webui_auth import addr_in_allowlist, WebUIAuth
 from .worker import main_worker, worker_init
 from .webhooks.cluster_events import ClusterEventsApplication
@@ -198,7 +203,10 @@ class Application:
 
         try:
             async with self._softhardsemaphore:
-                result = await self.middleware._call(message['method'], serviceobj, methodobj, params, app=self)
+                # `params` were just decoded from the message so they can be cleaned in-place
+                result = await self.middleware._call(
+                    message['method'], serviceobj, methodobj, params, app=self, trusted_args=True, coalesce=True,
+                )
             if isinstance(result, Job):
                 result = result.id
             elif isinstance(result, types.GeneratorType):
@@ -842,13 +850,45 @@ class PreparedCall:
         self.job = job
 
 
+# Kept between reboots so that startup of different releases can be compared
+STARTUP_PROFILE_PATH = '/var/log/middlewared-startup-profile.json'
+# Plugins that are set up one after another before all the other plugins
+SETUP_ORDER = [
+    'datastore',
+    # Allow internal UNIX socket authentication for plugins that run in separate pools
+    'auth',
+    # We need to register all services because pseudo-services can still be used by plugins setup functions
+    'service',
+    # We need to run pwenc first to ensure we have secret setup to work for encrypted fields which
+    # might be used in the setup functions.
+    'pwenc',
+    # We run boot plugin first to ensure we are able to retrieve
+    # BOOT POOL during system plugin initialization
+    'boot',
+    # We need to run system plugin setup's function first because when system boots, the right
+    # timezone is not configured. See #72131
+    'system',
+    # Initialize mail before other plugins try to send e-mail messages
+    'mail',
+    # We also need to load alerts first because other plugins can issue one-shot alerts during their
+    # initialization
+    'alert',
+    # Migrate users and groups ASAP
+    'account',
+    # Replication plugin needs to be initialized before zettarepl in order to register network activity
+    'replication',
+    # Migrate network interfaces ASAP
+    'network',
+]
+
+
 class Middleware(LoadPluginsMixin, ServiceCallMixin):
 
     CONSOLE_ONCE_PATH = f'{MIDDLEWARE_RUN_DIR}/.middlewared-console-once'
 
     def __init__(
         self, loop_debug=False, loop_monitor=True, debug_level=None,
-        log_handler=None, trace_malloc=False,
+        log_handler=None, trace_malloc=False, metrics_endpoint=False,
         log_format='[%(asctime)s] (%(levelname)s) %(name)s.%(funcName)s():%(lineno)d - %(message)s',
     ):
         super().__init__()
@@ -860,6 +900,7 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.loop_debug = loop_debug
         self.loop_monitor = loop_monitor
         self.trace_malloc = trace_malloc
+        self.metrics_endpoint = metrics_endpoint
         self.debug_level = debug_level
         self.log_handler = log_handler
         self.log_format = log_format
@@ -867,6 +908,9 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.loop = None
         self.__thread_id = threading.get_ident()
         self.thread_pool_executor = IoThreadPoolExecutor()
+        self.executors = create_executors(self.thread_pool_executor)
+        self.__service_executors = {}
+        self.__service_executors_lock = threading.Lock()
         multiprocessing.set_start_method('spawn')  # Spawn new processes for ProcessPool instead of forking
         self.__init_procpool()
         self.__wsclients = {}
@@ -883,6 +927,10 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.mocks = defaultdict(list)
         self.tasks = set()
         self.role_manager = RoleManager(ROLES)
+        self.startup_profile = None
+        self.periodic_tasks = PeriodicTaskScheduler()
+        self.metrics = CallMetrics()
+        self.coalescer = CallCoalescer()
 
     def create_task(self, coro, *, name=None):
         task = self.loop.create_task(coro, name=name)
@@ -910,7 +958,7 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
             mod_name = mod.__name__.split('.')
             setup_plugin = '.'.join(mod_name[mod_name.index('plugins') + 1:])
 
-            setup_funcs.append((setup_plugin, mod.setup))
+            setup_funcs.append((setup_plugin, mod.setup, getattr(mod, 'SETUP_DEPENDS', None)))
 
         def on_modules_loaded():
             self._console_write('resolving plugins schemas')
@@ -959,98 +1007,84 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         return setup_funcs
 
     async def __plugins_setup(self, setup_funcs):
-
-        # TODO: Rework it when we have order defined for setup functions
-        def sort_key(plugin__function):
-            plugin, function = plugin__function
-
-            beginning = [
-                'datastore',
-                # Allow internal UNIX socket authentication for plugins that run in separate pools
-                'auth',
-                # We need to register all services because pseudo-services can still be used by plugins setup functions
-                'service',
-                # We need to run pwenc first to ensure we have secret setup to work for encrypted fields which
-                # might be used in the setup functions.
-                'pwenc',
-                # We run boot plugin first to ensure we are able to retrieve
-                # BOOT POOL during system plugin initialization
-                'boot',
-                # We need to run system plugin setup's function first because when system boots, the right
-                # timezone is not configured. See #72131
-                'system',
-                # Initialize mail before other plugins try to send e-mail messages
-                'mail',
-                # We also need to load alerts first because other plugins can issue one-shot alerts during their
-                # initialization
-                'alert',
-                # Migrate users and groups ASAP
-                'account',
-                # Replication plugin needs to be initialized before zettarepl in order to register network activity
-                'replication',
-                # Migrate network interfaces ASAP
-                'network',
-            ]
-            try:
-                return beginning.index(plugin)
-            except ValueError:
-                return len(beginning)
-        setup_funcs = sorted(setup_funcs, key=sort_key)
+        dependencies = setup_dependencies(setup_funcs, SETUP_ORDER)
 
         # Only call setup after all schemas have been resolved because
         # they can call methods with schemas defined.
         setup_total = len(setup_funcs)
-        for i, setup_func in enumerate(setup_funcs):
-            name, f = setup_func
-            self._console_write(f'setting up plugins ({name}) [{i + 1}/{setup_total}]')
+        setup_started = 0
+
+        async def run(name, f):
+            nonlocal setup_started
+            setup_started += 1
+            self._console_write(f'setting up plugins ({name}) [{setup_started}/{setup_total}]')
             self.__notify_startup_progress()
             call = f(self)
             # Allow setup to be a coroutine
             if asyncio.iscoroutinefunction(f):
                 await call
 
+        started = time.monotonic()
+        timings = await run_setup_graph(setup_funcs, dependencies, run)
+        self.__save_startup_profile(setup_funcs, dependencies, timings, time.monotonic() - started)
+
         self.logger.debug('All plugins loaded')
 
+    def __save_startup_profile(self, setup_funcs, dependencies, timings, setup_time):
+        setup_started = min([started for started, finished in timings.values()], default=0)
+        self.startup_profile = {
+            'version': sw_version(),
+            'imports': sorted([
+                {'module': module, 'time': import_time}
+                for module, import_time in self._plugins_import_times.items()
+            ], key=lambda i: i['time'], reverse=True),
+            'import_time': sum(self._plugins_import_times.values()),
+            'setups': sorted([
+                {
+                    'plugin': plugin,
+                    'depends': sorted(dependencies[plugin]),
+                    'start': timings[plugin][0] - setup_started,
+                    'duration': timings[plugin][1] - timings[plugin][0],
+                }
+                for plugin, function, depends in setup_funcs
+            ], key=lambda i: i['start']),
+            'setup_time': setup_time,
+            'critical_path': setup_critical_path(timings, dependencies),
+        }
+
+        try:
+            with open(STARTUP_PROFILE_PATH, 'w') as f:
+                json.dump(self.startup_profile, f, indent=4)
+        except Exception:
+            self.logger.warning('Failed to save startup profile', exc_info=True)
+
     def _setup_periodic_tasks(self):
+        if self.periodic_tasks.tasks:
+            return
+
         for service_name, service_obj in self.get_services().items():
             for task_name in dir(service_obj):
                 method = getattr(service_obj, task_name)
                 if callable(method) and hasattr(method, "_periodic"):
-                    if method._periodic.run_on_start:
-                        delay = 0
-                    else:
-                        delay = method._periodic.interval
-
                     method_name = f'{service_name}.{task_name}'
                     self.logger.debug(
                         f"Setting up periodic task {method_name} to run every {method._periodic.interval} seconds"
                     )
 
-                    self.loop.call_later(
-                        delay,
-                        functools.partial(
-                            self.__call_periodic_task,
-                            method, service_name, service_obj, method_name, method._periodic.interval
-                        )
+                    self.periodic_tasks.add(
+                        method_name,
+                        functools.partial(self.__call_periodic_task, method_name, service_obj, method),
+                        *method._periodic,
                     )
 
-    def __call_periodic_task(self, method, service_name, service_obj, method_name, interval):
-        self.create_task(self.__periodic_task_wrapper(method, service_name, service_obj, method_name, interval))
-
-    async def __periodic_task_wrapper(self, method, service_name, service_obj, method_name, interval):
-        self.logger.trace("Calling periodic task %s", method_name)
-        try:
-            await self._call(method_name, service_obj, method, [])
-        except Exception:
-            self.logger.warning("Exception while calling periodic task", exc_info=True)
+        # `core.notify_postinit` sets up periodic tasks from a thread
+        self.loop.call_soon_threadsafe(self.periodic_tasks.start)
 
-        self.loop.call_later(
-            interval,
-            functools.partial(
-                self.__call_periodic_task,
-                method, service_name, service_obj, method_name, interval
-            )
-        )
+    async def __call_periodic_task(self, method_name, service_obj, method):
+        result = await self._call(method_name, service_obj, method, [])
+        if isinstance(result, Job):
+            # The run is only complete once the job has finished
+            await result.wait(raise_error=True)
 
     console_error_counter = 0
 
@@ -1347,32 +1381,98 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         elif serviceobj._config.thread_pool:
             executor = serviceobj._config.thread_pool
         else:
-            executor = self.thread_pool_executor
+            executor = self._service_executor(serviceobj)
 
         return PreparedCall(args=args, executor=executor)
 
+    def _service_executor(self, serviceobj):
+        name = serviceobj._config.namespace
+        if (executor := self.__service_executors.get(name)) is None:
+            with self.__service_executors_lock:
+                if (executor := self.__service_executors.get(name)) is None:
+                    executor = self.__service_executors[name] = QuotaExecutor(
+                        name,
+                        self.executors[serviceobj._config.executor],
+                        serviceobj._config.executor_quota,
+                        serviceobj._config.executor_max_queued,
+                    )
+
+        return executor
+
     async def _call(
-        self, name, serviceobj, methodobj, params, **kwargs,
+        self, name, serviceobj, methodobj, params, trusted_args=False, coalesce=False, **kwargs,
     ):
+        """
+        :param trusted_args: `params` are not referenced by the caller so `@accepts` does not need to copy them.
+        :param coalesce: the result is not modified by the caller so it can be shared with identical concurrent calls
+            of `@coalesce` methods.
+        """
+        if coalesce and (coalesce_options := getattr(methodobj, '_coalesce', None)) is not None:
+            if (key := self.coalescer.key(name, methodobj, params, kwargs.get('app'))) is not None:
+                return await self.coalescer.call(name, key, coalesce_options['ttl'], functools.partial(
+                    self._call, name, serviceobj, methodobj, params, trusted_args=trusted_args, **kwargs,
+                ))
+
         prepared_call = self._call_prepare(name, serviceobj, methodobj, params, **kwargs)
 
         if prepared_call.job:
             return prepared_call.job
 
+        if trusted_args:
+            methodobj = trusted_method(methodobj)
+
         if asyncio.iscoroutinefunction(methodobj):
             self.logger.trace('Calling %r in current IO loop', name)
-            return await methodobj(*prepared_call.args)
+            with self.metrics.timer(name, 'loop'):
+                return await methodobj(*prepared_call.args)
 
         if not self.mocks.get(name) and serviceobj._config.process_pool:
             self.logger.trace('Calling %r in process pool', name)
-            if isinstance(serviceobj, middlewared.service.CRUDService):
-                service_name, method_name = name.rsplit('.', 1)
-                if method_name in ['create', 'update', 'delete']:
-                    name = f'{service_name}.do_{method_name}'
-            return await self._call_worker(name, *prepared_call.args)
+            with self.metrics.timer(name, 'process'):
+                if isinstance(serviceobj, middlewared.service.CRUDService):
+                    service_name, method_name = name.rsplit('.', 1)
+                    if method_name in ['create', 'update', 'delete']:
+                        name = f'{service_name}.do_{method_name}'
+                return await self._call_worker(name, *prepared_call.args)
 
         self.logger.trace('Calling %r in executor %r', name, prepared_call.executor)
-        return await self.run_in_executor(prepared_call.executor, methodobj, *prepared_call.args)
+        with self.metrics.timer(name, self._executor_type(prepared_call.executor)) as timer:
+            return await self.run_in_executor(prepared_call.executor, timer.run, methodobj, *prepared_call.args)
+
+    def _executor_type(self, executor):
+        if isinstance(executor, QuotaExecutor):
+            executor = executor.executor
+
+        if executor is self.thread_pool_executor:
+            return 'thread'
+
+        for executor_class, class_executor in self.executors.items():
+            if executor is class_executor:
+                return executor_class.lower()
+
+        return 'service_thread'
+
+    def executors_stats(self):
+        """
+        Saturation of the thread pools, service thread pools quotas and the process pool.
+        """
+        stats = {
+            'thread': self.thread_pool_executor.stats(),
+            'subprocess': thread_pool_stats(self.executors['SUBPROCESS']),
+            'cpu': thread_pool_stats(self.executors['CPU']),
+            'process': process_pool_stats(self.__procpool),
+        }
+        for name, executor in sorted(self.__service_executors.items()):
+            stats[f'quota:{name}'] = executor.stats()
+        executors = set()
+        for service_name, service in sorted(self.get_services().items()):
+            executor = service._config.thread_pool
+            # Several services can share the same thread pool
+            if executor is not None and executor not in executors:
+                executors.add(executor)
+                stats[f'service_thread:{service_name}'] = thread_pool_stats(executor)
+
+        return stats
 
     async def _call_worker(self, name, *args, job=None):
         return await self.run_in_proc(main_worker, name, args, job)
@@ -1440,20 +1540,30 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
 
         if asyncio.iscoroutinefunction(methodobj):
             self.logger.trace('Calling %r in main IO loop', name)
-            return self.run_coroutine(methodobj(*prepared_call.args))
+            with self.metrics.timer(name, 'loop'):
+                return self.run_coroutine(methodobj(*prepared_call.args))
 
         if serviceobj._config.process_pool:
             self.logger.trace('Calling %r in process pool', name)
-            return self.run_coroutine(self._call_worker(name, *prepared_call.args))
-
-        if not self._in_executor(prepared_call.executor):
-            self.logger.trace('Calling %r in executor %r', name, prepared_call.executor)
-            return self.run_coroutine(self.run_in_executor(prepared_call.executor, methodobj, *prepared_call.args))
+            with self.metrics.timer(name, 'process'):
+                return self.run_coroutine(self._call_worker(name, *prepared_call.args))
+
+        with self.metrics.timer(name, self._executor_type(prepared_call.executor)) as timer:
+            if not self._in_executor(prepared_call.executor):
+                self.logger.trace('Calling %r in executor %r', name, prepared_call.executor)
+                return self.run_coroutine(
+                    self.run_in_executor(prepared_call.executor, timer.run, methodobj, *prepared_call.args)
+                )
 
-        self.logger.trace('Calling %r in current thread', name)
-        return methodobj(*prepared_call.args)
+            self.logger.trace('Calling %r in current thread', name)
+            return methodobj(*prepared_call.args)
 
     def _in_executor(self, executor):
+        if isinstance(executor, QuotaExecutor):
+            # Nested calls made from any of the shared executors threads are run in the current thread (regardless of
+            # the quota and the executor class), waiting for the quota could deadlock otherwise
+            return in_executors_thread()
+
         if isinstance(executor, concurrent.futures.thread.ThreadPoolExecutor):
             return threading.current_thread() in executor._threads
         elif isinstance(executor, IoThreadPoolExecutor):
@@ -1662,6 +1772,16 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
 
         return ws, prepared
 
+    def get_metrics(self):
+        return dict(self.metrics.snapshot(), executors=self.executors_stats(), coalesced=self.coalescer.stats())
+
+    async def metrics_handler(self, request):
+        sock = request.transport.get_extra_info('socket') if request.transport else None
+        if sock is None or sock.family != socket.AF_UNIX:
+            return web.Response(status=403, text='Metrics are only available over the UNIX socket\n')
+
+        return web.Response(text=prometheus_text(self.get_metrics()), content_type='text/plain', charset='utf-8')
+
     async def ws_handler(self, request):
         ws, prepared = await self.create_and_prepare_ws(request)
         if not prepared:
@@ -1835,6 +1955,8 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
             t.setDaemon(True)
             t.start()
 
+        self.create_task(self.metrics.monitor_loop_lag())
+
         self.loop.add_signal_handler(signal.SIGINT, self.terminate)
         self.loop.add_signal_handler(signal.SIGTERM, self.terminate)
         self.loop.add_signal_handler(signal.SIGUSR1, self.pdb)
@@ -1842,6 +1964,9 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
 
         app.router.add_route('GET', '/websocket', self.ws_handler)
 
+        if self.metrics_endpoint:
+            app.router.add_route('GET', '/_metrics', self.metrics_handler)
+
         app.router.add_routes(apidocs_routes)
         app.router.add_route('*', '/ui{path_info:.*}', WebUIAuth(self))
 
@@ -1893,6 +2018,8 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.__terminate_task = self.create_task(self.__terminate())
 
     async def __terminate(self):
+        self.periodic_tasks.stop()
+
         for service_name, service in self.get_services().items():
             # We're using this instead of having no-op `terminate`
             # in base class to reduce number of awaits
@@ -1939,6 +2066,8 @@ def main():
     parser.add_argument('--pidfile', '-P', action='store_true')
     parser.add_argument('--disable-loop-monitor', '-L', action='store_true')
     parser.add_argument('--loop-debug', action='store_true')
+    parser.add_argument('--metrics-endpoint', action='store_true',
+                        help='Serve call metrics in Prometheus text format at /_metrics (UNIX socket only)')
     parser.add_argument('--trace-malloc', '-tm', action='store', nargs=2, type=int, default=False)
     parser.add_argument('--overlay-dirs', '-o', action='append')
     parser.add_argument('--debug-mode', action='store_true', default=False)
@@ -1982,6 +2111,7 @@ def main():
         loop_debug=args.loop_debug,
         loop_monitor=not args.disable_loop_monitor,
         trace_malloc=args.trace_malloc,
+        metrics_endpoint=args.metrics_endpoint,
         debug_level=args.debug_level,
         log_handler=args.log_handler,
     ).run()
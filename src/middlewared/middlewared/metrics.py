@@ -0,0 +1,217 @@
+import asyncio
+import bisect
+import threading
+import time
+
+# Upper bounds (in seconds) of the method call latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+# How often the event loop lag is measured (in seconds)
+LOOP_LAG_INTERVAL = 1
+
+
+class MethodMetrics:
+    __slots__ = ('executor', 'count', 'errors', 'buckets', 'latency_sum', 'latency_max', 'wait_count', 'wait_sum',
+                 'wait_max')
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0
+        self.latency_max = 0
+        self.wait_count = 0
+        self.wait_sum = 0
+        self.wait_max = 0
+
+    def snapshot(self):
+        buckets = {}
+        total = 0
+        for le, count in zip(LATENCY_BUCKETS + ('+Inf',), self.buckets):
+            total += count
+            buckets[str(le)] = total
+
+        return {
+            'executor': self.executor,
+            'count': self.count,
+            'errors': self.errors,
+            'latency': {
+                'sum': self.latency_sum,
+                'max': self.latency_max,
+                'buckets': buckets,
+            },
+            'queue_wait': {
+                'count': self.wait_count,
+                'sum': self.wait_sum,
+                'max': self.wait_max,
+            },
+        }
+
+
+class CallTimer:
+    """
+    Measures a single method call. Used as a context manager around the call, methods that are run in an executor must
+    be called via `run` so that the time spent waiting in the executor queue is measured.
+    """
+
+    __slots__ = ('metrics', 'name', 'executor', 'start', 'wait')
+
+    def __init__(self, metrics, name, executor):
+        self.metrics = metrics
+        self.name = name
+        self.executor = executor
+        self.start = None
+        self.wait = None
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.record(
+            self.name, self.executor, time.monotonic() - self.start,
+            exc_type is not None and issubclass(exc_type, Exception), self.wait,
+        )
+
+    def run(self, method, *args):
+        self.wait = time.monotonic() - self.start
+        return method(*args)
+
+
+class CallMetrics:
+    """
+    Always-on per-method call statistics (call count, errors, latency histogram, executor queue wait time) and event
+    loop lag.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.methods = {}
+        self.loop_lag = 0
+        self.loop_lag_max = 0
+
+    def timer(self, name, executor):
+        return CallTimer(self, name, executor)
+
+    def record(self, name, executor, latency, error, wait=None):
+        with self.lock:
+            if (metrics := self.methods.get(name)) is None:
+                metrics = self.methods[name] = MethodMetrics(executor)
+
+            metrics.executor = executor
+            metrics.count += 1
+            if error:
+                metrics.errors += 1
+            metrics.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            metrics.latency_sum += latency
+            metrics.latency_max = max(metrics.latency_max, latency)
+            if wait is not None:
+                metrics.wait_count += 1
+                metrics.wait_sum += wait
+                metrics.wait_max = max(metrics.wait_max, wait)
+
+    async def monitor_loop_lag(self, interval=LOOP_LAG_INTERVAL):
+        """
+        Measures how late the event loop wakes up a coroutine that sleeps for `interval` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag = max(loop.time() - start - interval, 0)
+            self.loop_lag_max = max(self.loop_lag_max, self.loop_lag)
+
+    def snapshot(self):
+        with self.lock:
+            methods = {name: metrics.snapshot() for name, metrics in self.methods.items()}
+
+        return {
+            'methods': methods,
+            'loop': {
+                'lag': self.loop_lag,
+                'lag_max': self.loop_lag_max,
+            },
+        }
+
+
+def thread_pool_stats(executor):
+    """
+    Saturation of a `concurrent.futures.ThreadPoolExecutor`.
+    """
+    workers = len(executor._threads)
+    return {
+        'max_workers': executor._max_workers,
+        'workers': workers,
+        'busy': max(workers - executor._idle_semaphore._value, 0),
+        'queued': executor._work_queue.qsize(),
+    }
+
+
+def process_pool_stats(executor):
+    """
+    Saturation of a `concurrent.futures.ProcessPoolExecutor`.
+    """
+    return {
+        'max_workers': executor._max_workers,
+        'pending': len(executor._pending_work_items),
+    }
+
+
+def prometheus_text(metrics):
+    """
+    Renders `core.metrics` output in the Prometheus text exposition format.
+    """
+    lines = []
+
+    def metric(name, type_, help_, samples):
+        lines.append(f'# HELP middlewared_{name} {help_}')
+        lines.append(f'# TYPE middlewared_{name} {type_}')
+        for suffix, labels, value in samples:
+            labels = ','.join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f'middlewared_{name}{suffix}{{{labels}}} {value}' if labels else
+                         f'middlewared_{name}{suffix} {value}')
+
+    methods = sorted(metrics['methods'].items())
+    metric('calls_total', 'counter', 'Number of method calls.', [
+        ('', {'method': name, 'executor': m['executor']}, m['count']) for name, m in methods
+    ])
+    metric('call_errors_total', 'counter', 'Number of method calls that raised an exception.', [
+        ('', {'method': name}, m['errors']) for name, m in methods
+    ])
+    metric('call_duration_seconds', 'histogram', 'Method call latency.', sum([
+        [('_bucket', {'method': name, 'le': le}, count) for le, count in m['latency']['buckets'].items()] +
+        [('_sum', {'method': name}, m['latency']['sum']), ('_count', {'method': name}, m['count'])]
+        for name, m in methods
+    ], []))
+    metric('call_queue_wait_seconds', 'summary', 'Time method calls spent waiting for an executor thread.', sum([
+        [('_sum', {'method': name}, m['queue_wait']['sum']), ('_count', {'method': name}, m['queue_wait']['count'])]
+        for name, m in methods
+    ], []))
+    metric('coalesced_calls_total', 'counter', 'Number of calls of the methods marked with `@coalesce`.', sum([
+        [('', {'method': name, 'result': result}, count) for result, count in counters.items()]
+        for name, counters in sorted(metrics.get('coalesced', {}).items())
+    ], []))
+    metric('loop_lag_seconds', 'gauge', 'Event loop lag.', [('', {}, metrics['loop']['lag'])])
+    metric('loop_lag_max_seconds', 'gauge', 'Maximum event loop lag.', [('', {}, metrics['loop']['lag_max'])])
+
+    executors = sorted(metrics['executors'].items())
+    for key, name, type_, help_ in [
+        ('max_workers', 'executor_max_workers', 'gauge', 'Maximum number of executor workers.'),
+        ('workers', 'executor_workers', 'gauge', 'Number of started executor workers.'),
+        ('busy', 'executor_busy', 'gauge', 'Number of busy executor workers.'),
+        ('queued', 'executor_queued', 'gauge', 'Number of calls waiting for an executor worker.'),
+        ('pending', 'executor_pending', 'gauge', 'Number of process pool calls that have not finished yet.'),
+        ('saturated', 'executor_saturated_total', 'counter',
+         'Number of calls run in a single-use thread because the pool was saturated.'),
+        ('quota', 'executor_quota', 'gauge', 'Maximum number of service calls run at once in a shared pool.'),
+        ('running', 'executor_running', 'gauge', 'Number of service calls running in a shared pool.'),
+        ('rejected', 'executor_rejected_total', 'counter',
+         'Number of service calls rejected because too many were waiting.'),
+        ('nested', 'executor_nested_total', 'counter',
+         'Number of service calls run regardless of the quota because the calling chain already held it.'),
+    ]:
+        samples = [('', {'executor': executor}, stats[key]) for executor, stats in executors if key in stats]
+        if samples:
+            metric(name, type_, help_, samples)
+
+    return '\n'.join(lines) + '\n'
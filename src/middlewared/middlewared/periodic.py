@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of periodic tasks running at the same time
+PERIODIC_TASKS_CONCURRENCY = 4
+# Unless specified explicitly, every periodic task run is delayed by a random amount of time up to this fraction of
+# its interval (but not more than `PERIODIC_TASK_MAX_JITTER` seconds) so that tasks with the same interval do not all
+# fire at the same instant
+PERIODIC_TASK_JITTER = 0.1
+PERIODIC_TASK_MAX_JITTER = 60
+
+
+class PeriodicTask:
+    def __init__(self, name, call, interval, run_on_start=True, jitter=None, max_concurrency=1):
+        self.name = name
+        self.call = call
+        self.interval = interval
+        self.run_on_start = run_on_start
+        if jitter is None:
+            jitter = min(interval * PERIODIC_TASK_JITTER, PERIODIC_TASK_MAX_JITTER)
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+
+        self.handle = None
+        self.next_run = None
+        self.running = 0
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0
+        self.last_started = None
+        self.last_duration = None
+
+    def delay(self, first=False):
+        delay = random.uniform(0, self.jitter)
+        if not (first and self.run_on_start):
+            delay += self.interval
+
+        return delay
+
+
+class PeriodicTaskScheduler:
+    """
+    Runs periodic tasks (`@periodic` service methods).
+
+    The next run of a task is scheduled `interval` seconds (plus jitter) after the previous one has finished. Tasks
+    which `max_concurrency` is greater than one are run at a fixed rate instead: every `interval` seconds (plus jitter)
+    regardless of how long the previous run took. If such a task still has `max_concurrency` runs in progress when it
+    is due again, that run is skipped and counted as an overrun. At most `max_concurrency` tasks are run
+    simultaneously, the rest wait for their turn.
+    """
+
+    def __init__(self, loop=None, max_concurrency=PERIODIC_TASKS_CONCURRENCY):
+        self.loop = loop
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.tasks = {}
+        self.running_tasks = set()
+        self.started = False
+
+    def add(self, name, call, interval, run_on_start=True, jitter=None, max_concurrency=1):
+        """
+        Adds periodic task `name`. `call` is a coroutine function called without arguments.
+        """
+        self.tasks[name] = PeriodicTask(name, call, interval, run_on_start, jitter, max_concurrency)
+
+    def start(self):
+        """
+        Schedules all the added tasks. Must be called from the event loop thread.
+        """
+        if self.started:
+            return
+
+        self.started = True
+        if self.loop is None:
+            self.loop = asyncio.get_event_loop()
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        for task in self.tasks.values():
+            self._schedule(task, task.delay(first=True))
+
+    def stop(self):
+        for task in self.tasks.values():
+            if task.handle is not None:
+                task.handle.cancel()
+                task.handle = None
+                task.next_run = None
+
+        self.started = False
+
+    def _schedule(self, task, delay):
+        task.next_run = self.loop.time() + delay
+        task.handle = self.loop.call_later(delay, self._fire, task)
+
+    def _fire(self, task):
+        task.handle = task.next_run = None
+        if task.max_concurrency > 1:
+            self._schedule(task, task.delay())
+
+        if task.running >= task.max_concurrency:
+            task.overruns += 1
+            logger.debug('Periodic task %r is still running, skipping this run', task.name)
+            return
+
+        task.running += 1
+        run = self.loop.create_task(self._run(task))
+        self.running_tasks.add(run)
+        run.add_done_callback(self.running_tasks.discard)
+
+    async def _run(self, task):
+        try:
+            async with self.semaphore:
+                task.last_started = datetime.utcnow()
+                started = time.monotonic()
+                try:
+                    await task.call()
+                except Exception:
+                    task.errors += 1
+                    logger.warning('Exception while calling periodic task %r', task.name, exc_info=True)
+                finally:
+                    task.runs += 1
+                    task.last_duration = time.monotonic() - started
+        finally:
+            task.running -= 1
+            if task.max_concurrency == 1 and self.started and task.handle is None:
+                self._schedule(task, task.delay())
+
+    def stats(self):
+        now = datetime.utcnow()
+        loop_time = self.loop.time() if self.loop is not None else None
+        return [
+            {
+                'name': task.name,
+                'interval': task.interval,
+                'jitter': task.jitter,
+                'max_concurrency': task.max_concurrency,
+                'running': task.running,
+                'next_run': (
+                    None if task.next_run is None else now + timedelta(seconds=max(task.next_run - loop_time, 0))
+                ),
+                'last_started': task.last_started,
+                'last_duration': task.last_duration,
+                'runs': task.runs,
+                'errors': task.errors,
+                'overruns': task.overruns,
+            }
+            for task in sorted(self.tasks.values(), key=lambda task: task.name)
+        ]
@@ -1,9 +1,10 @@
-from middlewared.schema import accepts, Bool, Dict, Int, List, Password, Patch, returns, Str, LocalUsername
+from middlewared.schema import accepts, Bool, Dict, Int, List, Password, Patch, Ref, returns, Str, LocalUsername
 from middlewared.service import (
     CallError, CRUDService, ValidationErrors, no_auth_required, pass_app, private, filterable, job
 )
 import middlewared.sqlalchemy as sa
 from middlewared.utils import run, filter_list
+from middlewared.utils.asyncio_ import asyncio_map
 from middlewared.validators import Email, Range
 from middlewared.async_validators import check_path_resides_within_volume
 from middlewared.plugins.smb import SMBBuiltin
@@ -351,7 +352,7 @@ class UserService(CRUDService):
         return True
 
     @private
-    def validate_homedir_path(self, verrors, schema, data, users):
+    def validate_homedir_path(self, verrors, schema, data, existing):
         p = Path(data['home'])
 
         if not p.is_absolute():
@@ -400,11 +401,10 @@ class UserService(CRUDService):
                     f'{data["home"]}: home directory path is immutable.'
                 )
 
-        in_use = filter_list(users, [('home', '=', data['home'])])
-        if in_use:
+        if in_use := existing['homes'].get(data['home']):
             verrors.add(
                 f'{schema}.home',
-                f'{data["home"]}: homedir already used by {in_use[0]["username"]}.',
+                f'{data["home"]}: homedir already used by {in_use}.',
                 errno.EEXIST
             )
 
@@ -648,29 +648,255 @@ class UserService(CRUDService):
             gm_job = self.middleware.call_sync('smb.synchronize_passdb')
             gm_job.wait_sync()
 
-        if os.path.isdir(SKEL_PATH) and os.path.exists(data['home']) and data['home'] not in DEFAULT_HOME_PATHS:
-            for f in os.listdir(SKEL_PATH):
-                if f.startswith('dot'):
-                    dest_file = os.path.join(data['home'], f[3:])
+        self.populate_homedir(data, group, sshpubkey)
+
+        return pk
+
+    @private
+    def populate_homedir(self, user, group, sshpubkey):
+        if not (os.path.isdir(SKEL_PATH) and os.path.exists(user['home']) and user['home'] not in DEFAULT_HOME_PATHS):
+            return
+
+        for f in os.listdir(SKEL_PATH):
+            if f.startswith('dot'):
+                dest_file = os.path.join(user['home'], f[3:])
+            else:
+                dest_file = os.path.join(user['home'], f)
+            if not os.path.exists(dest_file):
+                shutil.copyfile(os.path.join(SKEL_PATH, f), dest_file)
+                chown_job = self.middleware.call_sync('filesystem.chown', {
+                    'path': dest_file,
+                    'uid': user['uid'],
+                    'gid': group['gid'],
+                })
+                chown_job.wait_sync()
+
+        user['sshpubkey'] = sshpubkey
+        try:
+            self.update_sshpubkey(user['home'], user, group['group'])
+        except PermissionError as e:
+            self.logger.warn('Failed to update authorized keys', exc_info=True)
+            raise CallError(f'Failed to update authorized keys: {e}')
+
+    @accepts(List('users', items=[Ref('user_create')], required=True))
+    @returns(List('results', items=[Dict(
+        'user_create_bulk_result',
+        Int('result', null=True),
+        Str('error', null=True),
+    )]))
+    @job(lock='account_create_bulk')
+    async def create_bulk(self, job, users):
+        """
+        Create multiple users at once.
+
+        Every entry accepts the same attributes as `user.create`. All entries are validated before any user is
+        created; if any of them is invalid, nothing is created. Users are inserted into the database in a single
+        transaction, home directories are created concurrently and dependent services (SSH, user database and SMB
+        passdb) are reloaded only once.
+
+        Result is a list of `{"result": <user id>, "error": <error message>}` statuses in the same order as `users`.
+        An entry which `result` is `null` was not created.
+        """
+        job.set_progress(0, 'Validating users')
+        verrors = ValidationErrors()
+        ds_groups = {
+            g['id']: g for g in await self.middleware.call(
+                'datastore.query', 'account.bsdgroups', [], {'prefix': 'bsdgrp_'}
+            )
+        }
+        existing = await self.existing_users()
+        usernames = set()
+        smb_usernames = set()
+        uids = set()
+        homes = {}
+        for i, data in enumerate(users):
+            schema = f'user_create_bulk.{i}'
+            if (
+                not data.get('group') and not data.get('group_create')
+            ) or (
+                data.get('group') is not None and data.get('group_create')
+            ):
+                verrors.add(
+                    f'{schema}.group',
+                    'Enter either a group name or create a new group to continue.',
+                    errno.EINVAL
+                )
+
+            group_ids = []
+            if data.get('group'):
+                group_ids.append(data['group'])
+            if data.get('groups'):
+                group_ids.extend(data['groups'])
+
+            if missing := [str(group_id) for group_id in group_ids if group_id not in ds_groups]:
+                verrors.add(f'{schema}.groups', f'Following groups do not exist: {", ".join(missing)}', errno.ENOENT)
+
+            await self.common_validation(verrors, data, schema, group_ids, existing=existing)
+
+            if data.get('sshpubkey') and not data['home'].startswith('/mnt'):
+                verrors.add(f'{schema}.sshpubkey', 'The home directory is not writable. Leave this field blank.')
+
+            if data['username'] in usernames:
+                verrors.add(
+                    f'{schema}.username', f'The username "{data["username"]}" is specified more than once.',
+                    errno.EEXIST
+                )
+            elif data['smb'] and data['username'].lower() in smb_usernames:
+                verrors.add(
+                    f'{schema}.smb',
+                    f'Username "{data["username"]}" conflicts with another SMB user being created. Note that SMB '
+                    'usernames are case-insensitive.',
+                    errno.EEXIST,
+                )
+            usernames.add(data['username'])
+            if data['smb']:
+                smb_usernames.add(data['username'].lower())
+
+            if data.get('uid') is not None:
+                if data['uid'] in uids:
+                    verrors.add(f'{schema}.uid', f'Uid {data["uid"]} is specified more than once.', errno.EEXIST)
+                uids.add(data['uid'])
+
+            if data['home'] and data['home'] not in DEFAULT_HOME_PATHS:
+                home = os.path.join(data['home'], data['username']) if data['home_create'] else data['home']
+                if in_use := homes.get(home):
+                    verrors.add(
+                        f'{schema}.home',
+                        f'{home}: homedir is also specified for user "{in_use}" being created.',
+                        errno.EEXIST
+                    )
+                homes.setdefault(home, data['username'])
+
+        verrors.check()
+
+        job.set_progress(10, 'Creating primary groups')
+        results = [{'result': None, 'error': None} for i in range(len(users))]
+        groups = [None] * len(users)
+        ds_groups_by_name = {g['group']: g for g in ds_groups.values()}
+        new_groups = {}
+        for i, data in enumerate(users):
+            if data.pop('group_create'):
+                if data['username'] in ds_groups_by_name:
+                    groups[i] = ds_groups_by_name[data['username']]
                 else:
-                    dest_file = os.path.join(data['home'], f)
-                if not os.path.exists(dest_file):
-                    shutil.copyfile(os.path.join(SKEL_PATH, f), dest_file)
-                    chown_job = self.middleware.call_sync('filesystem.chown', {
-                        'path': dest_file,
-                        'uid': data['uid'],
-                        'gid': group['gid'],
-                    })
-                    chown_job.wait_sync()
-
-            data['sshpubkey'] = sshpubkey
+                    new_groups[i] = {
+                        'group': data['username'],
+                        'smb': False,
+                        'sudo_commands': [],
+                        'sudo_commands_nopasswd': [],
+                    }
+            else:
+                groups[i] = ds_groups[data['group']]
+
+        if new_groups:
+            for new_group, gid in zip(
+                new_groups.values(), await self.middleware.call('group.get_next_gids', len(new_groups))
+            ):
+                new_group['gid'] = gid
+
+            for i, pk in zip(new_groups, await self.middleware.call(
+                'datastore.insert_many', 'account.bsdgroups', list(new_groups.values()), {'prefix': 'bsdgrp_'}
+            )):
+                groups[i] = {'id': pk, **new_groups[i]}
+
+        for i, data in enumerate(users):
+            data['group'] = groups[i]['id']
+
+        missing_uids = [data for data in users if data.get('uid') is None]
+        for data, uid in zip(missing_uids, await self.get_next_uids(len(missing_uids), uids)):
+            data['uid'] = uid
+
+        job.set_progress(20, 'Setting up home directories')
+        home_modes = [data.pop('home_mode') for data in users]
+
+        async def setup_homedir(i):
+            data = users[i]
             try:
-                self.update_sshpubkey(data['home'], data, group['group'])
-            except PermissionError as e:
-                self.logger.warn('Failed to update authorized keys', exc_info=True)
-                raise CallError(f'Failed to update authorized keys: {e}')
+                data['home'] = await self.middleware.run_in_thread(
+                    self.setup_homedir, data['home'], data['username'], home_modes[i], data['uid'],
+                    groups[i]['gid'], data['home_create'],
+                )
+            except Exception as e:
+                results[i]['error'] = str(e)
 
-        return pk
+        await asyncio_map(
+            setup_homedir,
+            [i for i, data in enumerate(users) if data['home'] and data['home'] not in DEFAULT_HOME_PATHS],
+            8,
+        )
+
+        failed_new_groups = [groups[i]['id'] for i in new_groups if results[i]['error'] is not None]
+        if failed_new_groups:
+            # Homedir setup failed, we should remove any auto-generated group
+            await self.middleware.call('datastore.delete', 'account.bsdgroups', [['id', 'in', failed_new_groups]])
+
+        job.set_progress(40, 'Creating users')
+        builtin_users_id = None
+        if any(data['smb'] for data in users):
+            builtin_users_id = (await self.middleware.call(
+                'group.query', [('group', '=', 'builtin_users')], {'get': True},
+            ))['id']
+
+        to_create = [i for i in range(len(users)) if results[i]['error'] is None]
+        aux_groups = {}
+        sshpubkeys = {}
+        rows = []
+        for i in to_create:
+            data = users[i]
+            aux_groups[i] = data.pop('groups') + ([builtin_users_id] if data['smb'] else [])
+            data = self.user_compress(data)
+            sshpubkeys[i] = data.pop('sshpubkey', None)  # datastore does not have sshpubkey
+            rows.append(data)
+
+        # SHA-512 crypt is slow, hash the passwords in threads so the event loop is not blocked
+        await asyncio_map(lambda data: self.middleware.run_in_thread(self.__set_password, data), rows, 8)
+
+        # Two-factor and group membership rows need the new users' ids so they are inserted in separate transactions.
+        # If any of them fails, everything created so far is removed.
+        pks = []
+        try:
+            pks = await self.middleware.call('datastore.insert_many', 'account.bsdusers', rows, {'prefix': 'bsdusr_'})
+            await self.middleware.call('datastore.insert_many', 'account.twofactor_user_auth', [
+                {'secret': None, 'user': pk} for pk in pks
+            ])
+            await self.middleware.call('datastore.insert_many', 'account.bsdgroupmembership', [
+                {'group': group_id, 'user': pk}
+                for i, pk in zip(to_create, pks)
+                for group_id in set(aux_groups[i])
+            ], {'prefix': 'bsdgrpmember_'})
+        except Exception:
+            if pks:
+                # Two-factor and group membership rows are deleted on cascade
+                await self.middleware.call('datastore.delete', 'account.bsdusers', [['id', 'in', pks]])
+            if new_groups:
+                await self.middleware.call('datastore.delete', 'account.bsdgroups', [
+                    ['id', 'in', [groups[i]['id'] for i in new_groups if results[i]['error'] is None]]
+                ])
+            raise
+
+        for i, pk in zip(to_create, pks):
+            results[i]['result'] = pk
+
+        job.set_progress(70, 'Reloading services')
+        await self.middleware.call('service.reload', 'ssh')
+        await self.middleware.call('service.reload', 'user')
+
+        if any(users[i]['smb'] for i in to_create):
+            gm_job = await self.middleware.call('smb.synchronize_passdb')
+            await gm_job.wait()
+
+        job.set_progress(80, 'Populating home directories')
+
+        async def populate_homedir(i):
+            try:
+                await self.middleware.run_in_thread(self.populate_homedir, users[i], groups[i], sshpubkeys[i])
+            except Exception as e:
+                results[i]['error'] = str(e)
+
+        await asyncio_map(populate_homedir, to_create, 8)
+
+        job.set_progress(100, f'Created {len(to_create)} of {len(users)} users')
+        return results
 
     @accepts(
         Int('id'),
@@ -1062,22 +1288,27 @@ class UserService(CRUDService):
         """
         Get the next available/free uid.
         """
-        # We want to create new users from 3000 to avoid potential conflicts - Reference: NAS-117892
-        last_uid = 2999
-        builtins = await self.middleware.call(
-            'datastore.query', 'account.bsdusers',
-            [('builtin', '=', False)], {'order_by': ['uid'], 'prefix': 'bsdusr_'}
-        )
-        for i in builtins:
-            # If the difference between the last uid and the current one is
-            # bigger than 1, it means we have a gap and can use it.
-            if i['uid'] - last_uid > 1:
-                return last_uid + 1
+        return (await self.get_next_uids(1))[0]
 
-            if i['uid'] > last_uid:
-                last_uid = i['uid']
+    @private
+    async def get_next_uids(self, count, exclude=None):
+        """
+        Get `count` next available uids (see `user.get_next_uid`) that are not in `exclude` either.
+        """
+        # We want to create new users from 3000 to avoid potential conflicts - Reference: NAS-117892
+        used_uids = {
+            user['uid'] for user in await self.middleware.call(
+                'datastore.query', 'account.bsdusers', [('builtin', '=', False)], {'prefix': 'bsdusr_'}
+            )
+        } | set(exclude or [])
+        result = []
+        next_uid = 3000
+        while len(result) < count:
+            if next_uid not in used_uids:
+                result.append(next_uid)
+            next_uid += 1
 
-        return last_uid + 1
+        return result
 
     @no_auth_required
     @accepts()
@@ -1205,16 +1436,30 @@ class UserService(CRUDService):
             raise CallError(f"Failed to copy homedir [{home_old}] to [{home_new}]: {do_copy.stderr.decode()}")
 
     @private
-    async def common_validation(self, verrors, data, schema, group_ids, old=None):
-        exclude_filter = [('id', '!=', old['id'])] if old else []
+    async def existing_users(self, exclude_filter=None):
+        """
+        Usernames and home directories of the existing users `common_validation` checks new values against.
+        """
+        existing = {'usernames': set(), 'smb_usernames': set(), 'homes': {}}
+        for user in await self.middleware.call(
+            'datastore.query', 'account.bsdusers', exclude_filter or [], {'prefix': 'bsdusr_'}
+        ):
+            existing['usernames'].add(user['username'])
+            if user['smb']:
+                existing['smb_usernames'].add(user['username'].casefold())
+            existing['homes'].setdefault(user['home'], user['username'])
+
+        return existing
+
+    @private
+    async def common_validation(self, verrors, data, schema, group_ids, old=None, existing=None):
+        """
+        `existing` is the result of `existing_users`, it is queried unless specified.
+        """
         combined = data if not old else old | data
 
-        users = await self.middleware.call(
-            'datastore.query',
-            'account.bsdusers',
-            exclude_filter,
-            {'prefix': 'bsdusr_'}
-        )
+        if existing is None:
+            existing = await self.existing_users([('id', '!=', old['id'])] if old else [])
 
         if await self.middleware.call('cluster.utils.is_clustered'):
             if data.get('smb') is True:
@@ -1249,7 +1494,7 @@ class UserService(CRUDService):
         if 'username' in data:
             pw_checkname(verrors, f'{schema}.username', data['username'])
 
-            if filter_list(users, [('username', '=', data['username'])]):
+            if data['username'] in existing['usernames']:
                 verrors.add(
                     f'{schema}.username',
                     f'The username "{data["username"]}" already exists.',
@@ -1257,7 +1502,7 @@ class UserService(CRUDService):
                 )
 
             if data.get('smb'):
-                if filter_list(users, [['username', 'C=', data['username']], ['smb', '=', True]]):
+                if data['username'].casefold() in existing['smb_usernames']:
                     verrors.add(
                         f'{schema}.smb',
                         f'Username "{data["username"]}" conflicts with existing SMB user. Note that SMB '
@@ -1280,7 +1525,7 @@ class UserService(CRUDService):
             )
 
         if 'home' in data:
-            if await self.middleware.run_in_thread(self.validate_homedir_path, verrors, schema, data, users):
+            if await self.middleware.run_in_thread(self.validate_homedir_path, verrors, schema, data, existing):
                 await check_path_resides_within_volume(verrors, self.middleware, schema, data['home'])
 
         if 'home_mode' in data:
@@ -1636,6 +1881,91 @@ class GroupService(CRUDService):
         """
         return await self.create_internal(data)
 
+    @accepts(List('groups', items=[Ref('group_create')], required=True))
+    @returns(List('results', items=[Dict(
+        'group_create_bulk_result',
+        Int('result', null=True),
+        Str('error', null=True),
+    )]))
+    @job(lock='account_create_bulk')
+    async def create_bulk(self, job, groups):
+        """
+        Create multiple groups at once.
+
+        Every entry accepts the same attributes as `group.create`. All entries are validated before any group is
+        created; if any of them is invalid, nothing is created. Groups are inserted into the database in a single
+        transaction and the user database and SMB group mappings are only synchronized once.
+
+        Result is a list of `{"result": <group id>, "error": null}` statuses in the same order as `groups`.
+        """
+        job.set_progress(0, 'Validating groups')
+        verrors = ValidationErrors()
+        existing = await self.__existing_groups()
+        names = set()
+        smb_names = set()
+        gids = set()
+        for i, data in enumerate(groups):
+            schema = f'group_create_bulk.{i}'
+            allow_duplicate_gid = data['allow_duplicate_gid']
+            await self.__common_validation(verrors, data, schema, existing=existing)
+
+            if data['name'] in names:
+                verrors.add(
+                    f'{schema}.name', f'Group name "{data["name"]}" is specified more than once.', errno.EEXIST
+                )
+            elif data['smb'] and data['name'].lower() in smb_names:
+                verrors.add(
+                    f'{schema}.name',
+                    f'Group name "{data["name"]}" conflicts with another SMB group being created. Note that SMB '
+                    'group names are case-insensitive.',
+                    errno.EEXIST,
+                )
+            names.add(data['name'])
+            if data['smb']:
+                smb_names.add(data['name'].lower())
+
+            if data.get('gid') is not None:
+                if data['gid'] in gids and not allow_duplicate_gid:
+                    verrors.add(f'{schema}.gid', f'Gid {data["gid"]} is specified more than once.', errno.EEXIST)
+                gids.add(data['gid'])
+
+        verrors.check()
+
+        job.set_progress(30, 'Creating groups')
+        missing_gids = [data for data in groups if data.get('gid') is None]
+        for data, gid in zip(missing_gids, await self.get_next_gids(len(missing_gids), gids)):
+            data['gid'] = gid
+
+        rows = []
+        users = []
+        for data in groups:
+            group = data.copy()
+            group['group'] = group.pop('name')
+            users.append(group.pop('users', []))
+            rows.append(await self.group_compress(group))
+
+        pks = await self.middleware.call('datastore.insert_many', 'account.bsdgroups', rows, {'prefix': 'bsdgrp_'})
+        try:
+            await self.middleware.call('datastore.insert_many', 'account.bsdgroupmembership', [
+                {'bsdgrpmember_group': pk, 'bsdgrpmember_user': user}
+                for pk, group_users in zip(pks, users)
+                for user in group_users
+            ])
+        except Exception:
+            # Group membership rows are inserted in a separate transaction because they need the new groups' ids
+            await self.middleware.call('datastore.delete', 'account.bsdgroups', [['id', 'in', pks]])
+            raise
+
+        job.set_progress(70, 'Reloading services')
+        await self.middleware.call('service.reload', 'user')
+
+        if any(data['smb'] for data in groups):
+            gm_job = await self.middleware.call('smb.synchronize_group_mappings')
+            await gm_job.wait()
+
+        job.set_progress(100, f'Created {len(pks)} groups')
+        return [{'result': pk, 'error': None} for pk in pks]
+
     @private
     async def create_internal(self, data, reload_users=True):
 
@@ -1791,19 +2121,30 @@ class GroupService(CRUDService):
         """
         Get the next available/free gid.
         """
+        return (await self.get_next_gids(1))[0]
+
+    @private
+    async def get_next_gids(self, count, exclude=None):
+        """
+        Get `count` next available gids (see `group.get_next_gid`) that are not in `exclude` either.
+        """
         used_gids = (
             {
                 group['bsdgrp_gid']
                 for group in await self.middleware.call('datastore.query', 'account.bsdgroups')
             } |
-            set((await self.middleware.call('privilege.used_local_gids')).keys())
+            set((await self.middleware.call('privilege.used_local_gids')).keys()) |
+            set(exclude or [])
         )
         # We should start gid from 3000 to avoid potential conflicts - Reference: NAS-117892
+        result = []
         next_gid = 3000
-        while next_gid in used_gids:
+        while len(result) < count:
+            if next_gid not in used_gids:
+                result.append(next_gid)
             next_gid += 1
 
-        return next_gid
+        return result
 
     @accepts(Dict(
         'get_group_obj',
@@ -1827,9 +2168,22 @@ class GroupService(CRUDService):
         verrors.check()
         return await self.middleware.call('dscache.get_uncached_group', data['groupname'], data['gid'])
 
-    async def __common_validation(self, verrors, data, schema, pk=None):
+    async def __existing_groups(self, pk=None):
+        groups = await self.middleware.call(
+            'datastore.query', 'account.bsdgroups', [('id', '!=', pk)] if pk else [], {'prefix': 'bsdgrp_'}
+        )
+        return {
+            'names': {group['group'] for group in groups},
+            'smb_names': {group['group'].casefold() for group in groups if group['smb']},
+            'privilege_gids': await self.middleware.call('privilege.used_local_gids'),
+        }
 
-        exclude_filter = [('id', '!=', pk)] if pk else []
+    async def __common_validation(self, verrors, data, schema, pk=None, existing=None):
+        """
+        `existing` is the result of `__existing_groups`, it is queried unless specified.
+        """
+        if existing is None:
+            existing = await self.__existing_groups(pk)
 
         if await self.middleware.call('cluster.utils.is_clustered'):
             if data.get('smb') is True:
@@ -1856,12 +2210,7 @@ class GroupService(CRUDService):
                         errno.EEXIST,
                     )
 
-                smb_groups = await self.middleware.call('datastore.query',
-                                                        'account.bsdgroups',
-                                                        [('smb', '=', True)] + exclude_filter,
-                                                        {'prefix': 'bsdgrp_'})
-
-                if filter_list(smb_groups, [['group', 'C=', data['name']]]):
+                if data['name'].casefold() in existing['smb_names']:
                     verrors.add(
                         f'{schema}.name',
                         f'Group name "{data["name"]}" conflicts with existing groupmap entry. '
@@ -1870,11 +2219,7 @@ class GroupService(CRUDService):
                         errno.EEXIST,
                     )
 
-            existing = await self.middleware.call(
-                'datastore.query', 'account.bsdgroups',
-                [('group', '=', data['name'])] + exclude_filter, {'prefix': 'bsdgrp_'}
-            )
-            if existing:
+            if data['name'] in existing['names']:
                 verrors.add(
                     f'{schema}.name',
                     f'A Group with the name "{data["name"]}" already exists.',
@@ -1886,7 +2231,7 @@ class GroupService(CRUDService):
         allow_duplicate_gid = data.pop('allow_duplicate_gid', False)
         if data.get('gid') and not allow_duplicate_gid:
             try:
-                existing = await self.middleware.call(
+                group = await self.middleware.call(
                     'group.get_group_obj', {'gid': data['gid']},
                 )
             except KeyError:
@@ -1894,12 +2239,12 @@ class GroupService(CRUDService):
             else:
                 verrors.add(
                     f'{schema}.gid',
-                    f'Gid {data["gid"]} is already used (group {existing["gr_name"]} has it)',
+                    f'Gid {data["gid"]} is already used (group {group["gr_name"]} has it)',
                     errno.EEXIST,
                 )
 
         if data.get('gid'):
-            if privilege := (await self.middleware.call('privilege.used_local_gids')).get(data['gid']):
+            if privilege := existing['privilege_gids'].get(data['gid']):
                 verrors.add(
                     f'{schema}.gid',
                     f'A privilege {privilege["name"]!r} already uses this group ID.',
@@ -1907,7 +2252,7 @@ class GroupService(CRUDService):
                 )
 
         if 'users' in data:
-            existing = {
+            existing_users = {
                 i['id']
                 for i in await self.middleware.call(
                     'datastore.query',
@@ -1915,7 +2260,7 @@ class GroupService(CRUDService):
                     [('id', 'in', data['users'])],
                 )
             }
-            notfound = set(data['users']) - existing
+            notfound = set(data['users']) - existing_users
             if notfound:
                 verrors.add(
                     f'{schema}.users',
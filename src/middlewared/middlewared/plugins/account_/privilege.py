@@ -414,6 +414,9 @@ class PrivilegeService(CRUDService):
         )
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     middleware.event_register(
         'user.web_ui_login_disabled',
@@ -1,15 +1,15 @@
 import errno
-
-import boto3
 import time
 
-from botocore import exceptions as boto_exceptions
-
 from middlewared.schema import accepts, Dict, Password, Str
 from middlewared.service import CallError, skip_arg
+from middlewared.utils.python import lazy_import
 
 from .base import Authenticator
 
+boto3 = lazy_import('boto3')
+boto_exceptions = lazy_import('botocore.exceptions')
+
 
 class Route53Authenticator(Authenticator):
 
@@ -0,0 +1,127 @@
+import contextlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+from collections import defaultdict
+from datetime import datetime
+
+
+INDEX_DIR_NAME = '.index'
+INDEX_MAGIC = b'TNCATIDX1'
+INDEX_HEADER_LENGTH = struct.Struct('<Q')
+INDEX_BUILD_LOCKS = defaultdict(threading.Lock)
+INDEX_LOCK = threading.Lock()
+OPEN_INDEXES = {}
+
+
+def get_index_path(catalog_location, commit):
+    return os.path.join(
+        os.path.dirname(catalog_location), INDEX_DIR_NAME, f'{os.path.basename(catalog_location)}@{commit}.idx'
+    )
+
+
+def write_catalog_index(path, commit, trains_data, unhealthy_apps, categories):
+    """
+    Write catalog index to `path`.
+
+    Index file layout is: magic, header length, JSON header, and then every catalog item JSON-encoded one after the
+    other. Header maps each train/item to the offset and length of its encoded blob so that a single item can be
+    decoded without reading the rest of the catalog.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    body = bytearray()
+    trains = {}
+    for train, train_data in trains_data.items():
+        trains[train] = {}
+        for item, item_data in train_data.items():
+            blob = json.dumps(item_data).encode()
+            trains[train][item] = [len(body), len(blob)]
+            body += blob
+
+    header = json.dumps({
+        'commit': commit,
+        'trains': trains,
+        'unhealthy_apps': sorted(unhealthy_apps),
+        'categories': sorted(categories),
+    }).encode()
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_MAGIC)
+        f.write(INDEX_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+def remove_catalog_indexes(catalog_location, keep=None):
+    index_dir = os.path.join(os.path.dirname(catalog_location), INDEX_DIR_NAME)
+    prefix = f'{os.path.basename(catalog_location)}@'
+    with contextlib.suppress(FileNotFoundError):
+        for entry in os.scandir(index_dir):
+            if entry.name.startswith(prefix) and entry.name.endswith('.idx') and entry.path != keep:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(entry.path)
+                close_catalog_index(entry.path)
+
+
+class CatalogIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if self.mm[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+                raise ValueError(f'{path!r} is not a catalog index')
+
+            offset = len(INDEX_MAGIC)
+            header_length, = INDEX_HEADER_LENGTH.unpack_from(self.mm, offset)
+            offset += INDEX_HEADER_LENGTH.size
+            header = json.loads(self.mm[offset:offset + header_length])
+        except Exception:
+            self.mm.close()
+            raise
+
+        self.body_offset = offset + header_length
+        self.commit = header['commit']
+        self.trains = header['trains']
+        self.unhealthy_apps = header['unhealthy_apps']
+        self.categories = header['categories']
+
+    def item(self, train, item):
+        offset, length = self.trains[train][item]
+        start = self.body_offset + offset
+        data = json.loads(self.mm[start:start + length])
+        if data['last_update']:
+            data['last_update'] = datetime.strptime(data['last_update'], '%Y-%m-%d %H:%M:%S')
+
+        return data
+
+    def train(self, train):
+        return {item: self.item(train, item) for item in self.trains[train]}
+
+
+def get_catalog_index(path):
+    """
+    Returns an open `CatalogIndex` for `path`. Indexes are immutable once written (a new commit produces a new file)
+    so opened indexes are shared between callers.
+    """
+    with INDEX_LOCK:
+        if path not in OPEN_INDEXES:
+            OPEN_INDEXES[path] = CatalogIndex(path)
+
+        return OPEN_INDEXES[path]
+
+
+def close_catalog_index(path):
+    # Other threads might still be reading from it, mapping will be closed when the last reference is gone
+    with INDEX_LOCK:
+        OPEN_INDEXES.pop(path, None)
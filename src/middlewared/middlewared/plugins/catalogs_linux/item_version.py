@@ -55,18 +55,24 @@ class CatalogService(Service):
         elif not os.path.isdir(item_location):
             raise CallError(f'{item_location!r} must be a directory')
 
-        train_data = self.middleware.call_sync('catalog.items', options['catalog'], {
-            'retrieve_all_trains': False,
-            'trains': [options['train']],
-        })
-        if options['train'] not in train_data:
-            raise CallError(f'Unable to locate {options["train"]!r} train')
-        elif item_name not in train_data[options['train']]:
-            raise CallError(f'Unable to locate {item_name!r} item in {options["train"]!r} train')
+        item_data = self.middleware.call_sync(
+            'catalog.get_cached_item', options['catalog'], options['train'], item_name
+        )
+        if item_data is None:
+            train_data = self.middleware.call_sync('catalog.items', options['catalog'], {
+                'retrieve_all_trains': False,
+                'trains': [options['train']],
+            })
+            if options['train'] not in train_data:
+                raise CallError(f'Unable to locate {options["train"]!r} train')
+            elif item_name not in train_data[options['train']]:
+                raise CallError(f'Unable to locate {item_name!r} item in {options["train"]!r} train')
+
+            item_data = train_data[options['train']][item_name]
 
         questions_context = self.middleware.call_sync('catalog.get_normalised_questions_context')
 
-        item_details = get_item_details(item_location, train_data[options['train']][item_name], questions_context)
+        item_details = get_item_details(item_location, item_data, questions_context)
         if options['catalog'] == OFFICIAL_LABEL:
             recommended_apps = self.middleware.call_sync('catalog.retrieve_recommended_apps')
             if options['train'] in recommended_apps and item_name in recommended_apps[options['train']]:
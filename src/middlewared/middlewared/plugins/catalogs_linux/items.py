@@ -6,12 +6,15 @@ from catalog_validation.items.catalog import retrieve_recommended_apps, retrieve
 from catalog_validation.items.utils import get_catalog_json_schema
 from catalog_validation.items.items_util import get_item_details_base
 from catalog_validation.utils import CACHED_CATALOG_FILE_NAME
-from datetime import datetime
 from jsonschema import validate as json_schema_validate, ValidationError as JsonValidationError
 
 from middlewared.schema import Bool, Dict, List, returns, Str
 from middlewared.service import accepts, private, Service
+from middlewared.utils.git import get_repo_head
 
+from .catalog_index import (
+    get_catalog_index, get_index_path, INDEX_BUILD_LOCKS, remove_catalog_indexes, write_catalog_index,
+)
 from .items_util import get_item_version_details
 from .update import OFFICIAL_LABEL
 from .utils import get_cache_key
@@ -85,33 +88,18 @@ class CatalogService(Service):
         """
         catalog = self.middleware.call_sync('catalog.get_instance', label)
         all_trains = options['retrieve_all_trains']
-        cache_available = False
+        index = None
 
         if options['cache']:
-            cache_key = get_cache_key(label)
-            try:
-                orig_cached_data = self.middleware.call_sync('cache.get', cache_key)
-            except KeyError:
-                orig_cached_data = None
+            index = self.get_cached_index(label)
 
-            cache_available = orig_cached_data is not None
-
-        if options['cache'] and options['cache_only'] and not cache_available:
+        if options['cache'] and options['cache_only'] and index is None:
             return {}
 
-        if options['cache'] and cache_available:
-            cached_data = {}
-            for train in orig_cached_data:
-                if not all_trains and train not in options['trains']:
-                    continue
-
-                train_data = {}
-                for catalog_item in orig_cached_data[train]:
-                    train_data[catalog_item] = {k: v for k, v in orig_cached_data[train][catalog_item].items()}
-
-                cached_data[train] = train_data
-
-            return cached_data
+        if index is not None:
+            return {
+                train: index.train(train) for train in index.trains if all_trains or train in options['trains']
+            }
         elif not os.path.exists(catalog['location']):
             return {}
 
@@ -119,69 +107,112 @@ class CatalogService(Service):
             # We can only safely say that the catalog is healthy if we retrieve data for all trains
             self.middleware.call_sync('alert.oneshot_delete', 'CatalogNotHealthy', label)
 
-        trains = self.get_trains(catalog, options)
+        index = self.get_index(catalog)
+        if index is None:
+            return {}
 
         if all_trains:
+            if index.unhealthy_apps:
+                self.middleware.call_sync(
+                    'alert.oneshot_create', 'CatalogNotHealthy', {
+                        'catalog': catalog['id'], 'apps': ', '.join(index.unhealthy_apps)
+                    }
+                )
+
             # We will only update cache if we are retrieving data of all trains for a catalog
             # which happens when we sync catalog(s) periodically or manually
             # We cache for 90000 seconds giving system an extra 1 hour to refresh it's cache which
             # happens after 24h - which means that for a small amount of time it's possible that user
             # come with a case where system is trying to access cached data but it has expired and it's
             # reading again from disk hence the extra 1 hour.
-            self.middleware.call_sync('cache.put', get_cache_key(label), trains, 90000)
+            # Only the path of the catalog index is cached, item details are decoded from it on demand.
+            self.middleware.call_sync('cache.put', get_cache_key(label), index.path, 90000)
 
-        return trains
+        trains_to_traverse = retrieve_train_names(catalog['location'], all_trains, options['trains'])
+        return {train: index.train(train) for train in index.trains if train in trains_to_traverse}
 
     @private
-    def get_trains(self, catalog, options):
-        if os.path.exists(os.path.join(catalog['location'], CACHED_CATALOG_FILE_NAME)):
-            # If the data is malformed or something similar, let's read the data then from filesystem
-            try:
-                return self.retrieve_trains_data_from_json(catalog, options)
-            except (json.JSONDecodeError, JsonValidationError):
-                self.logger.error('Invalid catalog json file specified for %r catalog', catalog['id'])
+    def get_cached_index(self, label):
+        try:
+            index_path = self.middleware.call_sync('cache.get', get_cache_key(label))
+        except KeyError:
+            return None
 
-        return {}
+        try:
+            return get_catalog_index(index_path)
+        except (FileNotFoundError, ValueError):
+            return None
 
     @private
-    def retrieve_trains_data_from_json(self, catalog, options):
-        trains_to_traverse = retrieve_train_names(
-            catalog['location'], options['retrieve_all_trains'], options['trains']
-        )
+    def get_cached_item(self, label, train, item):
+        """
+        Retrieve `item` details of `train` from `label` catalog index without decoding the rest of the catalog.
+        Returns `None` if `label` catalog has not been cached yet or it does not have such item.
+        """
+        index = self.get_cached_index(label)
+        if index is None or item not in index.trains.get(train, {}):
+            return None
+
+        return index.item(train, item)
+
+    @private
+    def get_index(self, catalog):
+        """
+        Returns catalog index for the currently checked out commit of `catalog`, building it if it does not exist.
+        Catalog JSON schema is only validated when the index is being built.
+        """
+        catalog_file = os.path.join(catalog['location'], CACHED_CATALOG_FILE_NAME)
+        if not os.path.exists(catalog_file):
+            return None
+
+        commit = get_repo_head(catalog['location'])
+        if commit is None:
+            st = os.stat(catalog_file)
+            commit = f'{st.st_mtime_ns}-{st.st_size}'
+
+        index_path = get_index_path(catalog['location'], commit)
+        with INDEX_BUILD_LOCKS[index_path]:
+            if not os.path.exists(index_path):
+                # If the data is malformed or something similar, we won't have any data for the catalog
+                try:
+                    self.build_index(catalog, index_path, commit)
+                except (json.JSONDecodeError, JsonValidationError):
+                    self.logger.error('Invalid catalog json file specified for %r catalog', catalog['id'])
+                    return None
+
+        index = get_catalog_index(index_path)
+        self.CATEGORIES_SET.update(index.categories)
+        return index
+
+    @private
+    def build_index(self, catalog, index_path, commit):
         with open(os.path.join(catalog['location'], CACHED_CATALOG_FILE_NAME), 'r') as f:
             catalog_data = json.loads(f.read())
             json_schema_validate(catalog_data, get_catalog_json_schema())
 
+            trains_to_traverse = retrieve_train_names(catalog['location'])
             data = {k: v for k, v in catalog_data.items() if k in trains_to_traverse}
 
         recommended_apps = self.retrieve_recommended_apps(False) if catalog['label'] == OFFICIAL_LABEL else {}
         unhealthy_apps = set()
+        categories = set()
         for train in data:
             for item in data[train]:
                 data[train][item].update({
                     **{k: v for k, v in get_item_details_base().items() if k not in data[train][item]},
                     'location': os.path.join(catalog['location'], train, item),
                 })
-                if data[train][item]['last_update']:
-                    data[train][item]['last_update'] = datetime.strptime(
-                        data[train][item]['last_update'], '%Y-%m-%d %H:%M:%S'
-                    )
 
                 if data[train][item]['healthy'] is False:
                     unhealthy_apps.add(f'{item} ({train} train)')
                 if train in recommended_apps and item in recommended_apps[train]:
                     data[train][item]['recommended'] = True
 
-                self.CATEGORIES_SET.update(data[train][item].get('categories') or [])
+                categories.update(data[train][item].get('categories') or [])
 
-        if unhealthy_apps:
-            self.middleware.call_sync(
-                'alert.oneshot_create', 'CatalogNotHealthy', {
-                    'catalog': catalog['id'], 'apps': ', '.join(unhealthy_apps)
-                }
-            )
-
-        return data
+        write_catalog_index(index_path, commit, data, unhealthy_apps, categories)
+        # Indexes built for previous commits of this catalog are not needed anymore
+        remove_catalog_indexes(catalog['location'], keep=index_path)
 
     @private
     def item_version_details(self, version_path, questions_context=None):
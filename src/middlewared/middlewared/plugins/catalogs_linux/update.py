@@ -10,6 +10,7 @@ from middlewared.service import accepts, CallError, CRUDService, job, private
 from middlewared.utils import filter_list, MIDDLEWARE_RUN_DIR
 from middlewared.validators import Match
 
+from .catalog_index import remove_catalog_indexes
 from .utils import convert_repository_to_path, get_cache_key
 
 OFFICIAL_ENTERPRISE_TRAIN = 'enterprise'
@@ -309,6 +310,7 @@ class CatalogService(CRUDService):
         # Remove cached content of the catalog in question so that if a catalog is created again
         # with same label but different repo/branch, we don't reuse old cache
         self.middleware.call_sync('cache.pop', get_cache_key(id_))
+        remove_catalog_indexes(catalog['location'])
 
         return ret
 
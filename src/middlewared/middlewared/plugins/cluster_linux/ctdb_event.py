@@ -128,5 +128,8 @@ class CtdbEventService(Service):
         return getattr(self, ev.get_fn())(data)
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.event_register('ctdb.status', 'Sent on cluster status changes.')
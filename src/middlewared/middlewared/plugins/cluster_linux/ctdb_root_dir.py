@@ -3,7 +3,6 @@ import json
 import os
 
 from pathlib import Path
-from pyglfs import GLFSError
 from time import sleep
 from uuid import uuid4
 
@@ -12,6 +11,9 @@ from middlewared.schema import Bool, Dict, Int, IPAddr, List, Ref, returns, Str
 from middlewared.plugins.cluster_linux.utils import CTDBConfig, FuseConfig
 from middlewared.plugins.gluster_linux.utils import get_parsed_glusterd_uuid as get_glusterd_uuid
 from middlewared.validators import UUID
+from middlewared.utils.python import lazy_import
+
+pyglfs = lazy_import('pyglfs')
 
 
 MOUNT_UMOUNT_LOCK = CTDBConfig.MOUNT_UMOUNT_LOCK.value
@@ -46,7 +48,7 @@ class CtdbRootDirService(Service):
                     'volume_name': LEGACY_CTDB_VOL_NAME,
                     'path': '.DEPRECATED'
                 })['uuid']
-            except GLFSError as e:
+            except pyglfs.GLFSError as e:
                 if e.errno != errno.ENOENT:
                     raise CallError(
                         'Failed to lookup DEPRECATED sentinel for legacy CTDB '
@@ -69,7 +71,7 @@ class CtdbRootDirService(Service):
                     'volume_name': vol,
                     'path': CTDB_STATE_DIR
                 })['uuid']
-            except GLFSError as e:
+            except pyglfs.GLFSError as e:
                 if e.errno != errno.ENOENT:
                     raise CallError(
                         'Failed to lookup truenas cluster state dir on '
@@ -222,7 +224,7 @@ class CtdbRootDirService(Service):
                     'volume_name': current['volume_name'],
                     'path': current['path']
                 })
-            except GLFSError as e:
+            except pyglfs.GLFSError as e:
                 if e.errno != errno.ENOENT:
                     raise CallError(
                         'Failed to lookup truenas cluster state dir '
@@ -256,7 +258,7 @@ class CtdbRootDirService(Service):
                 'volume_name': data['name'],
                 'path': CTDB_STATE_DIR
             })['uuid']
-        except GLFSError as e:
+        except pyglfs.GLFSError as e:
             if e.errno != errno.ENOENT:
                 raise
 
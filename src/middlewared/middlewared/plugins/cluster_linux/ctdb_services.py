@@ -1,7 +1,6 @@
 import errno
 import json
 import os
-import pyglfs
 
 from copy import deepcopy
 from middlewared.plugins.cluster_linux.utils import CTDBConfig
@@ -10,6 +9,9 @@ from middlewared.schema import Dict, Str, Bool
 from middlewared.service import accepts, filterable, Service
 from middlewared.service_exception import CallError
 from middlewared.utils import filter_list
+from middlewared.utils.python import lazy_import
+
+pyglfs = lazy_import('pyglfs')
 
 CTDB_MONITORED_SERVICES = ['cifs']
 CTDB_SERVICE_DEFAULTS = {srv: {
@@ -1,8 +1,10 @@
 import errno
 
-from glustercli.cli import volume
 from middlewared.service import Service, CallError, job
 from middlewared.plugins.cluster_linux.utils import CTDBConfig
+from middlewared.utils.python import lazy_import
+
+volume = lazy_import('glustercli.cli.volume')
 
 
 CRE_OR_DEL_LOCK = CTDBConfig.CRE_OR_DEL_LOCK.value
@@ -20,6 +20,7 @@ class CryptoKeyService(Service):
 
     class Config:
         private = True
+        executor = 'CPU'
 
     def normalize_san(self, san_list):
         return normalize_san(san_list)
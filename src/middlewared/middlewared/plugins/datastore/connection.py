@@ -90,6 +90,42 @@ class DatastoreService(Service):
         options.setdefault('ha_sync', True)
         options.setdefault('return_last_insert_rowid', False)
 
+        sql, binds = self._compile(stmt)
+
+        result = self.connection.execute(sql, binds)
+
+        self.middleware.call_hook_inline("datastore.post_execute_write", sql, binds, options)
+
+        if options['return_last_insert_rowid']:
+            return self.fetchall("SELECT last_insert_rowid()")[0][0]
+
+        return result
+
+    @private
+    def execute_write_many(self, stmts, options=None):
+        """
+        Execute all `stmts` in a single transaction. Either all of them are applied or none.
+        """
+        options = options or {}
+        options.setdefault('ha_sync', True)
+        options.setdefault('return_last_insert_rowid', False)
+
+        compiled = [self._compile(stmt) for stmt in stmts]
+        results = []
+        with self.connection.begin():
+            for sql, binds in compiled:
+                result = self.connection.execute(sql, binds)
+                if options['return_last_insert_rowid']:
+                    result = self.fetchall("SELECT last_insert_rowid()")[0][0]
+
+                results.append(result)
+
+        for sql, binds in compiled:
+            self.middleware.call_hook_inline("datastore.post_execute_write", sql, binds, options)
+
+        return results
+
+    def _compile(self, stmt):
         compiled = stmt.compile(self.engine, compile_kwargs={"render_postcompile": True})
 
         sql = compiled.string
@@ -103,14 +139,7 @@ class DatastoreService(Service):
             else:
                 binds.append(value)
 
-        result = self.connection.execute(sql, binds)
-
-        self.middleware.call_hook_inline("datastore.post_execute_write", sql, binds, options)
-
-        if options['return_last_insert_rowid']:
-            return self.fetchall("SELECT last_insert_rowid()")[0][0]
-
-        return result
+        return sql, binds
 
     @private
     def fetchall(self, query, params=None):
@@ -1,7 +1,7 @@
 from sqlalchemy import and_, types
 from sqlalchemy.sql import sqltypes
 
-from middlewared.schema import accepts, Any, Bool, Dict, Str
+from middlewared.schema import accepts, Any, Bool, Dict, List, Str
 from middlewared.service import Service
 
 from .filter import FilterMixin
@@ -48,14 +48,7 @@ class DatastoreService(Service, FilterMixin, SchemaMixin):
         Insert a new entry to `name`.
         """
         table = self._get_table(name)
-        insert, relationships = self._extract_relationships(table, options['prefix'], data)
-
-        for column in table.c:
-            if column.default is not None:
-                insert.setdefault(column.name, column.default.arg)
-            if not column.nullable:
-                if isinstance(column.type, (types.String, types.Text)):
-                    insert.setdefault(column.name, '')
+        insert, relationships = self._prepare_insert(table, options['prefix'], data)
 
         pk_column = self._get_pk(table)
         return_last_insert_rowid = type(pk_column.type) == sqltypes.Integer
@@ -79,6 +72,141 @@ class DatastoreService(Service, FilterMixin, SchemaMixin):
 
         return pk
 
+    @accepts(
+        Str('name'),
+        List('data', items=[Dict('row', additional_attrs=True)]),
+        Dict(
+            'options',
+            Bool('ha_sync', default=True),
+            Str('prefix', default=''),
+            Bool('send_events', default=True),
+        ),
+    )
+    async def insert_many(self, name, data, options):
+        """
+        Insert multiple entries to `name` in a single transaction. Returns the list of primary keys of the new entries
+        in the same order as `data`.
+        """
+        table = self._get_table(name)
+        pk_column = self._get_pk(table)
+        return_last_insert_rowid = type(pk_column.type) is sqltypes.Integer
+
+        inserts = []
+        for row in data:
+            insert, relationships = self._prepare_insert(table, options['prefix'], row)
+            if relationships:
+                raise ValueError(f'{name}: relationships are not supported for bulk inserts')
+
+            inserts.append(insert)
+
+        if not inserts:
+            return []
+
+        result = await self.middleware.call(
+            'datastore.execute_write_many',
+            [table.insert().values(**insert) for insert in inserts],
+            {
+                'ha_sync': options['ha_sync'],
+                'return_last_insert_rowid': return_last_insert_rowid,
+            },
+        )
+        if return_last_insert_rowid:
+            pks = result
+        else:
+            pks = [insert[pk_column.name] for insert in inserts]
+
+        if options['send_events']:
+            for pk, insert in zip(pks, inserts):
+                await self.middleware.call('datastore.send_insert_events', name, {**insert, pk_column.name: pk})
+
+        return pks
+
+    @accepts(
+        Str('name'),
+        Dict(
+            'changes',
+            List('insert', items=[Dict('row', additional_attrs=True)]),
+            List('update', items=[Dict('row', additional_attrs=True)]),
+            List('delete', items=[Any('id')]),
+        ),
+        Dict(
+            'options',
+            Bool('ha_sync', default=True),
+            Str('prefix', default=''),
+            Bool('send_events', default=True),
+        ),
+    )
+    async def write_many(self, name, changes, options):
+        """
+        Delete, update and insert multiple entries of `name` (in that order) in a single transaction. Rows to
+        `update` are identified by their primary key value. Returns the list of primary keys of the inserted entries.
+        """
+        table = self._get_table(name)
+        pk_column = self._get_pk(table)
+        return_last_insert_rowid = type(pk_column.type) is sqltypes.Integer
+
+        # Deletes go first so that rows can be re-inserted with the primary key of a deleted row
+        stmts = [table.delete().where(pk_column == id_) for id_ in changes['delete']]
+
+        updated = []
+        for row in changes['update']:
+            update, relationships = self._extract_relationships(table, options['prefix'], row)
+            if relationships:
+                raise ValueError(f'{name}: relationships are not supported for bulk writes')
+
+            id_ = update.pop(pk_column.name)
+            updated.append(id_)
+            if update:
+                stmts.append(table.update().values(**update).where(pk_column == id_))
+
+        first_insert = len(stmts)
+        inserts = []
+        for row in changes['insert']:
+            insert, relationships = self._prepare_insert(table, options['prefix'], row)
+            if relationships:
+                raise ValueError(f'{name}: relationships are not supported for bulk writes')
+
+            inserts.append(insert)
+            stmts.append(table.insert().values(**insert))
+
+        if not stmts:
+            return []
+
+        result = await self.middleware.call(
+            'datastore.execute_write_many',
+            stmts,
+            {
+                'ha_sync': options['ha_sync'],
+                'return_last_insert_rowid': return_last_insert_rowid,
+            },
+        )
+        if return_last_insert_rowid:
+            pks = result[first_insert:]
+        else:
+            pks = [insert[pk_column.name] for insert in inserts]
+
+        if options['send_events']:
+            for id_ in changes['delete']:
+                await self.middleware.call('datastore.send_delete_events', name, id_)
+            for id_ in updated:
+                await self.middleware.call('datastore.send_update_events', name, id_)
+            for pk, insert in zip(pks, inserts):
+                await self.middleware.call('datastore.send_insert_events', name, {**insert, pk_column.name: pk})
+
+        return pks
+
+    def _prepare_insert(self, table, prefix, data):
+        insert, relationships = self._extract_relationships(table, prefix, data)
+
+        for column in table.c:
+            if column.default is not None:
+                insert.setdefault(column.name, column.default.arg)
+            if not column.nullable:
+                if isinstance(column.type, (types.String, types.Text)):
+                    insert.setdefault(column.name, '')
+
+        return insert, relationships
+
     @accepts(
         Str('name'),
         Any('id_or_filters'),
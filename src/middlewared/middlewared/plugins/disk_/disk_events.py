@@ -30,5 +30,8 @@ async def udev_block_devices_hook(middleware, data):
         await remove_disk(middleware, data['SYS_NAME'])
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_hook('udev.block', udev_block_devices_hook)
@@ -1,12 +1,35 @@
 import re
 from datetime import datetime, timedelta
 
+from middlewared.plugins.enclosure_.ses_cache import build_slot_index
 from middlewared.schema import accepts, Bool, Dict, Str
 from middlewared.service import job, private, Service, ServiceChangeMixin
 
 RE_IDENT = re.compile(r'^\{(?P<type>.+?)\}(?P<value>.+)$')
 
 
+class DiskIdentIndex:
+    """
+    Maps disk identifiers (`{serial_lunid}...`, `{serial}...`, `{uuid}...`, `{devicename}...`) to device names.
+    If several disks share the same value, the first one wins.
+    """
+
+    def __init__(self, sys_disks):
+        self.index = {'uuid': {}, 'devicename': {}, 'serial_lunid': {}, 'serial': {}}
+        for disk, info in sys_disks.items():
+            for part in info['parts']:
+                self.index['uuid'].setdefault(part['partition_uuid'], part['disk'])
+            for tp, key in (('devicename', 'name'), ('serial_lunid', 'serial_lunid'), ('serial', 'serial')):
+                if (value := info.get(key)) is not None:
+                    self.index[tp].setdefault(value, disk)
+
+    def ident_to_dev(self, ident):
+        if not ident or not (search := RE_IDENT.search(ident)):
+            return
+
+        return self.index.get(search.group('type'), {}).get(search.group('value'))
+
+
 class DiskService(Service, ServiceChangeMixin):
 
     DISK_EXPIRECACHE_DAYS = 7
@@ -80,21 +103,7 @@ class DiskService(Service, ServiceChangeMixin):
 
     @private
     def ident_to_dev(self, ident, sys_disks):
-        if not ident or not (search := RE_IDENT.search(ident)):
-            return
-
-        tp = search.group('type')
-        value = search.group('value')
-        mapping = {'uuid': 'uuid', 'devicename': 'name', 'serial_lunid': 'serial_lunid', 'serial': 'serial'}
-        if tp not in mapping:
-            return
-
-        for disk, info in sys_disks.items():
-            if tp == 'uuid':
-                for part in filter(lambda x: x['partition_uuid'] == value, info['parts']):
-                    return part['disk']
-            elif info.get(mapping[tp]) == value:
-                return disk
+        return DiskIdentIndex(sys_disks).ident_to_dev(ident)
 
     @private
     def dev_to_ident(self, name, sys_disks, uuids):
@@ -132,45 +141,102 @@ class DiskService(Service, ServiceChangeMixin):
 
         job.set_progress(10, 'Enumerating system disks')
         sys_disks = self.middleware.call_sync('device.get_disks', True)
-        number_of_disks = self.log_disk_info(sys_disks)
+        self.log_disk_info(sys_disks)
 
         job.set_progress(20, 'Enumerating disk information from database')
         db_disks = self.middleware.call_sync('datastore.query', 'storage.disk', [], {'order_by': ['disk_expiretime']})
 
         uuids = self.middleware.call_sync('disk.get_valid_zfs_partition_type_uuids')
-        options = {'send_events': False, 'ha_sync': False}
-        seen_disks = {}
-        changed = set()
-        deleted = set()
-        dif_formatted_disks = []
-        increment = round((40 - 20) / number_of_disks, 3)  # 20% of the total percentage
-        progress_percent = 40
         encs = self.middleware.call_sync('enclosure.query')
-        for idx, disk in enumerate(db_disks, start=1):
-            progress_percent += increment
-            job.set_progress(progress_percent, f'Syncing disk {idx}/{number_of_disks}')
 
+        job.set_progress(40, f'Syncing {len(sys_disks)} disks')
+        plan = self._sync_plan(db_disks, sys_disks, uuids, encs)
+
+        for disk in plan['kmip_reset']:
+            self.middleware.call_sync(
+                'kmip.reset_sed_disk_password', disk['disk_identifier'], disk['disk_kmip_uid'], background=True
+            )
+
+        changed = {disk['disk_identifier'] for disk in plan['insert'] + plan['update']}
+        # A disk can be deleted and re-inserted with the same identifier, it is only changed then
+        deleted = set(plan['delete']) - changed
+        if changed or deleted:
+            job.set_progress(70, f'Writing {len(changed) + len(deleted)} disk changes to database')
+            # All the changes are written in a single transaction. Events are emitted below once everything is written.
+            self.middleware.call_sync(
+                'datastore.write_many', 'storage.disk', {
+                    'insert': plan['insert'], 'update': plan['update'], 'delete': plan['delete'],
+                }, {'send_events': False, 'ha_sync': False},
+            )
+
+        if plan['dif_formatted']:
+            self.middleware.call_sync('alert.oneshot_create', 'DifFormatted', plan['dif_formatted'])
+        else:
+            self.middleware.call_sync('alert.oneshot_delete', 'DifFormatted', None)
+
+        if changed or deleted:
+            job.set_progress(92, 'Restarting necessary services')
+            self.middleware.call_sync('disk.restart_services_after_sync')
+
+            # we query the db again since we've made changes to it
+            job.set_progress(94, 'Emitting disk events')
+            disks = {i['disk_identifier']: i for i in self.middleware.call_sync('datastore.query', 'storage.disk')}
+            for change in changed:
+                self.middleware.send_event('disk.query', 'CHANGED', id=change, fields=disks[change])
+            for delete in deleted:
+                self.middleware.send_event('disk.query', 'REMOVED', id=delete)
+
+        if opts['zfs_guid']:
+            job.set_progress(95, 'Synchronizing ZFS GUIDs')
+            self.middleware.call_sync('disk.sync_all_zfs_guid')
+
+        if licensed and status == 'MASTER':
+            job.set_progress(96, 'Synchronizing database to standby controller')
+            # there could be, literally, > 1k database changes in this method on large systems
+            # so we're not sync'ing these db changes synchronously. Instead we're sync'ing the
+            # entire database to the remote node after we're done. The (potential) speed
+            # improvement this provides is substantial
+            self.middleware.call_sync('failover.datastore.force_send')
+
+        job.set_progress(100, 'Syncing all disks complete')
+        return 'OK'
+
+    def _sync_plan(self, db_disks, sys_disks, uuids, enclosures, now=None):
+        """
+        Compare `db_disks` (ordered by expiretime) with `sys_disks` in memory and return the database changes
+        required to bring them in sync. Disk identifiers and enclosure slots are indexed once so this is linear
+        in the number of disks.
+        """
+        now = now or datetime.utcnow()
+        expiretime = now + timedelta(days=self.DISK_EXPIRECACHE_DAYS)
+        index = DiskIdentIndex(sys_disks)
+        slots = build_slot_index(enclosures)
+
+        db = {}
+        seen_disks = set()
+        inserts = {}
+        updates = {}
+        deletes = []
+        kmip_reset = []
+        dif_formatted_disks = []
+        for disk in db_disks:
             original_disk = disk.copy()
 
-            name = self.ident_to_dev(disk['disk_identifier'], sys_disks)
+            name = index.ident_to_dev(disk['disk_identifier'])
             if not name or self.dev_to_ident(name, sys_disks, uuids) != disk['disk_identifier']:
                 # 1. can't translate identitifer to device
                 # 2. or can't translate device to identifier
                 if not disk['disk_expiretime']:
-                    disk['disk_expiretime'] = datetime.utcnow() + timedelta(days=self.DISK_EXPIRECACHE_DAYS)
-                    self.middleware.call_sync(
-                        'datastore.update', 'storage.disk', disk['disk_identifier'], disk, options
-                    )
-                    changed.add(disk['disk_identifier'])
-                elif disk['disk_expiretime'] < datetime.utcnow():
+                    disk['disk_expiretime'] = expiretime
+                    updates[disk['disk_identifier']] = disk
+                elif disk['disk_expiretime'] < now:
                     # Disk expire time has surpassed, go ahead and remove it
                     if disk['disk_kmip_uid']:
-                        self.middleware.call_sync(
-                            'kmip.reset_sed_disk_password', disk['disk_identifier'], disk['disk_kmip_uuid'],
-                            background=True
-                        )
-                    self.middleware.call_sync('datastore.delete', 'storage.disk', disk['disk_identifier'], options)
-                    deleted.add(disk['disk_identifier'])
+                        kmip_reset.append(disk)
+                    deletes.append(disk['disk_identifier'])
+                    continue
+
+                db[disk['disk_identifier']] = disk
                 continue
             else:
                 disk['disk_expiretime'] = None
@@ -184,93 +250,49 @@ class DiskService(Service, ServiceChangeMixin):
 
             if name not in sys_disks and not disk['disk_expiretime']:
                 # If for some reason disk is not identified as a system disk mark it to expire.
-                disk['disk_expiretime'] = datetime.utcnow() + timedelta(days=self.DISK_EXPIRECACHE_DAYS)
+                disk['disk_expiretime'] = expiretime
 
-            if self._disk_changed(disk, original_disk):
-                self.middleware.call_sync('datastore.update', 'storage.disk', disk['disk_identifier'], disk, options)
-                changed.add(disk['disk_identifier'])
+            self._map_enclosure_slot(disk, slots)
 
-            try:
-                self.middleware.call_sync('enclosure.sync_disk', disk['disk_identifier'], encs)
-            except Exception:
-                self.logger.error(
-                    'Unhandled exception in enclosure.sync_disk for %r', disk['disk_identifier'], exc_info=True
-                )
+            if self._disk_changed(disk, original_disk):
+                updates[disk['disk_identifier']] = disk
 
-            seen_disks[name] = disk
+            seen_disks.add(name)
+            db[disk['disk_identifier']] = disk
 
-        qs = None
-        progress_percent = 70
         for name in filter(lambda x: x not in seen_disks, sys_disks):
-            progress_percent += increment
             disk_identifier = self.dev_to_ident(name, sys_disks, uuids)
-            if qs is None:
-                qs = self.middleware.call_sync('datastore.query', 'storage.disk')
-
-            if disk := [i for i in qs if i['disk_identifier'] == disk_identifier]:
-                new = False
-                disk = disk[0]
-                job.set_progress(progress_percent, f'Updating disk {name!r}')
+            if disk_identifier in db:
+                disk = db[disk_identifier]
             else:
-                new = True
-                disk = {'disk_identifier': disk_identifier}
-                job.set_progress(progress_percent, f'Syncing new disk {name!r}')
+                disk = db[disk_identifier] = inserts[disk_identifier] = {'disk_identifier': disk_identifier}
 
             original_disk = disk.copy()
             disk['disk_name'] = name
             self._map_device_disk_to_db(disk, sys_disks[name])
+            self._map_enclosure_slot(disk, slots)
 
             if sys_disks[name]['dif']:
                 dif_formatted_disks.append(name)
 
-            if not new:
-                if self._disk_changed(disk, original_disk):
-                    self.middleware.call_sync(
-                        'datastore.update', 'storage.disk', disk['disk_identifier'], disk, options
-                    )
-                    changed.add(disk['disk_identifier'])
-            else:
-                self.middleware.call_sync('datastore.insert', 'storage.disk', disk, options)
-                changed.add(disk['disk_identifier'])
-
-            try:
-                self.middleware.call_sync('enclosure.sync_disk', disk['disk_identifier'], encs)
-            except Exception:
-                self.logger.error(
-                    'Unhandled exception in enclosure.sync_disk for %r', disk['disk_identifier'], exc_info=True
-                )
-
-        if dif_formatted_disks:
-            self.middleware.call_sync('alert.oneshot_create', 'DifFormatted', dif_formatted_disks)
-        else:
-            self.middleware.call_sync('alert.oneshot_delete', 'DifFormatted', None)
-
-        if changed or deleted:
-            job.set_progress(92, 'Restarting necessary services')
-            self.middleware.call_sync('disk.restart_services_after_sync')
-
-            # we query the db again since we've made changes to it
-            job.set_progress(94, 'Emitting disk events')
-            disks = {i['disk_identifier']: i for i in self.middleware.call_sync('datastore.query', 'storage.disk')}
-            for change in changed:
-                self.middleware.send_event('disk.query', 'CHANGED', id=change, fields=disks[change])
-            for delete in deleted:
-                self.middleware.send_event('disk.query', 'REMOVED', id=delete)
-
-        if opts['zfs_guid']:
-            job.set_progress(95, 'Synchronizing ZFS GUIDs')
-            self.middleware.call_sync('disk.sync_all_zfs_guid')
+            if disk_identifier not in inserts and self._disk_changed(disk, original_disk):
+                updates[disk_identifier] = disk
 
-        if licensed and status == 'MASTER':
-            job.set_progress(96, 'Synchronizing database to standby controller')
-            # there could be, literally, > 1k database changes in this method on large systems
-            # so we're not sync'ing these db changes synchronously. Instead we're sync'ing the
-            # entire database to the remote node after we're done. The (potential) speed
-            # improvement this provides is substantial
-            self.middleware.call_sync('failover.datastore.force_send')
+        return {
+            'insert': list(inserts.values()),
+            'update': list(updates.values()),
+            'delete': deletes,
+            'kmip_reset': kmip_reset,
+            'dif_formatted': dif_formatted_disks,
+        }
 
-        job.set_progress(100, 'Syncing all disks complete')
-        return 'OK'
+    def _map_enclosure_slot(self, db_disk, slots):
+        # Same encoding as `disk.update` uses for the `enclosure` field
+        if slot := slots.get(db_disk['disk_name']):
+            enclosure, element = slot
+            db_disk['disk_enclosure_slot'] = enclosure['number'] * 1000 + element['slot']
+        else:
+            db_disk['disk_enclosure_slot'] = None
 
     def _disk_changed(self, disk, original_disk):
         # storage_disk.disk_size is a string
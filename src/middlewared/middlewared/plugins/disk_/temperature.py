@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import datetime
 import time
 
@@ -8,11 +9,12 @@ from middlewared.common.smart.smartctl import SMARTCTL_POWERMODES
 from middlewared.schema import accepts, Bool, Dict, Int, List, Ref, returns, Str
 from middlewared.service import private, Service
 from middlewared.utils.asyncio_ import asyncio_map
-from middlewared.utils.disks import parse_smartctl_for_temperature_output
+from middlewared.utils.disks import NVME_TYPE, parse_smartctl_for_temperature_output, read_hwmon_temperatures
 
 
 class DiskService(Service):
     cache = {}
+    temperature_sources = {}
 
     @private
     async def disks_for_temperature_monitoring(self):
@@ -55,16 +57,76 @@ class DiskService(Service):
                 if cache_time > time.monotonic() - options['cache']:
                     return temperature
 
-        temperature = await self.middleware.call('disk.temperature_uncached', name, options['powermode'])
+        return (await self.middleware.call('disk.temperatures_uncached', [name], options['powermode']))[name]
 
-        self.cache[name] = (temperature, time.monotonic())
-        return temperature
+    @private
+    async def temperatures_uncached(self, names, powermode):
+        """
+        Collects temperatures of `names` disks and stores them in the cache.
+
+        The kernel hwmon interface is read for all the disks at once. It is only used for NVMe disks or when
+        `powermode` allows waking up the disk anyway. `smartctl` is only run (querying just the attributes and,
+        for ATA disks, SCT status) for disks that hwmon does not provide temperature for.
+        """
+        temperatures = dict.fromkeys(names)
+
+        if hwmon := [name for name in names if powermode == 'NEVER' or name.startswith(NVME_TYPE)]:
+            with self._temperature_source('hwmon', len(hwmon)) as found:
+                temperatures.update(await self.middleware.run_in_thread(read_hwmon_temperatures, hwmon))
+                found.extend(filter(lambda name: temperatures[name] is not None, hwmon))
+
+        async def smartctl(name):
+            args = ['-A', '-n', powermode.lower()]
+            if not name.startswith(NVME_TYPE):
+                args.extend(['-l', 'scttempsts'])
+
+            with self._temperature_source('smartctl', 1) as found:
+                try:
+                    async with async_timeout.timeout(15):
+                        output = await self.middleware.call('disk.smartctl', name, args, {'silent': True})
+                except asyncio.TimeoutError:
+                    return None
+
+                if output is not None and (temperature := parse_smartctl_for_temperature_output(output)) is not None:
+                    found.append(name)
+                    return temperature
+
+        remaining = [name for name, temperature in temperatures.items() if temperature is None]
+        temperatures.update(zip(remaining, await asyncio_map(smartctl, remaining, 8)))
+
+        now = time.monotonic()
+        for name, temperature in temperatures.items():
+            self.cache[name] = (temperature, now)
+
+        return temperatures
+
+    @contextlib.contextmanager
+    def _temperature_source(self, source, disks):
+        found = []
+        start = time.monotonic()
+        try:
+            yield found
+        finally:
+            elapsed = time.monotonic() - start
+            stats = self.temperature_sources.setdefault(source, {
+                'queries': 0, 'disks': 0, 'found': 0, 'total_time': 0, 'max_time': 0,
+            })
+            stats['queries'] += 1
+            stats['disks'] += disks
+            stats['found'] += len(found)
+            stats['total_time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
 
     @private
-    async def temperature_uncached(self, name, powermode):
-        output = await self.middleware.call('disk.smartctl', name, ['-a', '-n', powermode.lower()], {'silent': True})
-        if output is not None:
-            return parse_smartctl_for_temperature_output(output)
+    async def temperature_source_stats(self):
+        """
+        Latency of the temperature sources (in seconds) and how many of the queried disks each of them
+        provided temperature for.
+        """
+        return {
+            source: dict(stats, avg_time=stats['total_time'] / stats['queries'])
+            for source, stats in self.temperature_sources.items()
+        }
 
     @private
     async def reset_temperature_cache(self):
@@ -107,14 +169,18 @@ class DiskService(Service):
                 )
             }
 
-        async def temperature(name):
-            try:
-                async with async_timeout.timeout(15):
-                    return await self.middleware.call('disk.temperature', name, options)
-            except asyncio.TimeoutError:
-                return None
+        temperatures = {}
+        if options['cache'] is not None:
+            for name in names:
+                if (cached := self.cache.get(name)) and cached[1] > time.monotonic() - options['cache']:
+                    temperatures[name] = cached[0]
+
+        if missing := [name for name in names if name not in temperatures]:
+            temperatures.update(
+                await self.middleware.call('disk.temperatures_uncached', missing, options['powermode'])
+            )
 
-        return dict(zip(names, await asyncio_map(temperature, names, 8)))
+        return {name: temperatures[name] for name in names}
 
     @accepts(List('names', items=[Str('name')]), Int('days', default=7))
     @returns(Dict('temperatures', additional_attrs=True))
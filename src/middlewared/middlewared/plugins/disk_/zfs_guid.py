@@ -124,6 +124,9 @@ async def hook(middleware, pool):
     await middleware.call("disk.sync_zfs_guid", pool)
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     middleware.register_hook("zfs.pool.events", zfs_events_hook)
     middleware.register_hook("pool.post_create_or_update", hook)
@@ -14,6 +14,7 @@ import middlewared.sqlalchemy as sa
 from middlewared.utils import filter_list
 from middlewared.plugins.enclosure_.r30_drive_identify import set_slot_status as r30_set_slot_status
 from middlewared.plugins.enclosure_.fseries_drive_identify import set_slot_status as fseries_set_slot_status
+from middlewared.plugins.enclosure_.ses_cache import EnclosureSnapshotCache
 
 
 logger = logging.getLogger(__name__)
@@ -66,9 +67,21 @@ class EnclosureService(CRUDService):
 
     class Config:
         cli_namespace = 'storage.enclosure'
+        query_coalesce = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._snapshot = EnclosureSnapshotCache(self.__query_enclosures)
 
     @filterable
     def query(self, filters, options):
+        return filter_list(self._snapshot.query(), filters=filters or [], options=options or {})
+
+    @private
+    def invalidate_snapshot(self):
+        self._snapshot.invalidate()
+
+    def __query_enclosures(self):
         enclosures = []
         if self.middleware.call_sync('truenas.get_chassis_hardware') == 'TRUENAS-UNKNOWN':
             # this feature is only available on hardware that ix sells
@@ -137,7 +150,7 @@ class EnclosureService(CRUDService):
         for enclosure in enclosures:
             enclosure["label"] = labels.get(enclosure["id"]) or enclosure["name"]
 
-        return filter_list(enclosures, filters=filters or [], options=options or {})
+        return enclosures
 
     @accepts(
         Str("id"),
@@ -154,6 +167,7 @@ class EnclosureService(CRUDService):
                 "encid": id_,
                 "label": data["label"]
             })
+            self._snapshot.invalidate()
 
         return await self.get_instance(id_)
 
@@ -173,7 +187,7 @@ class EnclosureService(CRUDService):
         raise MatchNotFound()
 
     def _get_slot_for_disk(self, disk, enclosure_info=None):
-        return self._get_slot(lambda element: element["data"]["Device"] == disk, enclosure_info=enclosure_info)
+        return self._snapshot.slot_for_disk(disk, enclosure_info)
 
     def _get_ses_slot(self, enclosure, element):
         if "original" in element:
@@ -256,6 +270,8 @@ class EnclosureService(CRUDService):
             msg = f'Failed to {status} slot {slot!r} on enclosure {info["id"]!r}'
             self.logger.warning(msg, exc_info=True)
             raise CallError(msg)
+        finally:
+            self._snapshot.invalidate()
 
     @private
     def sync_disk(self, id_, enclosure_info=None, retry=False):
@@ -308,9 +324,11 @@ class EnclosureService(CRUDService):
                     if enc.set_control(slot_str, 'get=ident'):
                         # identify light is on, clear it
                         enc.set_control(slot_str, 'clear=ident')
+                        self._snapshot.invalidate()
                     if enc.set_control(slot_str, 'get=fault'):
                         # fault light is on, clear it
                         enc.set_control(slot_str, 'clear=fault')
+                        self._snapshot.invalidate()
                 except OSError:
                     self.logger.warning('Failed to clear slot %r on enclosure %r', slot, i, exc_info=True)
                     return
@@ -1265,14 +1283,23 @@ async def udev_block_devices_hook(middleware, data):
         return
 
     if data['ACTION'] in ['add', 'remove']:
+        await middleware.call('enclosure.invalidate_snapshot')
         await middleware.call('enclosure.sync_zpool')
 
 
+async def udev_enclosure_hook(middleware, data):
+    await middleware.call('enclosure.invalidate_snapshot')
+
+
 async def pool_post_delete(middleware, id_):
     await middleware.call('enclosure.sync_zpool')
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_hook('zfs.pool.events', zfs_events_hook)
     middleware.register_hook('udev.block', udev_block_devices_hook)
+    middleware.register_hook('udev.enclosure', udev_enclosure_hook)
     middleware.register_hook('pool.post_delete', pool_post_delete)
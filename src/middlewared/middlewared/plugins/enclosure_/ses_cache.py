@@ -0,0 +1,123 @@
+import copy
+import re
+import threading
+import time
+
+from middlewared.service_exception import MatchNotFound
+
+GENERATION_CODE_RE = re.compile(r'generation code: (0x[0-9a-f]+)', re.IGNORECASE)
+# Enclosure status page (sensor readings, slot status) can change without any notification, so the snapshot
+# is never served longer than this.
+SNAPSHOT_MAX_AGE = 10
+
+
+def generation_code(page):
+    """
+    SES generation code of a diagnostic page (as formatted by libsg3). It is incremented by the enclosure
+    every time its configuration changes.
+    """
+    if m := GENERATION_CODE_RE.search(page):
+        return int(m.group(1), 16)
+
+
+def build_slot_index(enclosures):
+    """
+    Maps disk device name to (enclosure, element) of the array device slot it is in.
+    """
+    index = {}
+    for enclosure in enclosures:
+        for elements in filter(lambda element: element['name'] == 'Array Device Slot', enclosure['elements']):
+            for element in elements['elements']:
+                if device := element['data'].get('Device'):
+                    index.setdefault(device, (enclosure, element))
+
+            # Only the first group of array device slots is taken into account (same as `enclosure._get_slot`)
+            break
+
+    return index
+
+
+class ConfigurationPageCache:
+    """
+    SES configuration page only changes when the generation code reported in the enclosure status page
+    changes, so it does not have to be read each time the enclosure status is.
+    """
+
+    def __init__(self):
+        self.pages = {}
+
+    def get(self, name, status_page, read):
+        generation = generation_code(status_page)
+        cached = self.pages.get(name)
+        if generation is not None and cached is not None and cached[0] == generation:
+            return cached[1]
+
+        page = read()
+        if generation is not None and generation_code(page) == generation:
+            self.pages[name] = (generation, page)
+        else:
+            self.pages.pop(name, None)
+
+        return page
+
+    def retain(self, names):
+        for name in self.pages.keys() - set(names):
+            self.pages.pop(name)
+
+
+class EnclosureSnapshotCache:
+    """
+    Caches the result of `enclosure.query` together with a disk -> slot index. The snapshot is rebuilt when
+    it is older than `SNAPSHOT_MAX_AGE` or when it was invalidated (udev events, slot status or label changes).
+    """
+
+    def __init__(self, build, max_age=SNAPSHOT_MAX_AGE):
+        self.build = build
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        # `invalidate` may be called from the event loop so it must not wait for the lock
+        self.version = 0
+        self.snapshot = None
+        self.snapshot_version = None
+        self.taken_at = 0
+        self.slot_index = None
+        self.info_index = (None, None)
+
+    def invalidate(self):
+        self.version += 1
+
+    def _get(self):
+        with self.lock:
+            if (
+                self.snapshot is None or
+                self.snapshot_version != self.version or
+                time.monotonic() - self.taken_at > self.max_age
+            ):
+                version = self.version
+                self.snapshot = self.build()
+                self.snapshot_version = version
+                self.taken_at = time.monotonic()
+                self.slot_index = None
+
+            if self.slot_index is None:
+                self.slot_index = build_slot_index(self.snapshot)
+
+            return self.snapshot, self.slot_index
+
+    def query(self):
+        return copy.deepcopy(self._get()[0])
+
+    def slot_for_disk(self, disk, enclosure_info=None):
+        if enclosure_info is None:
+            index = self._get()[1]
+        else:
+            # Callers syncing many disks pass the same `enclosure.query` result for each of them
+            info, index = self.info_index
+            if info is not enclosure_info:
+                index = build_slot_index(enclosure_info)
+                self.info_index = (enclosure_info, index)
+
+        try:
+            return index[disk]
+        except KeyError:
+            raise MatchNotFound()
@@ -3,9 +3,15 @@ from pyudev import Context
 from libsg3.ses import EnclosureDevice
 from middlewared.service import private, Service
 
+from .ses_cache import ConfigurationPageCache
+
 
 class EnclosureService(Service):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._configuration_pages = ConfigurationPageCache()
+
     @private
     def list_ses_enclosures(self):
         ctx = Context()
@@ -14,18 +20,21 @@ class EnclosureService(Service):
     @private
     def get_ses_enclosures(self):
         output = {}
-        for i, name in enumerate(self.list_ses_enclosures()):
+        names = self.list_ses_enclosures()
+        self._configuration_pages.retain(names)
+        for i, name in enumerate(names):
             dev = EnclosureDevice(name)
             try:
-                cf = dev.get_configuration()
+                es = dev.get_enclosure_status()
             except OSError:
-                self.logger.warning('Error querying configuration page for %r', name, exc_info=True)
+                self.logger.warning('Error querying enclosure status page for %r', name, exc_info=True)
                 continue
 
             try:
-                es = dev.get_enclosure_status()
+                # Configuration page is only read again if its generation code changed
+                cf = self._configuration_pages.get(name, es, dev.get_configuration)
             except OSError:
-                self.logger.warning('Error querying enclosure status page for %r', name, exc_info=True)
+                self.logger.warning('Error querying configuration page for %r', name, exc_info=True)
                 continue
 
             output[i] = (name.removeprefix('/dev/'), (cf, es))
@@ -158,6 +158,9 @@ class FailoverDisabledReasonsService(Service):
         return reasons
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     middleware.event_register('failover.disabled.reasons', 'Sent when failover status reasons change.',
                               no_auth_required=True)
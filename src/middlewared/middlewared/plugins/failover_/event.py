@@ -792,6 +792,9 @@ async def vrrp_fifo_hook(middleware, data):
     await middleware.call('failover.events.event', ifname, event)
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.event_register('failover.vrrp_event', 'Sent when a VRRP state changes.')
     middleware.register_hook('vrrp.fifo', vrrp_fifo_hook)
@@ -16,6 +16,7 @@ from middlewared.event import EventSource
 from middlewared.plugins.pwenc import PWENC_FILE_SECRET
 from middlewared.plugins.cluster_linux.utils import CTDBConfig, FuseConfig
 from middlewared.plugins.filesystem_ import chflags, dosmode, stat_x
+from middlewared.plugins.filesystem_.listdir import DirectoryLister
 from middlewared.schema import accepts, Bool, Dict, Float, Int, List, Ref, returns, Path, Str, UnixPerm
 from middlewared.service import private, CallError, filterable_returns, filterable, Service, job
 from middlewared.utils import filter_list
@@ -299,6 +300,35 @@ class FilesystemService(Service):
           is_ctldir(bool): path is within special .zfs directory
         """
 
+        return self.listdir_impl(path, filters, options)[0]
+
+    @accepts(
+        Str('path', required=True),
+        Ref('query-filters'),
+        Ref('query-options'),
+        Str('cursor', null=True, default=None),
+        roles=['FILESYSTEM_ATTRS_READ']
+    )
+    @returns(Dict(
+        'listdir_page',
+        List('entries', items=[Ref('path_entry')]),
+        Str('cursor', null=True),
+    ))
+    def listdir_page(self, path, filters, options, cursor):
+        """
+        Get a page of the contents of a directory.
+
+        Behaves like `filesystem.listdir` and additionally returns `cursor` which should be passed to the next call
+        (with the same `path`, `filters` and `options`) to continue the listing after the last returned entry.
+        `cursor` is `null` when there are no more entries. `query-options.order_by` can not be used with a cursor.
+
+        Entries created or removed while the directory is being paged through may be missed or returned twice.
+        """
+        entries, cursor = self.listdir_impl(path, filters, options, cursor)
+        return {'entries': entries, 'cursor': cursor}
+
+    @private
+    def listdir_impl(self, path, filters, options, cursor=None):
         path = self.resolve_cluster_path(path)
         path = pathlib.Path(path)
         if not path.exists():
@@ -310,67 +340,7 @@ class FilesystemService(Service):
         if 'ix-applications' in path.parts:
             raise CallError('Ix-applications is a system managed dataset and its contents cannot be listed')
 
-        stat_opts = {"file_only": False, "dir_only": False}
-        for filter_ in filters:
-            if filter_[0] not in ['type']:
-                continue
-
-            if filter_[1] != '=':
-                continue
-
-            if filter_[2] == 'DIRECTORY':
-                stat_opts["dir_only"] = True
-            elif filter_[2] == 'FILE':
-                stat_opts["file_only"] = True
-            else:
-                continue
-
-        rv = []
-        if stat_opts["dir_only"] and stat_opts["file_only"]:
-            return rv
-
-        only_top_level = path.absolute() == pathlib.Path('/mnt')
-        for entry in path.iterdir():
-            st = self.statx_entry_impl(entry, stat_opts)
-            if st is None:
-                continue
-
-            if only_top_level and not entry.is_mount():
-                # sometimes (on failures) the top-level directory
-                # where the zpool is mounted does not get removed
-                # after the zpool is exported. WebUI calls this
-                # specifying `/mnt` as the path. This is used when
-                # configuring shares in the "Path" drop-down. To
-                # prevent shares from being configured to point to
-                # a path that doesn't exist on a zpool, we'll
-                # filter these here.
-                continue
-            if 'ix-applications' in entry.parts:
-                continue
-
-            etype = st['etype']
-            stat = st['st']
-            realpath = entry.resolve().as_posix() if etype == 'SYMLINK' else entry.absolute().as_posix()
-
-            data = {
-                'name': entry.name,
-                'path': entry.as_posix().replace(
-                    f'{FuseConfig.FUSE_PATH_BASE.value}/', FuseConfig.FUSE_PATH_SUBST.value
-                ),
-                'realpath': realpath,
-                'type': etype,
-                'size': stat.stx_size,
-                'mode': stat.stx_mode,
-                'acl': False if self.acl_is_trivial(realpath) else True,
-                'uid': stat.stx_uid,
-                'gid': stat.stx_gid,
-                'is_mountpoint': entry.is_mount(),
-                'is_ctldir': st['is_ctldir'],
-            }
-
-            rv.append(data)
-
-        return filter_list(rv, filters=filters or [], options=options or {})
+        return DirectoryLister(path.as_posix(), filters, options).list(cursor)
 
     @accepts(Str('path'), roles=['FILESYSTEM_ATTRS_READ'])
     @returns(Dict(
@@ -719,5 +689,8 @@ class FileFollowTailEventSource(EventSource):
             queue.append(data)
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_event_source('filesystem.file_tail_follow', FileFollowTailEventSource)
@@ -178,12 +178,13 @@ class ACLBase(ServicePartBase):
                 Bool('stripacl', default=False),
                 Bool('recursive', default=False),
                 Bool('traverse', default=False),
-                Bool('canonicalize', default=True)
+                Bool('canonicalize', default=True),
+                Bool('resume', default=False),
             )
         ), roles=['FILESYSTEM_ATTRS_WRITE']
     )
     @returns()
-    @job(lock="perm_change")
+    @job(lock="perm_change", abortable=True)
     def setacl(self, job, data):
         """
         Set ACL of a given path. Takes the following parameters:
@@ -205,6 +206,10 @@ class ACLBase(ServicePartBase):
 
         `traverse` traverse filestem boundaries (ZFS datasets)
 
+        Recursive operations report the number of processed files and the processing rate as job progress.
+        If a recursive job is aborted or fails, running it again with the same parameters and `resume` set resumes
+        the operation skipping directories that were already processed.
+
         `strip` convert ACL to trivial. ACL is trivial if it can be expressed as a file mode without
         losing any access rules.
 
@@ -280,13 +285,14 @@ class ACLBase(ServicePartBase):
             Dict(
                 'options',
                 Bool('recursive', default=False),
-                Bool('traverse', default=False)
+                Bool('traverse', default=False),
+                Bool('resume', default=False),
             )
         ),
         roles=['FILESYSTEM_ATTRS_WRITE']
     )
     @returns()
-    @job(lock="perm_change")
+    @job(lock="perm_change", abortable=True)
     def chown(self, job, data):
         """
         Change owner or group of file at `path`.
@@ -300,6 +306,8 @@ class ACLBase(ServicePartBase):
 
         If `traverse` and `recursive` are specified, then the chown
         operation will traverse filesystem mount points.
+
+        Aborted or failed recursive chown is resumed when run again with the same parameters and `resume` set.
         """
 
     @accepts(
@@ -314,12 +322,13 @@ class ACLBase(ServicePartBase):
                 Bool('stripacl', default=False),
                 Bool('recursive', default=False),
                 Bool('traverse', default=False),
+                Bool('resume', default=False),
             )
         ),
         roles=['FILESYSTEM_ATTRS_WRITE']
     )
     @returns()
-    @job(lock="perm_change")
+    @job(lock="perm_change", abortable=True)
     def setperm(self, job, data):
         """
         Set unix permissions on given `path`.
@@ -346,6 +355,8 @@ class ACLBase(ServicePartBase):
 
         `traverse` remove ACLs from child datasets.
 
+        Aborted or failed recursive operation is resumed when run again with the same parameters and `resume` set.
+
         If no `mode` is set, and `stripacl` is True, then non-trivial ACLs
         will be converted to trivial ACLs. An ACL is trivial if it can be
         expressed as a file mode without losing any access rules.
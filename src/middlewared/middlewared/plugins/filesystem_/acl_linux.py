@@ -1,14 +1,18 @@
+import copy
 import errno
-import json
 import os
 import subprocess
 import stat as pystat
+import threading
 from pathlib import Path
 
+from middlewared.job import State
 from middlewared.plugins.chart_releases_linux.utils import is_ix_volume_path
 from middlewared.service import private, CallError, ValidationErrors, Service
 from middlewared.utils.path import FSLocation, path_location
+from . import acl_xattr
 from .acl_base import ACLBase, ACLType
+from .perm_engine import RecursivePermissionEngine
 
 
 class FilesystemService(Service, ACLBase):
@@ -32,6 +36,30 @@ class FilesystemService(Service, ACLBase):
         if acltool.returncode != 0:
             raise CallError(f"acltool [{action}] on path {path} failed with error: [{acltool.stderr.decode().strip()}]")
 
+    @private
+    def acltool_recursive(self, job, path, action, uid, gid, options, mode=None):
+        """
+        Same as `acltool` but uses multiple workers, reports progress and, if `resume` option is set, resumes from
+        the checkpoint if the previous run with the same arguments was aborted or failed.
+        """
+        start = job.progress['percent'] or 0
+
+        def progress(percent, description):
+            job.set_progress(start + (100 - start) * percent / 100, description)
+
+        # Aborted job must not release `perm_change` lock while the engine is still running
+        stopped = threading.Event()
+        job.wait_on_abort(stopped)
+        try:
+            engine = RecursivePermissionEngine(
+                path, action, uid, gid, options, mode,
+                progress_callback=progress,
+                should_abort=lambda: job.state == State.ABORTED,
+            )
+            return engine.run()
+        finally:
+            stopped.set()
+
     def _common_perm_path_validate(self, schema, data, verrors):
         loc = path_location(data['path'])
         if loc is FSLocation.EXTERNAL:
@@ -169,8 +197,9 @@ class FilesystemService(Service, ACLBase):
             })
             return job.wrap_sync(glfs_job)
 
-        self.acltool(data['path'], 'chown', uid, gid, options)
-        job.set_progress(100, 'Finished changing owner.')
+        counts = self.acltool_recursive(job, data['path'], 'chown', uid, gid, options)
+        job.set_progress(100, f'Finished changing owner of {counts["files"]} files and {counts["directories"]} '
+                              'directories.')
 
     @private
     def _strip_acl_nfs4(self, path):
@@ -254,12 +283,11 @@ class FilesystemService(Service, ACLBase):
             })
             return job.wrap_sync(glfs_job)
 
-        action = 'clone' if mode else 'strip'
         job.set_progress(10, f'Recursively setting permissions on {data["path"]}.')
         options['posixacl'] = not is_nfs4acl
-        options['do_chmod'] = True
-        self.acltool(data['path'], action, uid, gid, options)
-        job.set_progress(100, 'Finished setting permissions.')
+        counts = self.acltool_recursive(job, data['path'], 'strip', uid, gid, options, mode or None)
+        job.set_progress(100, f'Finished setting permissions on {counts["files"]} files and '
+                              f'{counts["directories"]} directories.')
 
     async def default_acl_choices(self, path):
         acl_templates = await self.middleware.call('filesystem.acltemplate.by_path', {"path": path})
@@ -275,21 +303,11 @@ class FilesystemService(Service, ACLBase):
 
     @private
     def getacl_nfs4(self, path, simplified, resolve_ids):
-        flags = "-jn"
-
-        if not simplified:
-            flags += "v"
-
-        getacl = subprocess.run(
-            ['nfs4xdr_getfacl', flags, path],
-            capture_output=True,
-            check=False
-        )
-        if getacl.returncode != 0:
-            raise CallError("Failed to get ACL for path [%s]: %s",
-                            path, getacl.stderr.decode())
+        try:
+            output = acl_xattr.getacl_nfs4(path, simplified)
+        except (OSError, ValueError) as e:
+            raise CallError(f"Failed to get ACL for path [{path}]: {e}")
 
-        output = json.loads(getacl.stdout.decode())
         for ace in output['acl']:
             if resolve_ids and ace['id'] != -1:
                 ace['who'] = self.middleware.call_sync(
@@ -319,7 +337,11 @@ class FilesystemService(Service, ACLBase):
 
     @private
     def getacl_posix1e(self, path, simplified, resolve_ids):
-        st = os.stat(path)
+        try:
+            st, acl = acl_xattr.getacl_posix1e(path)
+        except (OSError, ValueError) as e:
+            raise CallError(f"Failed to get POSIX1e ACL on path [{path}]: {e}")
+
         ret = {
             'uid': st.st_uid,
             'gid': st.st_gid,
@@ -332,63 +354,15 @@ class FilesystemService(Service, ACLBase):
             'acltype': ACLType.POSIX1E.name
         }
 
-        ret['uid'] = st.st_uid
-        ret['gid'] = st.st_gid
-
-        gfacl = subprocess.run(['getfacl', '-c', '-n', path],
-                               check=False, capture_output=True)
-        if gfacl.returncode != 0:
-            raise CallError(f"Failed to get POSIX1e ACL on path [{path}]: {gfacl.stderr.decode()}")
-
-        # linux output adds extra line to output if it's an absolute path and extra newline at end.
-        entries = gfacl.stdout.decode().splitlines()
-        entries = entries[:-1]
-
-        for entry in entries:
-            if entry.startswith("#"):
-                continue
-
-            entry = entry.split("\t")[0]
-            ace = {
-                "default": False,
-                "tag": None,
-                "id": -1,
-                "perms": {
-                    "READ": False,
-                    "WRITE": False,
-                    "EXECUTE": False,
-                }
-            }
-
-            tag, id_, perms = entry.rsplit(":", 2)
-            ace['perms'].update({
-                "READ": perms[0].casefold() == "r",
-                "WRITE": perms[1].casefold() == "w",
-                "EXECUTE": perms[2].casefold() == "x",
-            })
-            if tag.startswith('default'):
-                ace['default'] = True
-                tag = tag[8:]
-
-            ace['tag'] = tag.upper()
-            if id_.isdigit():
-                ace['id'] = int(id_)
-                if resolve_ids:
-                    ace['who'] = self.middleware.call_sync(
-                        'idmap.id_to_name', ace['id'], ace['tag']
-                    )
-
-            elif ace['tag'] not in ['OTHER', 'MASK']:
-                if resolve_ids:
-                    to_check = st.st_gid if ace['tag'] == "GROUP" else st.st_uid
-                    ace['who'] = self.middleware.call_sync(
-                        'idmap.id_to_name', to_check, ace['tag']
-                    )
-
-                ace['tag'] += '_OBJ'
-
-            elif resolve_ids:
-                ace['who'] = None
+        for ace in acl:
+            if resolve_ids:
+                if ace['tag'] in ('USER', 'GROUP'):
+                    ace['who'] = self.middleware.call_sync('idmap.id_to_name', ace['id'], ace['tag'])
+                elif ace['tag'] in ('USER_OBJ', 'GROUP_OBJ'):
+                    to_check = st.st_gid if ace['tag'] == 'GROUP_OBJ' else st.st_uid
+                    ace['who'] = self.middleware.call_sync('idmap.id_to_name', to_check, ace['tag'][:-4])
+                else:
+                    ace['who'] = None
 
             ret['acl'].append(ace)
 
@@ -429,30 +403,18 @@ class FilesystemService(Service, ACLBase):
 
     @private
     def setacl_nfs4_internal(self, path, acl, do_canon, verrors):
-        payload = {
-            'acl': ACLType.NFS4.canonicalize(acl) if do_canon else acl,
-        }
-        json_payload = json.dumps(payload)
-        setacl = subprocess.run(
-            ['nfs4xdr_setfacl', '-j', json_payload, path],
-            capture_output=True,
-            check=False
-        )
-        """
-        nfs4xr_setacl with JSON input will return validation
-        errors on exit with EX_DATAERR (65).
-        """
-        if setacl.returncode == 65:
-            err = setacl.stderr.decode()
-            json_verrors = json.loads(err.split(None, 1)[1])
-            for entry in json_verrors:
-                for schema, err in entry.items():
-                    verrors.add(f'filesystem_acl.{schema.replace("acl", "dacl")}', err)
+        acl = ACLType.NFS4.canonicalize(acl) if do_canon else acl
+        try:
+            acl_xattr.setacl_nfs4(path, acl)
+        except acl_xattr.ACLCodecError as e:
+            schema = 'filesystem_acl.dacl'
+            if e.index is not None:
+                schema += f'.{e.index}.{e.attribute}'
 
+            verrors.add(schema, e.errmsg)
             verrors.check()
-
-        elif setacl.returncode != 0:
-            raise CallError(setacl.stderr.decode())
+        except OSError as e:
+            raise CallError(f'Failed to set ACL on path [{path}]: {e}', e.errno)
 
     @private
     def setacl_nfs4(self, job, data):
@@ -506,10 +468,11 @@ class FilesystemService(Service, ACLBase):
             job.set_progress(100, 'Finished setting NFSv4 ACL.')
             return
 
-        self.acltool(path, 'clone' if not do_strip else 'strip',
-                     uid, gid, options)
+        job.set_progress(10, f'Recursively setting NFSv4 ACL on {path}.')
+        counts = self.acltool_recursive(job, path, 'clone' if not do_strip else 'strip', uid, gid, options)
 
-        job.set_progress(100, 'Finished setting NFSv4 ACL.')
+        job.set_progress(100, f'Finished setting NFSv4 ACL on {counts["files"]} files and '
+                              f'{counts["directories"]} directories.')
 
     @private
     def gen_aclstring_posix1e(self, dacl, recursive, verrors):
@@ -664,7 +627,7 @@ class FilesystemService(Service, ACLBase):
                     e.errmsg
                 )
 
-            aclstring = self.gen_aclstring_posix1e(dacl, recursive, verrors)
+            aclstring = self.gen_aclstring_posix1e(copy.deepcopy(dacl), recursive, verrors)
 
         verrors.check()
 
@@ -673,11 +636,10 @@ class FilesystemService(Service, ACLBase):
         job.set_progress(50, 'Setting POSIX1e ACL.')
 
         if not do_strip:
-            setacl = subprocess.run(['setfacl', '-m', aclstring, path],
-                                    check=False, capture_output=True)
-            if setacl.returncode != 0:
-                raise CallError(f'Failed to set ACL [{aclstring}] on path [{path}]: '
-                                f'{setacl.stderr.decode()}')
+            try:
+                acl_xattr.setacl_posix1e(path, dacl)
+            except OSError as e:
+                raise CallError(f'Failed to set ACL [{aclstring}] on path [{path}]: {e}', e.errno)
 
         if not recursive:
             os.chown(path, uid, gid)
@@ -699,11 +661,10 @@ class FilesystemService(Service, ACLBase):
             return job.wrap_sync(glfs_job)
 
         options['posixacl'] = True
-        self.acltool(data['path'],
-                     'clone' if not do_strip else 'strip',
-                     uid, gid, options)
+        counts = self.acltool_recursive(job, data['path'], 'clone' if not do_strip else 'strip', uid, gid, options)
 
-        job.set_progress(100, 'Finished setting POSIX1e ACL.')
+        job.set_progress(100, f'Finished setting POSIX1e ACL on {counts["files"]} files and '
+                              f'{counts["directories"]} directories.')
 
     def setacl(self, job, data):
         verrors = ValidationErrors()
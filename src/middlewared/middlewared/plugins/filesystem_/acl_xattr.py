@@ -0,0 +1,410 @@
+import errno
+import os
+import stat
+import struct
+
+from enum import IntEnum, IntFlag
+
+
+NFS4_ACL_XATTR = 'system.nfs4_acl_xdr'
+POSIX_ACL_ACCESS_XATTR = 'system.posix_acl_access'
+POSIX_ACL_DEFAULT_XATTR = 'system.posix_acl_default'
+
+# XDR encoded `nfsacl41i`: big-endian acl flags and number of ACEs followed by `nfsace4i` entries
+# ( type, flags, iflags, access mask, who )
+NFS4_ACL_HEADER = struct.Struct('>II')
+NFS4_ACE = struct.Struct('>IIIII')
+NFS4_ACE_SPECIAL_WHO = 0x00000001
+NFS4_ACE_MAX = 1024
+
+# Linux `posix_acl_xattr_header` and `posix_acl_xattr_entry` ( little-endian )
+POSIX_ACL_XATTR_VERSION = 2
+POSIX_ACL_HEADER = struct.Struct('<I')
+POSIX_ACL_ENTRY = struct.Struct('<HHI')
+POSIX_ACL_UNDEFINED_ID = 0xFFFFFFFF
+
+
+class NFS4ACEType(IntEnum):
+    ALLOW = 0
+    DENY = 1
+    AUDIT = 2
+    ALARM = 3
+
+
+class NFS4Who(IntEnum):
+    OWNER = 1
+    GROUP = 2
+    EVERYONE = 3
+
+    def tag(self):
+        return f'{self.name.lower()}@'
+
+
+class NFS4Perm(IntFlag):
+    READ_DATA = 0x00000001
+    WRITE_DATA = 0x00000002
+    APPEND_DATA = 0x00000004
+    READ_NAMED_ATTRS = 0x00000008
+    WRITE_NAMED_ATTRS = 0x00000010
+    EXECUTE = 0x00000020
+    DELETE_CHILD = 0x00000040
+    READ_ATTRIBUTES = 0x00000080
+    WRITE_ATTRIBUTES = 0x00000100
+    DELETE = 0x00010000
+    READ_ACL = 0x00020000
+    WRITE_ACL = 0x00040000
+    WRITE_OWNER = 0x00080000
+    SYNCHRONIZE = 0x00100000
+
+
+class NFS4BasicPerm(IntEnum):
+    TRAVERSE = (
+        NFS4Perm.EXECUTE | NFS4Perm.READ_NAMED_ATTRS | NFS4Perm.READ_ATTRIBUTES | NFS4Perm.READ_ACL |
+        NFS4Perm.SYNCHRONIZE
+    )
+    READ = TRAVERSE | NFS4Perm.READ_DATA
+    MODIFY = (
+        READ | NFS4Perm.WRITE_DATA | NFS4Perm.APPEND_DATA | NFS4Perm.WRITE_NAMED_ATTRS | NFS4Perm.DELETE_CHILD |
+        NFS4Perm.WRITE_ATTRIBUTES | NFS4Perm.DELETE
+    )
+    FULL_CONTROL = MODIFY | NFS4Perm.WRITE_ACL | NFS4Perm.WRITE_OWNER
+
+
+class NFS4Flag(IntFlag):
+    FILE_INHERIT = 0x00000001
+    DIRECTORY_INHERIT = 0x00000002
+    NO_PROPAGATE_INHERIT = 0x00000004
+    INHERIT_ONLY = 0x00000008
+    SUCCESSFUL_ACCESS = 0x00000010
+    FAILED_ACCESS = 0x00000020
+    IDENTIFIER_GROUP = 0x00000040
+    INHERITED = 0x00000080
+
+
+class NFS4BasicFlag(IntEnum):
+    NOINHERIT = 0
+    INHERIT = NFS4Flag.FILE_INHERIT | NFS4Flag.DIRECTORY_INHERIT
+
+
+class NFS4ACLFlag(IntFlag):
+    AUTOINHERIT = 0x00000001
+    PROTECTED = 0x00000002
+    DEFAULTED = 0x00000004
+    # Set by ZFS when returning the ACL, ignored on write
+    IS_TRIVIAL = 0x00010000
+    IS_DIR = 0x00020000
+
+
+class POSIXACLTag(IntEnum):
+    USER_OBJ = 0x01
+    USER = 0x02
+    GROUP_OBJ = 0x04
+    GROUP = 0x08
+    MASK = 0x10
+    OTHER = 0x20
+
+
+class POSIXACLPerm(IntFlag):
+    READ = 0x04
+    WRITE = 0x02
+    EXECUTE = 0x01
+
+
+class ACLCodecError(ValueError):
+    def __init__(self, index, attribute, errmsg):
+        self.index = index
+        self.attribute = attribute
+        self.errmsg = errmsg
+        super().__init__(errmsg)
+
+
+def _flags_to_dict(enum, value, exclude=()):
+    return {f.name: bool(value & f) for f in enum if f.name not in exclude}
+
+
+def _dict_to_flags(enum, basic_enum, data, index, attribute):
+    if basic_enum is not None and 'BASIC' in data:
+        try:
+            return basic_enum[data['BASIC']].value
+        except KeyError:
+            raise ACLCodecError(index, attribute, f'{data["BASIC"]}: unknown basic {attribute}')
+
+    value = 0
+    for name, enabled in data.items():
+        try:
+            flag = enum[name]
+        except KeyError:
+            raise ACLCodecError(index, attribute, f'{name}: unknown {attribute} entry')
+
+        if enabled:
+            value |= flag
+
+    return value
+
+
+def nfs4acl_decode(data, simplified):
+    """
+    Decode `system.nfs4_acl_xdr` xattr value into the structure returned by `nfs4xdr_getfacl -j`.
+    """
+    acl_flags, count = NFS4_ACL_HEADER.unpack_from(data)
+    if len(data) != NFS4_ACL_HEADER.size + count * NFS4_ACE.size:
+        raise ValueError(f'Invalid NFSv4 ACL length ({len(data)} bytes for {count} entries)')
+
+    acl = []
+    for idx in range(count):
+        ace_type, flags, iflags, access_mask, who = NFS4_ACE.unpack_from(
+            data, NFS4_ACL_HEADER.size + idx * NFS4_ACE.size
+        )
+        if iflags & NFS4_ACE_SPECIAL_WHO:
+            tag = NFS4Who(who).tag()
+            id_ = -1
+        else:
+            tag = 'GROUP' if flags & NFS4Flag.IDENTIFIER_GROUP else 'USER'
+            id_ = who
+
+        perms = access_mask & NFS4BasicPerm.FULL_CONTROL
+        if simplified and perms in NFS4BasicPerm._value2member_map_:
+            perms = {'BASIC': NFS4BasicPerm(perms).name}
+        else:
+            perms = _flags_to_dict(NFS4Perm, perms)
+
+        inherit_flags = flags & ~NFS4Flag.IDENTIFIER_GROUP
+        if simplified and inherit_flags in NFS4BasicFlag._value2member_map_:
+            flags = {'BASIC': NFS4BasicFlag(inherit_flags).name}
+        else:
+            flags = _flags_to_dict(NFS4Flag, inherit_flags, ('IDENTIFIER_GROUP',))
+
+        acl.append({
+            'tag': tag,
+            'id': id_,
+            'perms': perms,
+            'flags': flags,
+            'type': NFS4ACEType(ace_type).name,
+        })
+
+    return {
+        'acl': acl,
+        'nfs41_flags': _flags_to_dict(NFS4ACLFlag, acl_flags, ('IS_TRIVIAL', 'IS_DIR')),
+        'trivial': bool(acl_flags & NFS4ACLFlag.IS_TRIVIAL),
+    }
+
+
+def nfs4acl_encode(acl, nfs41_flags=None):
+    """
+    Encode list of ACL entries ( in the format accepted by `filesystem.setacl` ) into `system.nfs4_acl_xdr` xattr
+    value. Raises `ACLCodecError` if an entry can not be encoded.
+    """
+    if len(acl) > NFS4_ACE_MAX:
+        raise ACLCodecError(None, None, f'NFSv4 ACL may not contain more than {NFS4_ACE_MAX} entries')
+
+    acl_flags = 0
+    for name, enabled in (nfs41_flags or {}).items():
+        if enabled:
+            acl_flags |= NFS4ACLFlag[name.upper()]
+
+    data = bytearray(NFS4_ACL_HEADER.pack(acl_flags, len(acl)))
+    for idx, ace in enumerate(acl):
+        flags = _dict_to_flags(NFS4Flag, NFS4BasicFlag, ace['flags'], idx, 'flags')
+        access_mask = _dict_to_flags(NFS4Perm, NFS4BasicPerm, ace['perms'], idx, 'perms')
+
+        if ace['tag'].endswith('@'):
+            try:
+                who = NFS4Who[ace['tag'][:-1].upper()].value
+            except KeyError:
+                raise ACLCodecError(idx, 'tag', f'{ace["tag"]}: unknown tag')
+
+            iflags = NFS4_ACE_SPECIAL_WHO
+        elif ace['tag'] in ('USER', 'GROUP'):
+            if ace.get('id') is None or ace['id'] < 0:
+                raise ACLCodecError(idx, 'id', 'ACL entry has invalid id for tag type.')
+
+            who = ace['id']
+            iflags = 0
+            if ace['tag'] == 'GROUP':
+                flags |= NFS4Flag.IDENTIFIER_GROUP
+        else:
+            raise ACLCodecError(idx, 'tag', f'{ace["tag"]}: unknown tag')
+
+        try:
+            ace_type = NFS4ACEType[ace.get('type', 'ALLOW')]
+        except KeyError:
+            raise ACLCodecError(idx, 'type', f'{ace["type"]}: unknown ACL entry type')
+
+        data += NFS4_ACE.pack(ace_type, flags, iflags, access_mask, who)
+
+    return bytes(data)
+
+
+def getacl_nfs4(path, simplified):
+    st = os.stat(path)
+    rv = nfs4acl_decode(os.getxattr(path, NFS4_ACL_XATTR), simplified)
+    rv.update({'uid': st.st_uid, 'gid': st.st_gid, 'path': path})
+    return rv
+
+
+def setacl_nfs4(path, acl, nfs41_flags=None):
+    os.setxattr(path, NFS4_ACL_XATTR, nfs4acl_encode(acl, nfs41_flags))
+
+
+def posixacl_decode(data, default):
+    """
+    Decode `system.posix_acl_access` or `system.posix_acl_default` xattr value into the list of ACL entries in the
+    format returned by `filesystem.getacl`.
+    """
+    version, = POSIX_ACL_HEADER.unpack_from(data)
+    if version != POSIX_ACL_XATTR_VERSION:
+        raise ValueError(f'Unsupported POSIX ACL xattr version {version}')
+
+    if (len(data) - POSIX_ACL_HEADER.size) % POSIX_ACL_ENTRY.size:
+        raise ValueError(f'Invalid POSIX ACL length ({len(data)} bytes)')
+
+    acl = []
+    for tag, perm, id_ in POSIX_ACL_ENTRY.iter_unpack(data[POSIX_ACL_HEADER.size:]):
+        tag = POSIXACLTag(tag)
+        acl.append({
+            'default': default,
+            'tag': tag.name,
+            'id': id_ if tag in (POSIXACLTag.USER, POSIXACLTag.GROUP) else -1,
+            'perms': _flags_to_dict(POSIXACLPerm, perm),
+        })
+
+    return acl
+
+
+def posixacl_encode(acl):
+    """
+    Encode list of ACL entries ( either access or default ones ) into the POSIX ACL xattr value. Entries are sorted
+    the way kernel expects them to be.
+    """
+    entries = []
+    for ace in acl:
+        tag = POSIXACLTag[ace['tag']]
+        perm = _dict_to_flags(POSIXACLPerm, None, ace['perms'], None, 'perms')
+        id_ = ace['id'] if tag in (POSIXACLTag.USER, POSIXACLTag.GROUP) else POSIX_ACL_UNDEFINED_ID
+        entries.append((tag.value, perm, id_))
+
+    entries.sort(key=lambda entry: (entry[0], entry[2]))
+    return POSIX_ACL_HEADER.pack(POSIX_ACL_XATTR_VERSION) + b''.join(
+        POSIX_ACL_ENTRY.pack(*entry) for entry in entries
+    )
+
+
+def _posixacl_from_mode(mode):
+    return [
+        {
+            'default': False,
+            'tag': tag.name,
+            'id': -1,
+            'perms': _flags_to_dict(POSIXACLPerm, (mode >> shift) & 0o7),
+        }
+        for tag, shift in ((POSIXACLTag.USER_OBJ, 6), (POSIXACLTag.GROUP_OBJ, 3), (POSIXACLTag.OTHER, 0))
+    ]
+
+
+def _getxattr_or_none(path, name):
+    try:
+        return os.getxattr(path, name)
+    except OSError as e:
+        if e.errno == errno.ENODATA:
+            return None
+
+        raise
+
+
+def getacl_posix1e(path):
+    """
+    Returns access and default POSIX ACL entries of `path`. Same as `getfacl`, if there is no access ACL then it is
+    synthesized from the file mode.
+    """
+    st = os.stat(path)
+    access = _getxattr_or_none(path, POSIX_ACL_ACCESS_XATTR)
+    acl = posixacl_decode(access, False) if access else _posixacl_from_mode(st.st_mode)
+    if stat.S_ISDIR(st.st_mode):
+        default = _getxattr_or_none(path, POSIX_ACL_DEFAULT_XATTR)
+        if default:
+            acl.extend(posixacl_decode(default, True))
+
+    return st, acl
+
+
+def setacl_posix1e(path, acl):
+    """
+    Replace POSIX ACL of `path` with `acl`. Kernel updates file mode according to the access ACL.
+    """
+    access = [ace for ace in acl if not ace['default']]
+    default = [ace for ace in acl if ace['default']]
+
+    os.setxattr(path, POSIX_ACL_ACCESS_XATTR, posixacl_encode(access))
+    if default:
+        os.setxattr(path, POSIX_ACL_DEFAULT_XATTR, posixacl_encode(default))
+
+
+def nfs4acl_inherit(data, is_dir, first_level):
+    """
+    Compute `system.nfs4_acl_xdr` xattr value that a new file ( or directory ) would get when created in a directory
+    with `data` ACL. `first_level` is `False` for objects that are not direct children of that directory, for these
+    entries flagged with NO_PROPAGATE_INHERIT are not inherited.
+
+    Returns `None` if ACL does not have any entries that would be inherited.
+    """
+    acl_flags, count = NFS4_ACL_HEADER.unpack_from(data)
+    inherit = NFS4Flag.FILE_INHERIT | NFS4Flag.DIRECTORY_INHERIT
+    propagation = inherit | NFS4Flag.NO_PROPAGATE_INHERIT | NFS4Flag.INHERIT_ONLY
+
+    aces = []
+    for ace_type, flags, iflags, access_mask, who in NFS4_ACE.iter_unpack(data[NFS4_ACL_HEADER.size:]):
+        if not flags & inherit:
+            continue
+
+        if flags & NFS4Flag.NO_PROPAGATE_INHERIT and not first_level:
+            continue
+
+        if is_dir:
+            if flags & NFS4Flag.DIRECTORY_INHERIT:
+                flags &= ~NFS4Flag.INHERIT_ONLY
+                if flags & NFS4Flag.NO_PROPAGATE_INHERIT:
+                    flags &= ~propagation
+            elif flags & NFS4Flag.NO_PROPAGATE_INHERIT:
+                continue
+            else:
+                # Applies to files created beneath this directory but not to directory itself
+                flags |= NFS4Flag.INHERIT_ONLY
+        elif flags & NFS4Flag.FILE_INHERIT:
+            flags &= ~propagation
+        else:
+            continue
+
+        aces.append(NFS4_ACE.pack(ace_type, flags | NFS4Flag.INHERITED, iflags, access_mask, who))
+
+    if not aces:
+        return None
+
+    return NFS4_ACL_HEADER.pack(acl_flags & NFS4ACLFlag.AUTOINHERIT, len(aces)) + b''.join(aces)
+
+
+def nfs4acl_trivial(mode, is_dir):
+    """
+    Compute `system.nfs4_acl_xdr` xattr value of the trivial ACL ( owner@, group@, everyone@ ) equivalent to `mode`.
+    """
+    base = NFS4Perm.READ_ACL | NFS4Perm.READ_ATTRIBUTES | NFS4Perm.READ_NAMED_ATTRS | NFS4Perm.SYNCHRONIZE
+    write = NFS4Perm.WRITE_DATA | NFS4Perm.APPEND_DATA | (NFS4Perm.DELETE_CHILD if is_dir else 0)
+
+    aces = []
+    for who, shift in ((NFS4Who.OWNER, 6), (NFS4Who.GROUP, 3), (NFS4Who.EVERYONE, 0)):
+        access_mask = base
+        if who == NFS4Who.OWNER:
+            access_mask |= (
+                NFS4Perm.WRITE_ACL | NFS4Perm.WRITE_OWNER | NFS4Perm.WRITE_ATTRIBUTES | NFS4Perm.WRITE_NAMED_ATTRS
+            )
+
+        bits = (mode >> shift) & 0o7
+        if bits & 0o4:
+            access_mask |= NFS4Perm.READ_DATA
+        if bits & 0o2:
+            access_mask |= write
+        if bits & 0o1:
+            access_mask |= NFS4Perm.EXECUTE
+
+        aces.append(NFS4_ACE.pack(NFS4ACEType.ALLOW, 0, NFS4_ACE_SPECIAL_WHO, access_mask, who))
+
+    return NFS4_ACL_HEADER.pack(0, len(aces)) + b''.join(aces)
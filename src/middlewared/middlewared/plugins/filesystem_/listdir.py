@@ -0,0 +1,248 @@
+import base64
+import json
+import os
+
+from middlewared.plugins.cluster_linux.utils import FuseConfig
+from middlewared.plugins.filesystem_.acl_base import ACLType
+from middlewared.plugins.zfs_.utils import ZFSCTL
+from middlewared.service_exception import CallError, MatchNotFound
+from middlewared.utils import filter_getattrs, filter_list, filters as filters_cls
+
+
+ALL_FIELDS = ('name', 'path', 'realpath', 'type', 'size', 'mode', 'acl', 'uid', 'gid', 'is_mountpoint', 'is_ctldir')
+# Fields that can be computed from the directory entry itself ( `d_type` ) without issuing any syscall
+CHEAP_FIELDS = {'name', 'path', 'realpath', 'type', 'is_ctldir'}
+STAT_FIELDS = {'size', 'mode', 'uid', 'gid'}
+NULLS_PREFIXES = ('nulls_first:', 'nulls_last:')
+FILTERS = filters_cls()
+
+
+def encode_cursor(directory_st, position):
+    return base64.urlsafe_b64encode(json.dumps([directory_st.st_dev, directory_st.st_ino, position]).encode()).decode()
+
+
+def decode_cursor(cursor, directory_st):
+    try:
+        dev, ino, position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise CallError('Invalid cursor')
+
+    if (dev, ino) != (directory_st.st_dev, directory_st.st_ino):
+        raise CallError('Cursor does not belong to this directory')
+
+    return position
+
+
+def path_is_ctldir(path):
+    while path != '/':
+        if os.path.basename(path) == '.zfs' and os.stat(path).st_ino == ZFSCTL.INO_ROOT:
+            return True
+
+        path = os.path.dirname(path)
+
+    return False
+
+
+def order_by_fields(order_by):
+    rv = set()
+    for o in order_by:
+        for prefix in NULLS_PREFIXES:
+            if o.startswith(prefix):
+                o = o[len(prefix):]
+                break
+
+        rv.add(o.lstrip('-'))
+
+    return rv
+
+
+class DirectoryLister:
+    """
+    Lists directory entries computing only the attributes that are actually needed to evaluate `filters`, `select`
+    and `order_by`. The `type` of the entry comes from `d_type`, so listing names of a huge directory does not issue
+    a single `stat` call. When no ordering is requested, `offset` and `limit` are applied while scanning the
+    directory and the scan stops as soon as enough entries were found.
+    """
+
+    def __init__(self, path, filters, options):
+        self.path = path
+        self.filters = filters or []
+        self.options = options or {}
+
+        FILTERS.validate_filters(self.filters)
+        FILTERS.validate_options(self.options)
+
+        if self.options.get('count') and not self.options.get('order_by'):
+            # We only need to know which entries match
+            self.fields = filter_getattrs(self.filters)
+        else:
+            select_fields = {s[0] if isinstance(s, list) else s for s in self.options.get('select') or []}
+            self.fields = (
+                {f.split('.', 1)[0] for f in select_fields} if select_fields else set(ALL_FIELDS)
+            ) | filter_getattrs(self.filters) | order_by_fields(self.options.get('order_by') or [])
+
+        # Top-level filters are a conjunction, the ones that only need cheap fields are evaluated before we stat
+        # the entry
+        self.cheap_filters = []
+        self.other_filters = []
+        for f in self.filters:
+            (self.cheap_filters if filter_getattrs([f]) <= CHEAP_FIELDS else self.other_filters).append(f)
+
+        self.only_top_level = os.path.abspath(path) == '/mnt'
+        if self.only_top_level:
+            self.fields.add('is_mountpoint')
+
+        self.directory_st = os.stat(path)
+        self.directory_is_ctldir = path_is_ctldir(os.path.abspath(path)) if 'is_ctldir' in self.fields else False
+
+    def list(self, cursor=None):
+        """
+        Returns a tuple of the list result ( with the semantics of `filter_list` ) and a cursor that can be used to
+        continue the listing after the last returned entry ( or `None` if the directory was listed till the end ).
+        """
+        options = self.options
+        order_by = options.get('order_by') or []
+        if cursor is not None and order_by:
+            raise CallError('Cursor can not be used together with `order_by`')
+
+        rest_options = {k: v for k, v in options.items() if k in ('select', 'count', 'get')}
+        if order_by:
+            # Ordering requires to see every matching entry, filtering is still done while scanning so that we only
+            # keep matching entries in memory
+            entries = [entry for position, entry in self.scan(0)]
+            return filter_list(entries, options={**rest_options, **{
+                k: v for k, v in options.items() if k in ('order_by', 'offset', 'limit')
+            }}), None
+
+        start = decode_cursor(cursor, self.directory_st) if cursor is not None else 0
+        if options.get('count'):
+            # Same as `filter_list`, `count` ignores `offset` and `limit`
+            return sum(1 for i in self.scan(start)), None
+
+        offset = options.get('offset') or 0
+        limit = 1 if options.get('get') else options.get('limit') or 0
+        entries = []
+        next_cursor = None
+        for position, entry in self.scan(start):
+            if offset:
+                offset -= 1
+                continue
+
+            entries.append(entry)
+            if limit and len(entries) == limit:
+                next_cursor = encode_cursor(self.directory_st, position + 1)
+                break
+
+        if options.get('get'):
+            if not entries:
+                raise MatchNotFound()
+
+            return filter_list(entries, options=rest_options), None
+
+        return filter_list(entries, options=rest_options), next_cursor
+
+    def scan(self, start):
+        dir_only = file_only = False
+        for f in self.filters:
+            if len(f) == 3 and f[0] == 'type' and f[1] == '=':
+                if f[2] == 'DIRECTORY':
+                    dir_only = True
+                elif f[2] == 'FILE':
+                    file_only = True
+
+        if dir_only and file_only:
+            return
+
+        directory = self.path.rstrip('/') or '/'
+        with os.scandir(self.path) as it:
+            for position, dirent in enumerate(it):
+                if position < start:
+                    continue
+
+                if dirent.name == 'ix-applications':
+                    continue
+
+                try:
+                    if dirent.is_symlink():
+                        etype = 'SYMLINK'
+                    elif dirent.is_dir(follow_symlinks=False):
+                        etype = 'DIRECTORY'
+                    elif dirent.is_file(follow_symlinks=False):
+                        etype = 'FILE'
+                    else:
+                        etype = 'OTHER'
+                except FileNotFoundError:
+                    continue
+
+                if (dir_only and etype != 'DIRECTORY') or (file_only and etype != 'FILE'):
+                    continue
+
+                try:
+                    entry = self.entry(directory, dirent, etype)
+                except FileNotFoundError:
+                    continue
+
+                if entry is not None:
+                    yield position, entry
+
+    def entry(self, directory, dirent, etype):
+        fields = self.fields
+        entry_path = os.path.join(directory, dirent.name)
+        st = None
+        if etype == 'SYMLINK':
+            # Dangling symlinks are not listed so we have to check the target even if we don't need its attributes
+            st = os.stat(entry_path)
+
+        entry = {'type': etype}
+        if 'name' in fields:
+            entry['name'] = dirent.name
+        if 'path' in fields:
+            entry['path'] = entry_path.replace(f'{FuseConfig.FUSE_PATH_BASE.value}/', FuseConfig.FUSE_PATH_SUBST.value)
+        if 'realpath' in fields or 'acl' in fields:
+            entry['realpath'] = os.path.realpath(entry_path) if etype == 'SYMLINK' else os.path.abspath(entry_path)
+        if 'is_ctldir' in fields:
+            entry['is_ctldir'] = self.directory_is_ctldir or (
+                dirent.name == '.zfs' and etype == 'DIRECTORY' and os.stat(entry_path).st_ino == ZFSCTL.INO_ROOT
+            )
+
+        if not self.match(entry, self.cheap_filters):
+            return None
+
+        if fields & STAT_FIELDS:
+            if st is None:
+                st = dirent.stat(follow_symlinks=False)
+
+            entry.update({'size': st.st_size, 'mode': st.st_mode, 'uid': st.st_uid, 'gid': st.st_gid})
+        if 'acl' in fields:
+            entry['acl'] = bool(set(os.listxattr(entry['realpath'])) & ACLType.xattr_names())
+        if 'is_mountpoint' in fields:
+            if etype == 'DIRECTORY':
+                lst = dirent.stat(follow_symlinks=False)
+                entry['is_mountpoint'] = (
+                    lst.st_dev != self.directory_st.st_dev or lst.st_ino == self.directory_st.st_ino
+                )
+            else:
+                entry['is_mountpoint'] = False
+
+        if self.only_top_level and not entry['is_mountpoint']:
+            # sometimes (on failures) the top-level directory
+            # where the zpool is mounted does not get removed
+            # after the zpool is exported. WebUI calls this
+            # specifying `/mnt` as the path. This is used when
+            # configuring shares in the "Path" drop-down. To
+            # prevent shares from being configured to point to
+            # a path that doesn't exist on a zpool, we'll
+            # filter these here.
+            return None
+
+        if not self.match(entry, self.other_filters):
+            return None
+
+        return {field: entry[field] for field in ALL_FIELDS if field in entry}
+
+    def match(self, entry, filters):
+        for f in filters:
+            if not FILTERS.eval_filter(entry, f, FILTERS.getter_fn([entry])):
+                return False
+
+        return True
@@ -0,0 +1,356 @@
+import contextlib
+import errno
+import hashlib
+import json
+import logging
+import os
+import queue
+import stat
+import threading
+import time
+
+from middlewared.plugins.zfs_.utils import ZFSCTL
+from middlewared.service_exception import CallError
+from middlewared.utils import MIDDLEWARE_RUN_DIR
+
+from . import acl_xattr
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.path.join(MIDDLEWARE_RUN_DIR, 'perm_checkpoints')
+CHECKPOINT_INTERVAL = 30
+PROGRESS_INTERVAL = 2
+WORKERS = min(16, max(4, os.cpu_count() or 1))
+MAX_REPORTED_ERRORS = 5
+COUNTS_FLUSH_INTERVAL = 1000
+
+
+class Directory:
+    __slots__ = ('path', 'relpath', 'dev', 'depth', 'parent', 'pending', 'failed', 'completed_children')
+
+    def __init__(self, path, relpath, dev, depth, parent):
+        self.path = path
+        self.relpath = relpath
+        self.dev = dev
+        self.depth = depth
+        self.parent = parent
+        # Listing of this directory itself + subdirectories that are not completed yet
+        self.pending = 1
+        # Some of the entries in this subtree failed, it must be processed again on resume
+        self.failed = False
+        self.completed_children = []
+
+
+class RecursivePermissionEngine:
+    """
+    Applies ownership and/or permissions to everything beneath `path` ( `path` itself only gets its owner changed )
+    using a pool of worker threads that take directories from a shared queue.
+
+    `action` is one of:
+      * `chown` - only change ownership.
+      * `clone` - apply ACL inherited from `path` ACL ( NFSv4 or POSIX default ACL ).
+      * `strip` - remove ACL ( and set `mode` if specified ).
+
+    Directories which subtrees were fully processed are recorded in a checkpoint file so that an aborted or failed
+    run with the same arguments and `resume` option does not process them again (without `resume` the checkpoint is
+    ignored as the directories might have changed since). All the operations are idempotent so the directories which
+    were partially processed are simply processed again.
+    """
+
+    def __init__(self, path, action, uid, gid, options, mode=None, progress_callback=None, should_abort=None):
+        self.path = path
+        self.action = action
+        self.uid = uid
+        self.gid = gid
+        self.mode = mode
+        self.traverse = options.get('traverse', False)
+        self.posixacl = options.get('posixacl', False)
+        self.resume = options.get('resume', False)
+        self.progress_callback = progress_callback
+        self.should_abort = should_abort or (lambda: False)
+
+        self.root_st = os.stat(path)
+        self.acls = {}
+        self.acl_source = b''
+        if action == 'clone':
+            self._prepare_clone()
+
+        self.checkpoint_path = os.path.join(CHECKPOINT_DIR, f'{self._checkpoint_key()}.json')
+        self.completed = set()
+        self.counts = {'files': 0, 'directories': 0, 'skipped': 0, 'errors': 0}
+        self.errors = []
+        self.estimated_total = self._estimate(path)
+
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.done = threading.Event()
+        self.aborted = False
+
+    def _prepare_clone(self):
+        if self.posixacl:
+            try:
+                default = os.getxattr(self.path, acl_xattr.POSIX_ACL_DEFAULT_XATTR)
+            except OSError as e:
+                if e.errno != errno.ENODATA:
+                    raise
+
+                raise CallError(f'{self.path}: default ACL entries are required in order to apply ACL recursively')
+
+            self.acl_source = default
+            self.acls = {(is_dir, first_level): default for is_dir in (True, False) for first_level in (True, False)}
+            return
+
+        self.acl_source = os.getxattr(self.path, acl_xattr.NFS4_ACL_XATTR)
+        for is_dir in (True, False):
+            for first_level in (True, False):
+                self.acls[(is_dir, first_level)] = acl_xattr.nfs4acl_inherit(self.acl_source, is_dir, first_level)
+
+    def _checkpoint_key(self):
+        return hashlib.sha256(json.dumps([
+            self.path, self.root_st.st_ino, self.action, self.uid, self.gid, self.mode, self.traverse, self.posixacl,
+            self.acl_source.hex(),
+        ]).encode()).hexdigest()
+
+    def _estimate(self, path):
+        with contextlib.suppress(OSError):
+            st = os.statvfs(path)
+            return max(st.f_files - st.f_ffree, 0)
+
+        return 0
+
+    def run(self):
+        resumed = self.resume and self._load_checkpoint()
+        if resumed and self.progress_callback:
+            self.progress_callback(0, f'Resuming from checkpoint, {len(self.completed)} directories already processed')
+
+        self._apply_owner(self.path)
+
+        root = Directory(self.path, '', self.root_st.st_dev, 0, None)
+        self.queue.put(root)
+
+        started_at = time.monotonic()
+        last_checkpoint = started_at
+        initial = self.counts['files'] + self.counts['directories']
+        threads = [threading.Thread(target=self._worker, daemon=True) for i in range(WORKERS)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while not self.done.wait(PROGRESS_INTERVAL):
+                if self.should_abort():
+                    self.aborted = True
+                    break
+
+                now = time.monotonic()
+                self._report_progress(now - started_at, initial)
+                if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    self._save_checkpoint()
+                    last_checkpoint = now
+        finally:
+            self.aborted = self.aborted or not self.done.is_set()
+            for thread in threads:
+                self.queue.put(None)
+            for thread in threads:
+                thread.join()
+
+        if self.aborted:
+            self._save_checkpoint()
+            raise CallError('Operation aborted, it can be resumed from the last checkpoint using `resume` option')
+
+        if self.errors:
+            self._save_checkpoint()
+            raise CallError(
+                f'Failed to apply permissions to {self.counts["errors"]} files: ' + '; '.join(self.errors) +
+                ('; ...' if self.counts['errors'] > len(self.errors) else '')
+            )
+
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.checkpoint_path)
+
+        self._report_progress(time.monotonic() - started_at, initial)
+        return self.counts
+
+    def _report_progress(self, elapsed, initial):
+        if not self.progress_callback:
+            return
+
+        processed = self.counts['files'] + self.counts['directories']
+        rate = (processed - initial) / elapsed if elapsed else 0
+        percent = min(99, int(processed * 100 / self.estimated_total)) if self.estimated_total else 0
+        self.progress_callback(
+            percent,
+            f'Processed {self.counts["files"]} files and {self.counts["directories"]} directories '
+            f'({int(rate)} files/s, {self.counts["errors"]} errors)',
+        )
+
+    def _worker(self):
+        while True:
+            directory = self.queue.get()
+            if directory is None or self.aborted:
+                return
+
+            try:
+                self._process_directory(directory)
+            except Exception as e:
+                self._error(directory, directory.path, e)
+
+            if self.aborted:
+                # Directory might not have been processed completely
+                return
+
+            self._directory_listed(directory)
+
+    def _process_directory(self, directory):
+        first_level = directory.depth == 0
+        counts = {'files': 0, 'directories': 0, 'skipped': 0}
+        with os.scandir(directory.path) as it:
+            for entry in it:
+                if self.aborted:
+                    break
+
+                if counts['files'] >= COUNTS_FLUSH_INTERVAL:
+                    self._flush_counts(counts)
+
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if stat.S_ISDIR(st.st_mode):
+                        relpath = os.path.join(directory.relpath, entry.name)
+                        if relpath in self.completed:
+                            with self.lock:
+                                directory.completed_children.append(relpath)
+                            counts['skipped'] += 1
+                            continue
+
+                        if entry.name == '.zfs' and st.st_ino == ZFSCTL.INO_ROOT:
+                            continue
+
+                        if st.st_dev != directory.dev:
+                            if not self.traverse:
+                                continue
+
+                            # We are crossing a dataset boundary
+                            estimate = self._estimate(entry.path)
+                            with self.lock:
+                                self.estimated_total += estimate
+
+                        self._apply(entry.path, st, True, first_level)
+                        counts['directories'] += 1
+
+                        with self.lock:
+                            directory.pending += 1
+                        self.queue.put(Directory(entry.path, relpath, st.st_dev, directory.depth + 1, directory))
+                    else:
+                        self._apply(entry.path, st, False, first_level)
+                        counts['files'] += 1
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    self._error(directory, entry.path, e)
+
+        self._flush_counts(counts)
+
+    def _flush_counts(self, counts):
+        with self.lock:
+            for k, v in counts.items():
+                self.counts[k] += v
+                counts[k] = 0
+
+    def _apply(self, path, st, is_dir, first_level):
+        if not stat.S_ISLNK(st.st_mode):
+            if self.action == 'clone':
+                self._apply_acl(path, is_dir, first_level)
+            elif self.action == 'strip':
+                self._strip_acl(path, st, is_dir)
+
+            if self.mode is not None:
+                os.chmod(path, self.mode)
+
+        self._apply_owner(path)
+
+    def _apply_acl(self, path, is_dir, first_level):
+        acl = self.acls[(is_dir, first_level)]
+        if self.posixacl:
+            os.setxattr(path, acl_xattr.POSIX_ACL_ACCESS_XATTR, acl)
+            if is_dir:
+                os.setxattr(path, acl_xattr.POSIX_ACL_DEFAULT_XATTR, acl)
+        elif acl is not None:
+            os.setxattr(path, acl_xattr.NFS4_ACL_XATTR, acl)
+        else:
+            # Nothing is inherited, object gets an ACL equivalent to its mode
+            os.setxattr(path, acl_xattr.NFS4_ACL_XATTR, acl_xattr.nfs4acl_trivial(os.stat(path).st_mode, is_dir))
+
+    def _strip_acl(self, path, st, is_dir):
+        if self.posixacl:
+            for xattr in (acl_xattr.POSIX_ACL_ACCESS_XATTR, acl_xattr.POSIX_ACL_DEFAULT_XATTR):
+                try:
+                    os.removexattr(path, xattr)
+                except OSError as e:
+                    if e.errno != errno.ENODATA:
+                        raise
+        else:
+            mode = st.st_mode if self.mode is None else self.mode
+            os.setxattr(path, acl_xattr.NFS4_ACL_XATTR, acl_xattr.nfs4acl_trivial(mode, is_dir))
+
+    def _apply_owner(self, path):
+        if self.uid != -1 or self.gid != -1:
+            os.chown(path, self.uid, self.gid, follow_symlinks=False)
+
+    def _error(self, directory, path, error):
+        logger.debug('Failed to apply permissions to %r', path, exc_info=True)
+        with self.lock:
+            directory.failed = True
+            self.counts['errors'] += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append(f'{path}: {error}')
+
+    def _directory_listed(self, directory):
+        with self.lock:
+            while directory is not None:
+                directory.pending -= 1
+                if directory.pending:
+                    break
+
+                # Whole subtree was processed. Its own record replaces records of all its children.
+                if not directory.failed:
+                    for child in directory.completed_children:
+                        self.completed.discard(child)
+
+                parent = directory.parent
+                if parent is None:
+                    self.done.set()
+                    break
+
+                if directory.failed:
+                    parent.failed = True
+                else:
+                    self.completed.add(directory.relpath)
+                    parent.completed_children.append(directory.relpath)
+
+                directory = parent
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return False
+        except ValueError:
+            logger.warning('Ignoring invalid checkpoint %r', self.checkpoint_path)
+            return False
+
+        self.completed = set(checkpoint['completed'])
+        self.counts.update(checkpoint['counts'])
+        self.counts['errors'] = 0
+        return True
+
+    def _save_checkpoint(self):
+        with self.lock:
+            checkpoint = {'path': self.path, 'completed': sorted(self.completed), 'counts': dict(self.counts)}
+
+        os.makedirs(CHECKPOINT_DIR, mode=0o700, exist_ok=True)
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+
+        os.replace(tmp_path, self.checkpoint_path)
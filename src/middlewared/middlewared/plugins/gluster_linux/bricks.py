@@ -1,9 +1,10 @@
-from glustercli.cli.bricks import add as bricks_add
-
 from middlewared.service import Service, accepts, job
 from middlewared.schema import Dict, Str, List
+from middlewared.utils.python import lazy_import
 from .utils import format_bricks
 
+bricks = lazy_import('glustercli.cli.bricks')
+
 
 class GlusterBricksService(Service):
 
@@ -38,6 +39,6 @@ class GlusterBricksService(Service):
         job.set_progress(50, 'Formatting brick information')
         options = {'args': (data['name'], await format_bricks(data['bricks']),), 'kwargs': {'force': True}}
         job.set_progress(99, f'Adding bricks to {data["name"]!r}')
-        await self.middleware.call('gluster.method.run', bricks_add, options)
+        await self.middleware.call('gluster.method.run', bricks.add, options)
         job.set_progress(100, f'Bricks successfully added to {data["name"]!r}')
         return await self.middleware.call('gluster.volume.info', {'name': data['name']})
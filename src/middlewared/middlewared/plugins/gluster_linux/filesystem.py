@@ -3,12 +3,14 @@ import os
 import stat
 
 from base64 import b64encode, b64decode
-from pyglfs import GLFSError
 from middlewared.schema import accepts, Bool, Dict, Int, List, Str, Ref
 from middlewared.service import Service, CallError, job, private
 from middlewared.schema import Path
 from middlewared.validators import UUID
 from middlewared.plugins.gluster_linux.pyglfs_utils import glfs
+from middlewared.utils.python import lazy_import
+
+pyglfs = lazy_import('pyglfs')
 
 
 class GlusterFilesystemService(Service):
@@ -579,7 +581,7 @@ class GlusterFilesystemService(Service):
             if entry.file_type == 'DIRECTORY':
                 try:
                     dst_hdl_lst.append(dst.mkdir(entry.name, mode=new_mode))
-                except GLFSError as e:
+                except pyglfs.GLFSError as e:
                     if e.errno != errno.EEXIST:
                         raise
                     existing_hdl = dst.lookup(entry.name)
@@ -590,7 +592,7 @@ class GlusterFilesystemService(Service):
             elif entry.file_type == 'FILE':
                 try:
                     hdl = dst.create(entry.name, os.O_RDWR, mode=new_mode)
-                except GLFSError as e:
+                except pyglfs.GLFSError as e:
                     if e.errno != errno.EEXIST or not data['force']:
                         raise
 
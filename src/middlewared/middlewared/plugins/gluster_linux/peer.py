@@ -1,10 +1,9 @@
 import errno
 import subprocess
-import pyglfs
 import xml.etree.ElementTree as ET
-from glustercli.cli import peer
 
 from middlewared.utils import filter_list
+from middlewared.utils.python import lazy_import
 from middlewared.schema import accepts, Bool, Dict, IPAddr, List, Ref, returns, Str
 from middlewared.service import private, job, filterable, CallError, CRUDService, ValidationErrors
 from .utils import GlusterConfig
@@ -13,6 +12,9 @@ from .utils import GlusterConfig
 GLUSTER_JOB_LOCK = GlusterConfig.CLI_LOCK.value
 MAX_PEERS = GlusterConfig.MAX_PEERS.value
 
+peer = lazy_import('glustercli.cli.peer')
+pyglfs = lazy_import('pyglfs')
+
 
 class GlusterPeerService(CRUDService):
 
@@ -1,12 +1,14 @@
 import errno
 import fcntl
 import functools
-import pyglfs
 import threading
 
 from contextlib import contextmanager
 from copy import deepcopy
 from middlewared.service_exception import CallError
+from middlewared.utils.python import lazy_import
+
+pyglfs = lazy_import('pyglfs')
 
 DEFAULT_GLFS_OPTIONS = {"volfile_servers": None, "translators": []}
 
@@ -1,15 +1,16 @@
 import errno
 
-from glustercli.cli import rebalance
-
 from middlewared.service import Service, CallError, accepts, job
 from middlewared.schema import Dict, Str, Bool
 from middlewared.utils import filter_list
+from middlewared.utils.python import lazy_import
 from middlewared.validators import UUID
 from asyncio import sleep
 
 LOCK = 'rebalance_lock'
 
+rebalance = lazy_import('glustercli.cli.rebalance')
+
 
 class GlusterRebalanceService(Service):
 
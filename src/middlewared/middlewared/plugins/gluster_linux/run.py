@@ -1,6 +1,7 @@
-from glustercli.cli.utils import GlusterCmdException
-
 from middlewared.service import CallError, Service
+from middlewared.utils.python import lazy_import
+
+gluster_utils = lazy_import('glustercli.cli.utils')
 
 
 class GlusterMethodService(Service):
@@ -22,7 +23,7 @@ class GlusterMethodService(Service):
 
         try:
             result = func(*args, **kwargs)
-        except GlusterCmdException as e:
+        except gluster_utils.GlusterCmdException as e:
             # gluster cli binary will return stderr to stdout
             # and vice versa depending on the failure.
             rc, out, err = e.args[0]
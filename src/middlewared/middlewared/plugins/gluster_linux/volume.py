@@ -1,6 +1,5 @@
-from glustercli.cli import volume, quota
-
 from middlewared.utils import filter_list
+from middlewared.utils.python import lazy_import
 from middlewared.service import CRUDService, accepts, job, filterable, private, ValidationErrors
 from middlewared.schema import Dict, Str, Int, Bool, List, Ref, returns
 from middlewared.plugins.cluster_linux.utils import CTDBConfig, FuseConfig
@@ -11,6 +10,9 @@ GLUSTER_JOB_LOCK = GlusterConfig.CLI_LOCK.value
 LEGACY_CTDB_VOL_NAME = CTDBConfig.LEGACY_CTDB_VOL_NAME.value
 FUSE_BASE = FuseConfig.FUSE_PATH_BASE.value
 
+volume = lazy_import('glustercli.cli.volume')
+quota = lazy_import('glustercli.cli.quota')
+
 
 class GlusterVolumeService(CRUDService):
 
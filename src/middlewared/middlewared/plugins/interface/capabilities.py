@@ -68,5 +68,7 @@ class InterfaceCapabilitiesService(Service):
             else:
                 dev.disabled_capabilities = data['capabilities']
 
+        # Offload capabilities are not announced over rtnetlink
+        self.middleware.call_sync('interface.invalidate_state_cache')
         caps = self.middleware.call_sync('interface.capabilities.get', data['name'])
         return caps['enabled'] if data['action'] == 'ENABLE' else caps['disabled']
@@ -0,0 +1,142 @@
+import copy
+import errno
+import logging
+import threading
+import time
+
+from pyroute2 import IPRoute
+from pyroute2.netlink.exceptions import NetlinkError
+from pyroute2.netlink.rtnl import RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR, RTMGRP_LINK
+
+from .netif import netif
+
+logger = logging.getLogger(__name__)
+
+RESTART_INTERVAL = 5
+
+
+class InterfaceStateCache:
+    """
+    Keeps `Interface` objects and their `asdict()` state for every link on the system.
+
+    A background thread subscribes to rtnetlink link and address notifications and marks affected links as
+    dirty. Dirty links are re-read lazily on the next access so that a burst of notifications (e.g. when
+    hundreds of VLANs are configured) results in a single refresh. Until the subscription is established
+    (or if it fails) every access reads the state of all links.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # ifindex -> (Interface, state). `None` means that all links must be read.
+        self.links = None
+        self.dirty = set()
+        # ifindex -> ifindex of its master (bond or bridge). Changes of ports change the state of the master.
+        self.masters = {}
+        self.watching = False
+        self.thread = None
+
+    def interfaces(self):
+        """
+        Returns a dictionary of interface name -> (Interface, state). `state` is a copy and can be modified by
+        the caller.
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._watch, daemon=True, name='netlink_ifstate')
+                self.thread.start()
+
+            if self.links is None or not self.watching:
+                self.dirty.clear()
+                links = self._read_links(None)
+                if self.watching:
+                    self.links = links
+            else:
+                if self.dirty:
+                    dirty, self.dirty = self.dirty, set()
+                    for index in dirty:
+                        self.links.pop(index, None)
+                    self.links.update(self._read_links(dirty))
+
+                links = self.links
+
+            return {iface.name: (iface, copy.deepcopy(state)) for iface, state in links.values()}
+
+    def invalidate(self):
+        """
+        Read the state of all links on next access. This is required after changes that are not announced
+        over rtnetlink (e.g. ethtool offload capabilities).
+        """
+        with self.lock:
+            self.links = None
+
+    def _read_links(self, indexes):
+        links = {}
+        with IPRoute() as ipr:
+            if indexes is None:
+                devs = ipr.get_links()
+            else:
+                devs = []
+                for index in indexes:
+                    try:
+                        devs.extend(ipr.get_links(index))
+                    except NetlinkError as e:
+                        if e.code != errno.ENODEV:
+                            raise
+
+        for dev in devs:
+            if master := dev.get_attr('IFLA_MASTER'):
+                self.masters[dev['index']] = master
+
+            iface = netif.Interface(dev)
+            try:
+                links[dev['index']] = (iface, iface.asdict())
+            except OSError:
+                # Interface might have been removed in the meantime, retry on next access
+                logger.warning('Failed to get interface state for %s', iface.name, exc_info=True)
+                self.dirty.add(dev['index'])
+
+        return links
+
+    def _watch(self):
+        while True:
+            try:
+                with IPRoute() as ipr:
+                    ipr.bind(groups=RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR)
+                    with self.lock:
+                        # Anything that happened before the subscription was established might have been missed
+                        self.links = None
+                        self.watching = True
+
+                    while True:
+                        for msg in ipr.get():
+                            self._handle(msg)
+            except Exception:
+                # Most likely ENOBUFS, i.e. we did not keep up with notifications and some of them were lost
+                logger.warning('Interface state watcher failed, restarting', exc_info=True)
+                with self.lock:
+                    self.watching = False
+                    self.links = None
+
+                time.sleep(RESTART_INTERVAL)
+
+    def _handle(self, msg):
+        index = msg.get('index')
+        event = msg.get('event')
+        if index is None or event not in ('RTM_NEWLINK', 'RTM_DELLINK', 'RTM_NEWADDR', 'RTM_DELADDR'):
+            return
+
+        with self.lock:
+            if event in ('RTM_NEWLINK', 'RTM_DELLINK'):
+                if previous := self.masters.pop(index, None):
+                    self.dirty.add(previous)
+
+                if (master := msg.get_attr('IFLA_MASTER')) and event == 'RTM_NEWLINK':
+                    self.masters[index] = master
+                    self.dirty.add(master)
+
+            if event == 'RTM_DELLINK':
+                self.dirty.discard(index)
+                if self.links is not None:
+                    self.links.pop(index, None)
+            else:
+                self.dirty.add(index)
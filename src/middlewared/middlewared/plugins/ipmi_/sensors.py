@@ -29,6 +29,7 @@ class IpmiSensorsService(Service):
     class Config:
         namespace = 'ipmi.sensors'
         cli_namespace = 'service.ipmi.sensors'
+        executor = 'SUBPROCESS'
 
     @private
     def query_impl(self):
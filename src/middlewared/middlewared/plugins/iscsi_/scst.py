@@ -0,0 +1,379 @@
+import errno
+import logging
+import os
+import shlex
+import time
+
+logger = logging.getLogger(__name__)
+
+SCST_CONF = '/etc/scst.conf'
+SCST_SYSFS = '/sys/kernel/scst_tgt'
+# Handlers whose devices we are able to reconfigure in place
+HANDLERS = ('vdisk_fileio', 'vdisk_blockio')
+# Device attributes that can only be specified with `add_device`. All other attributes are written to
+# device sysfs attribute files after the device is created.
+DEVICE_CREATE_PARAMS = (
+    'filename', 'blocksize', 'read_only', 'rotational', 'lb_per_pb_exp', 'cluster_mode', 'nv_cache', 'o_direct',
+    'thin_provisioned', 'write_through', 'removable',
+)
+TARGET_ATTRS = ('per_portal_acl', 'enabled')
+TARGET_USER_ATTRS = ('IncomingUser', 'OutgoingUser')
+DRIVER_ATTRS = ('enabled',)
+# How long to wait for an asynchronously completed management command (seconds)
+MGMT_RESULT_TIMEOUT = 60
+
+
+class UnsupportedConfig(Exception):
+    """
+    Raised when the difference between running and desired configuration can not
+    be applied incrementally and complete configuration has to be reloaded.
+    """
+
+
+def parse_scst_conf(text):
+    """
+    Parse scst.conf into a list of nodes. Every node is a dictionary with `key`, `args` and
+    `children` (`None` for plain attributes, list of nodes for blocks).
+    """
+    root = []
+    stack = [root]
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        try:
+            tokens = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise UnsupportedConfig(f'Line {lineno}: {e}')
+
+        if not tokens:
+            continue
+
+        if tokens == ['}']:
+            if len(stack) == 1:
+                raise UnsupportedConfig(f'Line {lineno}: unexpected closing bracket')
+
+            stack.pop()
+        elif tokens[-1] == '{':
+            node = {'key': tokens[0], 'args': tokens[1:-1], 'children': []}
+            stack[-1].append(node)
+            stack.append(node['children'])
+        else:
+            stack[-1].append({'key': tokens[0], 'args': tokens[1:], 'children': None})
+
+    if len(stack) != 1:
+        raise UnsupportedConfig('Unbalanced brackets')
+
+    return root
+
+
+def _new_target():
+    return {'attrs': {}, 'users': {k: set() for k in TARGET_USER_ATTRS}, 'luns': {}, 'groups': {}}
+
+
+def _parse_lun(node):
+    if node['children'] is not None or len(node['args']) != 2:
+        raise UnsupportedConfig(f'Unsupported LUN definition: {node["args"]}')
+
+    return int(node['args'][0]), node['args'][1]
+
+
+def _parse_target(nodes):
+    target = _new_target()
+    for node in nodes:
+        if node['key'] == 'LUN':
+            lun, device = _parse_lun(node)
+            target['luns'][lun] = device
+        elif node['key'] == 'GROUP' and node['children'] is not None:
+            group = target['groups'][node['args'][0]] = {'initiators': set(), 'luns': {}}
+            for child in node['children']:
+                if child['key'] == 'INITIATOR':
+                    group['initiators'].add(' '.join(child['args']))
+                elif child['key'] == 'LUN':
+                    lun, device = _parse_lun(child)
+                    group['luns'][lun] = device
+                else:
+                    raise UnsupportedConfig(f'Unsupported group attribute {child["key"]!r}')
+        elif node['key'] in TARGET_USER_ATTRS:
+            target['users'][node['key']].add(' '.join(node['args']))
+        elif node['key'] in TARGET_ATTRS:
+            target['attrs'][node['key']] = ' '.join(node['args'])
+        else:
+            # ALUA specific attributes (rel_tgt_id, forwarding etc)
+            raise UnsupportedConfig(f'Unsupported target attribute {node["key"]!r}')
+
+    return target
+
+
+def desired_state(text):
+    """
+    Convert scst.conf contents into desired state:
+    {
+        'devices': {name: {'handler': handler, 'attrs': {attr: value}}},
+        'driver': {attr: value},
+        'targets': {iqn: {'attrs': {}, 'users': {attr: set()}, 'luns': {}, 'groups': {}}},
+    }
+
+    Configurations used by HA systems (cluster name, device groups, dev_disk handler) are not supported.
+    """
+    state = {'devices': {}, 'driver': {}, 'targets': {}}
+    for node in parse_scst_conf(text):
+        if node['key'] == 'HANDLER' and node['args'][0] in HANDLERS:
+            for device in node['children']:
+                if device['key'] != 'DEVICE' or device['children'] is None:
+                    raise UnsupportedConfig(f'Unsupported handler attribute {device["key"]!r}')
+
+                state['devices'][device['args'][0]] = {
+                    'handler': node['args'][0],
+                    'attrs': {attr['key']: ' '.join(attr['args']) for attr in device['children']},
+                }
+        elif node['key'] == 'TARGET_DRIVER' and node['args'] == ['copy_manager']:
+            # SCST automatically adds and removes copy manager LUNs when devices are registered
+            continue
+        elif node['key'] == 'TARGET_DRIVER' and node['args'] == ['iscsi']:
+            for child in node['children']:
+                if child['key'] == 'TARGET' and child['children'] is not None:
+                    state['targets'][child['args'][0]] = _parse_target(child['children'])
+                elif child['children'] is None:
+                    state['driver'][child['key']] = ' '.join(child['args'])
+                else:
+                    raise UnsupportedConfig(f'Unsupported iscsi driver section {child["key"]!r}')
+        else:
+            raise UnsupportedConfig(f'Unsupported section {node["key"]!r}')
+
+    return state
+
+
+class ScstSysfs:
+    def __init__(self, root=SCST_SYSFS):
+        self.root = root
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def read_attr(self, *parts):
+        """
+        SCST attributes contain the value on the first line followed by optional `[key]` marker.
+        """
+        try:
+            with open(self.path(*parts)) as f:
+                return f.readline().strip()
+        except FileNotFoundError:
+            return None
+
+    def _listdir(self, *parts):
+        try:
+            return os.listdir(self.path(*parts))
+        except FileNotFoundError:
+            return []
+
+    def _luns(self, *parts):
+        luns = {}
+        for lun in self._listdir(*parts):
+            if lun.isdigit():
+                luns[int(lun)] = os.path.basename(os.readlink(self.path(*parts, lun, 'device')))
+
+        return luns
+
+    def running_state(self, desired):
+        """
+        Read the running configuration. Only device and driver attributes that are present
+        in the desired configuration are read.
+        """
+        state = {'devices': {}, 'driver': {}, 'targets': {}}
+        for handler in HANDLERS:
+            for name in self._listdir('handlers', handler):
+                if not os.path.islink(self.path('handlers', handler, name)):
+                    continue
+
+                attrs = desired['devices'].get(name, {}).get('attrs', {})
+                state['devices'][name] = {
+                    'handler': handler,
+                    'attrs': {attr: self.read_attr('devices', name, attr) for attr in attrs},
+                }
+
+        for attr in desired['driver']:
+            state['driver'][attr] = self.read_attr('targets', 'iscsi', attr)
+
+        for iqn in self._listdir('targets', 'iscsi'):
+            if not os.path.isdir(self.path('targets', 'iscsi', iqn)):
+                continue
+
+            target = state['targets'][iqn] = _new_target()
+            for attr in TARGET_ATTRS:
+                target['attrs'][attr] = self.read_attr('targets', 'iscsi', iqn, attr)
+
+            for attr in self._listdir('targets', 'iscsi', iqn):
+                user_attr = attr.rstrip('0123456789')
+                if user_attr in TARGET_USER_ATTRS:
+                    target['users'][user_attr].add(self.read_attr('targets', 'iscsi', iqn, attr))
+
+            target['luns'] = self._luns('targets', 'iscsi', iqn, 'luns')
+            for group in self._listdir('targets', 'iscsi', iqn, 'ini_groups'):
+                if not os.path.isdir(self.path('targets', 'iscsi', iqn, 'ini_groups', group)):
+                    continue
+
+                target['groups'][group] = {
+                    'initiators': set(self._listdir('targets', 'iscsi', iqn, 'ini_groups', group, 'initiators')) -
+                    {'mgmt'},
+                    'luns': self._luns('targets', 'iscsi', iqn, 'ini_groups', group, 'luns'),
+                }
+
+        return state
+
+    def delta(self, desired):
+        """
+        Returns list of (path, command) tuples that turn running configuration into `desired`.
+        """
+        running = self.running_state(desired)
+        commands = []
+        driver_mgmt = ('targets', 'iscsi', 'mgmt')
+
+        for iqn in running['targets'].keys() - desired['targets'].keys():
+            commands.append((('targets', 'iscsi', iqn, 'enabled'), '0'))
+            commands.append((driver_mgmt, f'del_target {iqn}'))
+
+        for name, device in desired['devices'].items():
+            current = running['devices'].get(name)
+            if current is None:
+                params = ';'.join(f'{k}={v}' for k, v in device['attrs'].items() if k in DEVICE_CREATE_PARAMS)
+                commands.append((('handlers', device['handler'], 'mgmt'), f'add_device {name} {params}'))
+                current = {'handler': device['handler'], 'attrs': {}}
+            elif current['handler'] != device['handler']:
+                raise UnsupportedConfig(f'{name}: device handler changed')
+
+            for attr, value in device['attrs'].items():
+                if current['attrs'].get(attr) == value.strip():
+                    continue
+
+                if attr in DEVICE_CREATE_PARAMS:
+                    if name in running['devices']:
+                        raise UnsupportedConfig(f'{name}: {attr} can not be changed for existing device')
+                    continue
+
+                commands.append((('devices', name, attr), value))
+
+        for iqn, target in desired['targets'].items():
+            current = running['targets'].get(iqn)
+            if current is None:
+                commands.append((driver_mgmt, f'add_target {iqn}'))
+                current = _new_target()
+
+            target_path = ('targets', 'iscsi', iqn)
+            for attr in TARGET_USER_ATTRS:
+                for user in current['users'][attr] - target['users'][attr]:
+                    commands.append((driver_mgmt, f'del_target_attribute {iqn} {attr} {user}'))
+                for user in target['users'][attr] - current['users'][attr]:
+                    commands.append((driver_mgmt, f'add_target_attribute {iqn} {attr} {user}'))
+
+            commands.extend(self._luns_delta(target_path + ('luns',), current['luns'], target['luns']))
+
+            groups_mgmt = target_path + ('ini_groups', 'mgmt')
+            for group in current['groups'].keys() - target['groups'].keys():
+                commands.append((groups_mgmt, f'del {group}'))
+
+            for group_name, group in target['groups'].items():
+                current_group = current['groups'].get(group_name)
+                if current_group is None:
+                    commands.append((groups_mgmt, f'create {group_name}'))
+                    current_group = {'initiators': set(), 'luns': {}}
+
+                group_path = target_path + ('ini_groups', group_name)
+                initiators_mgmt = group_path + ('initiators', 'mgmt')
+                for initiator in current_group['initiators'] - group['initiators']:
+                    commands.append((initiators_mgmt, f'del {initiator}'))
+                for initiator in group['initiators'] - current_group['initiators']:
+                    commands.append((initiators_mgmt, f'add {initiator}'))
+
+                commands.extend(self._luns_delta(group_path + ('luns',), current_group['luns'], group['luns']))
+
+            # Attributes are written last so that the target is only enabled once it is fully configured
+            for attr in TARGET_ATTRS:
+                if attr in target['attrs'] and current['attrs'].get(attr) != target['attrs'][attr]:
+                    commands.append((target_path + (attr,), target['attrs'][attr]))
+
+        for attr, value in desired['driver'].items():
+            if running['driver'][attr] == value:
+                continue
+
+            if attr not in DRIVER_ATTRS:
+                raise UnsupportedConfig(f'iscsi driver attribute {attr!r} changed')
+
+            commands.append((('targets', 'iscsi', attr), value))
+
+        for name in running['devices'].keys() - desired['devices'].keys():
+            commands.append((('handlers', running['devices'][name]['handler'], 'mgmt'), f'del_device {name}'))
+
+        return commands
+
+    def _luns_delta(self, luns_path, current, desired):
+        commands = []
+        mgmt = luns_path + ('mgmt',)
+        for lun, device in current.items():
+            if desired.get(lun) != device:
+                commands.append((mgmt, f'del {lun}'))
+
+        for lun, device in desired.items():
+            if current.get(lun) != device:
+                commands.append((mgmt, f'add {device} {lun}'))
+
+        return commands
+
+    def apply(self, commands):
+        for path, command in commands:
+            logger.debug('SCST: %s <- %r', '/'.join(path), command)
+            try:
+                with open(self.path(*path), 'w') as f:
+                    f.write(f'{command}\n')
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+                self._wait_mgmt_result()
+
+    def _wait_mgmt_result(self):
+        """
+        Long running management commands are completed asynchronously, their result is
+        reported through `last_sysfs_mgmt_res`.
+        """
+        deadline = time.monotonic() + MGMT_RESULT_TIMEOUT
+        while True:
+            try:
+                with open(self.path('last_sysfs_mgmt_res')) as f:
+                    result = int(f.read().strip() or 0)
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+                if time.monotonic() > deadline:
+                    raise OSError(errno.ETIMEDOUT, 'Timed out waiting for SCST management command to complete')
+
+                time.sleep(0.1)
+                continue
+
+            if result:
+                raise OSError(-result, os.strerror(-result))
+
+            return
+
+
+def reconfigure(config_path=SCST_CONF, root=SCST_SYSFS):
+    """
+    Apply only the difference between `config_path` and running SCST configuration.
+
+    Returns `False` if SCST is not running or the difference can not be applied incrementally,
+    in which case the caller should fall back to loading the complete configuration.
+    """
+    sysfs = ScstSysfs(root)
+    if not os.path.isdir(sysfs.path('targets', 'iscsi')):
+        return False
+
+    with open(config_path) as f:
+        text = f.read()
+
+    try:
+        commands = sysfs.delta(desired_state(text))
+    except UnsupportedConfig as e:
+        logger.debug('Unable to reconfigure SCST incrementally: %s', e)
+        return False
+
+    sysfs.apply(commands)
+    logger.debug('SCST reconfigured with %d sysfs commands', len(commands))
+    return True
@@ -2,12 +2,13 @@ import contextlib
 import socket
 import uuid
 
-from kmip.core import enums
-from kmip.pie.client import ProxyKmipClient
-from kmip.pie.exceptions import ClientConnectionFailure, ClientConnectionNotOpen, KmipOperationFailure
-from kmip.pie.objects import SecretData
-
 from middlewared.service import CallError
+from middlewared.utils.python import lazy_import
+
+enums = lazy_import('kmip.core.enums')
+kmip_client = lazy_import('kmip.pie.client')
+kmip_exceptions = lazy_import('kmip.pie.exceptions')
+kmip_objects = lazy_import('kmip.pie.objects')
 
 
 class KMIPServerMixin:
@@ -26,9 +27,9 @@ class KMIPServerMixin:
             'ssl_version': 'ssl_version'
         }
         try:
-            with ProxyKmipClient(**{k: data[v] for k, v in mapping.items() if data.get(v)}) as conn:
+            with kmip_client.ProxyKmipClient(**{k: data[v] for k, v in mapping.items() if data.get(v)}) as conn:
                 yield conn
-        except (ClientConnectionFailure, ClientConnectionNotOpen, socket.timeout) as e:
+        except (kmip_exceptions.ClientConnectionFailure, kmip_exceptions.ClientConnectionNotOpen, socket.timeout) as e:
             raise CallError(f'Failed to connect to KMIP Server: {e}')
 
     def _test_connection(self, data=None):
@@ -45,7 +46,7 @@ class KMIPServerMixin:
         # Revoke key from the KMIP Server
         try:
             conn.revoke(enums.RevocationReasonCode.CESSATION_OF_OPERATION, uid)
-        except KmipOperationFailure as e:
+        except kmip_exceptions.KmipOperationFailure as e:
             raise CallError(f'Failed to revoke key: {e}')
 
     def _revoke_and_destroy_key(self, uid, conn, logger=None, key_id=None):
@@ -67,31 +68,33 @@ class KMIPServerMixin:
         # Destroy key from the KMIP Server
         try:
             conn.destroy(uid)
-        except KmipOperationFailure as e:
+        except kmip_exceptions.KmipOperationFailure as e:
             raise CallError(f'Failed to destroy key: {e}')
 
     def _retrieve_secret_data(self, uid, conn):
         # Query key from the KMIP Server
         try:
             obj = conn.get(uid)
-        except KmipOperationFailure as e:
+        except kmip_exceptions.KmipOperationFailure as e:
             raise CallError(f'Failed to retrieve secret data: {e}')
         else:
-            if not isinstance(obj, SecretData):
+            if not isinstance(obj, kmip_objects.SecretData):
                 raise CallError('Retrieved managed object is not secret data')
             return obj.value.decode()
 
     def _register_secret_data(self, name, key, conn):
         # Create key on the KMIP Server
-        secret_data = SecretData(key.encode(), enums.SecretDataType.PASSWORD, name=f'{name}-{str(uuid.uuid4())[:7]}')
+        secret_data = kmip_objects.SecretData(
+            key.encode(), enums.SecretDataType.PASSWORD, name=f'{name}-{str(uuid.uuid4())[:7]}',
+        )
         try:
             uid = conn.register(secret_data)
-        except KmipOperationFailure as e:
+        except kmip_exceptions.KmipOperationFailure as e:
             raise CallError(f'Failed to register key with KMIP server: {e}')
         else:
             try:
                 conn.activate(uid)
-            except KmipOperationFailure as e:
+            except kmip_exceptions.KmipOperationFailure as e:
                 error = f'Failed to activate key: {e}'
                 try:
                     self._destroy_key(uid, conn)
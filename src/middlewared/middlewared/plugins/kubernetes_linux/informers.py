@@ -0,0 +1,31 @@
+from middlewared.service import Service
+
+from .k8s import Deployment, Pod, Secret, Service as K8sService, StatefulSet
+from .k8s.client import close_session
+from .k8s.informer import INFORMERS, start_informers, stop_informers
+
+
+INFORMER_RESOURCES = [Deployment, Pod, Secret, K8sService, StatefulSet]
+
+
+class KubernetesInformerService(Service):
+
+    class Config:
+        namespace = 'k8s.informer'
+        private = True
+
+    async def start(self):
+        await start_informers(INFORMER_RESOURCES)
+
+    async def stop(self):
+        await stop_informers()
+        await close_session()
+
+    async def status(self):
+        return {
+            informer.resource.OBJECT_HUMAN_NAME: {
+                'synced': informer.synced,
+                'objects': len(informer.objects),
+                'resource_version': informer.resource_version,
+            } for informer in INFORMERS.values()
+        }
@@ -7,11 +7,39 @@ import os
 import typing
 import urllib.parse
 
-from .config import get_config
+from .config import Config, get_config
 from .exceptions import ApiException
 from .utils import RequestMode, UPDATE_HEADERS
 
 
+SESSION: typing.Optional[typing.Tuple[Config, aiohttp.ClientSession]] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Returns a client session shared by all K8s API requests so that connections to the API server are pooled.
+    A new session is created whenever K8s client configuration is re-initialized (i.e. on k3s restart).
+    """
+    global SESSION
+    config = get_config()
+    if SESSION is not None and SESSION[0] is config and not SESSION[1].closed:
+        return SESSION[1]
+
+    if SESSION is not None:
+        await close_session()
+
+    SESSION = (config, aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=config.ssl_context)))
+    return SESSION[1]
+
+
+async def close_session() -> None:
+    global SESSION
+    if SESSION is not None:
+        session = SESSION[1]
+        SESSION = None
+        await session.close()
+
+
 class ClientMixin:
 
     @classmethod
@@ -23,16 +51,14 @@ class ClientMixin:
         exceptions = [aiohttp.ClientResponseError] + ([asyncio.TimeoutError] if handle_timeout else [])
         try:
             async with async_timeout.timeout(timeout):
-                async with aiohttp.ClientSession(
-                    connector=aiohttp.TCPConnector(ssl=get_config().ssl_context)
-                ) as session:
-                    async with await getattr(session, mode)(
-                        urllib.parse.urljoin(get_config().server, endpoint), json=body, headers=headers
-                    ) as resp:
-                        if resp.status not in (200, 201):
-                            raise ApiException(f'Received {resp.status!r} response code from {endpoint!r}')
-
-                        yield resp
+                session = await get_session()
+                async with await getattr(session, mode)(
+                    urllib.parse.urljoin(get_config().server, endpoint), json=body, headers=headers
+                ) as resp:
+                    if resp.status not in (200, 201):
+                        raise ApiException(f'Received {resp.status!r} response code from {endpoint!r}')
+
+                    yield resp
         except tuple(exceptions) as e:
             raise ApiException(f'Failed {endpoint!r} call: {e!r}')
 
@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import logging
+import typing
+
+from .client import ClientMixin, K8sClientBase
+from .exceptions import ApiException
+from .utils import RequestMode
+from .watch import Watch
+
+
+logger = logging.getLogger(__name__)
+
+INFORMERS: typing.Dict[typing.Type[K8sClientBase], 'Informer'] = {}
+
+
+def parse_selector(selector: typing.Optional[str]) -> typing.Optional[typing.List[typing.Tuple[str, str, str]]]:
+    """
+    Parse an equality based K8s label/field selector ( i.e. `a=b,c!=d,e` ) into `[(key, op, value)]`.
+    Returns `None` if the selector uses syntax which we do not evaluate locally ( i.e. set based selectors ).
+    """
+    if not selector:
+        return []
+
+    result = []
+    for term in selector.split(','):
+        term = term.strip()
+        if any(c in term for c in '()<>') or ' ' in term:
+            return None
+
+        if '!=' in term:
+            key, value = term.split('!=', 1)
+            result.append((key, '!=', value))
+        elif '==' in term:
+            key, value = term.split('==', 1)
+            result.append((key, '=', value))
+        elif '=' in term:
+            key, value = term.split('=', 1)
+            result.append((key, '=', value))
+        elif term.startswith('!'):
+            result.append((term[1:], '!', ''))
+        else:
+            result.append((term, 'exists', ''))
+
+    return result
+
+
+async def iter_lines(content) -> typing.AsyncIterable[bytes]:
+    """
+    Iterates over lines of a response stream. Unlike iterating the stream itself, this does not fail on lines longer
+    than the stream buffer limit ( i.e. watch events of large secrets or config maps ).
+    """
+    buffer = bytearray()
+    async for chunk in content.iter_any():
+        if b'\n' not in chunk:
+            buffer += chunk
+            continue
+
+        first, *lines, rest = chunk.split(b'\n')
+        buffer += first
+        yield bytes(buffer)
+        for line in lines:
+            yield line
+
+        buffer = bytearray(rest)
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def get_field(obj: dict, path: str) -> typing.Any:
+    for key in path.split('.'):
+        if not isinstance(obj, dict) or key not in obj:
+            return None
+        obj = obj[key]
+
+    return obj
+
+
+def selector_matches(value_getter: typing.Callable[[str], typing.Any], selector: list) -> bool:
+    for key, op, value in selector:
+        actual = value_getter(key)
+        if op == 'exists':
+            if actual is None:
+                return False
+        elif op == '!':
+            if actual is not None:
+                return False
+        elif op == '=':
+            if actual is None or str(actual) != value:
+                return False
+        elif actual is not None and str(actual) == value:
+            return False
+
+    return True
+
+
+class Informer(ClientMixin):
+    """
+    Keeps a local copy of all objects of a K8s resource type up to date by listing them once and then following
+    the watch stream of changes from that resource version on.
+    """
+
+    WATCH_TIMEOUT = 240
+
+    def __init__(self, resource: typing.Type[K8sClientBase]):
+        self.resource: typing.Type[K8sClientBase] = resource
+        self.objects: typing.Dict[str, dict] = {}
+        self.resource_version: typing.Optional[str] = None
+        self.synced: bool = False
+        self.task: typing.Optional[asyncio.Task] = None
+        self._stop: bool = False
+
+    async def stop(self) -> None:
+        self._stop = True
+        self.synced = False
+
+    async def run(self) -> None:
+        while not self._stop:
+            try:
+                await self.list()
+                await self.watch()
+            except (ApiException, asyncio.TimeoutError, ConnectionError) as e:
+                self.synced = False
+                logger.debug('%r informer stream failed: %r', self.resource.OBJECT_HUMAN_NAME, e)
+                await asyncio.sleep(5)
+            except Exception:
+                self.synced = False
+                logger.error('Unhandled exception in %r informer', self.resource.OBJECT_HUMAN_NAME, exc_info=True)
+                await asyncio.sleep(5)
+
+    async def list(self) -> None:
+        listing = await self.resource.query()
+        self.objects = {obj['metadata']['uid']: obj for obj in listing['items']}
+        self.resource_version = listing['metadata']['resourceVersion']
+        self.synced = True
+
+    async def watch(self) -> None:
+        while not self._stop:
+            uri = self.resource.uri(parameters={
+                'watch': 'true',
+                'allowWatchBookmarks': 'true',
+                'resourceVersion': self.resource_version,
+                'timeoutSeconds': self.WATCH_TIMEOUT,
+            })
+            async with self.request(
+                uri, RequestMode.GET.value, timeout=self.WATCH_TIMEOUT + 30, handle_timeout=False,
+            ) as response:
+                async for line in iter_lines(response.content):
+                    if self._stop:
+                        return
+
+                    if not line.strip():
+                        continue
+
+                    if not self.apply(Watch.sanitize_data(line, 'json')):
+                        # Our resource version is too old, we need to list everything again
+                        return
+
+    def apply(self, event: dict) -> bool:
+        obj = event.get('object') or {}
+        if event['type'] == 'ERROR':
+            if obj.get('code') == 410:
+                return False
+            raise ApiException(f'Received error on {self.resource.OBJECT_HUMAN_NAME!r} watch: {obj.get("message")}')
+
+        self.resource_version = obj['metadata']['resourceVersion']
+        if event['type'] in ('ADDED', 'MODIFIED'):
+            self.objects[obj['metadata']['uid']] = obj
+        elif event['type'] == 'DELETED':
+            self.objects.pop(obj['metadata']['uid'], None)
+
+        return True
+
+    def query(
+        self, namespace: typing.Optional[str] = None, label_selector: typing.Optional[str] = None,
+        field_selector: typing.Optional[str] = None,
+    ) -> typing.Optional[typing.List[dict]]:
+        """
+        Returns cached objects matching the specified namespace and selectors or `None` if the cache cannot be used
+        to answer the query. Returned objects are shared with the cache and must not be modified.
+        """
+        if not self.synced:
+            return None
+
+        labels = parse_selector(label_selector)
+        fields = parse_selector(field_selector)
+        if labels is None or fields is None:
+            return None
+
+        return [
+            obj for obj in self.objects.values()
+            if (namespace is None or obj['metadata'].get('namespace') == namespace) and selector_matches(
+                lambda k: (obj['metadata'].get('labels') or {}).get(k), labels
+            ) and selector_matches(lambda k: get_field(obj, k), fields)
+        ]
+
+
+def get_informer(resource: typing.Type[K8sClientBase]) -> typing.Optional[Informer]:
+    return INFORMERS.get(resource)
+
+
+async def start_informers(resources: typing.List[typing.Type[K8sClientBase]]) -> None:
+    for resource in resources:
+        if resource not in INFORMERS:
+            informer = INFORMERS[resource] = Informer(resource)
+            informer.task = asyncio.get_event_loop().create_task(informer.run())
+
+
+async def stop_informers() -> None:
+    for resource in list(INFORMERS):
+        informer = INFORMERS.pop(resource)
+        with contextlib.suppress(Exception):
+            await informer.stop()
+
+        informer.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await informer.task
@@ -1,8 +1,11 @@
+import copy
+
 from middlewared.schema import accepts, Dict, Str
 from middlewared.service import CallError, filterable
 from middlewared.utils import filter_list
 
 from .k8s import ApiException, K8sClientBase
+from .k8s.informer import get_informer
 
 
 class KubernetesBaseResource:
@@ -26,10 +29,23 @@ class KubernetesBaseResource:
         if len(filters) == 1 and len(filters[0]) == 3 and list(filters[0])[:2] == ['metadata.namespace', '=']:
             kwargs['namespace'] = filters[0][2]
 
-        resources = [
-            d for d in (await self.KUBERNETES_RESOURCE.query(**kwargs))['items']
-            if await self.conditional_filtering_in_query(d, options)
-        ]
+        cached = None
+        if (informer := get_informer(self.KUBERNETES_RESOURCE)) and set(kwargs) <= {
+            'labelSelector', 'fieldSelector', 'namespace'
+        }:
+            cached = informer.query(kwargs.get('namespace'), kwargs.get('labelSelector'), kwargs.get('fieldSelector'))
+
+        if cached is not None:
+            # Objects are shared with the informer cache so we only copy the ones we are going to return
+            resources = copy.deepcopy(filter_list(
+                [d for d in cached if await self.conditional_filtering_in_query(d, options)], filters
+            ))
+        else:
+            resources = [
+                d for d in (await self.KUBERNETES_RESOURCE.query(**kwargs))['items']
+                if await self.conditional_filtering_in_query(d, options)
+            ]
+
         if self.QUERY_EVENTS and self.QUERY_EVENTS_RESOURCE_NAME is not NotImplementedError and extra.get('events'):
             events = await self.middleware.call(
                 'kubernetes.get_events_of_resource_type', self.QUERY_EVENTS_RESOURCE_NAME,
@@ -51,6 +51,7 @@ class KubernetesService(Service):
             raise
         else:
             self.middleware.create_task(self.middleware.call('k8s.event.setup_k8s_events'))
+            await self.middleware.call('k8s.informer.start')
             await self.middleware.call('chart.release.refresh_events_state')
             await self.middleware.call('alert.oneshot_delete', 'ApplicationsStartFailed', None)
             await self.set_status(Status.RUNNING.value)
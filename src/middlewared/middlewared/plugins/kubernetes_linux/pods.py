@@ -105,5 +105,8 @@ class KubernetesPodLogsFollowTailEventSource(EventSource):
         self.watch = None
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_event_source('kubernetes.pod_log_follow', KubernetesPodLogsFollowTailEventSource)
@@ -13,6 +13,7 @@ from middlewared.schema import accepts, Bool, Dict, Int, IPAddr, List, Patch, re
 from middlewared.validators import Range
 from .interface.netif import netif
 from .interface.interface_types import InterfaceType
+from .interface.state_cache import InterfaceStateCache
 from .interface.lag_options import XmitHashChoices, LacpduRateChoices
 
 
@@ -107,6 +108,7 @@ class InterfaceService(CRUDService):
         super().__init__(*args, **kwargs)
         self._original_datastores = {}
         self._rollback_timer = None
+        self._state_cache = InterfaceStateCache()
 
     ENTRY = Dict(
         'interface_entry',
@@ -176,6 +178,10 @@ class InterfaceService(CRUDService):
         additional_attrs=True,
     )
 
+    @private
+    def invalidate_state_cache(self):
+        self._state_cache.invalidate()
+
     @private
     async def query_names_only(self):
         return [i['int_interface'] for i in await self.middleware.call('datastore.query', 'network.interfaces')]
@@ -201,7 +207,7 @@ class InterfaceService(CRUDService):
         elif platform.startswith('TRUENAS-H'):
             hseries = True
 
-        for name, iface in netif.list_interfaces().items():
+        for name, (iface, state) in self._state_cache.interfaces().items():
             if (name in ignore) or (iface.cloned and name not in configs):
                 continue
             elif any((fseries, hseries)) and iface.bus == 'usb':
@@ -210,14 +216,10 @@ class InterfaceService(CRUDService):
                 # interface so users can't configure it
                 continue
 
-            iface_extend_kwargs = {}
             if ha_hardware:
-                vrrp_config = self.middleware.call_sync('interfaces.vrrp_config', name)
-                iface_extend_kwargs.update(dict(vrrp_config=vrrp_config))
-            try:
-                data[name] = self.iface_extend(iface.asdict(**iface_extend_kwargs), configs, ha_hardware)
-            except OSError:
-                self.logger.warn('Failed to get interface state for %s', name, exc_info=True)
+                state['vrrp_config'] = self.middleware.call_sync('interfaces.vrrp_config', name)
+
+            data[name] = self.iface_extend(state, configs, ha_hardware)
         for name, config in filter(lambda x: x[0] not in data, configs.items()):
             data[name] = self.iface_extend({
                 'name': config['int_interface'],
@@ -1877,24 +1879,20 @@ class InterfaceService(CRUDService):
             static_ips['127.0.0.1'] = '127.0.0.1'
 
         ignore_nics = tuple(ignore_nics)
-        for iface in filter(lambda x: not x.orig_name.startswith(ignore_nics), list(netif.list_interfaces().values())):
-            try:
-                aliases_list = iface.asdict()['aliases']
-            except FileNotFoundError:
-                # This happens on freebsd where we have a race condition when the interface
-                # might no longer possibly exist when we try to retrieve data from it
-                pass
-            else:
-                for alias_dict in filter(lambda d: not choices['static'] or d['address'] in static_ips, aliases_list):
+        for iface, state in self._state_cache.interfaces().values():
+            if iface.orig_name.startswith(ignore_nics):
+                continue
+
+            for alias_dict in filter(lambda d: not choices['static'] or d['address'] in static_ips, state['aliases']):
 
-                    if choices['ipv4'] and alias_dict['type'] == 'INET':
-                        list_of_ip.append(alias_dict)
+                if choices['ipv4'] and alias_dict['type'] == 'INET':
+                    list_of_ip.append(alias_dict)
 
-                    if choices['ipv6'] and alias_dict['type'] == 'INET6':
-                        if not choices['ipv6_link_local']:
-                            if ipaddress.ip_address(alias_dict['address']) in ipaddress.ip_network('fe80::/64'):
-                                continue
-                        list_of_ip.append(alias_dict)
+                if choices['ipv6'] and alias_dict['type'] == 'INET6':
+                    if not choices['ipv6_link_local']:
+                        if ipaddress.ip_address(alias_dict['address']) in ipaddress.ip_network('fe80::/64'):
+                            continue
+                    list_of_ip.append(alias_dict)
 
         return list_of_ip
 
@@ -94,6 +94,7 @@ class PoolDatasetService(CRUDService):
         datastore_primary_key_type = 'string'
         event_send = False
         namespace = 'pool.dataset'
+        query_coalesce = True
         role_prefix = 'DATASET'
         role_separate_delete = True
 
@@ -13,6 +13,7 @@ from middlewared.service_exception import InstanceNotFound
 from middlewared.utils.size import format_size
 from middlewared.validators import Range
 
+from .state_cache import PoolStateCache
 from .utils import (
     ZFS_CHECKSUM_CHOICES, ZFS_ENCRYPTION_ALGORITHM_CHOICES, ZPOOL_CACHE_FILE, RE_DRAID_DATA_DISKS, RE_DRAID_SPARE_DISKS
 )
@@ -99,6 +100,11 @@ class PoolService(CRUDService):
         datastore_prefix = 'vol_'
         event_send = False
         cli_namespace = 'storage.pool'
+        query_coalesce = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._state_cache = PoolStateCache()
 
     @accepts(Str('name'))
     @returns(Ref('pool_entry'))
@@ -181,13 +187,27 @@ class PoolService(CRUDService):
 
     @private
     def pool_extend(self, pool, context):
+        # Pool state is served from the cache unless `{"extra": {"fresh": True}}` query option is specified
+        fresh = context['extra'].get('fresh', False)
         if context['extra'].get('is_upgraded'):
-            pool['is_upgraded'] = self.middleware.call_sync('pool.is_upgraded_by_name', pool['name'])
+            pool['is_upgraded'] = self._state_cache.get(
+                pool['name'], 'is_upgraded',
+                lambda: self.middleware.call_sync('pool.is_upgraded_by_name', pool['name']), fresh,
+            )
 
         # WebUI expects the same data as in `boot.get_state`
-        pool |= self.middleware.call_sync('pool.pool_normalize_info', pool['name'])
+        pool |= self._state_cache.get(
+            pool['name'], 'info', lambda: self.middleware.call_sync('pool.pool_normalize_info', pool['name']), fresh,
+        )
         return pool
 
+    @private
+    def invalidate_state_cache(self, pool_name=None):
+        """
+        Makes next `pool.query` read the state of `pool_name` (or of all pools if it is not specified).
+        """
+        self._state_cache.invalidate(pool_name)
+
     async def __convert_topology_to_vdevs(self, topology):
         # We do two things here:
         # 1. Gather all disks transversing the topology
@@ -722,6 +742,7 @@ class PoolService(CRUDService):
         if properties:
             await self.middleware.call('zfs.pool.update', pool['name'], {'properties': properties})
 
+        await self.middleware.call('pool.invalidate_state_cache', pool['name'])
         pool = await self.get_instance(id_)
         await self.middleware.call_hook('pool.post_create_or_update', pool=pool)
         return pool
@@ -108,5 +108,6 @@ class PoolService(Service):
         pool = await self.middleware.call('pool.get_instance', oid)
         # Should we check first if upgrade is required ?
         await self.middleware.call('zfs.pool.upgrade', pool['name'])
+        await self.middleware.call('pool.invalidate_state_cache', pool['name'])
         await self.middleware.call('alert.oneshot_delete', 'PoolUpgraded', pool['name'])
         return True
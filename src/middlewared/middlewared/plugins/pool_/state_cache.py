@@ -0,0 +1,59 @@
+import copy
+import threading
+import time
+
+# Space usage and vdev error counters change without any ZFS event being issued, so a pool state is never served
+# longer than this.
+POOL_STATE_MAX_AGE = 10
+
+
+class PoolStateCache:
+    """
+    Caches pool topology and status (`pool.pool_normalize_info`) and upgrade state per pool name.
+
+    Entries are dropped when ZFS reports a change of the pool (vdev state change, scrub / resilver, config sync,
+    import / destroy) or when they are older than `POOL_STATE_MAX_AGE`.
+    """
+
+    def __init__(self, max_age=POOL_STATE_MAX_AGE):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        # Bumped when all the pools are invalidated
+        self.generation = 0
+        # pool name -> version, bumped when that pool is invalidated
+        self.versions = {}
+        # (pool name, kind) -> (version, taken_at, value)
+        self.entries = {}
+
+    def get(self, pool_name, kind, read, fresh=False):
+        with self.lock:
+            version = self._version(pool_name)
+            entry = self.entries.get((pool_name, kind))
+
+        if (
+            not fresh and entry is not None and entry[0] == version and
+            time.monotonic() - entry[1] <= self.max_age
+        ):
+            return copy.deepcopy(entry[2])
+
+        taken_at = time.monotonic()
+        value = read()
+        with self.lock:
+            # Pool might have changed while it was being read, that value must not be cached
+            if self._version(pool_name) == version:
+                self.entries[(pool_name, kind)] = (version, taken_at, value)
+
+        return copy.deepcopy(value)
+
+    def _version(self, pool_name):
+        return self.generation, self.versions.get(pool_name, 0)
+
+    def invalidate(self, pool_name=None):
+        with self.lock:
+            if pool_name is None:
+                self.generation += 1
+                self.entries.clear()
+            else:
+                self.versions[pool_name] = self.versions.get(pool_name, 0) + 1
+                for key in [key for key in self.entries if key[0] == pool_name]:
+                    self.entries.pop(key)
@@ -98,5 +98,8 @@ class RealtimeEventSource(EventSource):
             time.sleep(interval)
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_event_source('reporting.realtime', RealtimeEventSource)
@@ -65,5 +65,8 @@ class ProcessesEventSource(EventSource):
             time.sleep(options["interval"])
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_event_source("reporting.processes", ProcessesEventSource)
@@ -3,6 +3,7 @@ import errno
 
 import psutil
 
+from middlewared.plugins.service_.coalesce import ServiceActionCoalescer
 from middlewared.plugins.service_.services.all import all_services
 from middlewared.plugins.service_.services.base import IdentifiableServiceInterface
 
@@ -38,6 +39,11 @@ class ServiceService(CRUDService):
         List('pids', items=[Int('pid')]),
     )
 
+    def __init__(self, middleware):
+        super().__init__(middleware)
+
+        self.coalescer = ServiceActionCoalescer()
+
     @private
     async def service_extend_context(self, services, extra):
         if not extra.get('include_state', True):
@@ -261,7 +267,14 @@ class ServiceService(CRUDService):
     async def restart(self, service, options):
         """
         Restart the service specified by `service`.
+
+        Concurrent restart requests for the same service are merged into a single restart.
         """
+        return await self.coalescer.call(
+            ('restart', service, tuple(sorted(options.items()))), self._restart_impl, service, options,
+        )
+
+    async def _restart_impl(self, service, options):
         service_object = await self.middleware.call('service.object', service)
 
         await self.middleware.call_hook('service.pre_action', service, 'restart', options)
@@ -318,7 +331,14 @@ class ServiceService(CRUDService):
     async def reload(self, service, options):
         """
         Reload the service specified by `service`.
+
+        Concurrent reload requests for the same service are merged into a single reload.
         """
+        return await self.coalescer.call(
+            ('reload', service, tuple(sorted(options.items()))), self._reload_impl, service, options,
+        )
+
+    async def _reload_impl(self, service, options):
         service_object = await self.middleware.call('service.object', service)
 
         await self.middleware.call_hook('service.pre_action', service, 'reload', options)
@@ -339,6 +359,17 @@ class ServiceService(CRUDService):
         else:
             return await self._restart(service, service_object)
 
+    @private
+    async def coalesce_stats(self):
+        """
+        Returns how many times each service action was actually executed and how many requests were merged into
+        another execution.
+        """
+        return [
+            {'action': action, 'service': service, 'options': dict(options), **stats}
+            for (action, service, options), stats in self.coalescer.stats.items()
+        ]
+
     SERVICES = {}
 
     @private
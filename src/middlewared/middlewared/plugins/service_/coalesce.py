@@ -0,0 +1,46 @@
+import asyncio
+from collections import defaultdict
+
+
+class ServiceActionCoalescer:
+    """
+    Merges concurrent requests to perform the same action on the same service.
+
+    While an action is running, the first request for the same action is scheduled to run right after it and every
+    following request just joins that scheduled run. This way each caller still waits for an execution that has
+    started after its request (so it observes the configuration that was committed before it has called us) while a
+    burst of N requests results in at most two executions instead of N.
+    """
+
+    def __init__(self):
+        self.running = {}
+        self.pending = {}
+        self.stats = defaultdict(lambda: {'executed': 0, 'collapsed': 0})
+
+    async def call(self, key, method, *args):
+        if key in self.pending:
+            self.stats[key]['collapsed'] += 1
+            return await asyncio.shield(self.pending[key])
+
+        previous = self.running.get(key)
+        task = asyncio.ensure_future(self._run(key, previous, method, args))
+        if previous is None:
+            self.running[key] = task
+        else:
+            self.pending[key] = task
+
+        return await asyncio.shield(task)
+
+    async def _run(self, key, previous, method, args):
+        task = asyncio.current_task()
+        if previous is not None:
+            await asyncio.wait([previous])
+            self.pending.pop(key, None)
+            self.running[key] = task
+
+        self.stats[key]['executed'] += 1
+        try:
+            return await method(*args)
+        finally:
+            if self.running.get(key) is task:
+                self.running.pop(key)
@@ -1,3 +1,4 @@
+from middlewared.plugins.iscsi_.scst import reconfigure, SCST_CONF
 from middlewared.utils import run
 
 from .base import SimpleService
@@ -18,6 +19,16 @@ class ISCSITargetService(SimpleService):
         await self.middleware.call("iscsi.host.injection.stop")
 
     async def reload(self):
+        # Only apply what has changed through SCST sysfs. `scstadmin -config` compares complete configuration
+        # which takes a long time with a lot of targets and extents and stalls I/O while doing so.
+        try:
+            if await self.middleware.run_in_thread(reconfigure, SCST_CONF):
+                return True
+        except Exception:
+            self.middleware.logger.warning(
+                "Failed to reconfigure SCST incrementally, reloading complete configuration", exc_info=True
+            )
+
         return (await run(
-            ["scstadmin", "-noprompt", "-force", "-config", "/etc/scst.conf"], check=False
+            ["scstadmin", "-noprompt", "-force", "-config", SCST_CONF], check=False
         )).returncode == 0
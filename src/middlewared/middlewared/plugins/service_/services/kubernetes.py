@@ -87,6 +87,7 @@ class KubernetesService(SimpleService):
         await self.middleware.call('kubernetes.set_status', Status.STOPPING.value)
         await self.middleware.call('k8s.node.add_taints', [{'key': 'ix-svc-stop', 'effect': 'NoExecute'}])
         await asyncio.sleep(10)
+        await self.middleware.call('k8s.informer.stop')
         await self.clear_chart_releases_cache()
         try:
             await self.middleware.call('kubernetes.remove_iptables_rules')
@@ -71,5 +71,8 @@ class SMARTTestEventSource(EventSource):
             await asyncio.sleep(interval)
 
 
+SETUP_DEPENDS = []
+
+
 def setup(middleware):
     middleware.register_event_source('smart.test.progress', SMARTTestEventSource)
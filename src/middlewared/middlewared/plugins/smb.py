@@ -7,6 +7,7 @@ import re
 from pathlib import Path
 import stat
 import subprocess
+import time
 import unicodedata
 import uuid
 
@@ -23,6 +24,7 @@ from middlewared.schema.utils import NOT_PROVIDED
 from middlewared.service import accepts, job, private, SharingService
 from middlewared.service import TDBWrapConfigService, ValidationErrors, filterable
 from middlewared.service_exception import CallError, MatchNotFound
+from middlewared.plugins.smb_.registry_sync import delta_changes, registry_delta
 from middlewared.plugins.smb_.smbconf.reg_global_smb import LOGLEVEL_MAP
 import middlewared.sqlalchemy as sa
 from middlewared.utils import filter_list, osc, Popen, run, MIDDLEWARE_RUN_DIR
@@ -2068,14 +2070,18 @@ class SharingSMBService(SharingService):
     async def sync_registry(self, job):
         """
         Synchronize registry config with the share configuration in the truenas config
-        file. This method simply reconciles lists of shares, removing from and adding to
-        the registry as-needed.
+        file. Differences between middleware and registry are computed in a single pass over
+        the output of one `net conf list` call and then applied in a single `net conf import`
+        transaction.
+
+        Returns number of shares that were added, removed, modified and disabled.
         """
         if not await self.middleware.run_in_thread(os.path.exists, SMBPath.GLOBALCONF.platform()):
             self.logger.warning("smb.conf does not exist. Skipping registry synchronization."
                                 "This may indicate that SMB service has not completed initialization.")
             return
 
+        started_at = time.monotonic()
         db_shares = await self.query()
 
         for share in db_shares:
@@ -2088,51 +2094,50 @@ class SharingSMBService(SharingService):
             ('path', '!=', '')
         ])
 
-        registry_shares = await self.middleware.call('sharing.smb.reg_listshares')
-
-        cf_db = set([x['name'].casefold() for x in db_shares])
-        cf_active = set([x['name'].casefold() for x in active_shares])
-        cf_reg = set([x.casefold() for x in registry_shares])
-        to_add = cf_active - cf_reg
-        to_del = cf_reg - cf_active
-        to_preserve = cf_db & to_del
-        to_sync = cf_active - to_add
-
-        for share in to_add:
-            share_conf = filter_list(active_shares, [['name', 'C=', share]])
-            if path_location(share_conf[0][self.path_field]) is FSLocation.LOCAL:
-                if not await self.middleware.run_in_thread(os.path.exists, share_conf[0]['path']):
+        job.set_progress(10, 'Retrieving registry configuration.')
+        registry = (await self.middleware.call('sharing.smb.reg_list'))['sections']
+        cf_reg = {x['service'].casefold() for x in registry if x['is_share']}
+        cf_active = {x['name'].casefold() for x in active_shares}
+        preserved = {x['name'].casefold() for x in db_shares} - cf_active
+
+        job.set_progress(20, 'Generating share configuration.')
+        globalconf = await self.middleware.call('sharing.smb.get_global_params', None)
+        desired = {}
+        for share in active_shares:
+            name = share['name'].casefold()
+            if name not in cf_reg and path_location(share[self.path_field]) is FSLocation.LOCAL:
+                if not await self.middleware.run_in_thread(os.path.exists, share['path']):
                     self.logger.warning("Path [%s] for share [%s] does not exist. "
                                         "Refusing to add share to SMB configuration.",
-                                        share_conf[0]['path'], share_conf[0]['name'])
+                                        share['path'], share['name'])
                     continue
 
             try:
-                await self.middleware.call('sharing.smb.reg_addshare', share_conf[0])
+                conf = await self.middleware.call('sharing.smb.share_to_smbconf', share, globalconf)
             except ValueError:
-                self.logger.warning("Share [%s] has invalid configuration.", share, exc_info=True)
-            except Exception:
-                self.logger.warning("Failed to add SMB share [%s] while synchronizing registry config",
-                                    share, exc_info=True)
-
-        for share in to_del:
-            await self.middleware.call('sharing.smb.toggle_share', share, False)
-            if share in to_preserve:
+                self.logger.warning("Share [%s] has invalid configuration.", share['name'], exc_info=True)
                 continue
 
-            try:
-                await self.middleware.call('sharing.smb.reg_delshare', share)
-            except Exception:
-                self.middleware.logger.warning('Failed to remove stale share [%s]',
-                                               share, exc_info=True)
+            desired[name] = ('homes' if share['home'] else share['name'], conf)
+
+        delta = registry_delta(registry, desired, preserved)
+        changed = {k: len(delta[k]) for k in ('added', 'removed', 'modified', 'disabled')}
+        if delta_changes(delta):
+            for share in delta['removed'] + delta['disabled']:
+                await self.close_share(share)
 
-        for share in to_sync:
-            share_conf = filter_list(active_shares, [['name', 'C=', share]])
-            conf_diff = await self.middleware.call('sharing.smb.diff_middleware_and_registry', share, share_conf[0])
+            job.set_progress(60, f'Applying changes to {delta_changes(delta)} shares.')
             try:
-                await self.middleware.call('sharing.smb.apply_conf_diff', share, conf_diff)
+                await self.middleware.call('sharing.smb.reg_import', delta['sections'])
             except Exception:
-                self.middleware.logger.warning('Failed to sync configuration for share %s', share, exc_info=True)
+                self.logger.warning('Failed to import registry configuration. Applying changes per-share.',
+                                    exc_info=True)
+                await self.middleware.call('sharing.smb.apply_registry_delta', delta)
+
+        elapsed = time.monotonic() - started_at
+        job.set_progress(100, f'{delta_changes(delta)} shares changed in {elapsed:.2f} seconds.')
+        self.logger.debug('SMB registry synchronized in %.2f seconds: %r', elapsed, changed)
+        return changed
 
 
 async def pool_post_import(middleware, pool):
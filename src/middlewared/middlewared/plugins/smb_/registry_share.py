@@ -1,12 +1,14 @@
 from middlewared.service import private, Service, filterable
 from middlewared.service_exception import CallError, MatchNotFound
-from middlewared.utils import run, filter_list
+from middlewared.utils import run, filter_list, MIDDLEWARE_RUN_DIR
 from middlewared.plugins.smb import SMBCmd, SMBHAMODE
+from middlewared.plugins.smb_.registry_sync import render_smbconf, UNAVAILABLE
 from middlewared.plugins.smb_.smbconf.reg_service import ShareSchema
 
 import errno
 import json
 import os
+import tempfile
 
 CONF_JSON_VERSION = {"major": 0, "minor": 1}
 
@@ -43,7 +45,8 @@ class SharingSMBService(Service):
             'delshare',
             'getparm',
             'setparm',
-            'delparm'
+            'delparm',
+            'import',
         ]:
             raise CallError(f'Action [{action}] is not permitted.', errno.EPERM)
 
@@ -237,6 +240,54 @@ class SharingSMBService(Service):
 
         return
 
+    @private
+    async def reg_import(self, sections):
+        """
+        Replace complete registry configuration with `sections` in a single
+        transaction. `sections` is a list of (service, parameters) tuples and
+        must include the global section.
+        """
+        with tempfile.NamedTemporaryFile(mode='w', dir=MIDDLEWARE_RUN_DIR, prefix='smb_registry_', suffix='.conf') as f:
+            await self.middleware.run_in_thread(f.write, render_smbconf(sections))
+            await self.middleware.run_in_thread(f.flush)
+            await self.netconf(action='import', args=[f.name])
+
+    @private
+    async def apply_registry_delta(self, delta):
+        """
+        Apply changes computed by `registry_delta` share-by-share. This is much slower than
+        `reg_import` and is only used if the registry can not be imported as a whole.
+        """
+        sections = dict(delta['sections'])
+        for share in delta['removed']:
+            try:
+                await self.reg_delshare(share)
+            except Exception:
+                self.logger.warning('Failed to remove stale share [%s]', share, exc_info=True)
+
+        for share in delta['disabled']:
+            try:
+                await self.reg_setparm({'service': share, 'parameters': {'available': UNAVAILABLE}})
+            except Exception:
+                self.logger.warning('Failed to disable share [%s]', share, exc_info=True)
+
+        for share, conf_diff in delta['modified'].items():
+            try:
+                await self.apply_conf_diff(share, conf_diff)
+            except Exception:
+                self.logger.warning('Failed to sync configuration for share %s', share, exc_info=True)
+
+        for share in delta['added']:
+            try:
+                await self.netconf(
+                    action='addshare',
+                    jsoncmd=True,
+                    args=[json.dumps({'service': share, 'parameters': sections[share]})]
+                )
+            except Exception:
+                self.logger.warning('Failed to add SMB share [%s] while synchronizing registry config',
+                                    share, exc_info=True)
+
     @private
     @filterable
     def reg_query(self, filters, options):
@@ -0,0 +1,93 @@
+UNAVAILABLE = {'raw': 'no', 'parsed': False}
+
+
+def is_available(parameters):
+    available = parameters.get('available')
+    if available is None:
+        return True
+
+    return str(available['raw']).lower() not in ('no', 'false', '0')
+
+
+def diff_share_conf(share_conf, reg_conf):
+    """
+    Compare share configuration generated from our schema with the one currently
+    stored in the registry. Values are compared by their raw representation, since
+    that is what is actually stored in registry.tdb.
+    """
+    s_keys = set(share_conf.keys())
+    r_keys = set(reg_conf.keys())
+
+    return {
+        'added': {x: share_conf[x] for x in s_keys - r_keys},
+        'removed': {x: reg_conf[x] for x in r_keys - s_keys},
+        'modified': {
+            x: share_conf[x] for x in s_keys & r_keys if str(share_conf[x]['raw']) != str(reg_conf[x]['raw'])
+        },
+    }
+
+
+def registry_delta(registry, desired, preserved):
+    """
+    Compute in a single pass the changes required to make registry match middleware config.
+
+    `registry` is output of `net conf list` (`sections` key of `sharing.smb.reg_list`).
+    `desired` maps casefolded share name to tuple (service name, smb.conf parameters) of shares
+    that should be available.
+    `preserved` is a set of casefolded names of shares that exist in middleware config but should
+    not be available (disabled or locked). These are kept in registry with `available = no`.
+
+    Returns dictionary with names of changed shares and list of (service, parameters) tuples
+    describing complete desired registry contents.
+    """
+    delta = {'added': [], 'removed': [], 'modified': {}, 'disabled': [], 'sections': []}
+    seen = set()
+
+    for section in registry:
+        service = section['service']
+        parameters = section['parameters']
+        if not section['is_share']:
+            delta['sections'].append((service, parameters))
+            continue
+
+        name = service.casefold()
+        seen.add(name)
+        if name in desired:
+            conf_diff = diff_share_conf(desired[name][1], parameters)
+            if any(conf_diff.values()):
+                delta['modified'][service] = conf_diff
+
+            delta['sections'].append((service, desired[name][1]))
+        elif name in preserved:
+            if is_available(parameters):
+                delta['disabled'].append(service)
+
+            delta['sections'].append((service, parameters | {'available': UNAVAILABLE}))
+        else:
+            delta['removed'].append(service)
+
+    for name, (service, parameters) in desired.items():
+        if name not in seen:
+            delta['added'].append(service)
+            delta['sections'].append((service, parameters))
+
+    return delta
+
+
+def delta_changes(delta):
+    return len(delta['added']) + len(delta['removed']) + len(delta['modified']) + len(delta['disabled'])
+
+
+def render_smbconf(sections):
+    """
+    Render registry sections in smb.conf format suitable for `net conf import`.
+    """
+    out = []
+    for service, parameters in sections:
+        out.append(f'[{service}]')
+        for param, value in parameters.items():
+            out.append(f'\t{param} = {value["raw"]}')
+
+        out.append('')
+
+    return '\n'.join(out)
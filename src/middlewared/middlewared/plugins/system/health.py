@@ -79,5 +79,8 @@ class SystemHealthEventSource(EventSource):
             })
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     middleware.register_event_source('system.health', SystemHealthEventSource)
@@ -8,7 +8,9 @@ import time
 from datetime import datetime, timedelta, timezone
 
 from middlewared.schema import accepts, Bool, Datetime, Dict, Float, Int, List, returns, Str
-from middlewared.service import no_auth_required, no_authz_required, pass_app, private, Service, throttle
+from middlewared.service import (
+    coalesce, no_auth_required, no_authz_required, pass_app, private, Service, throttle,
+)
 from middlewared.utils import sw_buildtime
 
 
@@ -129,6 +131,7 @@ class SystemService(Service):
         buildtime = sw_buildtime()
         return datetime.fromtimestamp(int(buildtime)) if buildtime else buildtime
 
+    @coalesce()
     @accepts()
     @returns(Dict(
         'system_info',
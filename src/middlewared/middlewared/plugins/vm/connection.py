@@ -1,11 +1,13 @@
 import contextlib
-import libvirt
 import os
 
 from middlewared.service import CallError
+from middlewared.utils.python import lazy_import
 
 from .utils import LIBVIRT_URI
 
+libvirt = lazy_import('libvirt')
+
 
 class LibvirtConnectionMixin:
 
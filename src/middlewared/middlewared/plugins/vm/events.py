@@ -1,10 +1,12 @@
-import libvirt
 import threading
 
 from middlewared.service import private, Service
+from middlewared.utils.python import lazy_import
 
 from .connection import LibvirtConnectionMixin
 
+libvirt = lazy_import('libvirt')
+
 
 class VMService(Service, LibvirtConnectionMixin):
 
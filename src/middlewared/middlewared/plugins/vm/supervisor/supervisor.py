@@ -1,6 +1,5 @@
 import contextlib
 import itertools
-import libvirt
 import os
 import sys
 import threading
@@ -11,10 +10,13 @@ from middlewared.service import CallError
 from middlewared.plugins.vm.connection import LibvirtConnectionMixin
 from middlewared.plugins.vm.devices import CDROM, DISK, NIC, PCI, RAW, DISPLAY, USB # noqa
 from middlewared.plugins.vm.utils import ACTIVE_STATES
+from middlewared.utils.python import lazy_import
 
 from .domain_xml import domain_children
 from .utils import create_element, DomainState
 
+libvirt = lazy_import('libvirt')
+
 
 class VMSupervisor(LibvirtConnectionMixin):
 
@@ -1,15 +1,15 @@
 import enum
-import libvirt
 
 from middlewared.plugins.vm.utils import create_element  # noqa
 
 
 class DomainState(enum.Enum):
-    NOSTATE = libvirt.VIR_DOMAIN_NOSTATE
-    RUNNING = libvirt.VIR_DOMAIN_RUNNING
-    BLOCKED = libvirt.VIR_DOMAIN_BLOCKED
-    PAUSED = libvirt.VIR_DOMAIN_PAUSED
-    SHUTDOWN = libvirt.VIR_DOMAIN_SHUTDOWN
-    SHUTOFF = libvirt.VIR_DOMAIN_SHUTOFF
-    CRASHED = libvirt.VIR_DOMAIN_CRASHED
-    PMSUSPENDED = libvirt.VIR_DOMAIN_PMSUSPENDED
+    # `virDomainState` values (stable libvirt ABI), spelled out so that libvirt is not imported on startup
+    NOSTATE = 0
+    RUNNING = 1
+    BLOCKED = 2
+    PAUSED = 3
+    SHUTDOWN = 4
+    SHUTOFF = 5
+    CRASHED = 6
+    PMSUSPENDED = 7
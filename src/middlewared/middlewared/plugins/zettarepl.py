@@ -31,8 +31,6 @@ from zettarepl.observer import (
 )
 from zettarepl.replication.task.dataset import get_target_dataset
 from zettarepl.replication.task.name_pattern import compile_name_regex
-from zettarepl.snapshot.list import multilist_snapshots, group_snapshots_by_datasets
-from zettarepl.snapshot.name import parse_snapshots_names_with_multiple_schemas
 from zettarepl.transport.create import create_transport
 from zettarepl.transport.interface import ExecException
 from zettarepl.transport.local import LocalShell
@@ -51,6 +49,8 @@ import middlewared.utils.osc as osc
 from middlewared.utils.string import make_sentence
 from middlewared.utils.threading import start_daemon_thread
 
+from middlewared.plugins.zettarepl_.snapshot_cache import SnapshotNameCache
+
 INVALID_DATASETS = (
     re.compile(r"boot-pool($|/)"),
     re.compile(r"freenas-boot($|/)"),
@@ -274,6 +274,7 @@ class ZettareplService(Service):
         self.queue = None
         self.process = None
         self.zettarepl = None
+        self.snapshot_cache = SnapshotNameCache()
 
     def is_running(self):
         return self.process is not None and self.process.is_alive()
@@ -520,24 +521,31 @@ class ZettareplService(Service):
         async with self._handle_ssh_exceptions():
             async with self._get_zettarepl_shell(data["transport"], data["ssh_credentials"]) as shell:
                 snapshots = await self.middleware.run_in_thread(
-                    multilist_snapshots, shell, [(dataset, False) for dataset in data["datasets"]]
+                    self.snapshot_cache.get,
+                    self._snapshot_cache_shell_key(data["transport"], data["ssh_credentials"]),
+                    shell,
+                    data["datasets"],
                 )
 
+        total = sum(len(entry.names) for entry in snapshots.values())
         if data["naming_schema"]:
-            parsed = parse_snapshots_names_with_multiple_schemas([s.name for s in snapshots], data["naming_schema"])
+            eligible = sum(entry.count_eligible(data["naming_schema"]) for entry in snapshots.values())
         elif data["name_regex"]:
             try:
                 name_pattern = compile_name_regex(data["name_regex"])
             except Exception as e:
                 raise CallError(f"Invalid `name_regex`: {e}")
 
-            parsed = [s.name for s in snapshots if name_pattern.match(s.name)]
+            eligible = sum(
+                len([name for name in entry.names if name_pattern.match(name)])
+                for entry in snapshots.values()
+            )
         else:
             raise CallError("Either `naming_schema` or `name_regex` must be specified", errno.EINVAL)
 
         return {
-            "total": len(snapshots),
-            "eligible": len(parsed),
+            "total": total,
+            "eligible": eligible,
         }
 
     async def get_source_target_datasets_mapping(self, source_datasets, target_dataset):
@@ -555,31 +563,40 @@ class ZettareplService(Service):
         try:
             local_shell = LocalShell()
             async with self._get_zettarepl_shell(transport, ssh_credentials) as remote_shell:
+                local_shell_key = self._snapshot_cache_shell_key("LOCAL", None)
+                remote_shell_key = self._snapshot_cache_shell_key(transport, ssh_credentials)
                 if direction == "PUSH":
-                    source_shell = local_shell
-                    target_shell = remote_shell
+                    source_shell, source_shell_key = local_shell, local_shell_key
+                    target_shell, target_shell_key = remote_shell, remote_shell_key
                 else:
-                    source_shell = remote_shell
-                    target_shell = local_shell
+                    source_shell, source_shell_key = remote_shell, remote_shell_key
+                    target_shell, target_shell_key = local_shell, local_shell_key
 
                 target_datasets = set(await self.middleware.run_in_thread(list_datasets, target_shell))
                 datasets = {source_dataset: target_dataset
                             for source_dataset, target_dataset in datasets.items()
                             if target_dataset in target_datasets}
 
-                source_snapshots = group_snapshots_by_datasets(await self.middleware.run_in_thread(
-                    multilist_snapshots, source_shell, [(dataset, False) for dataset in datasets.keys()]
-                ))
-                target_snapshots = group_snapshots_by_datasets(await self.middleware.run_in_thread(
-                    multilist_snapshots, target_shell, [(dataset, False) for dataset in datasets.values()]
-                ))
+                source_snapshots = await self.middleware.run_in_thread(
+                    self.snapshot_cache.get, source_shell_key, source_shell, list(datasets.keys()),
+                )
+                target_snapshots = await self.middleware.run_in_thread(
+                    self.snapshot_cache.get, target_shell_key, target_shell, list(datasets.values()),
+                )
         except Exception as e:
             raise CallError(repr(e))
 
         errors = {}
         for source_dataset, target_dataset in datasets.items():
-            unmatched_snapshots = list(set(target_snapshots.get(target_dataset, [])) -
-                                       set(source_snapshots.get(source_dataset, [])))
+            if (target_entry := target_snapshots.get(target_dataset)) is None:
+                continue
+
+            if (source_entry := source_snapshots.get(source_dataset)) is None:
+                source_names = frozenset()
+            else:
+                source_names = source_entry.names_set
+
+            unmatched_snapshots = [name for name in target_entry.names if name not in source_names]
             if unmatched_snapshots:
                 errors[target_dataset] = unmatched_snapshots
 
@@ -812,6 +829,16 @@ class ZettareplService(Service):
                 IOError, OSError) as e:
             raise CallError(repr(e).replace("[Errno None] ", ""), errno=errno.EACCES)
 
+    def invalidate_snapshot_cache(self):
+        self.snapshot_cache.invalidate(self._snapshot_cache_shell_key("LOCAL", None))
+
+    def _snapshot_cache_shell_key(self, transport, ssh_credentials):
+        if transport == "LOCAL":
+            return "LOCAL"
+
+        # SSH and SSH+NETCAT share the same shell
+        return "SSH", ssh_credentials
+
     @asynccontextmanager
     async def _get_zettarepl_shell(self, transport, ssh_credentials):
         if transport != "LOCAL":
@@ -1054,6 +1081,7 @@ class ZettareplService(Service):
 
 
 async def pool_configuration_change(middleware, *args, **kwargs):
+    await middleware.call("zettarepl.invalidate_snapshot_cache")
     await middleware.call("zettarepl.update_tasks")
 
 
@@ -0,0 +1,128 @@
+# -*- coding=utf-8 -*-
+from collections import OrderedDict
+import logging
+import threading
+
+from zettarepl.snapshot.list import multilist_snapshots
+from zettarepl.snapshot.name import parse_snapshots_names_with_multiple_schemas
+from zettarepl.transport.interface import ExecException
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["SnapshotNameCache"]
+
+
+class SnapshotNameCacheEntry:
+    def __init__(self, snapshots_changed, names):
+        self.snapshots_changed = snapshots_changed
+        self.names = names
+        self.names_set = frozenset(names)
+        # naming schemas tuple -> count of snapshot names that match any of them
+        self.eligible = {}
+
+    def count_eligible(self, naming_schemas):
+        key = tuple(sorted(naming_schemas))
+        if key not in self.eligible:
+            self.eligible[key] = len(parse_snapshots_names_with_multiple_schemas(self.names, naming_schemas))
+
+        return self.eligible[key]
+
+
+class SnapshotNameCache:
+    """
+    Per-dataset snapshot names cache keyed by the `snapshots_changed` dataset property.
+
+    Listing every snapshot of a dataset that has tens of thousands of them is expensive, so we only re-list
+    datasets which `snapshots_changed` timestamp differs from the one we've seen the last time. Datasets which do
+    not report `snapshots_changed` (old pools, remote systems with older ZFS) are always re-listed.
+    """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (shell key, dataset) -> SnapshotNameCacheEntry
+        self.entries = OrderedDict()
+
+    def get(self, shell_key, shell, datasets):
+        """
+        Returns `{dataset: SnapshotNameCacheEntry}` for all the requested datasets that exist on the `shell`.
+        """
+        datasets = list(dict.fromkeys(datasets))
+        result = {}
+        if not datasets:
+            return result
+
+        snapshots_changed = self._get_snapshots_changed(shell, datasets)
+
+        with self.lock:
+            stale = []
+            for dataset in datasets:
+                entry = self.entries.get((shell_key, dataset))
+                changed = snapshots_changed.get(dataset)
+                if entry is not None and changed is not None and entry.snapshots_changed == changed:
+                    self.entries.move_to_end((shell_key, dataset))
+                    result[dataset] = entry
+                else:
+                    stale.append(dataset)
+
+        if not stale:
+            return result
+
+        # `snapshots_changed` is set by the `shell` host clock so we can only compare it with the time of that host
+        started_at = self._get_time(shell)
+        names = {dataset: [] for dataset in stale}
+        for snapshot in multilist_snapshots(shell, [(dataset, False) for dataset in stale]):
+            names[snapshot.dataset].append(snapshot.name)
+
+        with self.lock:
+            for dataset in stale:
+                entry = SnapshotNameCacheEntry(snapshots_changed.get(dataset), names[dataset])
+                result[dataset] = entry
+
+                # `snapshots_changed` has a one second resolution so a snapshot created within the same second we've
+                # listed the dataset would not bump it. Do not trust such entries.
+                changed = snapshots_changed.get(dataset)
+                if changed is not None and started_at is not None and changed < started_at:
+                    self.entries[(shell_key, dataset)] = entry
+                    self.entries.move_to_end((shell_key, dataset))
+                else:
+                    self.entries.pop((shell_key, dataset), None)
+
+            while len(self.entries) > self.MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+        return result
+
+    def invalidate(self, shell_key=None):
+        with self.lock:
+            if shell_key is None:
+                self.entries.clear()
+            else:
+                for key in [key for key in self.entries if key[0] == shell_key]:
+                    self.entries.pop(key)
+
+    def _get_time(self, shell):
+        try:
+            return int(shell.exec(["date", "+%s"]))
+        except (ExecException, ValueError) as e:
+            logger.debug("Unable to get current time: %r", e)
+            return None
+
+    def _get_snapshots_changed(self, shell, datasets):
+        try:
+            output = shell.exec(["zfs", "get", "-H", "-p", "-o", "name,value", "snapshots_changed"] + datasets)
+        except ExecException as e:
+            # Either some of the datasets do not exist or `snapshots_changed` is not supported. Anyway, everything
+            # that we were able to get is still valid.
+            output = e.stdout or ""
+
+        result = {}
+        for line in output.splitlines():
+            try:
+                name, value = line.split("\t", 1)
+                result[name] = int(value)
+            except ValueError:
+                continue
+
+        return result
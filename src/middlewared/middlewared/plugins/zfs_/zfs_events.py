@@ -126,8 +126,31 @@ async def pool_alerts_args(middleware, pool_name):
     return {'pool_name': pool_name, 'disks': disks}
 
 
+# Events after which `pool.query` must not serve pool topology / status from its cache
+POOL_STATE_EVENTS = (
+    'resource.fs.zfs.statechange',
+    'sysevent.fs.zfs.config_sync',
+    'sysevent.fs.zfs.pool_destroy',
+    'sysevent.fs.zfs.pool_import',
+    'sysevent.fs.zfs.resilver_start',
+    'sysevent.fs.zfs.resilver_finish',
+    'sysevent.fs.zfs.scrub_start',
+    'sysevent.fs.zfs.scrub_finish',
+    'sysevent.fs.zfs.scrub_abort',
+    'sysevent.fs.zfs.vdev_add',
+    'sysevent.fs.zfs.vdev_remove',
+    'sysevent.fs.zfs.vdev_attach',
+    'sysevent.fs.zfs.vdev_online',
+    'sysevent.fs.zfs.vdev_clear',
+    'sysevent.fs.zfs.vdev_spare',
+)
+
+
 async def zfs_events(middleware, data):
     event_id = data['class']
+    if event_id in POOL_STATE_EVENTS:
+        await middleware.call('pool.invalidate_state_cache', data.get('pool'))
+
     if event_id in ('sysevent.fs.zfs.resilver_start', 'sysevent.fs.zfs.scrub_start'):
         await resilver_scrub_start(middleware, data.get('pool'))
     elif event_id in (
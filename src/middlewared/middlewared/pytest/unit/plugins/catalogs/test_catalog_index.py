@@ -0,0 +1,57 @@
+import os
+
+from datetime import datetime
+
+from middlewared.plugins.catalogs_linux.catalog_index import (
+    get_catalog_index, get_index_path, remove_catalog_indexes, write_catalog_index,
+)
+
+
+TRAINS = {
+    'charts': {
+        'chia': {'name': 'chia', 'last_update': '2023-02-01 22:55:31', 'healthy': True},
+        'plex': {'name': 'plex', 'last_update': None, 'healthy': False},
+    },
+    'community': {
+        'syncthing': {'name': 'syncthing', 'last_update': None, 'healthy': True},
+    },
+}
+
+
+def test_catalog_index_round_trip(tmpdir):
+    catalog_location = os.path.join(tmpdir, 'catalogs', 'github_com_truenas_charts_git_master')
+    path = get_index_path(catalog_location, 'abcdef')
+    write_catalog_index(path, 'abcdef', TRAINS, {'plex (charts train)'}, {'storage'})
+
+    index = get_catalog_index(path)
+    assert index.commit == 'abcdef'
+    assert index.unhealthy_apps == ['plex (charts train)']
+    assert index.categories == ['storage']
+    assert set(index.trains) == {'charts', 'community'}
+    assert index.item('charts', 'chia')['last_update'] == datetime(2023, 2, 1, 22, 55, 31)
+    assert index.train('community') == TRAINS['community']
+
+
+def test_catalog_index_items_are_not_shared(tmpdir):
+    catalog_location = os.path.join(tmpdir, 'catalogs', 'catalog')
+    path = get_index_path(catalog_location, 'abcdef')
+    write_catalog_index(path, 'abcdef', TRAINS, set(), set())
+
+    index = get_catalog_index(path)
+    index.item('charts', 'plex')['name'] = 'modified'
+    assert index.item('charts', 'plex')['name'] == 'plex'
+
+
+def test_remove_catalog_indexes(tmpdir):
+    catalog_location = os.path.join(tmpdir, 'catalogs', 'catalog')
+    other_location = os.path.join(tmpdir, 'catalogs', 'catalog_2')
+    old_path = get_index_path(catalog_location, 'old')
+    new_path = get_index_path(catalog_location, 'new')
+    other_path = get_index_path(other_location, 'old')
+    for path in (old_path, new_path, other_path):
+        write_catalog_index(path, 'commit', TRAINS, set(), set())
+
+    remove_catalog_indexes(catalog_location, keep=new_path)
+    assert not os.path.exists(old_path)
+    assert os.path.exists(new_path)
+    assert os.path.exists(other_path)
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.plugins.disk_.sync import DiskService
+
+OBJ = DiskService(Mock())
+NOW = datetime(2023, 1, 1)
+UUIDS = ["6a898cc3-1dd2-11b2-99a6-080020736631"]
+
+
+def sys_disk(i):
+    name = f"sd{i}"
+    return name, {
+        "name": name,
+        "serial": f"SERIAL{i:05}",
+        "lunid": f"5000c500{i:08x}",
+        "serial_lunid": f"SERIAL{i:05}_5000c500{i:08x}",
+        "rotationrate": 7200,
+        "type": "HDD",
+        "size": 4000787030016,
+        "subsystem": "scsi",
+        "number": 2048 + i,
+        "model": "ST4000NM0035",
+        "bus": "SAS",
+        "dif": False,
+        "parts": [{
+            "disk": name,
+            "partition_type": UUIDS[0],
+            "partition_uuid": f"00000000-0000-0000-0000-{i:012}",
+        }],
+    }
+
+
+def get_disks(count):
+    """
+    Synthetic `device.get_disks` output
+    """
+    return dict(sys_disk(i) for i in range(count))
+
+
+def db_disk(name, info, enclosure_slot=None):
+    return {
+        "disk_identifier": f"{{serial_lunid}}{info['serial_lunid']}",
+        "disk_name": name,
+        "disk_serial": info["serial"],
+        "disk_lunid": info["lunid"],
+        "disk_rotationrate": info["rotationrate"],
+        "disk_type": info["type"],
+        "disk_size": str(info["size"]),
+        "disk_subsystem": info["subsystem"],
+        "disk_number": info["number"],
+        "disk_model": info["model"],
+        "disk_bus": info["bus"],
+        "disk_expiretime": None,
+        "disk_kmip_uid": None,
+        "disk_enclosure_slot": enclosure_slot,
+    }
+
+
+def enclosures(names):
+    return [{
+        "number": 0,
+        "elements": [{
+            "name": "Array Device Slot",
+            "elements": [{"slot": slot, "data": {"Device": name}} for slot, name in enumerate(names, start=1)],
+        }],
+    }]
+
+
+def plan(db_disks, sys_disks, encs=None):
+    return OBJ._sync_plan(db_disks, sys_disks, UUIDS, encs or [], NOW)
+
+
+def test__in_sync():
+    sys_disks = get_disks(3)
+
+    result = plan([db_disk(name, info) for name, info in sys_disks.items()], sys_disks)
+
+    assert result == {"insert": [], "update": [], "delete": [], "kmip_reset": [], "dif_formatted": []}
+
+
+def test__new_disk_with_enclosure_slot():
+    sys_disks = get_disks(2)
+    sys_disks["sd1"]["dif"] = True
+
+    result = plan([db_disk("sd0", sys_disks["sd0"])], sys_disks, enclosures(["sd0", "sd1"]))
+
+    assert [disk["disk_identifier"] for disk in result["insert"]] == ["{serial_lunid}SERIAL00001_5000c50000000001"]
+    assert result["insert"][0]["disk_enclosure_slot"] == 2
+    assert [(disk["disk_name"], disk["disk_enclosure_slot"]) for disk in result["update"]] == [("sd0", 1)]
+    assert result["dif_formatted"] == ["sd1"]
+
+
+def test__renamed_and_changed_disk():
+    sys_disks = get_disks(1)
+    disk = db_disk("sd0", sys_disks["sd0"])
+    sys_disks["sdz"] = dict(sys_disks.pop("sd0"), name="sdz", size=4000787030017)
+
+    result = plan([disk], sys_disks)
+
+    assert result["update"] == [dict(disk, disk_name="sdz", disk_size=4000787030017)]
+    assert result["insert"] == []
+
+
+def test__missing_disks_expire():
+    sys_disks = get_disks(3)
+    db_disks = [db_disk(name, info) for name, info in sys_disks.items()]
+    db_disks[1]["disk_expiretime"] = NOW - timedelta(days=1)
+    db_disks[1]["disk_kmip_uid"] = "uid"
+    db_disks[2]["disk_expiretime"] = NOW + timedelta(days=1)
+    del sys_disks["sd0"], sys_disks["sd1"], sys_disks["sd2"]
+
+    result = plan(db_disks, sys_disks)
+
+    assert result["update"] == [dict(db_disks[0], disk_expiretime=NOW + timedelta(days=OBJ.DISK_EXPIRECACHE_DAYS))]
+    assert result["delete"] == [db_disks[1]["disk_identifier"]]
+    assert result["kmip_reset"] == [db_disks[1]]
+
+
+@pytest.mark.parametrize("count", [1000, 2000])
+def test__benchmark(count):
+    sys_disks = get_disks(count)
+    db_disks = [db_disk(name, info) for name, info in get_disks(count // 2).items()]
+    encs = enclosures(list(sys_disks))
+
+    start = time.monotonic()
+    result = plan(db_disks, sys_disks, encs)
+    elapsed = time.monotonic() - start
+
+    assert len(result["insert"]) == count - count // 2
+    assert len(result["update"]) == count // 2
+    # Catches any lookup becoming quadratic in the number of disks again
+    assert elapsed < 1, f"Syncing {count} disks took {elapsed:.2f} seconds"
@@ -0,0 +1,62 @@
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from middlewared.plugins.disk_.temperature import DiskService
+from middlewared.pytest.unit.middleware import Middleware
+
+SMARTCTL = {
+    "sdb": "194 Temperature_Celsius     0x0022   049   067   ---    Old_age   Always       -       51 (Min/Max 24/67)",
+    "sdc": None,
+}
+
+
+def disk_service(hwmon):
+    m = Middleware()
+    m["disk.smartctl"] = AsyncMock(side_effect=lambda name, args, options: SMARTCTL[name])
+    service = DiskService(m)
+    service.cache = {}
+    service.temperature_sources = {}
+    m["disk.temperatures_uncached"] = service.temperatures_uncached
+    return m, service, patch(
+        "middlewared.plugins.disk_.temperature.read_hwmon_temperatures",
+        Mock(side_effect=lambda names: {name: hwmon.get(name) for name in names}),
+    )
+
+
+@pytest.mark.asyncio
+async def test__smartctl_only_for_disks_without_hwmon():
+    m, service, hwmon = disk_service({"sda": 36, "nvme0n1": 41})
+    with hwmon as read_hwmon:
+        assert await service.temperatures_uncached(["sda", "nvme0n1", "sdb", "sdc"], "NEVER") == {
+            "sda": 36, "nvme0n1": 41, "sdb": 51, "sdc": None,
+        }
+
+    read_hwmon.assert_called_once_with(["sda", "nvme0n1", "sdb", "sdc"])
+    assert [call.args[0] for call in m["disk.smartctl"].call_args_list] == ["sdb", "sdc"]
+    assert m["disk.smartctl"].call_args_list[0].args[1] == ["-A", "-n", "never", "-l", "scttempsts"]
+    assert set(service.cache) == {"sda", "nvme0n1", "sdb", "sdc"}
+
+    stats = await service.temperature_source_stats()
+    assert (stats["hwmon"]["queries"], stats["hwmon"]["disks"], stats["hwmon"]["found"]) == (1, 4, 2)
+    assert (stats["smartctl"]["queries"], stats["smartctl"]["disks"], stats["smartctl"]["found"]) == (2, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test__hwmon_does_not_wake_up_disks():
+    m, service, hwmon = disk_service({"sdb": 36, "nvme0n1": 41})
+    with hwmon as read_hwmon:
+        assert await service.temperatures_uncached(["nvme0n1", "sdb"], "STANDBY") == {"nvme0n1": 41, "sdb": 51}
+
+    read_hwmon.assert_called_once_with(["nvme0n1"])
+    m["disk.smartctl"].assert_called_once_with("sdb", ["-A", "-n", "standby", "-l", "scttempsts"], {"silent": True})
+
+
+@pytest.mark.asyncio
+async def test__temperatures_served_from_cache():
+    m, service, hwmon = disk_service({"sda": 36, "sdb": 37})
+    with hwmon as read_hwmon:
+        await service.temperatures_uncached(["sda"], "NEVER")
+        assert await service.temperatures(["sda", "sdb"], {"cache": 290}) == {"sda": 36, "sdb": 37}
+
+    assert read_hwmon.call_args_list[-1].args == (["sdb"],)
@@ -0,0 +1,113 @@
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.plugins.enclosure_.ses_cache import (
+    build_slot_index, ConfigurationPageCache, EnclosureSnapshotCache, generation_code,
+)
+from middlewared.service_exception import MatchNotFound
+
+
+def page(generation):
+    return f'  Primary enclosure logical identifier (hex): 5003048001c1043f\n  generation code: 0x{generation:x}\n'
+
+
+def slot(number, device):
+    return {'slot': number, 'data': {'Descriptor': f'Slot {number:02}', 'Device': device}}
+
+
+ENCLOSURES = [
+    {'id': 'enc0', 'number': 0, 'elements': [
+        {'name': 'Temperature Sensors', 'elements': [{'slot': 1, 'data': {'Value': '30C'}}]},
+        {'name': 'Array Device Slot', 'elements': [slot(1, 'sda'), slot(2, ''), slot(3, 'sdb')]},
+    ]},
+    {'id': 'enc1', 'number': 1, 'elements': [
+        {'name': 'Array Device Slot', 'elements': [slot(1, 'sdc'), slot(2, 'sda')]},
+    ]},
+]
+
+
+def test__generation_code():
+    assert generation_code(page(0x1f)) == 0x1f
+    assert generation_code('Enclosure Status diagnostic page:') is None
+
+
+def test__build_slot_index():
+    index = build_slot_index(ENCLOSURES)
+
+    assert set(index) == {'sda', 'sdb', 'sdc'}
+    # First match wins
+    assert index['sda'] == (ENCLOSURES[0], ENCLOSURES[0]['elements'][1]['elements'][0])
+    assert index['sdc'][0]['id'] == 'enc1'
+
+
+def test__configuration_page_read_on_generation_change():
+    cache = ConfigurationPageCache()
+    read = Mock(return_value=page(1))
+
+    assert cache.get('/dev/bsg/0:0:0:0', page(1), read) == page(1)
+    assert cache.get('/dev/bsg/0:0:0:0', page(1), read) == page(1)
+    assert read.call_count == 1
+
+    read.return_value = page(2)
+    assert cache.get('/dev/bsg/0:0:0:0', page(2), read) == page(2)
+    assert read.call_count == 2
+
+
+def test__configuration_page_without_generation_code_not_cached():
+    cache = ConfigurationPageCache()
+    read = Mock(return_value='configuration')
+
+    cache.get('/dev/bsg/0:0:0:0', 'status', read)
+    cache.get('/dev/bsg/0:0:0:0', 'status', read)
+
+    assert read.call_count == 2
+
+
+def test__configuration_page_retain():
+    cache = ConfigurationPageCache()
+    cache.get('/dev/bsg/0:0:0:0', page(1), Mock(return_value=page(1)))
+    cache.retain(['/dev/bsg/0:0:1:0'])
+
+    assert cache.pages == {}
+
+
+def test__snapshot_cached_until_invalidated():
+    build = Mock(return_value=ENCLOSURES)
+    cache = EnclosureSnapshotCache(build)
+
+    assert cache.query() == ENCLOSURES
+    assert cache.slot_for_disk('sdb')[1]['slot'] == 3
+    assert build.call_count == 1
+
+    cache.invalidate()
+    cache.query()
+    assert build.call_count == 2
+
+
+def test__snapshot_max_age():
+    build = Mock(return_value=ENCLOSURES)
+    cache = EnclosureSnapshotCache(build, max_age=-1)
+
+    cache.query()
+    cache.query()
+
+    assert build.call_count == 2
+
+
+def test__snapshot_query_returns_copy():
+    cache = EnclosureSnapshotCache(Mock(return_value=ENCLOSURES))
+    cache.query()[0]['elements'].clear()
+
+    assert cache.query()[0]['elements']
+
+
+def test__slot_for_disk_with_enclosure_info():
+    build = Mock()
+    cache = EnclosureSnapshotCache(build)
+
+    assert cache.slot_for_disk('sdc', ENCLOSURES)[0]['id'] == 'enc1'
+    with pytest.raises(MatchNotFound):
+        cache.slot_for_disk('sdz', ENCLOSURES)
+
+    build.assert_not_called()
@@ -0,0 +1,79 @@
+from unittest.mock import Mock
+
+from middlewared.plugins.pool_.state_cache import PoolStateCache
+
+
+def test__cached_until_invalidated():
+    cache = PoolStateCache()
+    read = Mock(return_value={'status': 'ONLINE'})
+
+    assert cache.get('tank', 'info', read) == {'status': 'ONLINE'}
+    assert cache.get('tank', 'info', read) == {'status': 'ONLINE'}
+    assert read.call_count == 1
+
+    cache.invalidate('tank')
+    read.return_value = {'status': 'DEGRADED'}
+    assert cache.get('tank', 'info', read) == {'status': 'DEGRADED'}
+    assert read.call_count == 2
+
+
+def test__invalidate_only_affects_that_pool():
+    cache = PoolStateCache()
+    tank = Mock(return_value={})
+    boot = Mock(return_value={})
+    cache.get('tank', 'info', tank)
+    cache.get('tank', 'is_upgraded', tank)
+    cache.get('boot-pool', 'info', boot)
+
+    cache.invalidate('tank')
+    cache.get('tank', 'info', tank)
+    cache.get('tank', 'is_upgraded', tank)
+    cache.get('boot-pool', 'info', boot)
+
+    assert tank.call_count == 4
+    assert boot.call_count == 1
+
+
+def test__invalidate_all():
+    cache = PoolStateCache()
+    read = Mock(return_value={})
+    cache.get('tank', 'info', read)
+
+    cache.invalidate()
+    cache.get('tank', 'info', read)
+
+    assert read.call_count == 2
+
+
+def test__fresh_and_max_age():
+    read = Mock(return_value={})
+    cache = PoolStateCache()
+    cache.get('tank', 'info', read)
+    cache.get('tank', 'info', read, fresh=True)
+    assert read.call_count == 2
+
+    cache = PoolStateCache(max_age=-1)
+    cache.get('tank', 'info', read)
+    cache.get('tank', 'info', read)
+    assert read.call_count == 4
+
+
+def test__value_read_during_invalidation_is_not_cached():
+    cache = PoolStateCache()
+
+    def read():
+        cache.invalidate()
+        return {'status': 'ONLINE'}
+
+    cache.get('tank', 'info', read)
+
+    assert cache.entries == {}
+
+
+def test__returns_copy():
+    cache = PoolStateCache()
+    read = Mock(return_value={'topology': {'data': []}})
+
+    cache.get('tank', 'info', read)['topology']['data'].append('sda')
+
+    assert cache.get('tank', 'info', read) == {'topology': {'data': []}}
@@ -0,0 +1,293 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from middlewared.plugins.account import GroupService, UserService
+from middlewared.pytest.unit.middleware import Middleware
+from middlewared.service_exception import ValidationErrors
+from middlewared.utils import filter_list
+
+
+class Datastore:
+    def __init__(self, **tables):
+        self.tables = tables
+        self.inserts = []
+
+    def query(self, name, filters=None, options=None):
+        prefix = (options or {}).get('prefix', '')
+        rows = [
+            {k.removeprefix(prefix): v for k, v in row.items()}
+            for row in self.tables.setdefault(name, [])
+        ]
+        return filter_list(rows, filters or [])
+
+    def insert_many(self, name, rows, options=None):
+        prefix = (options or {}).get('prefix', '')
+        self.inserts.append(name)
+        table = self.tables.setdefault(name, [])
+        pks = []
+        for row in rows:
+            pk = max([r['id'] for r in table], default=0) + 1
+            table.append({'id': pk, **{f'{prefix}{k}': v for k, v in row.items()}})
+            pks.append(pk)
+
+        return pks
+
+    def delete(self, name, filters):
+        ids = {row['id'] for row in filter_list(self.tables[name], filters)}
+        self.tables[name] = [row for row in self.tables[name] if row['id'] not in ids]
+
+
+def middleware(datastore):
+    m = Middleware()
+    m['datastore.query'] = datastore.query
+    m['datastore.insert_many'] = Mock(side_effect=datastore.insert_many)
+    m['datastore.delete'] = datastore.delete
+    m['cluster.utils.is_clustered'] = AsyncMock(return_value=False)
+    m['privilege.used_local_gids'] = AsyncMock(return_value={})
+    m['service.reload'] = AsyncMock()
+    return m
+
+
+def user_service(datastore):
+    m = middleware(datastore)
+    m['group.get_next_gids'] = GroupService(m).get_next_gids
+    m['user.get_user_obj'] = Mock(side_effect=KeyError())
+    m['user.shell_choices'] = AsyncMock(side_effect=lambda group_ids: {'/usr/bin/zsh': 'zsh'})
+
+    service = UserService(m)
+    m._resolve_methods([service], [])
+    service.validate_homedir_path = Mock(return_value=False)
+    service.setup_homedir = Mock(side_effect=lambda path, username, *args: f'{path}/{username}')
+    service.populate_homedir = Mock()
+    return service
+
+
+def group_service(datastore):
+    m = middleware(datastore)
+    m['group.get_group_obj'] = Mock(side_effect=KeyError())
+    service = GroupService(m)
+    m._resolve_methods([service], [])
+    return service
+
+
+def user(username, **kwargs):
+    return {
+        'username': username,
+        'full_name': username.upper(),
+        'group_create': True,
+        'password_disabled': True,
+        'smb': False,
+        **kwargs,
+    }
+
+
+def group(name, **kwargs):
+    return {'name': name, 'smb': False, **kwargs}
+
+
+def existing_user(pk, username, uid, **kwargs):
+    return {
+        'id': pk,
+        'bsdusr_username': username,
+        'bsdusr_uid': uid,
+        'bsdusr_group': 1,
+        'bsdusr_builtin': False,
+        'bsdusr_smb': False,
+        'bsdusr_home': '/var/empty',
+        **kwargs,
+    }
+
+
+def existing_group(pk, name, gid):
+    return {'id': pk, 'bsdgrp_group': name, 'bsdgrp_gid': gid, 'bsdgrp_smb': False}
+
+
+def error_attributes(e):
+    return {error.attribute for error in e.value.errors}
+
+
+@pytest.mark.asyncio
+async def test__user_create_bulk_validates_all_entries_before_creating():
+    datastore = Datastore(**{'account.bsdusers': [existing_user(1, 'alice', 3000)]})
+
+    with pytest.raises(ValidationErrors) as e:
+        await user_service(datastore).create_bulk(Mock(), [
+            user('bob'),
+            user('alice'),
+            user('carol', group_create=False),
+            user('dave', group_create=False, group=100),
+        ])
+
+    assert error_attributes(e) == {
+        'user_create_bulk.1.username',
+        'user_create_bulk.2.group',
+        'user_create_bulk.3.groups',
+    }
+    assert datastore.inserts == []
+
+
+@pytest.mark.asyncio
+async def test__user_create_bulk_duplicates_within_batch():
+    datastore = Datastore()
+
+    with pytest.raises(ValidationErrors) as e:
+        await user_service(datastore).create_bulk(Mock(), [
+            user('bob', uid=4000),
+            user('bob'),
+            user('carol', uid=4000),
+            user('smbuser', smb=True, password_disabled=False, password='secret'),
+            user('SMBUser', smb=True, password_disabled=False, password='secret'),
+        ])
+
+    assert error_attributes(e) == {
+        'user_create_bulk.1.username',
+        'user_create_bulk.2.uid',
+        'user_create_bulk.4.smb',
+    }
+    assert datastore.inserts == []
+
+
+@pytest.mark.asyncio
+async def test__user_create_bulk_duplicate_home():
+    datastore = Datastore()
+
+    with pytest.raises(ValidationErrors) as e:
+        await user_service(datastore).create_bulk(Mock(), [
+            user('bob', home='/mnt/tank/home'),
+            user('carol', home='/mnt/tank/home'),
+            user('dave', home='/mnt/tank/users', home_create=True),
+            user('eve', home='/mnt/tank/users', home_create=True),
+            user('frank', home='/mnt/tank/users/dave'),
+        ])
+
+    assert error_attributes(e) == {'user_create_bulk.1.home', 'user_create_bulk.4.home'}
+    assert datastore.inserts == []
+
+
+@pytest.mark.asyncio
+async def test__user_create_bulk_allocates_ids():
+    datastore = Datastore(**{
+        'account.bsdusers': [existing_user(1, 'alice', 3000)],
+        'account.bsdgroups': [existing_group(1, 'alice', 3000), existing_group(2, 'staff', 3002)],
+    })
+
+    results = await user_service(datastore).create_bulk(Mock(), [
+        user('bob'),
+        user('carol', uid=3001),
+        user('dave', group_create=False, group=2),
+        user('staff'),
+    ])
+
+    assert results == [{'result': pk, 'error': None} for pk in (2, 3, 4, 5)]
+    users = {u['username']: u for u in datastore.query('account.bsdusers', [], {'prefix': 'bsdusr_'})}
+    assert {username: u['uid'] for username, u in users.items()} == {
+        'alice': 3000, 'bob': 3002, 'carol': 3001, 'dave': 3003, 'staff': 3004,
+    }
+    groups = {g['group']: g for g in datastore.query('account.bsdgroups', [], {'prefix': 'bsdgrp_'})}
+    assert {name: g['gid'] for name, g in groups.items()} == {
+        'alice': 3000, 'staff': 3002, 'bob': 3001, 'carol': 3003,
+    }
+    assert users['bob']['group'] == groups['bob']['id']
+    assert users['dave']['group'] == users['staff']['group'] == groups['staff']['id']
+
+
+@pytest.mark.asyncio
+async def test__user_create_bulk_inserts_in_single_transaction():
+    datastore = Datastore()
+
+    await user_service(datastore).create_bulk(Mock(), [user('bob'), user('carol'), user('dave')])
+
+    assert datastore.inserts == [
+        'account.bsdgroups', 'account.bsdusers', 'account.twofactor_user_auth', 'account.bsdgroupmembership',
+    ]
+    assert len(datastore.tables['account.bsdusers']) == 3
+
+
+@pytest.mark.asyncio
+async def test__user_create_bulk_rolls_back_on_insert_failure():
+    datastore = Datastore(**{'account.bsdgroups': [existing_group(1, 'staff', 3000)]})
+    service = user_service(datastore)
+
+    def insert_many(name, rows, options=None):
+        if name == 'account.bsdgroupmembership':
+            raise ValueError('Insert failed')
+
+        return datastore.insert_many(name, rows, options)
+
+    service.middleware['datastore.insert_many'] = insert_many
+
+    with pytest.raises(ValueError):
+        await service.create_bulk(Mock(), [user('bob'), user('carol', group_create=False, group=1)])
+
+    assert datastore.tables['account.bsdusers'] == []
+    assert [g['bsdgrp_group'] for g in datastore.tables['account.bsdgroups']] == ['staff']
+
+
+@pytest.mark.asyncio
+async def test__group_create_bulk_validation():
+    datastore = Datastore(**{'account.bsdgroups': [existing_group(1, 'staff', 3000)]})
+
+    with pytest.raises(ValidationErrors) as e:
+        await group_service(datastore).create_bulk(Mock(), [
+            group('staff'),
+            group('users', gid=4000),
+            group('users'),
+            group('admins', gid=4000),
+            group('operators', gid=4000, allow_duplicate_gid=True),
+            group('smbgroup', smb=True),
+            group('SMBGroup', smb=True),
+        ])
+
+    assert error_attributes(e) == {
+        'group_create_bulk.0.name',
+        'group_create_bulk.2.name',
+        'group_create_bulk.3.gid',
+        'group_create_bulk.6.name',
+    }
+    assert datastore.inserts == []
+
+
+@pytest.mark.asyncio
+async def test__group_create_bulk_allocates_gids():
+    datastore = Datastore(**{
+        'account.bsdusers': [existing_user(5, 'alice', 3000), existing_user(6, 'bob', 3001)],
+        'account.bsdgroups': [existing_group(1, 'staff', 3000)],
+    })
+
+    results = await group_service(datastore).create_bulk(Mock(), [
+        group('users'),
+        group('admins', gid=3001),
+        group('operators', users=[5, 6]),
+    ])
+
+    assert results == [{'result': pk, 'error': None} for pk in (2, 3, 4)]
+    groups = datastore.query('account.bsdgroups', [], {'prefix': 'bsdgrp_'})
+    assert {g['group']: g['gid'] for g in groups} == {'staff': 3000, 'users': 3002, 'admins': 3001, 'operators': 3003}
+    assert datastore.inserts == ['account.bsdgroups', 'account.bsdgroupmembership']
+    assert datastore.tables['account.bsdgroupmembership'] == [
+        {'id': 1, 'bsdgrpmember_group': 4, 'bsdgrpmember_user': 5},
+        {'id': 2, 'bsdgrpmember_group': 4, 'bsdgrpmember_user': 6},
+    ]
+
+
+@pytest.mark.asyncio
+async def test__group_create_bulk_rolls_back_on_membership_failure():
+    datastore = Datastore(**{
+        'account.bsdusers': [existing_user(5, 'alice', 3000)],
+        'account.bsdgroups': [existing_group(1, 'staff', 3000)],
+    })
+    service = group_service(datastore)
+
+    def insert_many(name, rows, options=None):
+        if name == 'account.bsdgroupmembership':
+            raise ValueError('Insert failed')
+
+        return datastore.insert_many(name, rows, options)
+
+    service.middleware['datastore.insert_many'] = insert_many
+
+    with pytest.raises(ValueError):
+        await service.create_bulk(Mock(), [group('users', users=[5]), group('admins')])
+
+    assert [g['bsdgrp_group'] for g in datastore.tables['account.bsdgroups']] == ['staff']
@@ -0,0 +1,181 @@
+import struct
+
+import pytest
+
+from middlewared.plugins.filesystem_.acl_xattr import (
+    ACLCodecError, nfs4acl_decode, nfs4acl_encode, nfs4acl_inherit, nfs4acl_trivial, posixacl_decode, posixacl_encode,
+)
+
+
+NFS4_PERMS = [
+    'READ_DATA', 'WRITE_DATA', 'APPEND_DATA', 'READ_NAMED_ATTRS', 'WRITE_NAMED_ATTRS', 'EXECUTE', 'DELETE_CHILD',
+    'READ_ATTRIBUTES', 'WRITE_ATTRIBUTES', 'DELETE', 'READ_ACL', 'WRITE_ACL', 'WRITE_OWNER', 'SYNCHRONIZE',
+]
+NFS4_FLAGS = [
+    'FILE_INHERIT', 'DIRECTORY_INHERIT', 'NO_PROPAGATE_INHERIT', 'INHERIT_ONLY', 'SUCCESSFUL_ACCESS', 'FAILED_ACCESS',
+    'INHERITED',
+]
+
+
+def nfs4_perms(*enabled):
+    return {perm: perm in enabled for perm in NFS4_PERMS}
+
+
+def nfs4_flags(*enabled):
+    return {flag: flag in enabled for flag in NFS4_FLAGS}
+
+
+NFS4_ACL = [
+    {'tag': 'owner@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'FULL_CONTROL'}, 'flags': {'BASIC': 'INHERIT'}},
+    {'tag': 'group@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'MODIFY'}, 'flags': {'BASIC': 'NOINHERIT'}},
+    {'tag': 'everyone@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'TRAVERSE'}, 'flags': {'BASIC': 'INHERIT'}},
+    {'tag': 'USER', 'id': 1000, 'type': 'DENY', 'perms': nfs4_perms('WRITE_DATA', 'APPEND_DATA'),
+     'flags': nfs4_flags('FILE_INHERIT', 'INHERITED')},
+    {'tag': 'GROUP', 'id': 1001, 'type': 'ALLOW', 'perms': {'BASIC': 'READ'},
+     'flags': nfs4_flags('DIRECTORY_INHERIT', 'INHERIT_ONLY', 'NO_PROPAGATE_INHERIT')},
+]
+
+
+def test__nfs4acl_round_trip():
+    data = nfs4acl_encode(NFS4_ACL, {'autoinherit': True, 'protected': False})
+
+    assert len(data) == 8 + 20 * len(NFS4_ACL)
+    assert nfs4acl_decode(data, True) == {
+        'acl': NFS4_ACL,
+        'nfs41_flags': {'AUTOINHERIT': True, 'PROTECTED': False, 'DEFAULTED': False},
+        'trivial': False,
+    }
+
+
+def test__nfs4acl_xdr_layout():
+    data = nfs4acl_encode([NFS4_ACL[0], NFS4_ACL[4]])
+
+    assert struct.unpack('>II', data[:8]) == (0, 2)
+    # owner@ ALLOW, FILE_INHERIT | DIRECTORY_INHERIT, special who, full control
+    assert struct.unpack('>IIIII', data[8:28]) == (0, 0x3, 1, 0x1f01ff, 1)
+    # GROUP ALLOW, inheritance flags | IDENTIFIER_GROUP, read
+    assert struct.unpack('>IIIII', data[28:48]) == (0, 0x4e, 0, 0x1200a9, 1001)
+
+
+def test__nfs4acl_decode_not_simplified():
+    acl = nfs4acl_decode(nfs4acl_encode(NFS4_ACL[:1]), False)['acl']
+
+    assert acl[0]['perms'] == nfs4_perms(*NFS4_PERMS)
+    assert acl[0]['flags'] == nfs4_flags('FILE_INHERIT', 'DIRECTORY_INHERIT')
+
+
+def test__nfs4acl_decode_trivial():
+    data = bytearray(nfs4acl_encode(NFS4_ACL[:3]))
+    data[0:4] = struct.pack('>I', 0x10000)
+
+    assert nfs4acl_decode(bytes(data), True)['trivial'] is True
+
+
+def test__nfs4acl_decode_truncated():
+    with pytest.raises(ValueError):
+        nfs4acl_decode(nfs4acl_encode(NFS4_ACL)[:-4], True)
+
+
+@pytest.mark.parametrize('ace,index,attribute', [
+    ({'tag': 'USER', 'id': None, 'type': 'ALLOW', 'perms': {'BASIC': 'READ'}, 'flags': {'BASIC': 'INHERIT'}},
+     0, 'id'),
+    ({'tag': 'owner@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'WRITE'}, 'flags': {'BASIC': 'INHERIT'}},
+     0, 'perms'),
+    ({'tag': 'owner@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'READ'}, 'flags': {'INHERIT': True}},
+     0, 'flags'),
+    ({'tag': 'nobody@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'READ'}, 'flags': {'BASIC': 'INHERIT'}},
+     0, 'tag'),
+])
+def test__nfs4acl_encode_invalid(ace, index, attribute):
+    with pytest.raises(ACLCodecError) as ve:
+        nfs4acl_encode([ace])
+
+    assert ve.value.index == index
+    assert ve.value.attribute == attribute
+
+
+@pytest.mark.parametrize('is_dir,first_level,result', [
+    (False, True, [
+        ('owner@', {'BASIC': 'FULL_CONTROL'}, nfs4_flags('INHERITED')),
+        ('everyone@', {'BASIC': 'TRAVERSE'}, nfs4_flags('INHERITED')),
+        ('USER', nfs4_perms('WRITE_DATA', 'APPEND_DATA'), nfs4_flags('INHERITED')),
+    ]),
+    (True, True, [
+        ('owner@', {'BASIC': 'FULL_CONTROL'}, nfs4_flags('FILE_INHERIT', 'DIRECTORY_INHERIT', 'INHERITED')),
+        ('everyone@', {'BASIC': 'TRAVERSE'}, nfs4_flags('FILE_INHERIT', 'DIRECTORY_INHERIT', 'INHERITED')),
+        ('USER', nfs4_perms('WRITE_DATA', 'APPEND_DATA'), nfs4_flags('FILE_INHERIT', 'INHERIT_ONLY', 'INHERITED')),
+        ('GROUP', {'BASIC': 'READ'}, nfs4_flags('INHERITED')),
+    ]),
+    (True, False, [
+        ('owner@', {'BASIC': 'FULL_CONTROL'}, nfs4_flags('FILE_INHERIT', 'DIRECTORY_INHERIT', 'INHERITED')),
+        ('everyone@', {'BASIC': 'TRAVERSE'}, nfs4_flags('FILE_INHERIT', 'DIRECTORY_INHERIT', 'INHERITED')),
+        ('USER', nfs4_perms('WRITE_DATA', 'APPEND_DATA'), nfs4_flags('FILE_INHERIT', 'INHERIT_ONLY', 'INHERITED')),
+    ]),
+])
+def test__nfs4acl_inherit(is_dir, first_level, result):
+    inherited = nfs4acl_decode(nfs4acl_inherit(nfs4acl_encode(NFS4_ACL), is_dir, first_level), True)['acl']
+
+    assert [(ace['tag'], ace['perms'], ace['flags']) for ace in inherited] == result
+
+
+def test__nfs4acl_inherit_nothing():
+    assert nfs4acl_inherit(nfs4acl_encode(NFS4_ACL[1:2]), False, True) is None
+
+
+def test__nfs4acl_trivial():
+    acl = nfs4acl_decode(nfs4acl_trivial(0o751, True), False)['acl']
+
+    assert [ace['tag'] for ace in acl] == ['owner@', 'group@', 'everyone@']
+    assert all(ace['type'] == 'ALLOW' for ace in acl)
+    assert acl[0]['perms']['WRITE_ACL'] is True
+    assert acl[0]['perms']['DELETE_CHILD'] is True
+    assert (acl[1]['perms']['READ_DATA'], acl[1]['perms']['WRITE_DATA'], acl[1]['perms']['EXECUTE']) == \
+        (True, False, True)
+    assert (acl[2]['perms']['READ_DATA'], acl[2]['perms']['EXECUTE'], acl[2]['perms']['WRITE_ACL']) == \
+        (False, True, False)
+
+
+def posix_ace(tag, perms, id_=-1, default=False):
+    return {
+        'default': default,
+        'tag': tag,
+        'id': id_,
+        'perms': {'READ': 'r' in perms, 'WRITE': 'w' in perms, 'EXECUTE': 'x' in perms},
+    }
+
+
+def test__posixacl_round_trip():
+    acl = [
+        posix_ace('OTHER', 'r-x'),
+        posix_ace('GROUP', 'rw-', 1001),
+        posix_ace('USER', 'rwx', 1000),
+        posix_ace('MASK', 'rwx'),
+        posix_ace('GROUP_OBJ', 'r-x'),
+        posix_ace('USER_OBJ', 'rwx'),
+    ]
+    data = posixacl_encode(acl)
+
+    assert struct.unpack('<I', data[:4]) == (2,)
+    assert len(data) == 4 + 8 * len(acl)
+    # Entries are sorted by tag as kernel requires
+    assert posixacl_decode(data, False) == [
+        posix_ace('USER_OBJ', 'rwx'),
+        posix_ace('USER', 'rwx', 1000),
+        posix_ace('GROUP_OBJ', 'r-x'),
+        posix_ace('GROUP', 'rw-', 1001),
+        posix_ace('MASK', 'rwx'),
+        posix_ace('OTHER', 'r-x'),
+    ]
+
+
+def test__posixacl_decode_default():
+    acl = [posix_ace('USER_OBJ', 'rwx', default=True), posix_ace('GROUP_OBJ', '---', default=True),
+           posix_ace('OTHER', '---', default=True)]
+
+    assert posixacl_decode(posixacl_encode(acl), True) == acl
+
+
+def test__posixacl_undefined_id():
+    data = posixacl_encode([posix_ace('USER_OBJ', 'rwx')])
+
+    assert struct.unpack('<HHI', data[4:]) == (0x01, 0o7, 0xFFFFFFFF)
@@ -41,6 +41,7 @@ async def datastore_test():
 
                 m["datastore.execute"] = ds.execute
                 m["datastore.execute_write"] = ds.execute_write
+                m["datastore.execute_write_many"] = ds.execute_write_many
                 m["datastore.fetchall"] = ds.fetchall
 
                 m["datastore.query"] = ds.query
@@ -49,6 +50,8 @@ async def datastore_test():
                 m["datastore.send_delete_events"] = ds.send_delete_events
 
                 m["datastore.insert"] = ds.insert
+                m["datastore.insert_many"] = ds.insert_many
+                m["datastore.write_many"] = ds.write_many
                 m["datastore.update"] = ds.update
 
                 yield ds
@@ -193,6 +196,76 @@ async def test__inserted_primary_key():
         assert await ds.insert("account.bsdgroups", {"bsdgrp_gid": 10}) == 2
 
 
+@pytest.mark.asyncio
+async def test__insert_many():
+    async with datastore_test() as ds:
+        assert await ds.insert("account.bsdgroups", {"bsdgrp_gid": 5}) == 1
+        assert await ds.insert_many("account.bsdgroups", [{"bsdgrp_gid": 10}, {"bsdgrp_gid": 15}]) == [2, 3]
+        assert [row["bsdgrp_gid"] for row in await ds.query("account.bsdgroups")] == [5, 10, 15]
+
+
+@pytest.mark.asyncio
+async def test__insert_many__rollback():
+    async with datastore_test() as ds:
+        ds.execute("INSERT INTO `account_bsdgroups` VALUES (20, 2020)")
+
+        with pytest.raises(IntegrityError):
+            await ds.insert_many("account.bsdusers", [
+                {"bsdusr_uid": 100, "bsdusr_group": 20},
+                {"bsdusr_uid": 101, "bsdusr_group": 30},
+            ])
+
+        assert await ds.query("account.bsdusers") == []
+
+
+@pytest.mark.asyncio
+async def test__write_many():
+    async with datastore_test() as ds:
+        ds.execute("INSERT INTO `account_bsdgroups` VALUES (10, 1010)")
+        ds.execute("INSERT INTO `account_bsdgroups` VALUES (20, 2020)")
+
+        assert await ds.write_many("account.bsdgroups", {
+            "insert": [{"bsdgrp_gid": 3030}],
+            "update": [{"id": 20, "bsdgrp_gid": 2021}],
+            "delete": [10],
+        }) == [21]
+        assert await ds.query("account.bsdgroups") == [
+            {"id": 20, "bsdgrp_gid": 2021},
+            {"id": 21, "bsdgrp_gid": 3030},
+        ]
+
+
+@pytest.mark.asyncio
+async def test__write_many__reinsert_deleted_pk():
+    async with datastore_test() as ds:
+        ds.execute("INSERT INTO `account_bsdgroups` VALUES (10, 1010)")
+        ds.execute("INSERT INTO `account_bsdgroups` VALUES (20, 2020)")
+
+        assert await ds.write_many("account.bsdgroups", {
+            "insert": [{"id": 20, "bsdgrp_gid": 2021}],
+            "delete": [20],
+        }) == [20]
+        assert await ds.query("account.bsdgroups") == [
+            {"id": 10, "bsdgrp_gid": 1010},
+            {"id": 20, "bsdgrp_gid": 2021},
+        ]
+
+
+@pytest.mark.asyncio
+async def test__write_many__rollback():
+    async with datastore_test() as ds:
+        ds.execute("INSERT INTO `account_bsdgroups` VALUES (10, 1010)")
+        ds.execute("INSERT INTO `account_bsdusers` VALUES (5, 55, 10)")
+
+        with pytest.raises(IntegrityError):
+            await ds.write_many("account.bsdgroups", {
+                "insert": [{"bsdgrp_gid": 3030}],
+                "delete": [10],
+            })
+
+        assert await ds.query("account.bsdgroups") == [{"id": 10, "bsdgrp_gid": 1010}]
+
+
 @pytest.mark.asyncio
 async def test__update_filter__too_much_rows():
     async with datastore_test() as ds:
@@ -0,0 +1,84 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.plugins.filesystem_.listdir import DirectoryLister
+from middlewared.service_exception import CallError, MatchNotFound
+
+
+@pytest.fixture()
+def directory(tmp_path):
+    for i in range(10):
+        (tmp_path / f'file{i}').write_text('x' * i)
+    for i in range(3):
+        (tmp_path / f'dir{i}').mkdir()
+    os.symlink(tmp_path / 'file1', tmp_path / 'link')
+    os.symlink(tmp_path / 'missing', tmp_path / 'dangling')
+    return tmp_path
+
+
+def listdir(path, filters=None, options=None, cursor=None):
+    return DirectoryLister(str(path), filters or [], options or {}).list(cursor)
+
+
+def test__listdir_all(directory):
+    entries, cursor = listdir(directory)
+
+    assert cursor is None
+    assert {e['name'] for e in entries} == {f'file{i}' for i in range(10)} | {f'dir{i}' for i in range(3)} | {'link'}
+
+    link = next(e for e in entries if e['name'] == 'link')
+    assert link['type'] == 'SYMLINK'
+    assert link['realpath'] == str(directory / 'file1')
+    assert link['size'] == 1
+
+    file = next(e for e in entries if e['name'] == 'file5')
+    assert file['type'] == 'FILE'
+    assert file['path'] == str(directory / 'file5')
+    assert file['size'] == 5
+    assert file['is_mountpoint'] is False
+    assert file['is_ctldir'] is False
+
+
+def test__listdir_select_does_not_stat(directory):
+    with patch('os.DirEntry.stat', create=True) as stat:
+        entries, cursor = listdir(directory, [['type', '=', 'DIRECTORY']], {'select': ['name']})
+
+    stat.assert_not_called()
+    assert sorted(entries, key=lambda e: e['name']) == [{'name': 'dir0'}, {'name': 'dir1'}, {'name': 'dir2'}]
+
+
+@pytest.mark.parametrize('filters,options,result', [
+    ([['type', '=', 'FILE'], ['size', '>', 7]], {'select': ['name'], 'order_by': ['name']},
+     [{'name': 'file8'}, {'name': 'file9'}]),
+    ([['name', '^', 'file']], {'count': True}, 10),
+    ([['type', '=', 'DIRECTORY']], {'select': ['name', 'type'], 'order_by': ['-name'], 'get': True},
+     {'name': 'dir2', 'type': 'DIRECTORY'}),
+])
+def test__listdir_filter_list_semantics(directory, filters, options, result):
+    assert listdir(directory, filters, options)[0] == result
+
+
+def test__listdir_get_not_found(directory):
+    with pytest.raises(MatchNotFound):
+        listdir(directory, [['name', '=', 'nonexistent']], {'get': True})
+
+
+def test__listdir_cursor(directory):
+    names = []
+    cursor = None
+    while True:
+        entries, cursor = listdir(directory, [['type', '=', 'FILE']], {'select': ['name'], 'limit': 3}, cursor)
+        names.extend(e['name'] for e in entries)
+        if cursor is None:
+            break
+
+    assert sorted(names) == [f'file{i}' for i in range(10)]
+
+
+def test__listdir_cursor_other_directory(directory):
+    entries, cursor = listdir(directory, [], {'limit': 1})
+
+    with pytest.raises(CallError):
+        listdir(directory / 'dir0', [], {'limit': 1}, cursor)
@@ -0,0 +1,115 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from middlewared.plugins.interface import state_cache
+from middlewared.plugins.interface.state_cache import InterfaceStateCache
+
+
+class Message(dict):
+    def __init__(self, event, index, **attrs):
+        super().__init__(event=event, index=index)
+        self.attrs = attrs
+
+    def get_attr(self, name):
+        return self.attrs.get(name)
+
+
+class FakeInterface:
+    def __init__(self, dev):
+        self.name = dev.get_attr('IFLA_IFNAME')
+        self.index = dev['index']
+
+    def asdict(self):
+        return {'name': self.name, 'aliases': list(LINKS[self.index]['aliases'])}
+
+
+LINKS = {}
+
+
+@pytest.fixture()
+def cache():
+    LINKS.clear()
+    LINKS.update({
+        1: {'name': 'eno1', 'aliases': ['192.168.0.10']},
+        2: {'name': 'eno2', 'aliases': []},
+        3: {'name': 'bond0', 'aliases': []},
+    })
+    ipr = Mock()
+    ipr.get_links.side_effect = lambda *indexes: [
+        Message('RTM_NEWLINK', index, IFLA_IFNAME=LINKS[index]['name'])
+        for index in (indexes or LINKS) if index in LINKS
+    ]
+    ipr.__enter__ = Mock(return_value=ipr)
+    ipr.__exit__ = Mock(return_value=False)
+
+    with patch.object(state_cache, 'IPRoute', Mock(return_value=ipr)):
+        with patch.object(state_cache.netif, 'Interface', FakeInterface):
+            cache = InterfaceStateCache()
+            # Do not start the netlink watcher, tests feed notifications directly
+            cache.thread = Mock()
+            cache.watching = True
+            cache.ipr = ipr
+            yield cache
+
+
+def states(cache):
+    return {name: state['aliases'] for name, (iface, state) in cache.interfaces().items()}
+
+
+def test__not_watching_reads_every_time(cache):
+    cache.watching = False
+
+    states(cache)
+    states(cache)
+
+    assert cache.ipr.get_links.call_count == 2
+    assert cache.links is None
+
+
+def test__cached_until_notification(cache):
+    assert states(cache) == {'eno1': ['192.168.0.10'], 'eno2': [], 'bond0': []}
+    states(cache)
+    assert cache.ipr.get_links.call_count == 1
+
+    LINKS[2]['aliases'] = ['10.0.0.1']
+    cache._handle(Message('RTM_NEWADDR', 2))
+
+    assert states(cache) == {'eno1': ['192.168.0.10'], 'eno2': ['10.0.0.1'], 'bond0': []}
+    cache.ipr.get_links.assert_called_with(2)
+
+
+def test__link_removed(cache):
+    states(cache)
+    del LINKS[2]
+
+    cache._handle(Message('RTM_DELLINK', 2))
+
+    assert states(cache) == {'eno1': ['192.168.0.10'], 'bond0': []}
+    assert cache.ipr.get_links.call_count == 1
+
+
+def test__port_change_refreshes_master(cache):
+    states(cache)
+
+    cache._handle(Message('RTM_NEWLINK', 1, IFLA_MASTER=3))
+    assert cache.dirty == {1, 3}
+    states(cache)
+
+    # Port released from the bond
+    cache._handle(Message('RTM_NEWLINK', 1))
+    assert cache.dirty == {1, 3}
+
+
+def test__returned_state_is_a_copy(cache):
+    cache.interfaces()['eno1'][1]['aliases'].append('1.1.1.1')
+
+    assert states(cache)['eno1'] == ['192.168.0.10']
+
+
+def test__invalidate(cache):
+    states(cache)
+    cache.invalidate()
+    states(cache)
+
+    assert cache.ipr.get_links.call_count == 2
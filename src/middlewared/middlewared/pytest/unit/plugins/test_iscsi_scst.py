@@ -0,0 +1,194 @@
+import builtins
+import errno
+import os
+import textwrap
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.plugins.iscsi_.scst import desired_state, reconfigure, ScstSysfs, UnsupportedConfig
+
+BASENAME = 'iqn.2005-10.org.freenas.ctl'
+
+DEVICE = '''
+    DEVICE {name} {{
+        filename /dev/zvol/tank/{name}
+        blocksize 512
+        read_only 0
+        usn {name}-usn
+        prod_id "iSCSI Disk"
+        rotational 0
+    }}
+'''
+TARGET = '''
+    TARGET {basename}:{name} {{
+        enabled 1
+        per_portal_acl 1
+        IncomingUser "user secret{name}"
+
+        GROUP security_group {{
+            INITIATOR iqn.1991-05.com.microsoft:{name}\\#*
+            LUN 0 {name}
+        }}
+    }}
+'''
+
+
+def scst_conf(devices, targets=None, extra=''):
+    targets = devices if targets is None else targets
+    return textwrap.dedent(f'''\
+        {extra}
+        HANDLER vdisk_blockio {{
+        {''.join(DEVICE.format(name=name) for name in devices)}
+        }}
+
+        TARGET_DRIVER iscsi {{
+            enabled 1
+        {''.join(TARGET.format(basename=BASENAME, name=name) for name in targets)}
+        }}
+    ''')
+
+
+def write(path, value=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(value)
+
+
+def make_device(root, name):
+    write(os.path.join(root, 'devices', name, 'filename'), f'/dev/zvol/tank/{name}\n[key]\n')
+    write(os.path.join(root, 'devices', name, 'blocksize'), '512\n[key]\n')
+    write(os.path.join(root, 'devices', name, 'read_only'), '0\n')
+    write(os.path.join(root, 'devices', name, 'usn'), f'{name}-usn\n[key]\n')
+    write(os.path.join(root, 'devices', name, 'prod_id'), 'iSCSI Disk\n[key]\n')
+    write(os.path.join(root, 'devices', name, 'rotational'), '0\n[key]\n')
+    os.symlink(os.path.join(root, 'devices', name), os.path.join(root, 'handlers', 'vdisk_blockio', name))
+
+
+def make_target(root, name):
+    target = os.path.join(root, 'targets', 'iscsi', f'{BASENAME}:{name}')
+    write(os.path.join(target, 'enabled'), '1\n')
+    write(os.path.join(target, 'per_portal_acl'), '1\n[key]\n')
+    write(os.path.join(target, 'IncomingUser'), f'user secret{name}\n[key]\n')
+    write(os.path.join(target, 'luns', 'mgmt'))
+    write(os.path.join(target, 'ini_groups', 'mgmt'))
+    group = os.path.join(target, 'ini_groups', 'security_group')
+    write(os.path.join(group, 'initiators', 'mgmt'))
+    write(os.path.join(group, 'initiators', f'iqn.1991-05.com.microsoft:{name}#*'))
+    write(os.path.join(group, 'luns', 'mgmt'))
+    os.makedirs(os.path.join(group, 'luns', '0'))
+    os.symlink(os.path.join(root, 'devices', name), os.path.join(group, 'luns', '0', 'device'))
+
+
+@pytest.fixture()
+def sysfs(tmp_path):
+    root = str(tmp_path / 'scst_tgt')
+    for handler in ('vdisk_fileio', 'vdisk_blockio'):
+        write(os.path.join(root, 'handlers', handler, 'mgmt'))
+    write(os.path.join(root, 'targets', 'iscsi', 'mgmt'))
+    write(os.path.join(root, 'targets', 'iscsi', 'enabled'), '1\n')
+    for name in ('lun1', 'lun2'):
+        make_device(root, name)
+        make_target(root, name)
+
+    return ScstSysfs(root)
+
+
+def test__desired_state():
+    state = desired_state(scst_conf(['lun1']))
+
+    assert state['devices'] == {'lun1': {'handler': 'vdisk_blockio', 'attrs': {
+        'filename': '/dev/zvol/tank/lun1', 'blocksize': '512', 'read_only': '0', 'usn': 'lun1-usn',
+        'prod_id': 'iSCSI Disk', 'rotational': '0',
+    }}}
+    assert state['driver'] == {'enabled': '1'}
+    assert state['targets'][f'{BASENAME}:lun1'] == {
+        'attrs': {'enabled': '1', 'per_portal_acl': '1'},
+        'users': {'IncomingUser': {'user secretlun1'}, 'OutgoingUser': set()},
+        'luns': {},
+        'groups': {'security_group': {'initiators': {'iqn.1991-05.com.microsoft:lun1#*'}, 'luns': {0: 'lun1'}}},
+    }
+
+
+def test__no_changes(sysfs):
+    assert sysfs.delta(desired_state(scst_conf(['lun1', 'lun2']))) == []
+
+
+def test__add_and_remove(sysfs):
+    commands = sysfs.delta(desired_state(scst_conf(['lun1', 'lun3'])))
+
+    assert commands == [
+        (('targets', 'iscsi', f'{BASENAME}:lun2', 'enabled'), '0'),
+        (('targets', 'iscsi', 'mgmt'), f'del_target {BASENAME}:lun2'),
+        (('handlers', 'vdisk_blockio', 'mgmt'),
+         'add_device lun3 filename=/dev/zvol/tank/lun3;blocksize=512;read_only=0;rotational=0'),
+        (('devices', 'lun3', 'usn'), 'lun3-usn'),
+        (('devices', 'lun3', 'prod_id'), 'iSCSI Disk'),
+        (('targets', 'iscsi', 'mgmt'), f'add_target {BASENAME}:lun3'),
+        (('targets', 'iscsi', 'mgmt'), f'add_target_attribute {BASENAME}:lun3 IncomingUser user secretlun3'),
+        (('targets', 'iscsi', f'{BASENAME}:lun3', 'ini_groups', 'mgmt'), 'create security_group'),
+        (('targets', 'iscsi', f'{BASENAME}:lun3', 'ini_groups', 'security_group', 'initiators', 'mgmt'),
+         'add iqn.1991-05.com.microsoft:lun3#*'),
+        (('targets', 'iscsi', f'{BASENAME}:lun3', 'ini_groups', 'security_group', 'luns', 'mgmt'), 'add lun3 0'),
+        (('targets', 'iscsi', f'{BASENAME}:lun3', 'per_portal_acl'), '1'),
+        (('targets', 'iscsi', f'{BASENAME}:lun3', 'enabled'), '1'),
+        (('handlers', 'vdisk_blockio', 'mgmt'), 'del_device lun2'),
+    ]
+
+
+def test__change_lun_and_acl(sysfs):
+    config = scst_conf(['lun1', 'lun2']).replace('LUN 0 lun2', 'LUN 0 lun1\n LUN 1 lun2').replace(
+        'iqn.1991-05.com.microsoft:lun1', 'iqn.1991-05.com.microsoft:new'
+    ).replace('usn lun1-usn', 'usn changed')
+    group = ('targets', 'iscsi', f'{BASENAME}:{{}}', 'ini_groups', 'security_group')
+
+    commands = sysfs.delta(desired_state(config))
+
+    assert commands == [
+        (('devices', 'lun1', 'usn'), 'changed'),
+        (tuple(p.format('lun1') for p in group) + ('initiators', 'mgmt'), 'del iqn.1991-05.com.microsoft:lun1#*'),
+        (tuple(p.format('lun1') for p in group) + ('initiators', 'mgmt'), 'add iqn.1991-05.com.microsoft:new#*'),
+        (tuple(p.format('lun2') for p in group) + ('luns', 'mgmt'), 'del 0'),
+        (tuple(p.format('lun2') for p in group) + ('luns', 'mgmt'), 'add lun1 0'),
+        (tuple(p.format('lun2') for p in group) + ('luns', 'mgmt'), 'add lun2 1'),
+    ]
+
+
+def test__device_recreate_not_supported(sysfs):
+    with pytest.raises(UnsupportedConfig):
+        sysfs.delta(desired_state(scst_conf(['lun1', 'lun2']).replace('blocksize 512', 'blocksize 4096')))
+
+
+@pytest.mark.parametrize('extra', ['cluster_name HA', 'DEVICE_GROUP targets {\n}'])
+def test__ha_config_not_supported(sysfs, tmp_path, extra):
+    config = tmp_path / 'scst.conf'
+    config.write_text(scst_conf(['lun1', 'lun2'], extra=extra))
+
+    assert reconfigure(str(config), sysfs.root) is False
+
+
+def test__reconfigure_applies_commands(sysfs, tmp_path):
+    config = tmp_path / 'scst.conf'
+    config.write_text(scst_conf(['lun1', 'lun2'], ['lun1']))
+
+    assert reconfigure(str(config), sysfs.root) is True
+
+    with open(sysfs.path('targets', 'iscsi', 'mgmt')) as f:
+        assert f.read() == f'del_target {BASENAME}:lun2\n'
+    assert sysfs.read_attr('targets', 'iscsi', f'{BASENAME}:lun2', 'enabled') == '0'
+
+
+def test__mgmt_result_timeout(sysfs):
+    def open_(path, *args, **kwargs):
+        if os.path.basename(path) in ('mgmt', 'last_sysfs_mgmt_res'):
+            # Management command is still being processed
+            raise OSError(errno.EAGAIN, os.strerror(errno.EAGAIN))
+
+        return builtins.open(path, *args, **kwargs)
+
+    with patch('middlewared.plugins.iscsi_.scst.open', open_, create=True):
+        with patch('middlewared.plugins.iscsi_.scst.MGMT_RESULT_TIMEOUT', 0.2):
+            with pytest.raises(OSError) as e:
+                sysfs.apply([(('targets', 'iscsi', 'mgmt'), f'del_target {BASENAME}:lun2')])
+
+    assert e.value.errno == errno.ETIMEDOUT
@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.plugins.kubernetes_linux.k8s import Pod
+from middlewared.plugins.kubernetes_linux.k8s.informer import (
+    INFORMERS, Informer, iter_lines, parse_selector, start_informers, stop_informers,
+)
+
+
+def pod(uid, name, namespace, labels=None, phase='Running', resource_version='1'):
+    return {
+        'metadata': {
+            'uid': uid, 'name': name, 'namespace': namespace, 'labels': labels or {},
+            'resourceVersion': resource_version,
+        },
+        'status': {'phase': phase},
+    }
+
+
+@pytest.mark.parametrize('selector,result', [
+    (None, []),
+    ('app=plex', [('app', '=', 'plex')]),
+    ('app==plex,tier!=db', [('app', '=', 'plex'), ('tier', '!=', 'db')]),
+    ('app,!tier', [('app', 'exists', ''), ('tier', '!', '')]),
+    ('app in (plex, emby)', None),
+])
+def test_parse_selector(selector, result):
+    assert parse_selector(selector) == result
+
+
+def test_informer_applies_watch_events():
+    informer = Informer(Pod)
+    informer.synced = True
+    informer.apply({'type': 'ADDED', 'object': pod('1', 'plex', 'ix-plex')})
+    informer.apply({'type': 'ADDED', 'object': pod('2', 'emby', 'ix-emby')})
+    informer.apply({'type': 'MODIFIED', 'object': pod('1', 'plex', 'ix-plex', phase='Pending', resource_version='3')})
+    informer.apply({'type': 'DELETED', 'object': pod('2', 'emby', 'ix-emby', resource_version='4')})
+    informer.apply({'type': 'BOOKMARK', 'object': {'metadata': {'resourceVersion': '5'}}})
+
+    assert informer.resource_version == '5'
+    assert [p['status']['phase'] for p in informer.query()] == ['Pending']
+
+
+def test_informer_resource_version_expired():
+    informer = Informer(Pod)
+    assert informer.apply({'type': 'ERROR', 'object': {'code': 410}}) is False
+
+
+def test_informer_query():
+    informer = Informer(Pod)
+    assert informer.query() is None
+
+    informer.synced = True
+    informer.apply({'type': 'ADDED', 'object': pod('1', 'plex', 'ix-plex', {'app': 'plex'})})
+    informer.apply({'type': 'ADDED', 'object': pod('2', 'emby', 'ix-emby', {'app': 'emby'}, phase='Failed')})
+
+    assert [p['metadata']['name'] for p in informer.query(namespace='ix-emby')] == ['emby']
+    assert [p['metadata']['name'] for p in informer.query(label_selector='app=plex')] == ['plex']
+    assert [p['metadata']['name'] for p in informer.query(field_selector='status.phase!=Failed')] == ['plex']
+    assert informer.query(label_selector='app in (plex)') is None
+
+
+class Content:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def iter_any(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_iter_lines():
+    large = b'x' * 1024 * 1024
+    content = Content([b'{"a": 1}\n{"b"', b': 2}\n\n', large[:1000], large[1000:], b'\n{"c": 3}\n{"d"', b': 4}'])
+
+    assert [line async for line in iter_lines(content)] == [
+        b'{"a": 1}', b'{"b": 2}', b'', large, b'{"c": 3}', b'{"d": 4}',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stop_informers_cancels_tasks():
+    async def run(self):
+        await asyncio.sleep(3600)
+
+    with patch.object(Informer, 'run', run):
+        await start_informers([Pod])
+        task = INFORMERS[Pod].task
+        await asyncio.sleep(0)
+
+        await stop_informers()
+
+    assert INFORMERS == {}
+    assert task.cancelled()
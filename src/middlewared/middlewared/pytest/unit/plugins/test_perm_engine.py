@@ -0,0 +1,115 @@
+import errno
+import os
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.plugins.filesystem_ import acl_xattr, perm_engine
+from middlewared.plugins.filesystem_.perm_engine import RecursivePermissionEngine
+from middlewared.service_exception import CallError
+
+
+def posix_ace(tag, perms, default=False):
+    return {
+        'default': default,
+        'tag': tag,
+        'id': -1,
+        'perms': {'READ': 'r' in perms, 'WRITE': 'w' in perms, 'EXECUTE': 'x' in perms},
+    }
+
+
+DEFAULT_ACL = [posix_ace('USER_OBJ', 'rwx'), posix_ace('GROUP_OBJ', 'r-x'), posix_ace('OTHER', '---')]
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(tmp_path):
+    with patch.object(perm_engine, 'CHECKPOINT_DIR', str(tmp_path / 'checkpoints')):
+        yield tmp_path / 'checkpoints'
+
+
+@pytest.fixture()
+def tree(tmp_path):
+    root = tmp_path / 'root'
+    for d in ('a', 'a/b', 'a/b/c', 'd'):
+        (root / d).mkdir(parents=True)
+    for f in ('f1', 'a/f2', 'a/b/f3', 'a/b/c/f4', 'd/f5', 'd/f6'):
+        (root / f).write_text('')
+    os.symlink('f1', root / 'link')
+    return root
+
+
+def test__strip_with_mode(tree):
+    counts = RecursivePermissionEngine(
+        str(tree), 'strip', -1, -1, {'posixacl': True}, 0o750,
+    ).run()
+
+    assert counts == {'files': 7, 'directories': 4, 'skipped': 0, 'errors': 0}
+    for dirpath, dirnames, filenames in os.walk(tree):
+        for name in dirnames + [f for f in filenames if f != 'link']:
+            assert os.stat(os.path.join(dirpath, name)).st_mode & 0o7777 == 0o750
+
+
+def test__clone_posix(tree):
+    try:
+        os.setxattr(tree, acl_xattr.POSIX_ACL_DEFAULT_XATTR, acl_xattr.posixacl_encode(DEFAULT_ACL))
+    except OSError as e:
+        if e.errno == errno.EOPNOTSUPP:
+            pytest.skip('POSIX ACLs are not supported')
+        raise
+
+    RecursivePermissionEngine(str(tree), 'clone', -1, -1, {'posixacl': True}).run()
+
+    assert os.stat(tree / 'a/b/c/f4').st_mode & 0o777 == 0o750
+    assert acl_xattr.posixacl_decode(os.getxattr(tree / 'a/b', acl_xattr.POSIX_ACL_DEFAULT_XATTR), False) == \
+        DEFAULT_ACL
+
+
+def test__clone_posix_requires_default_acl(tree):
+    with pytest.raises(CallError):
+        RecursivePermissionEngine(str(tree), 'clone', -1, -1, {'posixacl': True})
+
+
+def test__resume_after_failure(tree, checkpoint_dir):
+    real_chmod = os.chmod
+
+    def chmod(path, mode):
+        if path.endswith('f4'):
+            raise PermissionError(errno.EPERM, 'Operation not permitted')
+        return real_chmod(path, mode)
+
+    with patch.object(perm_engine.os, 'chmod', chmod):
+        with pytest.raises(CallError) as ve:
+            RecursivePermissionEngine(str(tree), 'strip', -1, -1, {'posixacl': True}, 0o700).run()
+
+    assert 'f4' in ve.value.errmsg
+    checkpoints = os.listdir(checkpoint_dir)
+    assert len(checkpoints) == 1
+
+    counts = RecursivePermissionEngine(str(tree), 'strip', -1, -1, {'posixacl': True, 'resume': True}, 0o700).run()
+
+    # `d` subtree was completed during the first run, `a` has to be processed again
+    assert counts['skipped'] == 1
+    assert os.stat(tree / 'a/b/c/f4').st_mode & 0o777 == 0o700
+    assert os.listdir(checkpoint_dir) == []
+
+
+def test__abort_saves_checkpoint(tree, checkpoint_dir):
+    engine = RecursivePermissionEngine(str(tree), 'strip', -1, -1, {'posixacl': True}, 0o700, should_abort=lambda: True)
+    engine.done.wait = lambda timeout: False
+
+    with pytest.raises(CallError):
+        engine.run()
+
+    assert len(os.listdir(checkpoint_dir)) == 1
+
+
+def test__checkpoint_ignored_without_resume(tree, checkpoint_dir):
+    engine = RecursivePermissionEngine(str(tree), 'strip', -1, -1, {'posixacl': True}, 0o700, should_abort=lambda: True)
+    engine.done.wait = lambda timeout: False
+    with pytest.raises(CallError):
+        engine.run()
+
+    counts = RecursivePermissionEngine(str(tree), 'strip', -1, -1, {'posixacl': True}, 0o700).run()
+
+    assert counts == {'files': 7, 'directories': 4, 'skipped': 0, 'errors': 0}
+    assert os.listdir(checkpoint_dir) == []
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from middlewared.plugins.service_.coalesce import ServiceActionCoalescer
+
+
+@pytest.mark.asyncio
+async def test__coalesces_burst():
+    coalescer = ServiceActionCoalescer()
+    calls = []
+
+    async def reload(service):
+        calls.append(service)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    results = await asyncio.gather(*[coalescer.call(('reload', 'cifs'), reload, 'cifs') for i in range(10)])
+
+    # First request is executed immediately, all others are merged into a single execution that follows it
+    assert calls == ['cifs', 'cifs']
+    assert results == [1] + [2] * 9
+    assert coalescer.stats[('reload', 'cifs')] == {'executed': 2, 'collapsed': 8}
+    assert coalescer.running == {}
+    assert coalescer.pending == {}
+
+
+@pytest.mark.asyncio
+async def test__different_keys_not_coalesced():
+    coalescer = ServiceActionCoalescer()
+    calls = []
+
+    async def reload(service):
+        calls.append(service)
+        await asyncio.sleep(0.1)
+
+    await asyncio.gather(
+        coalescer.call(('reload', 'cifs'), reload, 'cifs'),
+        coalescer.call(('reload', 'nfs'), reload, 'nfs'),
+        coalescer.call(('restart', 'cifs'), reload, 'cifs'),
+    )
+
+    assert sorted(calls) == ['cifs', 'cifs', 'nfs']
+
+
+@pytest.mark.asyncio
+async def test__exception_is_propagated_to_merged_callers():
+    coalescer = ServiceActionCoalescer()
+
+    async def reload():
+        await asyncio.sleep(0.1)
+        raise ValueError('failed')
+
+    results = await asyncio.gather(*[coalescer.call('key', reload) for i in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert coalescer.stats['key'] == {'executed': 2, 'collapsed': 1}
+
+    # Following request runs again
+    with pytest.raises(ValueError):
+        await coalescer.call('key', reload)
@@ -0,0 +1,69 @@
+from middlewared.plugins.smb_.registry_sync import delta_changes, registry_delta, render_smbconf
+
+
+def param(raw):
+    return {'raw': raw, 'parsed': raw}
+
+
+GLOBAL = {'service': 'GLOBAL', 'is_share': False, 'parameters': {'workgroup': param('WORKGROUP')}}
+
+
+def share(service, **parameters):
+    return {'service': service, 'is_share': True, 'parameters': {k: param(v) for k, v in parameters.items()}}
+
+
+def conf(**parameters):
+    return {k.replace('_', ' '): param(v) for k, v in parameters.items()}
+
+
+def test__registry_delta():
+    registry = [
+        GLOBAL,
+        share('same', path='/mnt/tank/same'),
+        share('Changed', path='/mnt/tank/old', readonly='no'),
+        share('stale', path='/mnt/tank/stale'),
+        share('locked', path='/mnt/tank/locked'),
+        share('disabled', path='/mnt/tank/disabled', available='no'),
+    ]
+    desired = {
+        'same': ('same', conf(path='/mnt/tank/same')),
+        'changed': ('changed', conf(path='/mnt/tank/new', browseable='yes')),
+        'new': ('new', conf(path='/mnt/tank/new')),
+    }
+
+    delta = registry_delta(registry, desired, {'locked', 'disabled'})
+
+    assert delta['added'] == ['new']
+    assert delta['removed'] == ['stale']
+    assert delta['disabled'] == ['locked']
+    assert delta['modified'] == {'Changed': {
+        'added': conf(browseable='yes'),
+        'removed': conf(readonly='no'),
+        'modified': conf(path='/mnt/tank/new'),
+    }}
+    assert delta_changes(delta) == 4
+    assert [service for service, parameters in delta['sections']] == [
+        'GLOBAL', 'same', 'Changed', 'locked', 'disabled', 'new',
+    ]
+    assert dict(delta['sections'])['locked']['available']['raw'] == 'no'
+
+
+def test__registry_delta_no_changes():
+    registry = [GLOBAL, share('HOMES', path='/mnt/tank/homes'), share('disabled', path='/mnt/tank/d', available='no')]
+    desired = {'homes': ('homes', conf(path='/mnt/tank/homes'))}
+
+    assert delta_changes(registry_delta(registry, desired, {'disabled'})) == 0
+
+
+def test__render_smbconf():
+    assert render_smbconf([
+        ('GLOBAL', conf(workgroup='WORKGROUP')),
+        ('share', conf(path='/mnt/tank/share', vfs_objects='streams_xattr zfs_core')),
+    ]) == (
+        '[GLOBAL]\n'
+        '\tworkgroup = WORKGROUP\n'
+        '\n'
+        '[share]\n'
+        '\tpath = /mnt/tank/share\n'
+        '\tvfs objects = streams_xattr zfs_core\n'
+    )
@@ -1,7 +1,11 @@
+from unittest.mock import Mock, patch
+
 import pytest
+from zettarepl.snapshot.snapshot import Snapshot
 
 import middlewared.plugins.zettarepl  # noqa
 import middlewared.plugins.zettarepl_.util  # noqa
+from middlewared.plugins.zettarepl_.snapshot_cache import SnapshotNameCache
 
 from middlewared.pytest.unit.helpers import load_compound_service
 
@@ -22,3 +26,53 @@ async def test__reverse_source_target_datasets(source_datasets, target_dataset,
         reversed_source_datasets,
         reversed_target_dataset,
     )
+
+
+def mock_shell(snapshots_changed, now=1000):
+    shell = Mock()
+    shell.snapshots_changed = snapshots_changed
+    shell.exec.side_effect = lambda args: f"{now}\n" if args[0] == "date" else shell.snapshots_changed
+    return shell
+
+
+def test__snapshot_name_cache__relists_only_changed_datasets():
+    shell = mock_shell("tank/a\t100\ntank/b\t200\n")
+    snapshots = [Snapshot("tank/a", "auto-1"), Snapshot("tank/b", "auto-2")]
+
+    cache = SnapshotNameCache()
+    with patch("middlewared.plugins.zettarepl_.snapshot_cache.multilist_snapshots", Mock(return_value=snapshots)) as m:
+        result = cache.get("LOCAL", shell, ["tank/a", "tank/b"])
+        assert result["tank/a"].names == ["auto-1"]
+        assert result["tank/b"].names == ["auto-2"]
+
+        shell.snapshots_changed = "tank/a\t100\ntank/b\t300\n"
+        m.return_value = [Snapshot("tank/b", "auto-2"), Snapshot("tank/b", "auto-3")]
+        result = cache.get("LOCAL", shell, ["tank/a", "tank/b"])
+        m.assert_called_with(shell, [("tank/b", False)])
+        assert result["tank/a"].names == ["auto-1"]
+        assert result["tank/b"].names == ["auto-2", "auto-3"]
+
+
+def test__snapshot_name_cache__no_snapshots_changed():
+    shell = mock_shell("tank/a\t-\n")
+
+    cache = SnapshotNameCache()
+    with patch("middlewared.plugins.zettarepl_.snapshot_cache.multilist_snapshots",
+               Mock(return_value=[Snapshot("tank/a", "auto-1")])) as m:
+        cache.get("LOCAL", shell, ["tank/a"])
+        cache.get("LOCAL", shell, ["tank/a"])
+        assert m.call_count == 2
+
+
+@pytest.mark.parametrize("now", [100, "date: not found"])
+def test__snapshot_name_cache__not_cached_until_remote_time_passes(now):
+    # The dataset has been changed within the same second of the remote host clock when it was listed (or we do not
+    # know the remote host time)
+    shell = mock_shell("tank/a\t100\n", now)
+
+    cache = SnapshotNameCache()
+    with patch("middlewared.plugins.zettarepl_.snapshot_cache.multilist_snapshots",
+               Mock(return_value=[Snapshot("tank/a", "auto-1")])) as m:
+        cache.get("REMOTE", shell, ["tank/a"])
+        cache.get("REMOTE", shell, ["tank/a"])
+        assert m.call_count == 2
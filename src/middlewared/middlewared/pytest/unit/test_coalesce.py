@@ -0,0 +1,154 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.auth import RootTcpSocketSessionManagerCredentials, UserSessionManagerCredentials
+from middlewared.coalesce import CallCoalescer
+from middlewared.service import coalesce, CRUDService, job, pass_app
+
+
+def user_app(username):
+    return Mock(authenticated_credentials=UserSessionManagerCredentials({
+        "username": username, "privilege": {"allowlist": [], "roles": []},
+    }))
+
+
+@pytest.mark.asyncio
+async def test__concurrent_calls_share_execution():
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return [calls]
+
+    coalescer = CallCoalescer()
+    results = await asyncio.gather(*[coalescer.call("test.method", ("key",), None, call) for _ in range(5)])
+
+    assert results == [[1]] * 5
+    assert results[0] is results[4]
+    assert await coalescer.call("test.method", ("key",), None, call) == [2]
+    assert coalescer.stats() == {"test.method": {"executed": 2, "coalesced": 4, "cached": 0}}
+
+
+@pytest.mark.asyncio
+async def test__different_keys():
+    async def call(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    coalescer = CallCoalescer()
+    assert await asyncio.gather(
+        coalescer.call("test.method", ("a",), None, lambda: call("a")),
+        coalescer.call("test.method", ("b",), None, lambda: call("b")),
+    ) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test__ttl():
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    coalescer = CallCoalescer()
+    assert await coalescer.call("test.method", ("key",), 0.05, call) == 1
+    assert await coalescer.call("test.method", ("key",), 0.05, call) == 1
+    await asyncio.sleep(0.06)
+    assert await coalescer.call("test.method", ("key",), 0.05, call) == 2
+    assert coalescer.stats()["test.method"] == {"executed": 2, "coalesced": 0, "cached": 1}
+
+
+@pytest.mark.asyncio
+async def test__exception_is_shared_and_not_cached():
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("error")
+
+    coalescer = CallCoalescer()
+    results = await asyncio.gather(
+        *[coalescer.call("test.method", ("key",), 10, call) for _ in range(2)], return_exceptions=True,
+    )
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    with pytest.raises(ValueError):
+        await coalescer.call("test.method", ("key",), 10, call)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test__cancelled_caller_does_not_cancel_execution():
+    async def call():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    coalescer = CallCoalescer()
+    first = asyncio.ensure_future(coalescer.call("test.method", ("key",), None, call))
+    second = asyncio.ensure_future(coalescer.call("test.method", ("key",), None, call))
+    await asyncio.sleep(0.005)
+    first.cancel()
+
+    assert await second == "result"
+    assert first.cancelled()
+
+
+def test__key():
+    @coalesce()
+    async def method(filters, options):
+        pass
+
+    coalescer = CallCoalescer()
+    assert coalescer.key("test.method", method, [[], {"limit": 1, "count": True}], user_app("alice")) == \
+        coalescer.key("test.method", method, [[], {"count": True, "limit": 1}], user_app("bob"))
+    assert coalescer.key("test.method", method, [[], {}], None) != \
+        coalescer.key("test.method", method, [[["id", "=", 1]], {}], None)
+    assert coalescer.key("test.method", method, [object()], None) is None
+
+
+def test__key_app():
+    @coalesce()
+    @pass_app()
+    async def method(app):
+        pass
+
+    coalescer = CallCoalescer()
+    assert coalescer.key("test.method", method, [], user_app("alice")) == \
+        coalescer.key("test.method", method, [], user_app("alice"))
+    assert coalescer.key("test.method", method, [], user_app("alice")) != \
+        coalescer.key("test.method", method, [], user_app("bob"))
+    root_app = Mock(authenticated_credentials=RootTcpSocketSessionManagerCredentials())
+    assert coalescer.key("test.method", method, [], user_app("alice")) != \
+        coalescer.key("test.method", method, [], root_app)
+    assert coalescer.key("test.method", method, [], None) is None
+
+
+def test__key_job():
+    @coalesce()
+    @job()
+    def method(job):
+        pass
+
+    assert CallCoalescer().key("test.method", method, [], None) is None
+
+
+def test__crud_query_coalesce():
+    class CoalescedService(CRUDService):
+        class Config:
+            namespace = "test.coalesced"
+            query_coalesce = True
+            query_coalesce_ttl = 5
+
+    class NotCoalescedService(CRUDService):
+        class Config:
+            namespace = "test.not_coalesced"
+
+    assert CoalescedService.query._coalesce == {"ttl": 5}
+    assert not hasattr(NotCoalescedService.query, "_coalesce")
@@ -0,0 +1,126 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.job import Job
+from middlewared.pytest.unit.middleware import Middleware
+from middlewared.service import CoreService
+
+
+def core_service(method):
+    m = Middleware()
+    m["test.method"] = method
+    return CoreService(m)
+
+
+@pytest.mark.asyncio
+async def test__bulk_sequential():
+    calls = []
+
+    async def method(name, fail=False):
+        calls.append(name)
+        if fail:
+            raise ValueError(f"{name} failed")
+        return name
+
+    job = Mock()
+    statuses = await core_service(method).bulk(job, "test.method", [["a"], ["b", True], ["c"]], "Item {0}")
+
+    assert statuses == [
+        {"result": "a", "error": None},
+        {"result": None, "error": "b failed"},
+        {"result": "c", "error": None},
+    ]
+    assert calls == ["a", "b", "c"]
+    job.set_progress.assert_any_call(0, "0 / 3: Item a")
+
+
+@pytest.mark.asyncio
+async def test__bulk_concurrency_keeps_order():
+    running = 0
+    max_running = 0
+
+    async def method(delay):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        return delay
+
+    params = [[0.03], [0.01], [0.02], [0], [0.01]]
+    statuses = await core_service(method).bulk(Mock(), "test.method", params, None, {"concurrency": 2})
+
+    assert [status["result"] for status in statuses] == [0.03, 0.01, 0.02, 0, 0.01]
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test__bulk_group_by_pool():
+    running = set()
+    overlaps = []
+
+    async def method(snapshot):
+        pool = snapshot.split("/")[0]
+        if pool in running:
+            overlaps.append(snapshot)
+        running.add(pool)
+        await asyncio.sleep(0.01)
+        running.discard(pool)
+
+    params = [["tank/a@1"], ["tank/b@1"], ["data/a@1"], ["tank@1"], ["data@1"]]
+    await core_service(method).bulk(Mock(), "test.method", params, None, {"concurrency": 4, "group": "{0!p}"})
+
+    assert overlaps == []
+
+
+@pytest.mark.asyncio
+async def test__bulk_invalid_group():
+    async def method(dataset):
+        return dataset["name"]
+
+    params = [[{"name": "tank/a", "pool": "tank"}], [], [{"name": "tank/b"}]]
+    statuses = await core_service(method).bulk(Mock(), "test.method", params, None, {"group": "{0[pool]}"})
+
+    assert statuses[0] == {"result": "tank/a", "error": None}
+    assert statuses[1]["result"] is None and statuses[1]["error"].startswith("Invalid group: ")
+    assert statuses[2]["result"] is None and statuses[2]["error"].startswith("Invalid group: ")
+
+
+@pytest.mark.asyncio
+async def test__bulk_stop_on_error():
+    async def method(name):
+        if name == "b":
+            raise ValueError("b failed")
+        return name
+
+    statuses = await core_service(method).bulk(
+        Mock(), "test.method", [["a"], ["b"], ["c"]], None, {"stop_on_error": True},
+    )
+
+    assert statuses == [
+        {"result": "a", "error": None},
+        {"result": None, "error": "b failed"},
+        {"result": None, "error": "Not run because a previous call failed"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test__bulk_sub_job_progress():
+    sub_job = Mock(spec=Job, id=10, error=None, progress={"percent": 50})
+
+    async def wait():
+        sub_job.progress["percent"] = 100
+        return "done"
+
+    sub_job.wait.side_effect = wait
+
+    async def method():
+        return sub_job
+
+    job = Mock()
+    statuses = await core_service(method).bulk(job, "test.method", [[]], None)
+
+    assert statuses == [{"result": "done", "error": None, "job_id": 10}]
+    assert job.set_progress.call_args.args[0] == 100
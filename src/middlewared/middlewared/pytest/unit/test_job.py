@@ -0,0 +1,258 @@
+import asyncio
+from collections import defaultdict
+from threading import Event, Lock
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from middlewared.client.client import Client
+from middlewared.job import Job, JobsDeque, JobsQueue, State
+from middlewared.job_history import JobsHistory
+from middlewared.plugins.failover_.jobs_copy import on_job_change
+from middlewared.utils.service.task_state import TaskStateMixin
+
+
+def make_job(middleware=None, username=None):
+    if middleware is None:
+        middleware = Mock()
+        middleware.dump_args.side_effect = lambda args, method: args
+
+    credentials = None
+    if username is not None:
+        credentials = Mock(is_user_session=True, user={'username': username})
+
+    return Job(middleware, 'test.job', Mock(), Mock(), [1, 2], {
+        'check_pipes': False,
+        'pipes': [],
+        'description': None,
+        'transient': False,
+        'abortable': False,
+    }, None, None, credentials)
+
+
+@pytest.fixture()
+def deque(tmp_path):
+    with patch('middlewared.job.LOGS_DIR', str(tmp_path / 'jobs')):
+        yield JobsDeque()
+
+
+def test__encode_cached_until_changed():
+    job = make_job()
+
+    assert job.__encode__() is job.__encode__()
+    assert job.middleware.dump_args.call_count == 1
+
+    job.set_progress(50, 'Working')
+
+    assert job.__encode__()['progress'] == {'percent': 50, 'description': 'Working', 'extra': None}
+    # Arguments do not change
+    assert job.middleware.dump_args.call_count == 1
+
+
+def test__encode_raw_result_cached_separately():
+    job = make_job()
+    job.middleware.dump_result.return_value = 'dumped'
+    job.set_result('result')
+
+    assert job.__encode__()['result'] == 'result'
+    assert job.__encode__(False)['result'] == 'dumped'
+    assert job.__encode__(False)['result'] == 'dumped'
+    assert job.middleware.dump_result.call_count == 1
+
+
+def test__set_progress_sends_delta_only_on_change():
+    job = make_job()
+    job.set_id(5)
+
+    job.set_progress(10, 'Working')
+    job.set_progress(10, 'Working')
+
+    job.middleware.send_event.assert_called_once_with(
+        'core.get_jobs', 'CHANGED', id=5, fields={
+            'id': 5,
+            'method': 'test.job',
+            'arguments': [1, 2],
+            'state': 'WAITING',
+            'progress': {'percent': 10, 'description': 'Working', 'extra': None},
+        },
+    )
+    assert job.middleware.dump_args.call_count == 1
+
+
+def progress_event():
+    job = make_job()
+    job.set_id(5)
+    job.set_progress(10, 'Working')
+    return job.middleware.send_event.call_args.kwargs
+
+
+@pytest.mark.asyncio
+async def test__progress_event_failover_jobs_copy():
+    middleware = Mock(call=AsyncMock())
+
+    await on_job_change(middleware, 'CHANGED', progress_event())
+
+    middleware.call.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test__progress_event_task_state():
+    service = TaskStateMixin()
+    service.task_state_methods = ['test.job']
+    service.middleware = Mock(call=AsyncMock())
+    await service.persist_task_state_on_job_complete()
+    handler = service.middleware.event_subscribe.call_args.args[1]
+
+    await handler(service.middleware, 'CHANGED', progress_event())
+
+    service.middleware.call.assert_not_called()
+
+
+def test__progress_event_client_unknown_job():
+    client = SimpleNamespace(_jobs=defaultdict(dict), _jobs_lock=Lock())
+
+    Client._jobs_callback(client, 'CHANGED', **progress_event())
+
+    assert client._jobs[5]['state'] == 'WAITING'
+    assert '__ready' not in client._jobs[5]
+
+
+def test__select_by_state_and_id(deque):
+    jobs = [make_job() for i in range(3)]
+    for job in jobs:
+        deque.add(job)
+
+    jobs[1].set_state('RUNNING')
+
+    assert deque.select([['state', '=', 'RUNNING']]) == [jobs[1]]
+    assert deque.select([['state', 'in', ['WAITING', 'RUNNING']], ['method', '=', 'test.job']]) == jobs
+    assert deque.select([['id', '=', jobs[2].id]]) == [jobs[2]]
+    assert deque.select([['id', 'in', [jobs[0].id, jobs[1].id]], ['state', '=', 'WAITING']]) == [jobs[0]]
+    assert deque.select([['OR', [['state', '=', 'RUNNING'], ['id', '=', 1]]]]) == jobs
+
+
+def test__select_by_username(deque):
+    jobs = [make_job(username='alice'), make_job(username='bob'), make_job(), make_job(username='alice')]
+    for job in jobs:
+        deque.add(job)
+
+    assert deque.select([], 'alice') == [jobs[0], jobs[3]]
+    assert deque.select([['id', '=', jobs[1].id]], 'alice') == []
+
+
+def test__evicts_oldest_finished_job(deque):
+    deque.maxlen = 2
+    jobs = [make_job() for i in range(3)]
+    for job in jobs:
+        deque.add(job)
+    jobs[2].set_state('ABORTED')
+    jobs[1].set_state('ABORTED')
+
+    deque.add(make_job())
+
+    assert [job.id for job in deque.select([])] == [1, 3, 4]
+    assert deque.select([['state', '=', State.ABORTED.name]]) == [jobs[2]]
+
+
+def test__evicts_oldest_finished_job_after_remove(deque):
+    deque.maxlen = 2
+    jobs = [make_job() for i in range(3)]
+    for job in jobs:
+        deque.add(job)
+    for job in jobs:
+        job.set_state('ABORTED')
+    deque.remove(jobs[0].id)
+
+    deque.add(make_job())
+    deque.add(make_job())
+
+    assert [job.id for job in deque.select([])] == [3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test__persist_continues_ids_of_history(tmp_path):
+    middleware = Mock()
+    middleware.dump_args.side_effect = lambda args, method: args
+    middleware.dump_result.side_effect = lambda result, method: result
+
+    async def run_in_thread(method, *args):
+        return method(*args)
+
+    middleware.run_in_thread = run_in_thread
+
+    with patch('middlewared.job.LOGS_DIR', str(tmp_path / 'jobs')):
+        queue = JobsQueue(middleware)
+    queue.history = JobsHistory(str(tmp_path / 'jobs.db'), None)
+    queue.history.add([(make_job(middleware).__encode__(False) | {'id': i}, None) for i in (1, 2, 50)])
+
+    finished, running = make_job(middleware), make_job(middleware)
+    queue.deque.add(finished)
+    queue.deque.add(running)
+    finished.set_state('ABORTED')
+    await queue.persist(finished)
+
+    new = make_job(middleware)
+    queue.deque.add(new)
+    assert new.id == 51
+    assert [job['id'] for job in queue.query_history([], {})] == [50]
+    assert [job['id'] for job in queue.history.query([], {'order_by': ['id']})] == [1, 50]
+
+
+@pytest.mark.parametrize('filters,queried', [
+    ([['state', '=', 'RUNNING']], False),
+    ([['state', 'in', ['WAITING', 'RUNNING']]], False),
+    ([['id', '=', 1]], False),
+    ([['id', 'in', [1, 2]]], False),
+    ([['id', 'in', [1, 3]]], True),
+    ([['state', 'in', ['RUNNING', 'SUCCESS']]], True),
+    ([['id', '=', [1]]], True),
+    ([], True),
+])
+def test__query_history_only_in_memory(tmp_path, filters, queried):
+    with patch('middlewared.job.LOGS_DIR', str(tmp_path / 'jobs')):
+        queue = JobsQueue(Mock())
+    queue.history = Mock()
+    queue.history_opened = True
+    queue.deque.add(make_job())
+    queue.deque.add(make_job())
+
+    queue.query_history(filters, {})
+
+    assert queue.history.query.called == queried
+
+
+@pytest.mark.asyncio
+async def test__aborted_job_waits_for_thread():
+    loop = asyncio.get_running_loop()
+    middleware = Mock(loop=loop)
+    middleware.dump_args.side_effect = lambda args, method: args
+    middleware.run_in_thread = lambda method, *args: loop.run_in_executor(None, method, *args)
+    events = []
+
+    def method(job, *args):
+        stopped = Event()
+        job.wait_on_abort(stopped)
+        try:
+            while job.state != State.ABORTED:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            events.append('stopped')
+        finally:
+            stopped.set()
+
+    job = make_job(middleware)
+    job.method = method
+    job.options['logs'] = False
+    queue = Mock()
+    queue.release_lock.side_effect = lambda job: events.append('released')
+    queue.persist = AsyncMock()
+
+    run = asyncio.ensure_future(job.run(queue))
+    await asyncio.sleep(0.05)
+    job.abort()
+    await run
+
+    assert job.state == State.ABORTED
+    assert events == ['stopped', 'released']
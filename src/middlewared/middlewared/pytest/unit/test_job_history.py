@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from middlewared.job_history import chronological_key, JobsHistory, JOBS_HISTORY_PRUNE_INTERVAL, history_where
+
+NOW = datetime(2023, 1, 1)
+
+
+def encoded_job(id_, method='test.job', state='SUCCESS'):
+    return {
+        'id': id_,
+        'method': method,
+        'arguments': [id_],
+        'transient': False,
+        'description': None,
+        'abortable': False,
+        'logs_path': f'/var/log/jobs/{id_}.log',
+        'logs_excerpt': None,
+        'progress': {'percent': 100, 'description': '', 'extra': None},
+        'result': None,
+        'error': None,
+        'exception': None,
+        'exc_info': None,
+        'state': state,
+        'time_started': NOW + timedelta(minutes=id_),
+        'time_finished': NOW + timedelta(minutes=id_ + 1),
+        'credentials': None,
+    }
+
+
+@pytest.fixture()
+def history(tmp_path):
+    history = JobsHistory(str(tmp_path / 'jobs.db'), None)
+    history.add([(encoded_job(i, state='FAILED' if i % 2 else 'SUCCESS'), 'alice' if i % 3 == 0 else None)
+                 for i in range(1, 11)])
+    return history
+
+
+def test__roundtrip(history):
+    assert history.last_id() == 10
+    assert history.query([['id', '=', 3]], {}) == [dict(encoded_job(3, state='FAILED'), logs_path=None)]
+
+
+@pytest.mark.parametrize('filters,ids', [
+    ([['state', '=', 'FAILED']], [1, 3, 5, 7, 9]),
+    ([['state', '=', 'FAILED'], ['id', 'in', [1, 2, 3]]], [1, 3]),
+    ([['method', '=', 'other.job']], []),
+    ([['time_started', '>=', NOW + timedelta(minutes=9)]], [9, 10]),
+    ([['time_finished', '<', NOW + timedelta(minutes=3)]], [1]),
+])
+def test__query_filters(history, filters, ids):
+    assert [job['id'] for job in history.query(filters, {})] == ids
+
+
+def test__query_username_and_exclude(history):
+    assert [job['id'] for job in history.query([], {}, 'alice', [6])] == [3, 9]
+
+
+@pytest.mark.parametrize('options,ids', [
+    ({'limit': 2}, [1, 2]),
+    ({'limit': 2, 'offset': 3}, [1, 2, 3, 4, 5]),
+    ({'order_by': ['-id'], 'limit': 3}, [8, 9, 10]),
+])
+def test__query_paging(history, options, ids):
+    assert [job['id'] for job in history.query([['state', 'in', ['SUCCESS', 'FAILED']]], options)] == ids
+
+
+def test__query_inexact_filters_not_limited(history):
+    assert len(history.query([['description', '=', None]], {'limit': 2})) == 10
+
+
+def test__query_max(tmp_path):
+    history = JobsHistory(str(tmp_path / 'jobs.db'), None, query_max=3)
+    history.add([(encoded_job(i), None) for i in range(1, 6)])
+
+    assert [job['id'] for job in history.query([], {})] == [3, 4, 5]
+    assert [job['id'] for job in history.query([['description', '=', None]], {'limit': 2})] == [3, 4, 5]
+    assert [job['id'] for job in history.query([], {'order_by': ['method']})] == [3, 4, 5]
+    # Paged queries are not limited
+    assert [job['id'] for job in history.query([], {'limit': 2, 'offset': 1})] == [1, 2, 3]
+
+
+def test__history_where():
+    assert history_where([['state', '=', 'RUNNING'], ['id', '>', 5], ['OR', []]]) == (['state = ?'], ['RUNNING'], False)
+
+
+def test__open_removes_previous_run_jobs(history):
+    history.open(4)
+
+    assert [job['id'] for job in history.query([], {})] == [5, 6, 7, 8, 9, 10]
+
+
+def test__prune(tmp_path):
+    history = JobsHistory(str(tmp_path / 'jobs.db'), None, max_jobs=3)
+    history.add([(encoded_job(i), None) for i in range(1, 6)])
+
+    history.open(0)
+
+    assert [job['id'] for job in history.query([], {})] == [3, 4, 5]
+
+
+def test__prune_keeps_recently_finished(tmp_path):
+    history = JobsHistory(str(tmp_path / 'jobs.db'), None, max_jobs=3)
+    history.add([(encoded_job(i), None) for i in range(3, 6)])
+    history.open(2)
+    # Jobs of the current run that had been started before the history was opened
+    history.writes = JOBS_HISTORY_PRUNE_INTERVAL - 1
+    history.add([(encoded_job(i) | {'time_finished': NOW + timedelta(hours=i)}, None) for i in (1, 2)])
+
+    assert [job['id'] for job in history.query([], {})] == [5, 1, 2]
+
+
+def test__query_ordered_by_time_finished(history):
+    history.add([(encoded_job(1) | {'time_finished': NOW + timedelta(hours=1)}, None)])
+
+    assert [job['id'] for job in history.query([], {'limit': 2})] == [2, 3]
+    assert [job['id'] for job in history.query([], {})][-1] == 1
+    assert [job['id'] for job in history.query([], {'order_by': ['id'], 'limit': 2})] == [1, 2]
+
+
+def test__query_without_schema(tmp_path):
+    history = JobsHistory(str(tmp_path / 'jobs.db'), None)
+
+    assert history.last_id() == 0
+    assert history.query([], {}) == []
+
+
+def test__chronological_key():
+    jobs = [
+        {'id': 1, 'time_finished': None},
+        {'id': 2, 'time_finished': NOW + timedelta(minutes=1)},
+        {'id': 3, 'time_finished': NOW},
+    ]
+
+    assert [job['id'] for job in sorted(jobs, key=chronological_key)] == [3, 2, 1]
@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from middlewared.metrics import CallMetrics, prometheus_text, thread_pool_stats
+
+
+def test__record():
+    metrics = CallMetrics()
+    metrics.record("test.method", "loop", 0.003, False)
+    metrics.record("test.method", "loop", 0.2, True)
+    metrics.record("test.method", "loop", 100, False)
+
+    method = metrics.snapshot()["methods"]["test.method"]
+    assert method["executor"] == "loop"
+    assert method["count"] == 3
+    assert method["errors"] == 1
+    assert method["latency"]["max"] == 100
+    assert method["latency"]["buckets"]["0.001"] == 0
+    assert method["latency"]["buckets"]["0.005"] == 1
+    assert method["latency"]["buckets"]["0.5"] == 2
+    assert method["latency"]["buckets"]["60"] == 2
+    assert method["latency"]["buckets"]["+Inf"] == 3
+    assert method["queue_wait"]["count"] == 0
+
+
+def test__timer_error():
+    metrics = CallMetrics()
+    with pytest.raises(ValueError):
+        with metrics.timer("test.method", "loop"):
+            raise ValueError()
+
+    assert metrics.snapshot()["methods"]["test.method"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test__timer_queue_wait():
+    metrics = CallMetrics()
+    executor = ThreadPoolExecutor(1)
+    executor.submit(time.sleep, 0.05)
+
+    with metrics.timer("test.method", "service_thread") as timer:
+        assert await asyncio.get_running_loop().run_in_executor(executor, timer.run, sum, [1, 2]) == 3
+
+    method = metrics.snapshot()["methods"]["test.method"]
+    assert method["queue_wait"]["count"] == 1
+    assert 0.03 < method["queue_wait"]["sum"] <= method["latency"]["sum"]
+    assert thread_pool_stats(executor) == {"max_workers": 1, "workers": 1, "busy": 0, "queued": 0}
+
+
+def test__prometheus_text():
+    metrics = CallMetrics()
+    metrics.record("test.method", "thread", 0.02, False, 0.01)
+
+    text = prometheus_text(dict(metrics.snapshot(), executors={"process": {"max_workers": 5, "pending": 1}}))
+
+    assert 'middlewared_calls_total{method="test.method",executor="thread"} 1' in text
+    assert 'middlewared_call_duration_seconds_bucket{method="test.method",le="0.01"} 0' in text
+    assert 'middlewared_call_duration_seconds_bucket{method="test.method",le="+Inf"} 1' in text
+    assert 'middlewared_call_queue_wait_seconds_sum{method="test.method"} 0.01' in text
+    assert "middlewared_loop_lag_seconds 0" in text
+    assert 'middlewared_executor_pending{executor="process"} 1' in text
+    assert "middlewared_executor_busy" not in text
@@ -0,0 +1,114 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.periodic import PeriodicTask, PeriodicTaskScheduler
+from middlewared.service import periodic
+
+
+def test__periodic_descriptor_defaults():
+    @periodic(60)
+    def method():
+        pass
+
+    assert method._periodic == (60, True, None, 1)
+
+
+@pytest.mark.parametrize("interval,jitter", [(60, 6), (86400, 60)])
+def test__default_jitter(interval, jitter):
+    assert PeriodicTask("test.task", None, interval).jitter == jitter
+
+
+def test__delay():
+    with patch("middlewared.periodic.random.uniform", lambda a, b: b):
+        assert PeriodicTask("test.task", None, 60, jitter=5).delay(first=True) == 5
+        assert PeriodicTask("test.task", None, 60, jitter=5).delay() == 65
+        assert PeriodicTask("test.task", None, 60, run_on_start=False, jitter=5).delay(first=True) == 65
+
+
+@pytest.mark.asyncio
+async def test__fixed_delay():
+    starts = []
+
+    async def call():
+        starts.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(0.05)
+
+    scheduler = PeriodicTaskScheduler()
+    scheduler.add("test.task", call, 0.02, jitter=0)
+    scheduler.start()
+    await asyncio.sleep(0.1)
+    scheduler.stop()
+
+    stats = scheduler.stats()[0]
+    assert len(starts) == stats["runs"] + stats["running"] == 2
+    assert starts[1] - starts[0] >= 0.07
+    assert stats["overruns"] == 0
+    assert stats["next_run"] is None
+
+
+@pytest.mark.asyncio
+async def test__fixed_rate_skip_if_still_running():
+    running = 0
+    max_running = 0
+    calls = 0
+
+    async def call():
+        nonlocal running, max_running, calls
+        calls += 1
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    scheduler = PeriodicTaskScheduler()
+    scheduler.add("test.task", call, 0.01, jitter=0, max_concurrency=2)
+    scheduler.start()
+    await asyncio.sleep(0.08)
+    scheduler.stop()
+
+    stats = scheduler.stats()[0]
+    assert calls == stats["runs"] + stats["running"] >= 3
+    assert max_running == 2
+    assert stats["overruns"] >= 2
+    assert stats["last_duration"] >= 0.05
+    assert stats["next_run"] is None
+
+
+@pytest.mark.asyncio
+async def test__global_concurrency():
+    running = 0
+    max_running = 0
+
+    async def call():
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+
+    scheduler = PeriodicTaskScheduler(max_concurrency=2)
+    for i in range(5):
+        scheduler.add(f"test.task{i}", call, 10, jitter=0)
+    scheduler.start()
+    await asyncio.sleep(0.1)
+
+    assert max_running == 2
+    assert all(stats["runs"] == 1 and stats["next_run"] is not None for stats in scheduler.stats())
+    scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def test__errors():
+    async def call():
+        raise ValueError()
+
+    scheduler = PeriodicTaskScheduler()
+    scheduler.add("test.task", call, 0.02, jitter=0)
+    scheduler.start()
+    await asyncio.sleep(0.03)
+    scheduler.stop()
+
+    stats = scheduler.stats()[0]
+    assert stats["errors"] == stats["runs"] >= 1
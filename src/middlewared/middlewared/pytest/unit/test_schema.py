@@ -1,3 +1,5 @@
+import functools
+
 import pytest
 from unittest.mock import Mock
 
@@ -8,6 +10,7 @@ from middlewared.schema import (
     Password, UnixPerm, UUID, LocalUsername, NetbiosName, NetbiosDomain
 )
 from middlewared.plugins.cluster_linux.management import GlusterVolname, MAX_VOLNAME_LENGTH
+from middlewared.utils.type import trusted_method
 from middlewared.validators import QueryFilters, QueryOptions
 
 
@@ -950,3 +953,67 @@ def test__filterable(filters, options, expected_to_fail):
             do_filter_op(self, filters, options)
     else:
         do_filter_op(self, filters, options)
+
+
+def test__accepts_copies_internal_call_args():
+    @accepts(Dict('data', Int('count', default=1), List('items', items=[Dict('item', Str('name'))])))
+    def f(self, data):
+        data['items'][0]['name'] = 'changed'
+        return data
+
+    data = {'items': [{'name': 'item'}]}
+
+    assert f(Mock(), data) == {'count': 1, 'items': [{'name': 'changed'}]}
+    assert data == {'items': [{'name': 'item'}]}
+
+
+def test__accepts_trusted_call_cleans_in_place():
+    @accepts(Dict('data', Int('count', default=1)), Int('limit', default=10))
+    def f(self, data, limit):
+        return data, limit
+
+    data = {}
+    self = Mock()
+
+    result, limit = trusted_method(f)(self, data)
+
+    assert result is data
+    assert data == {'count': 1}
+    assert limit == 10
+    assert trusted_method(f)(self, {}, limit=5) == ({'count': 1}, 5)
+
+
+def test__accepts_trusted_bound_method():
+    class Service:
+        @accepts(Int('id'))
+        def method(self, id_):
+            return self, id_
+
+    service = Service()
+
+    assert trusted_method(service.method)(1) == (service, 1)
+    with pytest.raises(ValidationErrors):
+        trusted_method(service.method)('test')
+
+
+def test__trusted_method_does_not_bypass_wrapper():
+    @accepts(Str('name'))
+    def f(self, name):
+        return name
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        return 'wrapper'
+
+    assert trusted_method(wrapper) is wrapper
+
+
+def test__mutable_default_not_shared():
+    @accepts(Dict('data', List('items', default=[1])), List('list', default=[]))
+    def f(self, data, list_):
+        data['items'].append(2)
+        list_.append(3)
+        return data, list_
+
+    assert f(Mock()) == ({'items': [1, 2]}, [3])
+    assert f(Mock()) == ({'items': [1, 2]}, [3])
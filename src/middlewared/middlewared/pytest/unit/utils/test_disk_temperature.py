@@ -1,6 +1,8 @@
+import os
+
 import pytest
 
-from middlewared.utils.disks import parse_smartctl_for_temperature_output
+from middlewared.utils.disks import parse_smartctl_for_temperature_output, read_hwmon_temperatures
 
 
 @pytest.mark.parametrize("stdout,temperature", [
@@ -18,6 +20,27 @@ from middlewared.utils.disks import parse_smartctl_for_temperature_output
     ("Temperature Sensor 1:               30 Celsius", 30),
     # scsiprint.cpp
     ("Current Drive Temperature:     31 C", 31),
+    # SCT Status
+    ("Device State:                        Active (0)\nCurrent Temperature:                    35 Celsius", 35),
 ])
 def test__get_temperature(stdout, temperature):
     assert parse_smartctl_for_temperature_output(stdout) == temperature
+
+
+def test__read_hwmon_temperatures(tmp_path):
+    for path, value in [
+        ("block/sda/device/hwmon/hwmon3/temp1_input", "36000\n"),
+        ("block/nvme0n1/device/hwmon1/temp1_input", "40850\n"),
+        ("block/sdc/device/hwmon/hwmon4/temp1_input", ""),
+    ]:
+        os.makedirs(os.path.dirname(tmp_path / path))
+        (tmp_path / path).write_text(value)
+    os.makedirs(tmp_path / "block/sdb/device")
+
+    assert read_hwmon_temperatures(["sda", "nvme0n1", "sdb", "sdc", "sdd"], str(tmp_path)) == {
+        "sda": 36,
+        "nvme0n1": 41,
+        "sdb": None,
+        "sdc": None,
+        "sdd": None,
+    }
@@ -0,0 +1,14 @@
+import sys
+
+from middlewared.utils.python import lazy_import
+
+
+def test__lazy_import():
+    sys.modules.pop("colorsys", None)
+
+    colorsys = lazy_import("colorsys")
+    assert "colorsys" not in sys.modules
+
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert "colorsys" in sys.modules
+    assert colorsys.ONE_THIRD is sys.modules["colorsys"].ONE_THIRD
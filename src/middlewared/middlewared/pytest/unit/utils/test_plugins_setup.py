@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from middlewared.utils.plugins import run_setup_graph, setup_critical_path, setup_dependencies
+
+
+def setup_funcs(*plugins):
+    return [(plugin, None, depends) for plugin, depends in plugins]
+
+
+def test__setup_dependencies():
+    funcs = setup_funcs(('pool', ['disk']), ('disk', []), ('datastore', []), ('system', []), ('smb', ['datastore']))
+
+    assert setup_dependencies(funcs, ['datastore', 'auth', 'system']) == {
+        'datastore': set(),
+        'system': {'datastore'},
+        'pool': {'system', 'disk'},
+        'disk': {'system'},
+        'smb': {'system'},
+    }
+
+
+def test__setup_dependencies_undeclared_run_in_order():
+    funcs = setup_funcs(('smb', None), ('datastore', None), ('nfs', None), ('disk', []), ('pool', None))
+
+    assert setup_dependencies(funcs, ['datastore']) == {
+        'datastore': set(),
+        'smb': {'datastore'},
+        'nfs': {'smb'},
+        'disk': {'datastore'},
+        'pool': {'nfs'},
+    }
+
+
+def test__setup_dependencies_unknown_plugin():
+    assert setup_dependencies(setup_funcs(('pool', ['nonexistent'])), []) == {'pool': set()}
+
+
+def test__setup_dependencies_cycle():
+    with pytest.raises(ValueError) as e:
+        setup_dependencies(setup_funcs(('a', ['b']), ('b', ['a']), ('c', [])), [])
+
+    assert str(e.value) == 'Plugins setup dependency cycle: a, b'
+
+
+@pytest.mark.asyncio
+async def test__run_setup_graph():
+    funcs = setup_funcs(('datastore', []), ('disk', []), ('pool', ['disk']), ('smb', []))
+    dependencies = setup_dependencies(funcs, ['datastore'])
+    delays = {'datastore': 0.01, 'disk': 0.03, 'pool': 0.01, 'smb': 0.01}
+    running = set()
+    overlaps = set()
+
+    async def run(plugin, function):
+        for dependency in dependencies[plugin]:
+            assert dependency not in running
+        running.add(plugin)
+        if len(running) > 1:
+            overlaps.update(running)
+        await asyncio.sleep(delays[plugin])
+        running.discard(plugin)
+
+    timings = await run_setup_graph(funcs, dependencies, run)
+
+    assert timings['disk'][1] <= timings['pool'][0]
+    assert timings['datastore'][1] <= min(timings['disk'][0], timings['smb'][0])
+    assert overlaps == {'disk', 'smb'}
+    assert setup_critical_path(timings, dependencies) == ['datastore', 'disk', 'pool']
+
+
+@pytest.mark.asyncio
+async def test__run_setup_graph_error():
+    funcs = setup_funcs(('a', []), ('b', ['a']))
+
+    async def run(plugin, function):
+        if plugin == 'a':
+            raise RuntimeError('setup failed')
+
+    with pytest.raises(RuntimeError):
+        await run_setup_graph(funcs, setup_dependencies(funcs, []), run)
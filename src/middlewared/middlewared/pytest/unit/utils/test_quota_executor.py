@@ -0,0 +1,126 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import threading
+import time
+
+import pytest
+
+from middlewared.service_exception import CallError
+from middlewared.utils.threading import create_executors, in_executors_thread, IoThreadPoolExecutor, QuotaExecutor
+
+
+def test__default_quota():
+    assert QuotaExecutor("test", ThreadPoolExecutor(8)).quota == 4
+    assert QuotaExecutor("test", ThreadPoolExecutor(1)).quota == 1
+
+
+def test__quota():
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def method(i):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return i
+
+    executor = QuotaExecutor("test", ThreadPoolExecutor(8), 2)
+    futures = [executor.submit(method, i) for i in range(10)]
+
+    assert [future.result() for future in futures] == list(range(10))
+    assert max_running == 2
+    assert executor.stats() == {"quota": 2, "running": 0, "queued": 0, "rejected": 0, "nested": 0}
+
+
+def test__quota_does_not_block_other_services():
+    pool = ThreadPoolExecutor(4)
+    noisy = QuotaExecutor("noisy", pool)
+    quiet = QuotaExecutor("quiet", pool)
+
+    event = threading.Event()
+    noisy_futures = [noisy.submit(event.wait) for _ in range(10)]
+
+    assert quiet.submit(lambda: "quiet").result(timeout=1) == "quiet"
+
+    event.set()
+    for future in noisy_futures:
+        future.result()
+
+
+def test__exception():
+    def method():
+        raise ValueError("error")
+
+    executor = QuotaExecutor("test", ThreadPoolExecutor(2), 1)
+    with pytest.raises(ValueError):
+        executor.submit(method).result()
+
+    assert executor.submit(lambda: 1).result() == 1
+
+
+def test__max_queued():
+    event = threading.Event()
+    executor = QuotaExecutor("test", ThreadPoolExecutor(2), 1, 1)
+    running = executor.submit(event.wait)
+    queued = executor.submit(lambda: "queued")
+
+    with pytest.raises(CallError) as e:
+        executor.submit(lambda: "rejected")
+
+    assert e.value.errno == errno.EBUSY
+    assert executor.stats()["rejected"] == 1
+
+    event.set()
+    running.result()
+    assert queued.result() == "queued"
+
+
+def test__cancel_queued():
+    event = threading.Event()
+    executor = QuotaExecutor("test", ThreadPoolExecutor(2), 1)
+    running = executor.submit(event.wait)
+    cancelled = executor.submit(lambda: "cancelled")
+    queued = executor.submit(lambda: "queued")
+
+    assert cancelled.cancel()
+
+    event.set()
+    running.result()
+    assert queued.result() == "queued"
+    assert executor.stats()["running"] == 0
+
+
+def test__nested_call_does_not_wait_for_quota():
+    # Threaded method holding the quota -> `call_sync` of a coroutine method -> threaded method of the same service
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    executor = QuotaExecutor("test", ThreadPoolExecutor(4), 1)
+
+    async def coroutine_method():
+        return await loop.run_in_executor(executor, lambda: "nested")
+
+    def method():
+        return asyncio.run_coroutine_threadsafe(coroutine_method(), loop).result(timeout=5)
+
+    try:
+        assert executor.submit(method).result(timeout=10) == "nested"
+        # Calls that are not made on behalf of the quota holder are still subject to the quota
+        assert asyncio.run_coroutine_threadsafe(coroutine_method(), loop).result(timeout=5) == "nested"
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+    assert executor.stats() == {"quota": 1, "running": 0, "queued": 0, "rejected": 0, "nested": 1}
+
+
+@pytest.mark.parametrize("executor_class", ["IO", "SUBPROCESS", "CPU"])
+def test__in_executors_thread(executor_class):
+    executor = create_executors(IoThreadPoolExecutor())[executor_class]
+
+    assert executor.submit(in_executors_thread).result()
+    assert not in_executors_thread()
@@ -3,14 +3,16 @@ import io
 import xml.etree.ElementTree as ET
 
 from aws_requests_auth.aws_auth import AWSRequestsAuth
-import boto3
-import botocore
 import requests
 
 from middlewared.rclone.base import BaseRcloneRemote
 from middlewared.schema import Password, Str
 from middlewared.service_exception import CallError
 from middlewared.utils.network import INTERNET_TIMEOUT
+from middlewared.utils.python import lazy_import
+
+boto3 = lazy_import("boto3")
+botocore_config = lazy_import("botocore.config")
 
 
 class StorjIxRcloneRemote(BaseRcloneRemote):
@@ -36,7 +38,7 @@ class StorjIxRcloneRemote(BaseRcloneRemote):
         def create_bucket_sync():
             s3_client = boto3.client(
                 "s3",
-                config=botocore.config.Config(user_agent="ix-storj-1"),
+                config=botocore_config.Config(user_agent="ix-storj-1"),
                 endpoint_url="https://gateway.storjshare.io",
                 aws_access_key_id=credentials["attributes"]["access_key_id"],
                 aws_secret_access_key=credentials["attributes"]["secret_access_key"],
@@ -5,7 +5,7 @@ import textwrap
 from middlewared.service_exception import ValidationErrors
 
 from .exceptions import Error
-from .utils import NOT_PROVIDED, REDACTED_VALUE
+from .utils import copy_default, NOT_PROVIDED, REDACTED_VALUE
 
 
 class Attribute:
@@ -47,7 +47,7 @@ class Attribute:
             raise Error(self.name, 'null not allowed')
         if value is NOT_PROVIDED:
             if self.has_default:
-                value = copy.deepcopy(self.default)
+                value = copy_default(self.default)
             else:
                 raise Error(self.name, 'attribute required')
         if not self.editable and value != self.default:
@@ -10,7 +10,7 @@ from middlewared.utils.cron import CRON_FIELDS, croniter_for_schedule
 from .attribute import Attribute
 from .exceptions import Error
 from .string_schema import Str, Time
-from .utils import NOT_PROVIDED, REDACTED_VALUE
+from .utils import copy_default, NOT_PROVIDED, REDACTED_VALUE
 
 
 class Dict(Attribute):
@@ -67,6 +67,9 @@ class Dict(Attribute):
 
     def get_attrs_to_skip(self, data):
         skip_attrs = collections.defaultdict(set)
+        if not self.conditional_defaults:
+            return skip_attrs
+
         check_data = self.get_defaults(data, {}, ValidationErrors(), False) if not self.update else data
         for attr, attr_data in filter(
             lambda k: not filter_list([check_data], k[1]['filters']), self.conditional_defaults.items()
@@ -83,7 +86,7 @@ class Dict(Attribute):
             if self.null:
                 return None
 
-            return copy.deepcopy(self.default)
+            return copy_default(self.default)
 
         if not isinstance(data, dict):
             raise Error(self.name, 'A dict was expected')
@@ -103,7 +106,7 @@ class Dict(Attribute):
 
         # Do not make any field and required and not populate default values
         if not self.update:
-            data.update(self.get_defaults(data, self.get_attrs_to_skip(data), verrors))
+            data.update(self._get_missing_defaults(data, self.get_attrs_to_skip(data), verrors))
 
         verrors.check()
 
@@ -111,12 +114,17 @@ class Dict(Attribute):
 
     def get_defaults(self, orig_data, skip_attrs, verrors, check_required=True):
         data = copy.deepcopy(orig_data)
+        data.update(self._get_missing_defaults(orig_data, skip_attrs, verrors, check_required))
+        return data
+
+    def _get_missing_defaults(self, data, skip_attrs, verrors, check_required=True):
+        defaults = {}
         for attr in list(self.attrs.values()):
             if attr.name not in data and attr.name not in skip_attrs and (
                 (check_required and attr.required) or attr.has_default
             ):
-                data[attr.name] = self._clean_attr(attr, NOT_PROVIDED, verrors)
-        return data
+                defaults[attr.name] = self._clean_attr(attr, NOT_PROVIDED, verrors)
+        return defaults
 
     def _clean_attr(self, attr, value, verrors):
         try:
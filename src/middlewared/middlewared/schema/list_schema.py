@@ -5,7 +5,7 @@ from middlewared.service_exception import ValidationErrors
 from .attribute import Attribute
 from .enum import EnumMixin
 from .exceptions import Error
-from .utils import REDACTED_VALUE
+from .utils import copy_default, REDACTED_VALUE
 
 
 class List(EnumMixin, Attribute):
@@ -20,16 +20,18 @@ class List(EnumMixin, Attribute):
     def clean(self, value):
         value = super(List, self).clean(value)
         if value is None:
-            return copy.deepcopy(self.default)
+            return copy_default(self.default)
         if not isinstance(value, (list, tuple)):
             raise Error(self.name, 'Not a list')
         if not self.empty and not value:
             raise Error(self.name, 'Empty value not allowed')
         if self.items:
+            # An item is only copied if a schema that fails to clean it can be followed by another one
+            copy_item = len(self.items) > 1
             for index, v in enumerate(value):
                 for i in self.items:
                     try:
-                        tmpval = copy.deepcopy(v)
+                        tmpval = copy.deepcopy(v) if copy_item else v
                         value[index] = i.clean(tmpval)
                         found = True
                         break
@@ -121,7 +121,15 @@ def accepts(*schema, deprecated=None, roles=None):
             args_index += f._skip_arg
         assert len(schema) == f.__code__.co_argcount - args_index  # -1 for self
 
-        def clean_and_validate_args(args, kwargs):
+        # Names of the arguments that can be passed as keyword arguments (in the order of the schemas)
+        kwarg_names = f.__code__.co_varnames[args_index:f.__code__.co_argcount]
+
+        def clean_and_validate_args(args, kwargs, trusted=False):
+            """
+            `trusted` arguments are not referenced by anyone else (e.g. they were just decoded from a websocket
+            message or were already copied for a job run) so they are cleaned in-place instead of being deep-copied
+            first.
+            """
             args = list(args)
 
             common_args = args[:args_index]
@@ -135,30 +143,33 @@ def accepts(*schema, deprecated=None, roles=None):
                         had_warning = True
                     signature_args = adapt(*signature_args)
 
-            args = common_args + copy.deepcopy(signature_args)
-            kwargs = copy.deepcopy(kwargs)
+            if not trusted:
+                if signature_args:
+                    signature_args = copy.deepcopy(signature_args)
+                if kwargs:
+                    kwargs = copy.deepcopy(kwargs)
+
+            args = common_args + signature_args
 
             verrors = ValidationErrors()
 
             # Iterate over positional args first, excluding self
-            i = 0
-            if len(args[args_index:]) > len(nf.accepts):
-                raise CallError(f'Too many arguments (expected {len(nf.accepts)}, found {len(args[args_index:])})')
-            for _ in args[args_index:]:
-                args[args_index + i] = clean_and_validate_arg(verrors, nf.accepts[i], args[args_index + i])
-                i += 1
+            accepts = nf.accepts
+            i = len(signature_args)
+            if i > len(accepts):
+                raise CallError(f'Too many arguments (expected {len(accepts)}, found {i})')
+            for j in range(i):
+                args[args_index + j] = clean_and_validate_arg(verrors, accepts[j], args[args_index + j])
 
             # Use i counter to map keyword argument to rpc positional
-            for x in list(range(i + args_index, f.__code__.co_argcount)):
-                kwarg = f.__code__.co_varnames[x]
-
+            for kwarg in kwarg_names[i:]:
                 if kwarg in kwargs:
-                    attr = nf.accepts[i]
+                    attr = accepts[i]
                     i += 1
 
                     value = kwargs[kwarg]
-                elif len(nf.accepts) >= i + 1:
-                    attr = nf.accepts[i]
+                elif len(accepts) >= i + 1:
+                    attr = accepts[i]
                     i += 1
                     value = NOT_PROVIDED
                 else:
@@ -175,11 +186,19 @@ def accepts(*schema, deprecated=None, roles=None):
             async def nf(*args, **kwargs):
                 args, kwargs = clean_and_validate_args(args, kwargs)
                 return await func(*args, **kwargs)
+
+            async def trusted_nf(*args, **kwargs):
+                args, kwargs = clean_and_validate_args(args, kwargs, True)
+                return await func(*args, **kwargs)
         else:
             def nf(*args, **kwargs):
                 args, kwargs = clean_and_validate_args(args, kwargs)
                 return func(*args, **kwargs)
 
+            def trusted_nf(*args, **kwargs):
+                args, kwargs = clean_and_validate_args(args, kwargs, True)
+                return func(*args, **kwargs)
+
         from middlewared.utils.type import copy_function_metadata
         copy_function_metadata(f, nf)
         nf.accepts = list(schema)
@@ -188,6 +207,10 @@ def accepts(*schema, deprecated=None, roles=None):
         nf.roles = roles or []
         nf.wraps = f
         nf.wrap = wrap
+        nf.args_index = args_index
+        nf.clean_and_validate_args = clean_and_validate_args
+        nf.trusted = trusted_nf
+        trusted_nf.untrusted = nf
 
         return nf
 
@@ -1,5 +1,8 @@
+import copy
+
 NOT_PROVIDED = object()
 REDACTED_VALUE = "********"
+IMMUTABLE_TYPES = (type(None), bool, int, float, str, bytes)
 
 MS_RESERVED_WORDS = {
     'ANONYMOUS'.casefold(),
@@ -29,3 +32,16 @@ RFC_852_RESERVED_WORDS = {
 }
 
 RESERVED_WORDS = MS_RESERVED_WORDS | RFC_852_RESERVED_WORDS
+
+
+def copy_default(value):
+    """
+    Returns a copy of an attribute default `value` that can be safely modified. Immutable values do not need to be
+    copied.
+    """
+    if type(value) in IMMUTABLE_TYPES:
+        return value
+    if type(value) in (dict, list) and not value:
+        return type(value)()
+
+    return copy.deepcopy(value)
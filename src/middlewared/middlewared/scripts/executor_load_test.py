@@ -0,0 +1,78 @@
+"""
+Load test for the threaded methods executors.
+
+A noisy service receives a burst of slow blocking calls while a quiet service keeps receiving fast ones. The latency
+of the quiet service calls and the number of threads used are reported when both services submit directly to a shared
+pool (as middlewared did before per-service quotas) and when each of them has its own `QuotaExecutor`.
+
+With the IO pool, which starts single-use threads once it is saturated, the noisy service makes it start a thread per
+call. With a fixed-size pool (e.g. the SUBPROCESS one), the quiet service calls wait for the noisy ones to finish.
+
+Usage: python -m middlewared.scripts.executor_load_test [--noisy-calls 200] [--noisy-duration 1]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import threading
+import time
+
+import middlewared.logger  # noqa: F401 (adds the `trace` log level used by the executors)
+from middlewared.utils.threading import IoThreadPoolExecutor, QuotaExecutor, SUBPROCESS_THREADS
+
+
+async def run(noisy_executor, quiet_executor, noisy_calls, noisy_duration, quiet_calls, quiet_interval):
+    loop = asyncio.get_running_loop()
+    max_threads = threading.active_count()
+
+    def noisy():
+        nonlocal max_threads
+        max_threads = max(max_threads, threading.active_count())
+        time.sleep(noisy_duration)
+
+    async def quiet():
+        start = time.monotonic()
+        await loop.run_in_executor(quiet_executor, time.sleep, 0.001)
+        return time.monotonic() - start
+
+    noisy_futures = [loop.run_in_executor(noisy_executor, noisy) for _ in range(noisy_calls)]
+
+    latencies = []
+    for _ in range(quiet_calls):
+        latencies.append(await quiet())
+        await asyncio.sleep(quiet_interval)
+
+    await asyncio.gather(*noisy_futures)
+
+    return {
+        'quiet_p50_ms': statistics.median(latencies) * 1000,
+        'quiet_max_ms': max(latencies) * 1000,
+        'max_threads': max_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--noisy-calls', type=int, default=200)
+    parser.add_argument('--noisy-duration', type=float, default=1)
+    parser.add_argument('--quiet-calls', type=int, default=20)
+    parser.add_argument('--quiet-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    params = (args.noisy_calls, args.noisy_duration, args.quiet_calls, args.quiet_interval)
+
+    for pool, factory in [
+        ('IO', IoThreadPoolExecutor),
+        ('SUBPROCESS', lambda: ThreadPoolExecutor(SUBPROCESS_THREADS)),
+    ]:
+        executor = factory()
+        result = asyncio.run(run(executor, executor, *params))
+        print(f'{pool} pool, shared: {result}')
+
+        executor = factory()
+        result = asyncio.run(run(QuotaExecutor('noisy', executor), QuotaExecutor('quiet', executor), *params))
+        print(f'{pool} pool, quotas: {result}')
+
+
+if __name__ == '__main__':
+    main()
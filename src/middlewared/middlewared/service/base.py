@@ -21,6 +21,11 @@ def service_config(klass, config):
         'private': False,
         'thread_pool': None,
         'process_pool': None,
+        'executor': 'IO',
+        'executor_quota': None,
+        'executor_max_queued': None,
+        'query_coalesce': False,
+        'query_coalesce_ttl': None,
         'cli_namespace': None,
         'cli_private': False,
         'cli_description': None,
@@ -63,6 +68,13 @@ class ServiceBase(type):
       - verbose_name: human-friendly singular name for the service
       - thread_pool: thread pool to use for threaded methods
       - process_pool: process pool to run service methods
+      - executor: class of the shared thread pool to run threaded methods in when `thread_pool` is not specified:
+                  `IO` (default), `SUBPROCESS` or `CPU` (see `middlewared.utils.threading.create_executors`)
+      - executor_quota: maximum number of threaded methods of the service run at once (default: half of the pool)
+      - executor_max_queued: maximum number of threaded method calls waiting for the quota, further calls fail
+                             with `EBUSY` (default: unlimited)
+      - query_coalesce: coalesce concurrent identical `query` calls of a CRUD service (see `@coalesce`)
+      - query_coalesce_ttl: `ttl` for `query_coalesce`
       - cli_namespace: replace namespace identifier for CLI
       - cli_private: if the service is not private, this flags whether or not the service is visible in the CLI
     """
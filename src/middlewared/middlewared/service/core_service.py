@@ -1,10 +1,12 @@
 import asyncio
+import contextlib
 import errno
 import inspect
 import ipaddress
 import os
 import re
 import socket
+import string
 import threading
 import time
 import traceback
@@ -17,6 +19,7 @@ import middlewared.main
 
 from middlewared.common.environ import environ_update
 from middlewared.job import Job
+from middlewared.job_history import chronological_key
 from middlewared.pipe import Pipes
 from middlewared.plugins.account_.privilege_utils import credential_has_full_admin
 from middlewared.schema import accepts, Any, Bool, Datetime, Dict, Int, List, returns, Str
@@ -34,6 +37,23 @@ from .service import Service
 
 
 MIDDLEWARE_STARTED_SENTINEL_PATH = os.path.join(MIDDLEWARE_RUN_DIR, 'middlewared-started')
+BULK_MAX_CONCURRENCY = 64
+
+
+class BulkFormatter(string.Formatter):
+    """
+    `str.format` with an additional `!p` conversion that returns ZFS pool name of a dataset / snapshot / zvol
+    (e.g. `"{0!p}"` formats `"tank/data@snap"` as `"tank"`).
+    """
+
+    def convert_field(self, value, conversion):
+        if conversion == 'p':
+            return str(value).split('/', 1)[0].split('@', 1)[0]
+
+        return super().convert_field(value, conversion)
+
+
+BULK_FORMATTER = BulkFormatter()
 
 
 def is_service_class(service, klass):
@@ -200,18 +220,31 @@ class CoreService(Service):
         Get information about long-running jobs.
         If authenticated session does not have the FULL_ADMIN role, only
         jobs owned by the current authenticated session will be returned.
+
+        Finished jobs are also kept in a persistent history on the system dataset and are returned after they
+        are no longer tracked in memory. Unless ordered explicitly, these are returned in the order they have finished
+        (job ids are only unique, not ordered, across reboots).
+
+        Only the 1000 most recently finished jobs of the history are considered unless the query is paged: all the
+        filters are on `id`, `method`, `state`, `time_started` or `time_finished`, `limit` is specified and the
+        result is ordered by `id` or not ordered explicitly. Older jobs can be paged through using `offset` or
+        `time_finished` filters.
         """
+        username = None
         if app and self.__is_limited_to_own_jobs(app.authenticated_credentials):
             username = app.authenticated_credentials.user['username']
-            jobs = list(self.middleware.jobs.for_username(username).values())
-        else:
-            jobs = list(self.middleware.jobs.all().values())
+
+        # Only encode jobs that can match `id` / `state` filters
+        jobs = self.middleware.jobs.select(filters, username)
 
         raw_result = options['extra'].get('raw_result', True)
-        jobs = filter_list([
-            i.__encode__(raw_result) for i in jobs
-        ], filters, options)
-        return jobs
+        jobs = [i.__encode__(raw_result) for i in jobs]
+
+        # Jobs that are no longer kept in memory are read from the persistent history (their result is always dumped)
+        if history := self.middleware.jobs.query_history(filters, options, username):
+            jobs = sorted(jobs + history, key=chronological_key)
+
+        return filter_list(jobs, filters, options)
 
     @no_authz_required
     @accepts(Int('id'))
@@ -694,11 +727,85 @@ class CoreService(Service):
     def threads_stacks(self):
         return get_threads_stacks()
 
-    @accepts(Str("method"), List("params"), Str("description", null=True, default=None))
+    @private
+    def startup_profile(self):
+        """
+        Middleware startup profile: plugins import times, plugins setup durations and the setups critical path (also
+        saved to `/var/log/middlewared-startup-profile.json`).
+        """
+        return self.middleware.startup_profile
+
+    @private
+    def metrics(self):
+        """
+        Always-on call metrics: call count, error count, latency histogram (cumulative counts of calls that took up to
+        `le` seconds), executor and executor queue wait time per method. Also event loop lag, thread/process pools
+        saturation and, for `@coalesce` methods, the number of calls that were `executed`, `coalesced` with a call in
+        progress or answered with a `cached` result.
+
+        With `--metrics-endpoint` the same metrics are served in the Prometheus text format at `/_metrics`.
+        """
+        return self.middleware.get_metrics()
+
+    @private
+    def periodic_tasks(self):
+        """
+        Periodic tasks schedule and statistics: next run time, last run start time and duration, number of runs,
+        failed runs and runs skipped because the previous run was still in progress (overruns).
+        """
+        return self.middleware.periodic_tasks.stats()
+
+    @private
+    def validation_benchmark(self, iterations=1000):
+        """
+        Measures `@accepts` argument validation overhead of every method that can be called without arguments (so
+        that all the defaults are populated). Returns microseconds per call for internal calls (arguments are copied)
+        and for trusted calls (arguments are cleaned in-place), slowest methods first.
+        """
+        result = []
+        for service_name, service in self.middleware.get_services().items():
+            for attr in dir(service):
+                if attr.startswith('_'):
+                    continue
+
+                clean_and_validate_args = getattr(getattr(service, attr, None), 'clean_and_validate_args', None)
+                if not callable(clean_and_validate_args):
+                    continue
+
+                method = getattr(service, attr)
+                common_args = [None] * method.args_index
+                try:
+                    clean_and_validate_args(common_args, {})
+                except Exception:
+                    # Method has required arguments
+                    continue
+
+                timings = {}
+                for key, trusted in [('internal', False), ('trusted', True)]:
+                    start = time.perf_counter()
+                    for i in range(iterations):
+                        clean_and_validate_args(common_args, {}, trusted)
+                    timings[key] = (time.perf_counter() - start) / iterations * 1e6
+
+                result.append({'method': f'{service_name}.{attr}', **timings})
+
+        return sorted(result, key=lambda timing: timing['internal'], reverse=True)
+
+    @accepts(
+        Str("method"),
+        List("params"),
+        Str("description", null=True, default=None),
+        Dict(
+            "options",
+            Int("concurrency", default=1, validators=[Range(min_=1, max_=BULK_MAX_CONCURRENCY)]),
+            Str("group", null=True, default=None),
+            Bool("stop_on_error", default=False),
+        ),
+    )
     @job(lock=lambda args: f"bulk:{args[0]}")
-    async def bulk(self, job, method, params, description):
+    async def bulk(self, job, method, params, description, options):
         """
-        Will sequentially call `method` with arguments from the `params` list. For example, running
+        Will call `method` with arguments from the `params` list. For example, running
 
             call("core.bulk", "zfs.snapshot.delete", [["tank@snap-1", true], ["tank@snap-2", false]])
 
@@ -718,33 +825,98 @@ class CoreService(Service):
         error occurs). Caller must check for individual call results to ensure the absence of any call errors.
 
         `description` contains format string for job progress (e.g. "Deleting snapshot {0[dataset]}@{0[name]}")
+
+        `options.concurrency` is the number of calls that are run at the same time (calls are sequential by default).
+        Results are always returned in the order of `params`.
+
+        `options.group` is a format string (same as `description`). Calls that have the same formatted `group` value
+        are never run at the same time. `!p` conversion returns the pool name of a dataset or snapshot, so
+        `"{0!p}"` only runs one call per pool at a time. Calls which `group` can not be formatted are not run and
+        have `"error": "Invalid group: <formatting error>"` status.
+
+        If `options.stop_on_error` is set, no more calls are started after a call fails. Calls that were not run
+        have `"error": "Not run because a previous call failed"` status.
         """
-        statuses = []
+        statuses = [None] * len(params)
         if not params:
             return statuses
 
-        for i, p in enumerate(params):
-            progress_description = f"{i} / {len(params)}"
-            if description is not None:
-                progress_description += ": " + description.format(*p)
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        group_locks = defaultdict(asyncio.Lock)
+        groups = [None] * len(params)
+        if options["group"] is not None:
+            for i, p in enumerate(params):
+                try:
+                    groups[i] = BULK_FORMATTER.format(options["group"], *p)
+                except Exception as e:
+                    statuses[i] = {"result": None, "error": f"Invalid group: {e}"}
+        # Index of the call -> its job (if `method` is a job)
+        running_jobs = {}
+        failed = False
+
+        def set_progress(p=None):
+            done = len(params) - statuses.count(None)
+            # Progress of the running sub-jobs is accounted for proportionally
+            partial = sum((j.progress["percent"] or 0) / 100 for j in running_jobs.values())
+            if p is not None:
+                progress_description = f"{done} / {len(params)}"
+                if description is not None:
+                    progress_description += ": " + description.format(*p)
+            else:
+                progress_description = None
 
-            job.set_progress(100 * i / len(params), progress_description)
+            job.set_progress(100 * (done + partial) / len(params), progress_description)
 
-            try:
-                msg = await self.middleware.call(method, *p)
-                status = {"result": msg, "error": None}
+        async def call(i, p):
+            nonlocal failed
+
+            async with contextlib.AsyncExitStack() as stack:
+                if groups[i] is not None:
+                    await stack.enter_async_context(group_locks[groups[i]])
+
+                await stack.enter_async_context(semaphore)
 
-                if isinstance(msg, Job):
-                    b_job = msg
-                    status["job_id"] = b_job.id
-                    status["result"] = await msg.wait()
+                if failed and options["stop_on_error"]:
+                    statuses[i] = {"result": None, "error": "Not run because a previous call failed"}
+                    return
 
-                    if b_job.error:
-                        status["error"] = b_job.error
+                set_progress(p)
 
-                statuses.append(status)
-            except Exception as e:
-                statuses.append({"result": None, "error": str(e)})
+                try:
+                    msg = await self.middleware.call(method, *p)
+                    status = {"result": msg, "error": None}
+
+                    if isinstance(msg, Job):
+                        b_job = msg
+                        status["job_id"] = b_job.id
+                        running_jobs[i] = b_job
+                        try:
+                            status["result"] = await msg.wait()
+                        finally:
+                            running_jobs.pop(i)
+
+                        if b_job.error:
+                            status["error"] = b_job.error
+                except Exception as e:
+                    status = {"result": None, "error": str(e)}
+
+                if status["error"] is not None:
+                    failed = True
+
+                statuses[i] = status
+
+        pending = [asyncio.ensure_future(call(i, p)) for i, p in enumerate(params) if statuses[i] is None]
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=1)
+                for task in done:
+                    # Raise unexpected errors
+                    task.result()
+
+                set_progress()
+        finally:
+            for task in pending:
+                task.cancel()
 
         return statuses
 
@@ -8,7 +8,7 @@ from middlewared.utils import filter_list
 from middlewared.utils.type import copy_function_metadata
 
 from .base import ServiceBase
-from .decorators import filterable, pass_app, private
+from .decorators import coalesce, filterable, pass_app, private
 from .service import Service
 from .service_mixin import ServiceChangeMixin
 
@@ -69,6 +69,8 @@ class CRUDServiceMetabase(ServiceBase):
             result_entry,
             name='query_result',
         ))(query_method)
+        if klass._config.query_coalesce:
+            klass.query = coalesce(klass._config.query_coalesce_ttl)(klass.query)
 
         for m_name in filter(lambda m: hasattr(klass, m), ('do_create', 'do_update')):
             for d_name, decorator in filter(
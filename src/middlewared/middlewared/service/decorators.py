@@ -8,7 +8,9 @@ from middlewared.schema import accepts, Int, List, OROperator, Ref, returns
 
 
 LOCKS = defaultdict(asyncio.Lock)
-PeriodicTaskDescriptor = namedtuple('PeriodicTaskDescriptor', ['interval', 'run_on_start'])
+PeriodicTaskDescriptor = namedtuple(
+    'PeriodicTaskDescriptor', ['interval', 'run_on_start', 'jitter', 'max_concurrency'], defaults=[None, 1],
+)
 THREADING_LOCKS = defaultdict(threading.Lock)
 
 
@@ -18,6 +20,22 @@ def cli_private(fn):
     return fn
 
 
+def coalesce(ttl=None):
+    """
+    Mark a method that only reads state as safe to coalesce: concurrent API calls with identical arguments (and
+    equivalent credentials if the method receives `app`) share one execution and its result
+    (see `middlewared.coalesce.CallCoalescer`). The result must be plain data, it is sent to all the callers as is.
+
+    If `ttl` is specified, the result is also reused for identical calls made within `ttl` seconds after it was
+    returned.
+    """
+    def wrapper(fn):
+        fn._coalesce = {'ttl': ttl}
+        return fn
+
+    return wrapper
+
+
 def filterable(fn=None, /, *, roles=None):
     def filterable_internal(fn):
         fn._filterable = True
@@ -195,9 +213,17 @@ def pass_app(*, require=False, rest=False):
     return wrapper
 
 
-def periodic(interval, run_on_start=True):
+def periodic(interval, run_on_start=True, *, jitter=None, max_concurrency=1):
+    """
+    Run the method every `interval` seconds (see `middlewared.periodic.PeriodicTaskScheduler`).
+
+    Each run is delayed by a random amount of time up to `jitter` seconds (by default, 10% of the `interval` but no more
+    than a minute). The next run is scheduled once the previous one (including the job if the method is a job) has
+    finished. If `max_concurrency` is greater than one, the method is run at a fixed rate and a run is only skipped if
+    `max_concurrency` previous runs of the method are still in progress.
+    """
     def wrapper(fn):
-        fn._periodic = PeriodicTaskDescriptor(interval, run_on_start)
+        fn._periodic = PeriodicTaskDescriptor(interval, run_on_start, jitter, max_concurrency)
         return fn
 
     return wrapper
@@ -1,7 +1,9 @@
+import glob
+import os
 import re
 
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 
 from middlewared.utils.db import query_table
 
@@ -36,6 +38,11 @@ def parse_smartctl_for_temperature_output(stdout: str) -> Optional[int]:
     if reg:
         return int(reg.group(0).split()[9])
 
+    # SCT Status (`-l scttempsts`)
+    reg = re.search(r'^Current Temperature:\s+([0-9]+) Celsius', stdout, re.M)
+    if reg:
+        return int(reg.group(1))
+
     # nvmeprint.cpp
 
     reg = re.search(r'Temperature:\s+([0-9]+) Celsius', stdout, re.M)
@@ -53,6 +60,28 @@ def parse_smartctl_for_temperature_output(stdout: str) -> Optional[int]:
         return int(reg.group(1))
 
 
+def read_hwmon_temperature(name: str, sysfs: str = '/sys') -> Optional[int]:
+    """
+    Temperature of disk `name` as exposed by the kernel hwmon interface (`drivetemp` driver for ATA disks, `nvme`
+    driver for NVMe controllers reads it from the SMART / Health Information log page).
+    """
+    device = os.path.join(sysfs, 'block', name, 'device')
+    # `drivetemp` registers `device/hwmon/hwmonN`, `nvme` registers `device/hwmonN`
+    for path in sorted(
+        glob.glob(os.path.join(device, 'hwmon', 'hwmon*', 'temp1_input')) +
+        glob.glob(os.path.join(device, 'hwmon[0-9]*', 'temp1_input'))
+    ):
+        try:
+            with open(path) as f:
+                return round(int(f.read().strip()) / 1000)
+        except (OSError, ValueError):
+            pass
+
+
+def read_hwmon_temperatures(names: Iterable[str], sysfs: str = '/sys') -> Dict[str, Optional[int]]:
+    return {name: read_hwmon_temperature(name, sysfs) for name in names}
+
+
 def get_disks_for_temperature_reading() -> Dict[str, Disk]:
     disks = {}
     for disk in query_table('storage_disk', prefix='disk_'):
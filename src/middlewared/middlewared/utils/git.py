@@ -44,3 +44,11 @@ def update_repo(destination: str, branch: str) -> None:
 def validate_git_repo(destination: str) -> bool:
     cp = subprocess.run(['git', '-C', destination, 'status'], capture_output=True)
     return cp.returncode == 0
+
+
+def get_repo_head(destination: str) -> typing.Optional[str]:
+    cp = subprocess.run(['git', '-C', destination, 'rev-parse', 'HEAD'], capture_output=True)
+    if cp.returncode:
+        return None
+
+    return cp.stdout.decode().strip()
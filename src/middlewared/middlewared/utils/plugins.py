@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import importlib
 import inspect
@@ -5,6 +6,7 @@ import itertools
 import logging
 import os
 import sys
+import time
 
 from middlewared.schema import Schemas
 
@@ -53,6 +55,103 @@ def load_classes(module, base, blacklist):
     return classes
 
 
+def setup_dependencies(setup_funcs, order):
+    """
+    Returns `{plugin: set of plugins which setup must be completed first}` for `setup_funcs` list of
+    `(plugin, function, depends)`.
+
+    Plugins listed in `order` are set up one after another before all the other plugins. The other plugins are set up
+    one after another too (in the order of `setup_funcs`) unless they declare the plugins they depend on (module-level
+    `SETUP_DEPENDS` list, `depends` is `None` if it is not declared). Such plugins are set up concurrently as soon as
+    the setup of these plugins is completed. Declaring `SETUP_DEPENDS` also states that the setup of the plugins that
+    do not declare it does not rely on this plugin setup.
+    """
+    plugins = {plugin for plugin, function, depends in setup_funcs}
+    ordered = [plugin for plugin in order if plugin in plugins]
+
+    dependencies = {}
+    previous = ordered[-1:]
+    for plugin, function, depends in setup_funcs:
+        if plugin in ordered:
+            index = ordered.index(plugin)
+            dependencies[plugin] = set(ordered[index - 1:index] if index else [])
+        elif depends is None:
+            dependencies[plugin] = set(previous)
+            previous = [plugin]
+        else:
+            dependencies[plugin] = set(ordered[-1:])
+
+        for dependency in depends or []:
+            if dependency not in plugins:
+                logger.warning('Plugin %r depends on %r which does not have setup function', plugin, dependency)
+                continue
+
+            if dependency in ordered and plugin not in ordered:
+                # Already set up before any of the other plugins
+                continue
+
+            dependencies[plugin].add(dependency)
+
+    # Make sure there are no dependency cycles
+    resolved = set()
+    while len(resolved) < len(dependencies):
+        ready = {plugin for plugin, depends in dependencies.items() if plugin not in resolved and depends <= resolved}
+        if not ready:
+            raise ValueError(
+                f'Plugins setup dependency cycle: {", ".join(sorted(set(dependencies) - resolved))}'
+            )
+
+        resolved |= ready
+
+    return dependencies
+
+
+async def run_setup_graph(setup_funcs, dependencies, run):
+    """
+    Runs `run(plugin, function)` coroutine for every `setup_funcs` entry as soon as setup of all the plugins it
+    depends on has completed. Setups that do not depend on each other run concurrently.
+
+    Returns `{plugin: (started, finished)}` (`time.monotonic()` values).
+    """
+    events = {plugin: asyncio.Event() for plugin, function, depends in setup_funcs}
+    timings = {}
+
+    async def setup(plugin, function):
+        for dependency in dependencies[plugin]:
+            await events[dependency].wait()
+
+        started = time.monotonic()
+        await run(plugin, function)
+        timings[plugin] = (started, time.monotonic())
+        events[plugin].set()
+
+    tasks = [asyncio.ensure_future(setup(plugin, function)) for plugin, function, depends in setup_funcs]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return timings
+
+
+def setup_critical_path(timings, dependencies):
+    """
+    Returns the chain of plugins setups (in order) that determined total plugins setup time: the setup that finished
+    last preceded by the dependency that finished last, and so on.
+    """
+    if not timings:
+        return []
+
+    plugin = max(timings, key=lambda p: timings[p][1])
+    path = [plugin]
+    while depends := [dependency for dependency in dependencies[plugin] if dependency in timings]:
+        plugin = max(depends, key=lambda p: timings[p][1])
+        path.append(plugin)
+
+    return path[::-1]
+
+
 class SchemasMixin:
     def __init__(self):
         self._schemas = Schemas()
@@ -100,7 +199,17 @@ class LoadPluginsMixin(SchemasMixin):
         if not os.path.exists(plugins_dir):
             raise ValueError(f'plugins dir not found: {plugins_dir}')
 
-        for mod in load_modules(plugins_dir, depth=1):
+        # Module name -> time it took to import it (including its dependencies that were not imported yet)
+        self._plugins_import_times = {}
+        modules = load_modules(plugins_dir, depth=1)
+        while True:
+            start = time.monotonic()
+            mod = next(modules, None)
+            if mod is None:
+                break
+
+            self._plugins_import_times[mod.__name__] = time.monotonic() - start
+
             if on_module_begin:
                 on_module_begin(mod)
 
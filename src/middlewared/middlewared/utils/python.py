@@ -1,5 +1,31 @@
+import importlib
 import os
 
 
 def get_middlewared_dir():
     return os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.path.pardir))
+
+
+class LazyModule:
+    """
+    Proxy for a module that is only imported when any of its attributes is accessed for the first time.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attr):
+        # Modules are cached in `sys.modules` after the first import
+        return getattr(importlib.import_module(self.__name), attr)
+
+    def __repr__(self):
+        return f'<LazyModule {self.__name!r}>'
+
+
+def lazy_import(name):
+    """
+    Returns a proxy for module `name` that imports it on first use. Heavy dependencies of plugins that are not used on
+    most systems (VMs, clustering, KMIP, Apps, cloud services) are imported this way so that they are not loaded when
+    middlewared starts.
+    """
+    return LazyModule(name)
@@ -1,14 +1,27 @@
+from collections import deque
 from concurrent.futures import Executor, Future, ThreadPoolExecutor
+import contextvars
+import errno
 from itertools import count
 import logging
 import os
 import threading
 
+from middlewared.service_exception import CallError
+
 from .prctl import set_name
 
 logger = logging.getLogger(__name__)
 counter = count(1)
-__all__ = ["set_thread_name", "start_daemon_thread", "IoThreadPoolExecutor"]
+__all__ = ["set_thread_name", "start_daemon_thread", "IoThreadPoolExecutor", "QuotaExecutor", "create_executors",
+           "in_executors_thread"]
+
+# `QuotaExecutor`s which quota is held by the current call chain. Set in the threads running their calls and inherited
+# by the coroutines these threads run in the event loop (i.e. using `call_sync`)
+quota_holders = contextvars.ContextVar("quota_holders", default=frozenset())
+
+# Number of threads of the executor for services that mostly wait for subprocesses (`Config.executor = "SUBPROCESS"`)
+SUBPROCESS_THREADS = 16
 
 
 def set_thread_name(name):
@@ -33,16 +46,28 @@ class IoThreadPoolExecutor(Executor):
             "IoThread",
             initializer=lambda: set_thread_name("IoThread"),
         )
+        self.saturated = 0
 
     def submit(self, fn, *args, **kwargs):
         if len(self.executor._threads) == self.thread_count and self.executor._idle_semaphore._value - 1 <= 1:
             fut = Future()
+            self.saturated += 1
             logger.trace("Calling %r in a single-use thread", fn)
             start_daemon_thread(name=f"ExtraIoThread_{next(counter)}", target=worker, args=(fut, fn, args, kwargs))
             return fut
 
         return self.executor.submit(fn, *args, **kwargs)
 
+    def stats(self):
+        workers = len(self.executor._threads)
+        return {
+            "max_workers": self.thread_count,
+            "workers": workers,
+            "busy": max(workers - self.executor._idle_semaphore._value, 0),
+            "queued": self.executor._work_queue.qsize(),
+            "saturated": self.saturated,
+        }
+
 
 def worker(fut, fn, args, kwargs):
     set_thread_name("ExtraIoThread")
@@ -50,3 +75,136 @@ def worker(fut, fn, args, kwargs):
         fut.set_result(fn(*args, **kwargs))
     except Exception as e:
         fut.set_exception(e)
+
+
+def create_executors(io_executor):
+    """
+    Shared executors for the service executor classes (`Config.executor`):
+      - IO: blocking I/O (files, sockets, libraries that release the GIL). This is the main thread pool.
+      - SUBPROCESS: methods that mostly wait for external commands to finish (e.g. `ipmitool`).
+      - CPU: CPU-bound methods. There is no point in running more of those at once than there are CPUs.
+    """
+    return {
+        "IO": io_executor,
+        "SUBPROCESS": ThreadPoolExecutor(
+            SUBPROCESS_THREADS,
+            "SubprocessThread",
+            initializer=lambda: set_thread_name("SubprocessThread"),
+        ),
+        "CPU": ThreadPoolExecutor(
+            os.cpu_count() or 1,
+            "CpuThread",
+            initializer=lambda: set_thread_name("CpuThread"),
+        ),
+    }
+
+
+def in_executors_thread():
+    """
+    Whether the current thread belongs to one of the executors created by `create_executors`.
+    """
+    return threading.current_thread().name.startswith(("IoThread", "ExtraIoThread", "SubprocessThread", "CpuThread"))
+
+
+def executor_max_workers(executor):
+    if isinstance(executor, IoThreadPoolExecutor):
+        return executor.thread_count
+
+    return executor._max_workers
+
+
+class QuotaExecutor(Executor):
+    """
+    Runs calls of a single service in a shared `executor`, at most `quota` at a time (by default, half of the
+    `executor` threads), so that a service that receives many slow calls can not starve the others.
+
+    Calls over the quota wait in this service's own queue instead of the shared `executor` queue. If `max_queued`
+    calls are already waiting, new calls are rejected with `EBUSY`.
+
+    Calls made on behalf of a call that already holds this quota (e.g. a threaded method that uses `call_sync` to
+    call a coroutine method of the same service that, in turn, calls another threaded method of it) are not subject
+    to the quota: they would wait for the very calls that are waiting for them otherwise.
+    """
+
+    def __init__(self, name, executor, quota=None, max_queued=None):
+        self.name = name
+        self.executor = executor
+        self.quota = quota or max(executor_max_workers(executor) // 2, 1)
+        self.max_queued = max_queued
+        self.lock = threading.Lock()
+        self.running = 0
+        self.queue = deque()
+        self.rejected = 0
+        self.nested = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if self in quota_holders.get():
+            self.nested += 1
+            return self.executor.submit(self._call, fn, args, kwargs)
+
+        fut = Future()
+        with self.lock:
+            if self.running >= self.quota:
+                if self.max_queued is not None and len(self.queue) >= self.max_queued:
+                    self.rejected += 1
+                    raise CallError(f"Too many {self.name!r} calls are waiting to be run", errno.EBUSY)
+
+                self.queue.append((fut, fn, args, kwargs))
+                return fut
+
+            self.running += 1
+
+        self._run(fut, fn, args, kwargs)
+        return fut
+
+    def _run(self, fut, fn, args, kwargs):
+        while not fut.set_running_or_notify_cancel():
+            # Cancelled while waiting in the queue
+            if (item := self._next()) is None:
+                return
+
+            fut, fn, args, kwargs = item
+
+        try:
+            inner = self.executor.submit(self._call, fn, args, kwargs)
+        except BaseException as e:
+            fut.set_exception(e)
+            self._done(None)
+            return
+
+        inner.add_done_callback(lambda inner: self._done(inner, fut))
+
+    def _call(self, fn, args, kwargs):
+        token = quota_holders.set(quota_holders.get() | {self})
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            quota_holders.reset(token)
+
+    def _done(self, inner, fut=None):
+        if fut is not None:
+            try:
+                result = inner.result()
+            except BaseException as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
+
+        if (item := self._next()) is not None:
+            self._run(*item)
+
+    def _next(self):
+        with self.lock:
+            if self.queue:
+                return self.queue.popleft()
+
+            self.running -= 1
+
+    def stats(self):
+        return {
+            "quota": self.quota,
+            "running": self.running,
+            "queued": len(self.queue),
+            "rejected": self.rejected,
+            "nested": self.nested,
+        }
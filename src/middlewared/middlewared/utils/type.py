@@ -1,3 +1,6 @@
+import types
+
+
 def copy_function_metadata(f, nf):
     nf.__name__ = f.__name__
     nf.__doc__ = f.__doc__
@@ -11,3 +14,22 @@ def copy_function_metadata(f, nf):
     for i in ["accepts", "returns", "roles"]:
         if hasattr(f, i):
             setattr(nf, i, getattr(f, i))
+
+
+def trusted_method(method):
+    """
+    Returns a version of `@accepts`-decorated `method` that cleans its arguments in-place instead of deep-copying them
+    first. It must only be called with arguments that are not referenced by anyone else.
+
+    `method` is returned as is if it can't be called this way (e.g. it was wrapped by another decorator).
+    """
+    func = getattr(method, '__func__', method)
+    trusted = getattr(func, 'trusted', None)
+    # Decorators using `functools.wraps` copy `trusted` attribute to their wrapper which must not be bypassed
+    if trusted is None or getattr(trusted, 'untrusted', None) is not func:
+        return method
+
+    if isinstance(method, types.MethodType):
+        return types.MethodType(trusted, method.__self__)
+
+    return trusted
@@ -0,0 +1,147 @@
+import json
+import shlex
+
+import pytest
+
+from middlewared.test.integration.assets.pool import dataset
+from middlewared.test.integration.utils import call, ssh
+
+
+NFS4_ACLS = [
+    [
+        {'tag': 'owner@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'FULL_CONTROL'}, 'flags': {'BASIC': 'INHERIT'}},
+        {'tag': 'group@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'MODIFY'}, 'flags': {'BASIC': 'INHERIT'}},
+        {'tag': 'everyone@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'TRAVERSE'},
+         'flags': {'BASIC': 'NOINHERIT'}},
+    ],
+    [
+        {'tag': 'owner@', 'id': -1, 'type': 'ALLOW', 'perms': {'BASIC': 'FULL_CONTROL'}, 'flags': {'BASIC': 'INHERIT'}},
+        {'tag': 'USER', 'id': 65534, 'type': 'DENY', 'perms': {'WRITE_DATA': True, 'APPEND_DATA': True},
+         'flags': {'FILE_INHERIT': True}},
+        {'tag': 'GROUP', 'id': 65534, 'type': 'ALLOW', 'perms': {'BASIC': 'READ'},
+         'flags': {'DIRECTORY_INHERIT': True, 'INHERIT_ONLY': True, 'NO_PROPAGATE_INHERIT': True}},
+        {'tag': 'everyone@', 'id': -1, 'type': 'ALLOW', 'perms': {'READ_ATTRIBUTES': True, 'SYNCHRONIZE': True},
+         'flags': {'BASIC': 'NOINHERIT'}},
+    ],
+]
+
+POSIX_ACLS = [
+    'user::rwx,group::r-x,other::---',
+    'user::rwx,user:65534:rw-,group::r-x,group:65534:r--,mask::rwx,other::r--',
+    'user::rwx,group::rwx,other::---,default:user::rwx,default:group::r-x,default:group:65534:rwx,'
+    'default:mask::rwx,default:other::---',
+]
+
+
+def normalize_tool_nfs4(output):
+    for ace in output['acl']:
+        ace['flags'].pop('SUCCESSFUL_ACCESS', None)
+        ace['flags'].pop('FAILED_ACCESS', None)
+
+    return output['acl'], {'autoinherit': output['nfs41_flags']['AUTOINHERIT'],
+                           'protected': output['nfs41_flags']['PROTECTED']}, output['trivial']
+
+
+def tool_posix_acl(path):
+    acl = []
+    for line in ssh(f'getfacl -c -n {shlex.quote(path)}').splitlines():
+        line = line.split('\t')[0]
+        if not line or line.startswith('#'):
+            continue
+
+        default = line.startswith('default:')
+        tag, id_, perms = line.removeprefix('default:').rsplit(':', 2)
+        tag = tag.upper()
+        if not id_ and tag in ('USER', 'GROUP'):
+            tag += '_OBJ'
+
+        acl.append({
+            'default': default,
+            'tag': tag,
+            'id': int(id_) if id_ else -1,
+            'perms': {'READ': perms[0] == 'r', 'WRITE': perms[1] == 'w', 'EXECUTE': perms[2] == 'x'},
+        })
+
+    return acl
+
+
+@pytest.fixture(scope='module')
+def nfs4_dataset():
+    with dataset('acl_codec_nfs4', {'acltype': 'NFSV4', 'aclmode': 'PASSTHROUGH'}) as ds:
+        yield f'/mnt/{ds}'
+
+
+@pytest.fixture(scope='module')
+def posix_dataset():
+    with dataset('acl_codec_posix', {'acltype': 'POSIX'}) as ds:
+        yield f'/mnt/{ds}'
+
+
+@pytest.mark.parametrize('acl', NFS4_ACLS)
+@pytest.mark.parametrize('simplified', [True, False])
+def test_nfs4_getacl_matches_tool(nfs4_dataset, acl, simplified):
+    ssh(f'nfs4xdr_setfacl -j {shlex.quote(json.dumps({"acl": acl}))} {nfs4_dataset}')
+
+    tool = json.loads(ssh(f'nfs4xdr_getfacl -jn{"" if simplified else "v"} {nfs4_dataset}'))
+    result = call('filesystem.getacl', nfs4_dataset, simplified)
+
+    assert (result['acl'], result['nfs41_flags'], result['trivial']) == normalize_tool_nfs4(tool)
+    assert (result['uid'], result['gid']) == (tool['uid'], tool['gid'])
+
+
+@pytest.mark.parametrize('acl', NFS4_ACLS)
+def test_nfs4_setacl_round_trip(nfs4_dataset, acl):
+    call('filesystem.setacl', {'path': nfs4_dataset, 'dacl': acl, 'options': {'canonicalize': False}}, job=True)
+
+    for simplified in (True, False):
+        tool = json.loads(ssh(f'nfs4xdr_getfacl -jn{"" if simplified else "v"} {nfs4_dataset}'))
+        assert call('filesystem.getacl', nfs4_dataset, simplified)['acl'] == normalize_tool_nfs4(tool)[0]
+
+
+@pytest.mark.parametrize('aclstring', POSIX_ACLS)
+def test_posix_getacl_matches_tool(posix_dataset, aclstring):
+    ssh(f'setfacl -b {posix_dataset} && setfacl -m {shlex.quote(aclstring)} {posix_dataset}')
+
+    result = call('filesystem.getacl', posix_dataset)
+
+    assert result['acl'] == tool_posix_acl(posix_dataset)
+    assert result['trivial'] == (len(result['acl']) == 3)
+
+
+@pytest.mark.parametrize('aclstring', POSIX_ACLS)
+def test_posix_setacl_round_trip(posix_dataset, aclstring):
+    ssh(f'setfacl -b {posix_dataset} && setfacl -m {shlex.quote(aclstring)} {posix_dataset}')
+    acl = tool_posix_acl(posix_dataset)
+    ssh(f'setfacl -b {posix_dataset}')
+
+    call('filesystem.setacl', {'path': posix_dataset, 'dacl': acl}, job=True)
+
+    assert tool_posix_acl(posix_dataset) == acl
+
+
+BENCHMARK = '''
+import subprocess, timeit
+from middlewared.plugins.filesystem_ import acl_xattr
+path = {path!r}
+n = 200
+tool = timeit.timeit(lambda: subprocess.run({tool}, capture_output=True, check=True), number=n)
+codec = timeit.timeit(lambda: {codec}, number=n)
+print(int(n / tool), int(n / codec))
+'''
+
+
+@pytest.mark.parametrize('acltype', ['NFS4', 'POSIX'])
+def test_getacl_benchmark(nfs4_dataset, posix_dataset, acltype):
+    if acltype == 'NFS4':
+        script = BENCHMARK.format(
+            path=nfs4_dataset, tool="['nfs4xdr_getfacl', '-jn', path]", codec='acl_xattr.getacl_nfs4(path, True)',
+        )
+    else:
+        script = BENCHMARK.format(
+            path=posix_dataset, tool="['getfacl', '-c', '-n', path]", codec='acl_xattr.getacl_posix1e(path)',
+        )
+
+    tool_rate, codec_rate = map(int, ssh(f'python3 -c {shlex.quote(script)}').split())
+    print(f'{acltype} getacl calls per second: tool={tool_rate} codec={codec_rate}')
+
+    assert codec_rate > tool_rate
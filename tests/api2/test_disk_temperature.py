@@ -12,37 +12,55 @@ def reset_temperature_cache():
     call("disk.reset_temperature_cache")
 
 
+def mock_temperatures(temperature):
+    # `disk.temperatures_uncached` stores the temperatures it collects in the cache
+    return mock("disk.temperatures_uncached", f"""
+        def mock(self, names, powermode):
+            import time
+            self.cache.update({{name: ({temperature}, time.monotonic()) for name in names}})
+            return dict.fromkeys(names, {temperature})
+    """)
+
+
 def test_disk_temperature():
-    with mock("disk.temperature_uncached", return_value=50):
+    with mock_temperatures(50):
         assert call("disk.temperature", "sda") == 50
 
 
 def test_disk_temperature_cache():
-    with mock("disk.temperature_uncached", return_value=50):
+    with mock_temperatures(50):
         call("disk.temperature", "sda")
 
-    with mock("disk.temperature_uncached", exception=True):
+    with mock("disk.temperatures_uncached", exception=True):
         assert call("disk.temperature", "sda", {"cache": 300}) == 50
 
 
 def test_disk_temperature_cache_expires():
-    with mock("disk.temperature_uncached", return_value=50):
+    with mock_temperatures(50):
         call("disk.temperature", "sda")
 
     time.sleep(3)
 
-    with mock("disk.temperature_uncached", return_value=60):
+    with mock_temperatures(60):
         assert call("disk.temperature", "sda", {"cache": 2}) == 60
 
 
 def test_disk_temperatures_only_cached():
-    with mock("disk.temperature_uncached", return_value=50):
+    with mock_temperatures(50):
         call("disk.temperature", "sda")
 
-    with mock("disk.temperature_uncached", exception=True):
+    with mock("disk.temperatures_uncached", exception=True):
         assert call("disk.temperatures", ["sda"], {"only_cached": True}) == {"sda": 50}
 
 
+def test_disk_temperatures_uses_cache():
+    with mock_temperatures(50):
+        call("disk.temperatures", ["sda"])
+
+    with mock("disk.temperatures_uncached", exception=True):
+        assert call("disk.temperatures", ["sda"], {"cache": 300}) == {"sda": 50}
+
+
 def test_disk_temperature_alerts():
     sda_temperature_alert = {
         "uuid": "a11a16a9-a28b-4005-b11a-bce6af008d86",